@@ -52,6 +52,7 @@ a = Analysis(
         'PyQt6.QtCore',
         'PyQt6.QtGui',
         'PyQt6.QtWidgets',
+        'PyQt6.QtPdf',  # 内置 PDF 查看器
         'PyQt6.sip',
         # 数据库
         'sqlalchemy',
@@ -88,7 +89,9 @@ a = Analysis(
         'pygments.lexers',
         'pygments.formatters',
         'pygments.lexers.c_cpp',
-        # 客户端模块
+        'pygments.styles',
+        'pygments.styles.default',
+        # 客户端模块（包的 __init__ 按需导入子模块，静态分析找不到，需全部列出）
         'client',
         'client.main',
         'client.models',
@@ -98,24 +101,44 @@ a = Analysis(
         'client.models.history',
         'client.models.parameter',
         'client.models.update_notification',
+        'client.models.sync',
         'client.services',
         'client.services.auth_service',
         'client.services.regulation_service',
         'client.services.search_service',
         'client.services.update_service',
+        'client.services.cache',
+        'client.services.data_sync_service',
+        'client.services.delta_update',
+        'client.services.git_service',
+        'client.services.notification_watcher',
+        'client.services.replica_sync_service',
+        'client.services.update_downloader',
+        'client.services.update_scheduler',
         'client.ui',
         'client.ui.main_window',
         'client.ui.login_dialog',
         'client.ui.regulation_dialog',
         'client.ui.regulation_detail_dialog',
+        'client.ui.document_viewer',
+        'client.ui.upload_worker',
         'client.ui.update_notifications_dialog',
         'client.ui.push_update_dialog',
+        'client.ui.change_password_dialog',
+        'client.ui.code_manager_dialog',
+        'client.ui.data_sync_dialog',
+        'client.ui.first_run_dialog',
+        'client.ui.github_push_dialog',
+        'client.ui.parameter',
+        'client.ui.regulation_selector_dialog',
         'client.ui.styles',
         'client.utils',
         'client.utils.file_handler',
+        'client.utils.blob_store',
         'client.utils.pdf_parser',
         'client.utils.docx_parser',
         'client.utils.data_exporter',
+        'client.utils.data_importer',
         # 共享模块
         'shared',
         'shared.config',
@@ -147,7 +170,7 @@ exe = EXE(
     debug=True,  # 启用调试模式
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=False,  # UPX 压缩的文件每次启动都要解压，关闭以加快启动
     console=True,  # 启用控制台，显示错误信息
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -161,7 +184,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='SafetyManager',
 )
@@ -0,0 +1,254 @@
+"""
+基准测试数据生成器
+按随机种子生成可复现的法规、标签、参数（含备注图片）和历史记录，以及导入文件和 C 模板
+
+数据库连接在导入 client.models 时建立，调用方需先设置 DATABASE_PATH 等环境变量
+（见 run_benchmarks.py）
+"""
+import sys
+import json
+import zlib
+import random
+import struct
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, select
+
+from client.models import (
+    Regulation, Tag, RegulationTag, RegulationParameter, ChangeHistory, session_scope, chunked
+)
+from shared.constants import RegulationStatus, EntityType, ChangeType
+
+
+COUNTRIES = ("德国", "英国", "澳洲", "新西兰", "荷兰", "北爱尔兰", "法国", "意大利")
+CATEGORIES = ("并网标准", "安规", "电能质量", "储能", "防孤岛")
+PARAMETER_CATEGORIES = ("并网连接条件", "过欠压保护", "过欠频保护", "有功功率控制", "无功功率控制", "低电压穿越")
+UNITS = ("V", "Hz", "s", "%", "W", "\\")
+COEFFICIENTS = ("1", "0.1", "0.01", "0.001")
+STATUSES = (RegulationStatus.ACTIVE, RegulationStatus.DRAFT, RegulationStatus.ARCHIVED)
+WORDS = ("电网", "频率", "电压", "保护", "逆变器", "有功", "无功", "穿越", "孤岛", "并网", "功率因数", "谐波")
+
+# 参数协议位从这里开始按行顺序编号，C 模板使用相同的编号
+PROTOCOL_BIT_BASE = 11000
+# 批量写入的行数
+INSERT_BATCH_SIZE = 5000
+BASE_TIME = datetime(2024, 1, 1)
+
+
+@dataclass
+class DatasetSpec:
+    """数据集规模"""
+    regulations: int = 1000
+    parameters_per_regulation: int = 20
+    tags: int = 50
+    max_tags_per_regulation: int = 3
+    # 每条法规除创建记录外的更新记录数
+    history_updates: int = 3
+    # 带备注图片的参数行比例
+    image_ratio: float = 0.05
+    # 导入文件中的法规数，0 表示与 regulations 相同
+    import_rows: int = 0
+    seed: int = 42
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def make_png(rng: random.Random, size: int = 32) -> bytes:
+    """生成一张纯色 PNG 图片（模拟参数备注中的截图）"""
+    color = bytes(rng.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + color * size for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+def _description(rng: random.Random) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+
+
+def _regulation_row(rng: random.Random, index: int, code_prefix: str = "REG") -> dict:
+    country = rng.choice(COUNTRIES)
+    category = rng.choice(CATEGORIES)
+    return {
+        "code": f"{code_prefix}-{index:06d}",
+        "name": f"{country}{category}法规 {index}",
+        "country": country,
+        "category": category,
+        "description": _description(rng),
+        "status": rng.choice(STATUSES),
+        "version": f"V{rng.randint(1, 5)}.{rng.randint(0, 9)}",
+    }
+
+
+def parameter_rows(rng: random.Random, count: int) -> List[dict]:
+    """一条法规的参数行（键为 RegulationParameter 字段名，值为表格中的文本）"""
+    rows = []
+    for order in range(count):
+        coefficient = rng.choice(COEFFICIENTS)
+        rows.append({
+            "category": rng.choice(PARAMETER_CATEGORIES),
+            "parameter_name": f"{rng.choice(WORDS)}{rng.choice(WORDS)}参数{order}",
+            "default_value": "-" if rng.random() < 0.05 else str(round(rng.uniform(-100, 500), 2)),
+            "upper_limit": str(rng.randint(100, 1000)),
+            "lower_limit": rng.choice(("-", "0", str(rng.randint(-100, 0)))),
+            "unit": rng.choice(UNITS),
+            "coefficient": coefficient,
+            "protocol_bit": "-" if rng.random() < 0.05 else str(PROTOCOL_BIT_BASE + order),
+            "remark": _description(rng) if rng.random() < 0.3 else "",
+        })
+    return rows
+
+
+def generate_dataset(spec: DatasetSpec, user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    向当前数据库写入数据集（用于空数据库）
+
+    法规、标签和参数用 Core 批量插入；历史记录通过 ChangeHistory.create_change_records 写入，
+    与程序中的写入方式相同（压缩载荷、定期快照）
+
+    Returns:
+        各表写入的行数
+    """
+    rng = random.Random(spec.seed)
+    counts = {"regulations": 0, "tags": 0, "regulation_tags": 0, "parameters": 0, "images": 0, "history": 0}
+
+    with session_scope() as db:
+        tag_names = [f"标签{i:03d}" for i in range(spec.tags)]
+        if tag_names:
+            db.execute(insert(Tag), [{"name": name, "created_at": BASE_TIME} for name in tag_names])
+        tag_ids = dict(db.execute(select(Tag.name, Tag.id)).all())
+        counts["tags"] = len(tag_names)
+
+        images = [make_png(rng) for _ in range(16)]
+        for batch_start in range(0, spec.regulations, INSERT_BATCH_SIZE):
+            batch_end = min(batch_start + INSERT_BATCH_SIZE, spec.regulations)
+            regulations = []
+            for index in range(batch_start, batch_end):
+                row = _regulation_row(rng, index)
+                row["created_by"] = user_id
+                row["created_at"] = row["updated_at"] = BASE_TIME + timedelta(minutes=index)
+                regulations.append(row)
+            db.execute(insert(Regulation), regulations)
+
+            codes = [row["code"] for row in regulations]
+            ids = {}
+            for chunk in chunked(codes):
+                ids.update(db.execute(select(Regulation.code, Regulation.id).where(Regulation.code.in_(chunk))).all())
+
+            links, parameters, created = [], [], []
+            for row in regulations:
+                regulation_id = ids[row["code"]]
+                names = rng.sample(tag_names, rng.randint(0, min(spec.max_tags_per_regulation, len(tag_names))))
+                links.extend({"regulation_id": regulation_id, "tag_id": tag_ids[name]} for name in names)
+
+                for order, values in enumerate(parameter_rows(rng, spec.parameters_per_regulation)):
+                    image = images[rng.randrange(len(images))] if rng.random() < spec.image_ratio else None
+                    counts["images"] += image is not None
+                    parameters.append(dict(
+                        values, regulation_id=regulation_id, row_order=order, remark_image=image,
+                        created_at=row["created_at"], updated_at=row["created_at"], valid_from=row["created_at"],
+                    ))
+
+                snapshot = {
+                    "id": regulation_id, "code": row["code"], "name": row["name"],
+                    "country": row["country"], "category": row["category"],
+                    "description": row["description"], "status": row["status"].value,
+                    "version": row["version"], "created_at": row["created_at"].isoformat(), "tags": names,
+                }
+                created.append((regulation_id, {}, f"创建法规: {row['name']}", snapshot))
+
+            if links:
+                db.execute(insert(RegulationTag), links)
+            for start in range(0, len(parameters), INSERT_BATCH_SIZE):
+                db.execute(insert(RegulationParameter), parameters[start:start + INSERT_BATCH_SIZE])
+            ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.CREATE, created, user_id)
+
+            # 历史更新记录：每轮修改每条法规的版本号
+            for round_no in range(spec.history_updates):
+                updated = []
+                for regulation_id, _, _, snapshot in created:
+                    old_version = snapshot["version"]
+                    snapshot = dict(snapshot, version=f"{old_version}.{round_no + 1}")
+                    updated.append((
+                        regulation_id, {"changed": {"version": [old_version, snapshot["version"]]}},
+                        f"更新法规: {snapshot['name']}", snapshot
+                    ))
+                ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.UPDATE, updated, user_id)
+                created = updated
+
+            counts["regulations"] += len(regulations)
+            counts["regulation_tags"] += len(links)
+            counts["parameters"] += len(parameters)
+            counts["history"] += len(regulations) * (1 + spec.history_updates)
+
+    return counts
+
+
+def import_records(spec: DatasetSpec, code_prefix: str) -> List[dict]:
+    """导入文件的法规数据（新编号，使用已有的标签名）"""
+    rng = random.Random(f"{spec.seed}-{code_prefix}")
+    tag_names = [f"标签{i:03d}" for i in range(spec.tags)]
+    records = []
+    for index in range(spec.import_rows or spec.regulations):
+        row = _regulation_row(rng, index, code_prefix)
+        row["status"] = row["status"].value
+        row["tags"] = rng.sample(tag_names, rng.randint(0, min(spec.max_tags_per_regulation, len(tag_names))))
+        records.append(row)
+    return records
+
+
+def write_import_json(records: List[dict], path: Path):
+    """写入 DataImporter.import_from_json 格式的文件"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"total_count": len(records), "regulations": records}, f, ensure_ascii=False)
+
+
+def write_import_excel(records: List[dict], path: Path):
+    """写入 DataImporter.import_from_excel 格式的文件（中文表头）"""
+    from openpyxl import Workbook
+
+    # 不使用 write_only：导入按工作表尺寸统计总行数，write_only 模式不写尺寸信息
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "法规列表"
+    ws.append(["法规编号", "法规名称", "国家/地区", "分类", "状态", "版本", "标签", "描述"])
+    for row in records:
+        ws.append([
+            row["code"], row["name"], row["country"], row["category"], row["status"],
+            row["version"], ", ".join(row["tags"]), row["description"],
+        ])
+    wb.save(path)
+
+
+def write_c_template(path: Path, parameter_count: int):
+    """
+    写入与生成参数协议位对应的 C 模板（格式同 Satety_Parameter.c：
+    4 行表头，每行 "{ 默认值 , MIN , MAX },   // 协议位 说明"，以 "};" 结束）
+    """
+    write_protocol_template(path, [str(PROTOCOL_BIT_BASE + order) for order in range(parameter_count)])
+
+
+def write_protocol_template(path: Path, protocol_bits: List[str]):
+    """按给定协议位写入 C 模板"""
+    lines = [
+        "// 安规参数表（基准测试生成）\n",
+        "// DEF     MIN     MAX\n",
+        "\n",
+        "const SAFETY_PARAM SafetyParamTable[] = {\n",
+    ]
+    for number, protocol_bit in enumerate(protocol_bits):
+        lines.append(f"    {{   0       ,   0      ,   65535  }},   // {protocol_bit} 参数{number}\n")
+    lines.append("};\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
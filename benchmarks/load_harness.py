@@ -0,0 +1,423 @@
+"""
+多客户端并发负载测试
+启动 N 个进程，每个进程模拟一个客户端，对同一个数据库混合执行
+列表、搜索、打开详情、保存参数和导入操作，统计吞吐量、延迟分位数、
+锁等待时间和 "database is locked" 失败次数
+
+用法:
+    python benchmarks/load_harness.py --clients 8 --duration 30
+    python benchmarks/load_harness.py --clients 8 --journal-mode wal --busy-timeout 10000
+    python benchmarks/load_harness.py --clients 8 --database \\\\server\\share\\regulations.db
+    python benchmarks/load_harness.py --clients 8 --postgres     # 使用 .env 中的 PostgreSQL 配置
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+# 设置UTF-8编码输出
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 各操作的默认权重
+DEFAULT_MIX = {"list": 35, "search": 25, "detail": 20, "save": 15, "import": 5}
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal")
+# 每次导入操作的法规数
+DEFAULT_IMPORT_BATCH = 20
+SEARCH_WORDS = ("电压", "频率", "保护", "并网", "逆变器", "不存在的关键词")
+LOCKED_MESSAGE = "database is locked"
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """解析操作权重，如 "list=40,search=30,save=30"（未列出的操作不执行）"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"未知操作: {name}（可选: {', '.join(DEFAULT_MIX)}）")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def configure_environment(config: dict):
+    """让本进程使用负载测试的数据库（必须在导入 client 之前调用）"""
+    if config["postgres"]:
+        os.environ["OFFLINE_MODE"] = "false"
+    else:
+        os.environ["OFFLINE_MODE"] = "true"
+        os.environ["DATABASE_PATH"] = config["database"]
+    os.environ["REPLICA_MODE"] = "false"
+
+    # 失败的操作计入报告，不逐条输出错误日志
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="CRITICAL")
+
+
+def install_instrumentation(config: dict) -> dict:
+    """
+    在本进程的数据库引擎上统计语句耗时和锁冲突
+
+    SQLite 等待写锁发生在写语句和提交中（busy_timeout 期间阻塞），
+    因此写语句和提交的耗时作为锁等待时间；单客户端运行时即为无竞争的写入耗时
+    """
+    from sqlalchemy import event
+    from client.models import engine
+
+    stats = {"read_ms": 0.0, "write_ms": 0.0, "commit_ms": 0.0, "locked": 0}
+
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_conn, connection_record):
+            cursor = dbapi_conn.cursor()
+            if config["journal_mode"]:
+                cursor.execute(f"PRAGMA journal_mode={config['journal_mode']}")
+            if config["busy_timeout"] is not None:
+                cursor.execute(f"PRAGMA busy_timeout={config['busy_timeout']}")
+            cursor.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info.pop("statement_start")) * 1000
+        is_read = statement.lstrip()[:6].upper() in ("SELECT", "PRAGMA")
+        stats["read_ms" if is_read else "write_ms"] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def count_locked(context):
+        if LOCKED_MESSAGE in str(context.original_exception):
+            stats["locked"] += 1
+
+    # 提交没有执行后事件，直接包装方言的提交方法计时
+    do_commit = engine.dialect.do_commit
+
+    def timed_commit(dbapi_connection):
+        start = time.perf_counter()
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            stats["commit_ms"] += (time.perf_counter() - start) * 1000
+
+    engine.dialect.do_commit = timed_commit
+    return stats
+
+
+def client_worker(client_no: int, config: dict, start_barrier, results):
+    """客户端进程：在 config["duration"] 秒内按权重随机执行操作"""
+    configure_environment(config)
+
+    from client.models import ChangeHistory, session_scope, remove_session
+    from client.models.parameter import PARAMETER_VALUE_FIELDS
+    from client.services import RegulationService, SearchService
+    from client.services.cache import data_cache
+    from client.utils.data_importer import DataImporter
+    from shared.constants import EntityType
+    from benchmarks import data_generator
+
+    stats = install_instrumentation(config)
+    rng = random.Random(f"{config['seed']}-{client_no}")
+    service = RegulationService()
+    search = SearchService()
+    importer = DataImporter()
+    regulation_ids = config["regulation_ids"]
+    user_id = config["user_id"]
+    work_dir = Path(config["work_dir"])
+    import_counter = 0
+
+    def op_list():
+        country = rng.choice((None, None) + data_generator.COUNTRIES)
+        return service.list_regulations(country=country)
+
+    def op_search():
+        return search.search(rng.choice(SEARCH_WORDS), country=rng.choice((None,) + data_generator.COUNTRIES))
+
+    def op_detail():
+        # 与打开法规详情相同：法规（含文档、代码、标签）、参数和历史记录
+        regulation_id = rng.choice(regulation_ids)
+        service.get_regulation(regulation_id)
+        service.get_parameters(regulation_id)
+        with session_scope() as db:
+            db.query(ChangeHistory).filter(
+                ChangeHistory.entity_type == EntityType.REGULATION,
+                ChangeHistory.entity_id == regulation_id
+            ).order_by(ChangeHistory.id.desc()).all()
+
+    def op_save():
+        regulation_id = rng.choice(regulation_ids)
+        rows = [{field: getattr(param, field) for field in PARAMETER_VALUE_FIELDS}
+                for param in service.get_parameters(regulation_id)]
+        if rows:
+            rows[rng.randrange(len(rows))]["default_value"] = str(rng.randint(0, 1000))
+        return service.save_parameters(regulation_id, rows, changed_by=user_id)
+
+    def op_import():
+        nonlocal import_counter
+        import_counter += 1
+        spec = data_generator.DatasetSpec(import_rows=config["import_batch"], seed=config["seed"])
+        path = work_dir / f"import_{client_no}_{import_counter}.json"
+        data_generator.write_import_json(
+            data_generator.import_records(spec, f"LOAD{client_no}X{import_counter}"), path
+        )
+        try:
+            return importer.import_from_json(str(path), user_id)
+        finally:
+            path.unlink(missing_ok=True)
+
+    operations = {"list": op_list, "search": op_search, "detail": op_detail, "save": op_save, "import": op_import}
+    names = list(config["mix"])
+    weights = [config["mix"][name] for name in names]
+
+    samples = []  # (操作, 延迟毫秒, 成功, 错误)
+    start_barrier.wait()
+    deadline = time.perf_counter() + config["duration"]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        # 每次都访问数据库，不让本进程的缓存掩盖并发冲突
+        data_cache.clear()
+        locked_before = stats["locked"]
+        start = time.perf_counter()
+        error = None
+        try:
+            result = operations[name]()
+            if isinstance(result, tuple) and result and result[0] is False:
+                error = str(result[1])
+        except Exception as e:
+            error = str(e)
+        latency = (time.perf_counter() - start) * 1000
+        # 搜索等操作在内部捕获异常，通过引擎的错误事件发现锁冲突
+        if error is None and stats["locked"] > locked_before:
+            error = LOCKED_MESSAGE
+        samples.append((name, latency, error is None, error))
+
+    remove_session()
+    results.put({"client": client_no, "samples": samples, "stats": stats})
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩法分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(client_results: List[dict], duration: float) -> dict:
+    """汇总各客户端的结果"""
+    latencies = defaultdict(list)
+    failures = defaultdict(Counter)
+    totals = Counter()
+    for result in client_results:
+        for name, latency, ok, error in result["samples"]:
+            latencies[name].append(latency)
+            if not ok:
+                kind = LOCKED_MESSAGE if LOCKED_MESSAGE in error else error[:80]
+                failures[name][kind] += 1
+        for key, value in result["stats"].items():
+            totals[key] += value
+
+    operations = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        failed = sum(failures[name].values())
+        operations[name] = {
+            "count": len(values),
+            "failed": failed,
+            "locked": failures[name][LOCKED_MESSAGE],
+            "throughput_per_s": round(len(values) / duration, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2),
+            "errors": dict(failures[name]),
+        }
+
+    count = sum(op["count"] for op in operations.values())
+    all_values = sorted(v for values in latencies.values() for v in values)
+    return {
+        "operations": operations,
+        "total": {
+            "count": count,
+            "failed": sum(op["failed"] for op in operations.values()),
+            "locked": sum(op["locked"] for op in operations.values()),
+            "locked_errors": totals["locked"],
+            "throughput_per_s": round(count / duration, 2),
+            "p50_ms": round(percentile(all_values, 50), 2),
+            "p95_ms": round(percentile(all_values, 95), 2),
+            "p99_ms": round(percentile(all_values, 99), 2),
+            "max_ms": round(all_values[-1], 2) if all_values else 0.0,
+            "read_ms": round(totals["read_ms"], 1),
+            "lock_wait_ms": round(totals["write_ms"] + totals["commit_ms"], 1),
+            "commit_ms": round(totals["commit_ms"], 1),
+        },
+    }
+
+
+def print_report(summary: dict, config: dict):
+    print(f"\n{config['clients']} 个客户端，{config['duration']} 秒，"
+          f"{'PostgreSQL' if config['postgres'] else 'SQLite ' + config['database']}"
+          + (f"，journal_mode={config['journal_mode']}" if config["journal_mode"] else "")
+          + (f"，busy_timeout={config['busy_timeout']}" if config["busy_timeout"] is not None else ""))
+    print(f"   {'操作':<8}{'次数':>8}{'失败':>6}{'锁冲突':>7}{'吞吐/秒':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'最大 ms':>10}")
+    rows = list(summary["operations"].items()) + [("合计", summary["total"])]
+    for name, op in rows:
+        print(f"   {name:<8}{op['count']:>8}{op['failed']:>6}{op['locked']:>7}{op['throughput_per_s']:>10.1f}"
+              f"{op['p50_ms']:>10.1f}{op['p95_ms']:>10.1f}{op['p99_ms']:>10.1f}"
+              f"{op['max_ms']:>10.1f}")
+
+    total = summary["total"]
+    print(f"\n   读语句耗时 {total['read_ms'] / 1000:.1f} s，"
+          f"写语句和提交耗时（含等待写锁）{total['lock_wait_ms'] / 1000:.1f} s，其中提交 {total['commit_ms'] / 1000:.1f} s")
+    print(f"   数据库锁冲突错误 {total['locked_errors']} 次")
+    for name, op in summary["operations"].items():
+        for error, count in op["errors"].items():
+            if error != LOCKED_MESSAGE:
+                print(f"   [{name}] {count} 次: {error}")
+
+
+def prepare_database(config: dict, size: int, seed: int) -> dict:
+    """在父进程中初始化数据库并生成数据集，返回客户端需要的法规 ID 和用户 ID"""
+    configure_environment(config)
+    from sqlalchemy import text
+    from client.models import init_db, engine, session_scope, Regulation, User
+    from benchmarks import data_generator
+
+    if config["postgres"]:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            raise RuntimeError(f"无法连接 PostgreSQL: {e}")
+
+    init_db()
+    with session_scope() as db:
+        user_id = db.query(User.id).filter(User.username == "admin").scalar()
+        existing = db.query(Regulation.id).count()
+
+    if existing:
+        print(f"数据库中已有 {existing} 条法规，直接使用")
+    else:
+        print(f"生成数据集: {size} 条法规 (种子 {seed})")
+        data_generator.generate_dataset(data_generator.DatasetSpec(regulations=size, seed=seed), user_id)
+
+    if engine.dialect.name == "sqlite" and config["journal_mode"] == "wal":
+        # WAL 模式保存在数据库文件中，在启动客户端前切换
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=wal")
+
+    with session_scope() as db:
+        regulation_ids = [row[0] for row in db.query(Regulation.id).filter(Regulation.code.like("REG-%"))]
+    engine.dispose()
+    return {"regulation_ids": regulation_ids or [1], "user_id": user_id}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多客户端并发负载测试")
+    parser.add_argument("--clients", type=int, default=4, help="客户端进程数")
+    parser.add_argument("--duration", type=float, default=20, help="每个客户端运行的秒数")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="操作权重，如 list=35,search=25,detail=20,save=15,import=5")
+    parser.add_argument("--size", type=int, default=1000, help="空数据库时生成的法规数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--import-batch", type=int, default=DEFAULT_IMPORT_BATCH, help="每次导入的法规数")
+    parser.add_argument("--database", help="SQLite 数据库文件（默认在临时目录新建；测试会写入数据，请使用副本）")
+    parser.add_argument("--postgres", action="store_true", help="使用 .env 中配置的 PostgreSQL")
+    parser.add_argument("--journal-mode", choices=JOURNAL_MODES, help="SQLite 日志模式（默认不修改）")
+    parser.add_argument("--busy-timeout", type=int, help="SQLite 等待锁的毫秒数（默认 5000）")
+    parser.add_argument("--output", type=Path, help="结果输出文件（JSON）")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="safety_load_"))
+    config = {
+        "clients": max(1, args.clients),
+        "duration": args.duration,
+        "mix": args.mix,
+        "seed": args.seed,
+        "import_batch": args.import_batch,
+        "postgres": args.postgres,
+        "database": str(Path(args.database).resolve()) if args.database else str(work_dir / "load.db"),
+        "journal_mode": args.journal_mode,
+        "busy_timeout": args.busy_timeout,
+        "work_dir": str(work_dir),
+    }
+
+    try:
+        # 父进程只负责准备数据和汇总，用 spawn 启动客户端，各自建立数据库连接
+        context = multiprocessing.get_context("spawn")
+        prepare = context.Process(target=_prepare_in_child, args=(config, args.size, args.seed, work_dir))
+        prepare.start()
+        prepare.join()
+        if prepare.exitcode != 0:
+            return 1
+        config.update(json.loads((work_dir / "prepared.json").read_text(encoding="utf-8")))
+
+        start_barrier = context.Barrier(config["clients"])
+        results = context.Queue()
+        processes = [
+            context.Process(target=client_worker, args=(client_no, config, start_barrier, results))
+            for client_no in range(config["clients"])
+        ]
+        for process in processes:
+            process.start()
+
+        client_results = []
+        timeout = config["duration"] + 300
+        while len(client_results) < len(processes):
+            try:
+                client_results.append(results.get(timeout=timeout))
+            except queue.Empty:
+                print("[失败] 等待客户端结果超时")
+                break
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if not client_results:
+        return 1
+    summary = summarize(client_results, config["duration"])
+    print_report(summary, config)
+
+    if args.output:
+        report = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {key: value for key, value in config.items()
+                       if key not in ("regulation_ids", "work_dir")},
+            **summary,
+        }
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if len(client_results) == len(processes) else 1
+
+
+def _prepare_in_child(config: dict, size: int, seed: int, work_dir: Path):
+    """在单独的进程中准备数据库（父进程不导入 client，不持有数据库连接）"""
+    try:
+        prepared = prepare_database(config, size, seed)
+    except Exception as e:
+        print(f"[失败] {e}")
+        sys.exit(1)
+    (work_dir / "prepared.json").write_text(json.dumps(prepared), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+"""
+性能基准测试
+在临时数据库中生成可复现的数据集，测量各业务热点路径的耗时，
+结果可保存为 JSON 基线，之后的运行与基线比较，发现性能回退
+
+用法:
+    python benchmarks/run_benchmarks.py --size 1k                   # 运行并输出结果
+    python benchmarks/run_benchmarks.py --size 10k --save-baseline  # 保存为基线 baselines/10k.json
+    python benchmarks/run_benchmarks.py --size 10k --compare        # 与基线比较，有回退时退出码为 1
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# 设置UTF-8编码输出
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+RDB_DIR = PROJECT_ROOT / "RDB"
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+# 中位数比基线慢超过该比例，且绝对差超过 DEFAULT_MIN_DELTA_MS 时判定为回退
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_DELTA_MS = 5.0
+# 逐条测量的操作（读取参数、重建历史版本等）抽取的法规数
+SAMPLE_REGULATIONS = 100
+BULK_UPDATE_ROWS = 1000
+# 每次批量删除的法规数（从编号最大的法规开始，每次删除不同的法规）
+BULK_DELETE_ROWS = 100
+
+
+def parse_size(value: str) -> int:
+    """解析数据集规模：1k/10k/100k 或整数"""
+    if value in SIZES:
+        return SIZES[value]
+    match = re.fullmatch(r"(\d+)([kK]?)", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"无效的数据规模: {value}")
+    return int(match.group(1)) * (1000 if match.group(2) else 1)
+
+
+def size_label(size: int) -> str:
+    for label, value in SIZES.items():
+        if value == size:
+            return label
+    return str(size)
+
+
+def setup_environment(work_dir: Path):
+    """让程序使用临时目录中的 SQLite 数据库（必须在导入 client 之前调用）"""
+    os.environ["DATABASE_PATH"] = str(work_dir / "benchmark.db")
+    os.environ["OFFLINE_MODE"] = "true"
+    os.environ["REPLICA_MODE"] = "false"
+
+
+class BenchmarkRunner:
+    """重复执行并记录每项操作的耗时"""
+
+    def __init__(self, repeat: int, only: Optional[str] = None, trace_memory: bool = False):
+        self.repeat = repeat
+        self.only = re.compile(only) if only else None
+        # 计时之后再用 tracemalloc 执行一次，记录内存峰值和净增（跟踪会拖慢执行，不与计时混在一起）
+        self.trace_memory = trace_memory
+        self.results: Dict[str, dict] = {}
+
+    def measure(self, name: str, func: Callable[[int], object], rows: int = 0,
+                setup: Optional[Callable[[int], None]] = None):
+        """
+        执行 func(第几次) repeat 次，setup 在每次计时前执行（不计入耗时）
+
+        服务方法返回 (False, 消息, ...) 时视为失败，终止测试
+        """
+        if self.only and not self.only.search(name):
+            return
+        timings = []
+        for run in range(self.repeat):
+            if setup:
+                setup(run)
+            start = time.perf_counter()
+            result = func(run)
+            timings.append((time.perf_counter() - start) * 1000)
+            if isinstance(result, tuple) and result and result[0] is False:
+                raise RuntimeError(f"{name} 失败: {result[1]}")
+
+        result = {
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "runs_ms": [round(t, 3) for t in timings],
+            "rows": rows,
+        }
+        if self.trace_memory:
+            if setup:
+                setup(self.repeat)
+            tracemalloc.start()
+            try:
+                func(self.repeat)
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            result["peak_kb"] = round(peak / 1024, 1)
+            result["net_kb"] = round(current / 1024, 1)
+
+        self.results[name] = result
+        print(f"   {name:<40} 中位数 {statistics.median(timings):10.1f} ms   最小 {min(timings):10.1f} ms"
+              + (f"   峰值 {result['peak_kb']:10.0f} KB" if self.trace_memory else "")
+              + (f"   ({rows} 行)" if rows else ""))
+
+
+def read_parameter_workbook(path: Path) -> List[dict]:
+    """按参数编辑界面导入 Excel 的方式读取参数表：第 2 行起的前 9 列，跳过空行，值转为文本"""
+    import openpyxl
+    from client.models.parameter import PARAMETER_VALUE_FIELDS
+
+    wb = openpyxl.load_workbook(path)
+    try:
+        rows = []
+        for excel_row in wb.active.iter_rows(min_row=2, max_col=9):
+            if not any(cell.value is not None for cell in excel_row):
+                continue
+            values = []
+            for cell in excel_row:
+                value = cell.value
+                if cell.data_type == 'f' and '_xlfn.DISPIMG' in str(value):
+                    value = "__IMAGE__"
+                values.append(str(value) if value is not None else "")
+            rows.append(dict(zip(PARAMETER_VALUE_FIELDS, values)))
+        return rows
+    finally:
+        wb.close()
+
+
+def run_benchmarks(spec, work_dir: Path, runner: BenchmarkRunner) -> dict:
+    """生成数据集并执行全部基准测试，返回数据集统计"""
+    from client.models import init_db, session_scope, User
+    from client.models.parameter import PARAMETER_VALUE_FIELDS
+    from client.services import RegulationService, SearchService
+    from client.services.cache import data_cache
+    from client.utils.data_exporter import DataExporter
+    from client.utils.data_importer import DataImporter
+    from client.utils.c_code_generator import generate_c_code
+    from benchmarks import data_generator
+
+    init_db()
+    with session_scope() as db:
+        user_id = db.query(User.id).filter(User.username == "admin").scalar()
+
+    print(f"生成数据集: {spec.regulations} 条法规 × {spec.parameters_per_regulation} 个参数 (种子 {spec.seed})")
+    start = time.perf_counter()
+    counts = data_generator.generate_dataset(spec, user_id)
+    print(f"   完成，用时 {time.perf_counter() - start:.1f} s: {counts}")
+
+    template_path = work_dir / "Satety_Parameter.c"
+    data_generator.write_c_template(template_path, spec.parameters_per_regulation)
+
+    service = RegulationService()
+    search = SearchService()
+    exporter = DataExporter()
+    importer = DataImporter()
+    step = max(1, spec.regulations // SAMPLE_REGULATIONS)
+    sample_ids = list(range(1, spec.regulations + 1, step))[:SAMPLE_REGULATIONS]
+
+    def cold(_):
+        data_cache.clear()
+
+    print("\n查询")
+    runner.measure("list_regulations.cold", lambda _: service.list_regulations(), spec.regulations, setup=cold)
+    service.list_regulations()
+    runner.measure("list_regulations.warm", lambda _: service.list_regulations(), spec.regulations)
+    runner.measure("list_regulations.filtered",
+                   lambda _: service.list_regulations(country="德国", status=data_generator.STATUSES[0]),
+                   setup=cold)
+    runner.measure("list_regulations.tag", lambda _: service.list_regulations(tags=["标签001"]), setup=cold)
+    runner.measure("search.keyword", lambda _: search.search("电压"))
+    runner.measure("search.keyword_country", lambda _: search.search("保护", country="英国"))
+    runner.measure("search.no_match", lambda _: search.search("不存在的关键词"))
+    runner.measure("history.reconstruct",
+                   lambda _: [service.get_regulation_version(i) for i in sample_ids], len(sample_ids))
+
+    print("\n参数")
+    runner.measure("parameters.load",
+                   lambda _: [service.get_parameters(i) for i in sample_ids], len(sample_ids), setup=cold)
+
+    def current_rows(regulation_id) -> List[dict]:
+        return [{field: getattr(param, field) for field in PARAMETER_VALUE_FIELDS}
+                for param in service.get_parameters(regulation_id)]
+
+    def save_parameters(run):
+        # 每次修改第一行的默认值，产生一个新版本
+        for regulation_id in sample_ids:
+            rows = current_rows(regulation_id)
+            if rows:
+                rows[0]["default_value"] = str(run)
+            service.save_parameters(regulation_id, rows, changed_by=user_id)
+
+    runner.measure("parameters.save", save_parameters, len(sample_ids))
+    runner.measure("c_code.generate",
+                   lambda _: [generate_c_code(current_rows(i), template_path) for i in sample_ids],
+                   len(sample_ids), setup=cold)
+
+    workbooks = sorted(RDB_DIR.glob("*.xlsx"))
+    if workbooks:
+        def rdb_end_to_end(run):
+            # 读取参数表 -> 保存为法规参数 -> 重新读取 -> 生成 C 代码（每次写入不同的法规）
+            for index, workbook in enumerate(workbooks):
+                regulation_id = (run * len(workbooks) + index) % spec.regulations + 1
+                rows = read_parameter_workbook(workbook)
+                success, message, _ = service.save_parameters(regulation_id, rows, changed_by=user_id)
+                if not success:
+                    return False, f"{workbook.name}: {message}"
+                protocol_bits = [row["protocol_bit"] for row in rows if row["protocol_bit"] not in ("", "-")]
+                rdb_template = work_dir / "rdb_template.c"
+                data_generator.write_protocol_template(rdb_template, protocol_bits)
+                generate_c_code(current_rows(regulation_id), rdb_template)
+
+        runner.measure("rdb.workbooks_end_to_end", rdb_end_to_end, len(workbooks), setup=cold)
+
+    print("\n批量操作")
+    bulk_ids = list(range(1, min(spec.regulations, BULK_UPDATE_ROWS) + 1))
+    runner.measure("regulations.bulk_update",
+                   lambda run: service.bulk_update(bulk_ids, updated_by=user_id, version=f"B{run}"),
+                   len(bulk_ids))
+
+    print("\n导出")
+    total = spec.regulations
+    runner.measure("export.json", lambda _: exporter.export_to_json(str(work_dir / "export.json")), total)
+    runner.measure("export.csv", lambda _: exporter.export_to_csv(str(work_dir / "export.csv")), total)
+    runner.measure("export.excel", lambda _: exporter.export_to_excel(str(work_dir / "export.xlsx")), total)
+
+    print("\n导入")
+    import_rows = spec.import_rows or spec.regulations
+
+    def import_file(extension: str, writer: Callable):
+        # 每次导入一批新编号的法规，准备文件不计入耗时
+        def setup(run):
+            records = data_generator.import_records(spec, f"IMP{extension.upper()}{run}")
+            writer(records, work_dir / f"import.{extension}")
+        return setup
+
+    runner.measure("import.json",
+                   lambda _: importer.import_from_json(str(work_dir / "import.json"), user_id),
+                   import_rows, setup=import_file("json", data_generator.write_import_json))
+    runner.measure("import.excel",
+                   lambda _: importer.import_from_excel(str(work_dir / "import.xlsx"), user_id),
+                   import_rows, setup=import_file("xlsx", data_generator.write_import_excel))
+
+    # 删除会改变数据集，放在最后
+    print("\n删除")
+    delete_rows = min(BULK_DELETE_ROWS, spec.regulations // (runner.repeat + 1))
+
+    def bulk_delete(run):
+        end = spec.regulations - run * delete_rows
+        return service.bulk_delete(list(range(end - delete_rows + 1, end + 1)), deleted_by=user_id)
+
+    runner.measure("regulations.bulk_delete", bulk_delete, delete_rows)
+
+    return counts
+
+
+def git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> bool:
+    """与基线比较，打印对比表，有回退时返回 False"""
+    if baseline["meta"].get("spec") != results["meta"]["spec"]:
+        print("[警告] 数据集参数与基线不同，比较结果仅供参考")
+
+    print(f"\n与基线比较（{baseline['meta'].get('git_revision')} @ {baseline['meta'].get('created_at')}）")
+    regressions = []
+    for name, current in results["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"   {name:<40} {current['median_ms']:10.1f} ms   （基线中没有）")
+            continue
+        delta = current["median_ms"] - base["median_ms"]
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        regressed = delta > min_delta_ms and ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(f"   {name:<40} {base['median_ms']:10.1f} -> {current['median_ms']:10.1f} ms  "
+              f"{(ratio - 1) * 100:+7.1f}%{'  [回退]' if regressed else ''}")
+
+    if regressions:
+        print(f"\n[失败] {len(regressions)} 项性能回退（阈值 {threshold:.0%}）: {', '.join(regressions)}")
+        return False
+    print("\n[成功] 没有性能回退")
+    return True
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """基准测试脚本共用的参数：规模、重复次数、结果输出和基线比较"""
+    parser.add_argument("--size", type=parse_size, default=SIZES["1k"], help="法规数：1k/10k/100k 或整数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取中位数）")
+    parser.add_argument("--only", help="只运行名称匹配该正则的项")
+    parser.add_argument("--output", type=Path, help="结果输出文件")
+    parser.add_argument("--save-baseline", action="store_true", help="保存为基线")
+    parser.add_argument("--compare", nargs="?", const="", metavar="BASELINE",
+                        help="与基线比较（默认 baselines/<规模>.json）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回退判定比例")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS, help="忽略小于该值的差异")
+    parser.add_argument("--keep", action="store_true", help="保留临时数据库目录")
+
+
+def build_results(runner: BenchmarkRunner, spec, counts: dict) -> dict:
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": runner.repeat,
+            "spec": spec.to_dict(),
+            "dataset": counts,
+        },
+        "results": runner.results,
+    }
+
+
+def save_and_compare(results: dict, args, baseline_name: str) -> int:
+    """按命令行参数输出结果、保存基线、与基线比较，返回退出码"""
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        baseline_path = BASELINE_DIR / f"{baseline_name}.json"
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n基线已保存: {baseline_path}")
+
+    if args.compare is not None:
+        baseline_path = Path(args.compare) if args.compare else BASELINE_DIR / f"{baseline_name}.json"
+        if not baseline_path.exists():
+            print(f"\n[失败] 基线不存在: {baseline_path}")
+            return 1
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        return 0 if compare(results, baseline, args.threshold, args.min_delta_ms) else 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    add_common_arguments(parser)
+    parser.add_argument("--parameters", type=int, default=20, help="每条法规的参数行数")
+    parser.add_argument("--import-rows", type=int, default=0, help="导入文件的法规数（默认与 --size 相同）")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="safety_benchmark_"))
+    setup_environment(work_dir)
+    # 只输出警告和错误，避免逐条操作的日志影响计时
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    from benchmarks.data_generator import DatasetSpec
+
+    spec = DatasetSpec(regulations=args.size, parameters_per_regulation=args.parameters,
+                       import_rows=args.import_rows, seed=args.seed)
+    runner = BenchmarkRunner(max(1, args.repeat), args.only)
+    try:
+        counts = run_benchmarks(spec, work_dir, runner)
+    finally:
+        from client.models import engine
+        engine.dispose()
+        if args.keep:
+            print(f"\n临时目录: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return save_and_compare(build_results(runner, spec, counts), args, size_label(args.size))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
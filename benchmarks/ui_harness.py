@@ -0,0 +1,298 @@
+"""
+界面性能基准测试（无界面运行，QT_QPA_PLATFORM=offscreen）
+测量主窗口和各对话框主要流程的耗时和内存分配：
+主窗口打开、加载法规列表和搜索，打开带大量参数和图片的法规详情及其参数（冷读取和预读取后）、历史标签页，
+逐个导入 RDB/*.xlsx 参数表，类别合并、行高自适应，以及代码管理列表
+
+用法:
+    python benchmarks/ui_harness.py --size 10k --parameters 2000
+    python benchmarks/ui_harness.py --size 10k --save-baseline   # 保存为基线 baselines/ui_10k.json
+    python benchmarks/ui_harness.py --size 10k --compare
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import timedelta
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.run_benchmarks import (
+    RDB_DIR, BenchmarkRunner, add_common_arguments, build_results, save_and_compare,
+    setup_environment, size_label,
+)
+
+# 法规详情中每隔多少个参数出现一个新类别（其余行类别为空，与 RDB 参数表相同）
+CATEGORY_GROUP_SIZE = 10
+# 带图片的参数行比例
+IMAGE_RATIO = 0.1
+# 代码管理列表的代码文件数上限
+MAX_CODE_FILES = 5000
+
+
+class DialogRecorder:
+    """
+    替换 QMessageBox / QFileDialog 的静态方法，使流程不被模态对话框阻塞
+
+    消息框记录后按"确定/是"返回；critical 记为失败，测量时抛出
+    """
+
+    def __init__(self):
+        self.open_file = ""
+        self.errors: List[str] = []
+
+    def install(self):
+        from PyQt6.QtWidgets import QMessageBox, QFileDialog
+
+        def accept(*args, **kwargs):
+            return QMessageBox.StandardButton.Yes
+
+        def critical(parent, title, text, *args, **kwargs):
+            self.errors.append(f"{title}: {text}")
+            return QMessageBox.StandardButton.Ok
+
+        QMessageBox.information = QMessageBox.warning = QMessageBox.question = staticmethod(accept)
+        QMessageBox.critical = staticmethod(critical)
+        QFileDialog.getOpenFileName = staticmethod(lambda *args, **kwargs: (self.open_file, ""))
+
+    def check(self, name: str):
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise RuntimeError(f"{name} 失败: {errors[0]}")
+
+
+def create_large_regulation(service, regulation_id: int, parameter_count: int, image_dir: Path, seed: int):
+    """为法规保存大量参数：类别按组出现，部分行的备注为图片（"IMAGE:路径"，与界面保存的格式相同）"""
+    import random
+    from benchmarks import data_generator
+
+    rng = random.Random(seed)
+    image_dir.mkdir(parents=True, exist_ok=True)
+    images = []
+    for number in range(16):
+        path = image_dir / f"image_{number}.png"
+        path.write_bytes(data_generator.make_png(rng, size=240))
+        images.append(path)
+
+    rows = data_generator.parameter_rows(rng, parameter_count)
+    for order, row in enumerate(rows):
+        if order % CATEGORY_GROUP_SIZE:
+            row["category"] = ""
+        if rng.random() < IMAGE_RATIO:
+            row["remark"] = f"IMAGE:{rng.choice(images)}"
+    success, message, _ = service.save_parameters(regulation_id, rows)
+    if not success:
+        raise RuntimeError(message)
+
+
+def create_code_files(count: int, user_id: int):
+    """写入代码文件记录（代码管理列表只读取记录，不需要实际文件）"""
+    from sqlalchemy import insert
+    from client.models import CodeFile, session_scope
+    from benchmarks.data_generator import BASE_TIME
+
+    with session_scope() as db:
+        db.execute(insert(CodeFile), [{
+            "regulation_id": number % 100 + 1,
+            "file_name": f"safety_param_{number}.c",
+            "file_path": f"codes/safety_param_{number}.c",
+            "version": f"V1.{number % 10}",
+            "description": f"安规参数代码 {number}",
+            "created_by": user_id,
+            "created_at": BASE_TIME + timedelta(minutes=number),
+        } for number in range(count)])
+
+
+def run_ui_benchmarks(spec, parameter_count: int, work_dir: Path, runner: BenchmarkRunner) -> dict:
+    """生成数据并执行界面流程基准测试，返回数据集统计"""
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    recorder = DialogRecorder()
+    recorder.install()
+
+    from client.models import init_db, session_scope, User
+    from client.services import AuthService, RegulationService
+    from client.services.cache import data_cache
+    from client.ui.main_window import MainWindow
+    from client.ui.regulation_detail_dialog import RegulationDetailDialog
+    from client.ui.detail_prefetch import DetailPrefetcher
+    from client.ui.code_manager_dialog import CodeManagerDialog
+    from benchmarks import data_generator
+
+    # 启动时的数据同步检查会访问 Git 远程仓库，耗时取决于网络，不计入主窗口打开
+    MainWindow.check_data_sync_on_startup = lambda self: None
+
+    init_db()
+    with session_scope() as db:
+        user_id = db.query(User.id).filter(User.username == "admin").scalar()
+
+    print(f"生成数据集: {spec.regulations} 条法规，详情法规 {parameter_count} 个参数 (种子 {spec.seed})")
+    counts = data_generator.generate_dataset(spec, user_id)
+    service = RegulationService()
+    large_regulation_id = 1
+    create_large_regulation(service, large_regulation_id, parameter_count, work_dir / "parameter_images", spec.seed)
+    code_files = min(spec.regulations, MAX_CODE_FILES)
+    create_code_files(code_files, user_id)
+    counts.update(detail_parameters=parameter_count, code_files=code_files)
+
+    auth = AuthService()
+    success, message, _ = auth.login("admin", "admin123")
+    if not success:
+        raise RuntimeError(message)
+
+    def flow(name: str, action, rows: int = 0, setup=None):
+        """执行界面操作并处理完挂起的事件（布局、绘制），一起计入耗时"""
+        def run(_):
+            action()
+            app.processEvents()
+            recorder.check(name)
+        runner.measure(name, run, rows, setup=setup)
+
+    def cold(_):
+        data_cache.clear()
+
+    windows = []
+
+    def dispose(widget):
+        watcher = getattr(widget, "notification_watcher", None)
+        if watcher:
+            watcher.stop()
+        prefetcher = getattr(widget, "detail_prefetcher", None)
+        if prefetcher:
+            prefetcher.stop()
+        widget.hide()
+        widget.deleteLater()
+        app.processEvents()
+
+    def open_main_window():
+        window = MainWindow(auth)
+        window.show()
+        windows.append(window)
+
+    def close_windows(run):
+        cold(run)
+        while windows:
+            dispose(windows.pop())
+
+    print("\n主窗口")
+    flow("main_window.open", open_main_window, spec.regulations, setup=close_windows)
+    if not windows:  # --only 跳过了打开主窗口
+        open_main_window()
+    window = windows[-1]
+    flow("main_window.load_regulations", window.load_regulations, spec.regulations, setup=cold)
+    window.search_input.setText("电压")
+    flow("main_window.search_regulations", window.search_regulations)
+
+    print("\n法规详情")
+    dialogs = []
+
+    def wait_for_tabs(dialog):
+        """标签页在后台线程加载，等待加载完成并显示"""
+        while dialog.is_loading():
+            app.processEvents()
+            time.sleep(0.001)
+
+    def open_detail():
+        dialog = RegulationDetailDialog(window, regulation_id=large_regulation_id, user_id=user_id)
+        dialog.show()
+        dialogs.append(dialog)
+
+    def close_dialogs(run):
+        cold(run)
+        while dialogs:
+            dialog = dialogs.pop()
+            wait_for_tabs(dialog)
+            dispose(dialog)
+
+    def load_tab(load):
+        def action():
+            load()
+            wait_for_tabs(dialog)
+        return action
+
+    flow("detail_dialog.open", open_detail, setup=close_dialogs)
+    if not dialogs:
+        open_detail()
+    dialog = dialogs[-1]
+    flow("detail_dialog.load_parameters", load_tab(dialog.load_saved_parameters), parameter_count, setup=cold)
+
+    prefetcher = DetailPrefetcher(service)
+
+    def prefetch(run):
+        """冷缓存后模拟在主窗口选中该法规：等待预读取完成"""
+        cold(run)
+        prefetcher.prefetch([large_regulation_id])
+        while prefetcher.is_active():
+            app.processEvents()
+            time.sleep(0.001)
+
+    flow("detail_dialog.load_parameters_prefetched", load_tab(dialog.load_saved_parameters), parameter_count,
+         setup=prefetch)
+    flow("detail_dialog.load_history", load_tab(dialog.load_history))
+    if not dialog.param_table.rowCount():  # --only 跳过了加载参数
+        load_tab(dialog.load_saved_parameters)()
+    flow("detail_dialog.apply_category_merge", dialog.apply_category_merge, parameter_count,
+         setup=lambda _: dialog.param_table.clearSpans())
+    flow("detail_dialog.resize_rows_to_contents", dialog.param_table.resizeRowsToContents, parameter_count)
+
+    for workbook in sorted(RDB_DIR.glob("*.xlsx")):
+        def select_workbook(_, path=workbook):
+            recorder.open_file = str(path)
+
+        flow(f"detail_dialog.import_excel.{workbook.stem}", dialog.import_excel_parameters, setup=select_workbook)
+
+    print("\n代码管理")
+    code_dialog = CodeManagerDialog(window, user_id=user_id)
+    code_dialog.show()
+    flow("code_manager.load_codes", code_dialog.load_codes, code_files)
+
+    for widget in [code_dialog] + dialogs + windows:
+        if widget in dialogs:
+            wait_for_tabs(widget)
+        dispose(widget)
+    auth.logout()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="界面性能基准测试")
+    add_common_arguments(parser)
+    parser.add_argument("--parameters", type=int, default=2000, help="法规详情中的参数行数")
+    parser.add_argument("--no-memory", action="store_true", help="不统计内存分配")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # 不启动后台版本检查和同步；主窗口不预读取（预读取单独测量）
+    os.environ["AUTO_UPDATE"] = "false"
+    os.environ["AUTO_SYNC"] = "false"
+    os.environ["DETAIL_PREFETCH"] = "false"
+    work_dir = Path(tempfile.mkdtemp(prefix="safety_ui_benchmark_"))
+    setup_environment(work_dir)
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    from benchmarks.data_generator import DatasetSpec
+
+    spec = DatasetSpec(regulations=args.size, seed=args.seed)
+    runner = BenchmarkRunner(max(1, args.repeat), args.only, trace_memory=not args.no_memory)
+    try:
+        counts = run_ui_benchmarks(spec, args.parameters, work_dir, runner)
+    finally:
+        from client.models import engine
+        engine.dispose()
+        if args.keep:
+            print(f"\n临时目录: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return save_and_compare(build_results(runner, spec, counts), args, f"ui_{size_label(args.size)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
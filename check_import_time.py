@@ -0,0 +1,159 @@
+"""
+启动导入耗时检查工具
+用 python -X importtime 测量导入程序入口（到显示登录对话框为止需要的模块）的耗时，
+比基线明显变慢或提前导入了应按需加载的模块时返回非零退出码，可在打包前运行
+
+导入耗时随机器负载波动很大，因此每次测量入口后紧接着测量只导入第三方库（PyQt6、SQLAlchemy 等）
+的参照耗时，用两者之比与基线比较，机器快慢和负载的影响大部分相互抵消
+
+用法:
+    python check_import_time.py --save-baseline   # 保存基线 benchmarks/baselines/import_time.json
+    python check_import_time.py [--threshold 比例] [--runs 次数] [--top 条数]
+"""
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+# 设置UTF-8编码输出
+if sys.platform == 'win32':
+    import codecs
+    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+ENTRY_MODULE = "client.main"
+# 参照：入口必然导入的第三方库，程序自身的导入耗时体现在入口与参照之比中
+REFERENCE_MODULES = ("PyQt6.QtWidgets", "sqlalchemy.orm", "pydantic_settings", "loguru")
+BASELINE_PATH = PROJECT_ROOT / "benchmarks" / "baselines" / "import_time.json"
+# 耗时比超过基线的比例（同一台机器上多次测量的中位数波动约 ±10%）
+DEFAULT_THRESHOLD = 0.25
+# 登录前不应导入的模块（在首次使用时按需加载）
+DEFERRED_MODULES = (
+    "requests",
+    "PyPDF2",
+    "pdfplumber",
+    "pdfminer",
+    "docx",
+    "openpyxl",
+    "pygments",
+    "client.ui.main_window",
+    "client.ui.regulation_detail_dialog",
+    "client.ui.document_viewer",
+    "client.services.update_service",
+    "client.services.git_service",
+    "client.utils.data_importer",
+    "client.utils.data_exporter",
+)
+
+_LINE_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure_once(modules: str = ENTRY_MODULE) -> dict:
+    """运行一次 -X importtime，返回 {模块: (自身微秒, 累计微秒, 层级)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modules}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, encoding="utf-8", errors="replace"
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {modules} 失败:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+def total_ms(modules: dict) -> float:
+    """所有顶层导入的累计耗时（毫秒）"""
+    return sum(cumulative_us for _, cumulative_us, level in modules.values() if level == 0) / 1000
+
+
+def measure(runs: int) -> tuple[dict, list]:
+    """入口和参照交替测量 runs 次，返回 (汇总, 各次入口的模块耗时)"""
+    samples, entry, reference = [], [], []
+    for _ in range(runs):
+        sample = measure_once()
+        samples.append(sample)
+        entry.append(sample[ENTRY_MODULE][1] / 1000)
+        reference.append(total_ms(measure_once(", ".join(REFERENCE_MODULES))))
+    summary = {
+        "entry_ms": round(statistics.median(entry), 1),
+        "reference_ms": round(statistics.median(reference), 1),
+        "ratio": round(statistics.median(e / r for e, r in zip(entry, reference)), 3),
+        "runs": runs,
+        "python": sys.version.split()[0],
+    }
+    return summary, samples
+
+
+def check(threshold: float, runs: int, top: int, budget_ms: float = None, save_baseline: bool = False) -> bool:
+    print("=" * 60)
+    print("启动导入耗时检查")
+    print("=" * 60)
+
+    summary, samples = measure(runs)
+    print(f"导入 {ENTRY_MODULE}: 中位数 {summary['entry_ms']:.0f} ms，"
+          f"参照（{', '.join(REFERENCE_MODULES)}）{summary['reference_ms']:.0f} ms，"
+          f"耗时比 {summary['ratio']:.3f}（{runs} 次）")
+
+    # 自身耗时最多的模块（取最后一次运行）
+    modules = samples[-1]
+    print(f"\n自身耗时最多的 {top} 个模块:")
+    for name, (self_us, cumulative_us, _) in sorted(
+            modules.items(), key=lambda item: item[1][0], reverse=True)[:top]:
+        print(f"   {self_us / 1000:8.1f} ms  (累计 {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    ok = True
+    deferred = [
+        name for name in modules
+        if any(name == module or name.startswith(module + ".") for module in DEFERRED_MODULES)
+    ]
+    if deferred:
+        ok = False
+        print("\n[失败] 以下模块应按需导入，但在启动时被导入:")
+        for name in deferred:
+            print(f"   {name}")
+
+    if save_baseline:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n基线已保存: {BASELINE_PATH}")
+    elif BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+        limit = baseline["ratio"] * (1 + threshold)
+        print(f"基线耗时比 {baseline['ratio']:.3f}，上限 {limit:.3f}（+{threshold:.0%}）")
+        if summary["ratio"] > limit:
+            ok = False
+            print(f"\n[失败] 导入耗时比超过基线 {summary['ratio'] / baseline['ratio'] - 1:.0%}")
+    else:
+        print(f"基线不存在（{BASELINE_PATH}），不比较耗时；用 --save-baseline 保存")
+
+    # 绝对预算只在指定时检查（与机器相关）
+    if budget_ms is not None and summary["entry_ms"] > budget_ms:
+        ok = False
+        print(f"\n[失败] 导入耗时超出预算 {summary['entry_ms'] - budget_ms:.0f} ms")
+
+    print("\n[成功] 启动导入检查通过" if ok else "")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时检查")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="耗时比超过基线的比例")
+    parser.add_argument("--save-baseline", action="store_true", help=f"保存为基线 {BASELINE_PATH.name}")
+    parser.add_argument("--budget", type=float, default=None, help="另外检查绝对耗时预算（毫秒，与机器相关）")
+    parser.add_argument("--runs", type=int, default=5, help="测量次数")
+    parser.add_argument("--top", type=int, default=15, help="显示自身耗时最多的模块数")
+    args = parser.parse_args()
+    ok = check(args.threshold, max(1, args.runs), args.top, args.budget, args.save_baseline)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
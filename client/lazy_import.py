@@ -0,0 +1,34 @@
+"""
+包的按需导入
+
+包的 __init__ 只登记导出名称所在的子模块，首次访问属性时才导入（PEP 562），
+启动时不加载用不到的子模块及其依赖
+"""
+import sys
+import importlib
+from typing import Callable, Dict, Tuple
+
+
+def make_lazy_getattr(module_name: str, lazy_attrs: Dict[str, str]) -> Tuple[Callable, Callable]:
+    """
+    生成包的模块级 __getattr__ 和 __dir__
+
+    Args:
+        module_name: 包名（__name__）
+        lazy_attrs: {导出名称: 子模块（相对包的名称，如 ".auth_service"）}
+
+    Returns:
+        (__getattr__, __dir__)
+    """
+    def __getattr__(name):
+        if name in lazy_attrs:
+            module = sys.modules[module_name]
+            value = getattr(importlib.import_module(lazy_attrs[name], module_name), name)
+            setattr(module, name, value)  # 之后直接命中模块字典
+            return value
+        raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[module_name])) | set(lazy_attrs))
+
+    return __getattr__, __dir__
@@ -9,38 +9,13 @@ from loguru import logger
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from shared.config import settings
-from shared.constants import LOG_FORMAT
 from client.models import init_db
-from client.ui import LoginDialog, MainWindow
+from client.utils.logging_config import setup_logging
+# 启动时只导入登录对话框，主窗口（及其依赖的服务和对话框）在登录成功后才导入
+from client.ui.login_dialog import LoginDialog
 from client.ui.styles import MODERN_STYLE
 
 
-def setup_logging():
-    """配置日志"""
-    logger.remove()
-
-    logger.add(
-        sys.stderr,
-        format=LOG_FORMAT,
-        level=settings.LOG_LEVEL,
-        colorize=True
-    )
-
-    log_file = settings.LOG_DIR / f"app_main.log"
-    logger.add(
-        log_file,
-        format=LOG_FORMAT,
-        level=settings.LOG_LEVEL,
-        rotation="10 MB",
-        retention="7 days",
-        encoding="utf-8"
-    )
-
-    logger.info("=" * 50)
-    logger.info(f"{settings.APP_NAME} v{settings.APP_VERSION} 启动")
-    logger.info("=" * 50)
-
-
 def main():
     """主函数"""
     try:
@@ -55,6 +30,14 @@ def main():
         input()
         return 1
 
+    # 回滚上次未完成的增量更新，清理已完成更新留下的备份
+    try:
+        from client.services.delta_update import DeltaUpdater
+        if DeltaUpdater.is_supported():
+            DeltaUpdater().recover()
+    except Exception as e:
+        logger.warning(f"检查增量更新状态失败: {e}")
+
     try:
         print(">>> 步骤 2/5: 初始化数据库...")
         logger.info("正在初始化数据库...")
@@ -70,6 +53,19 @@ def main():
         print(">>> 数据库初始化成功")
         logger.info("数据库初始化成功")
         sys.stdout.flush()  # 强制刷新输出缓冲
+
+        if settings.REPLICA_MODE:
+            # 副本模式：首次运行时复制共享数据库，并在登录前拉取最新数据
+            from client.services import ReplicaSyncService
+            replica_sync = ReplicaSyncService()
+            success, message = replica_sync.bootstrap()
+            print(f">>> 本地副本: {message}")
+            if success:
+                replica_sync.sync_once()
+
+        # 超过保留期的已读通知移入归档表，保持通知表精简
+        from client.services import UpdateService
+        UpdateService().archive_read_notifications()
     except Exception as e:
         logger.error(f"数据库初始化失败: {e}")
         print(f"!!! 数据库初始化失败: {e}")
@@ -147,6 +143,7 @@ def main():
     try:
         if login_dialog.exec() == LoginDialog.DialogCode.Accepted:
             auth_service = login_dialog.get_auth_service()
+            from client.ui.main_window import MainWindow
             main_window = MainWindow(auth_service)
             main_window.show()
 
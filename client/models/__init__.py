@@ -1,17 +1,26 @@
 """
 数据模型模块
 """
-from .database import Base, engine, SessionLocal, get_db, init_db
+from .database import (
+    Base, engine, SessionLocal, ScopedSession, session_scope, remove_session, chunked, detach,
+    get_db, init_db
+)
 from .user import User
 from .regulation import Regulation, RegulationDocument, CodeFile, Tag, RegulationTag
 from .history import ChangeHistory
 from .parameter import RegulationParameter
-from .update_notification import UpdateNotification, NotificationType
+from .update_notification import UpdateNotification, UpdateNotificationArchive, NotificationType
+from .sync import RowVersion, SyncOutbox, SyncConflict, SyncState, SyncIdBlock
 
 __all__ = [
     "Base",
     "engine",
     "SessionLocal",
+    "ScopedSession",
+    "session_scope",
+    "remove_session",
+    "chunked",
+    "detach",
     "get_db",
     "init_db",
     "User",
@@ -23,5 +32,11 @@ __all__ = [
     "ChangeHistory",
     "RegulationParameter",
     "UpdateNotification",
+    "UpdateNotificationArchive",
     "NotificationType",
+    "RowVersion",
+    "SyncOutbox",
+    "SyncConflict",
+    "SyncState",
+    "SyncIdBlock",
 ]
\ No newline at end of file
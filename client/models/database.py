@@ -3,25 +3,34 @@
 """
 import sys
 from pathlib import Path
-from typing import Generator
+from contextlib import contextmanager
+from typing import Generator, Iterable, Iterator, List, TypeVar
 from sqlalchemy import create_engine, event
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, Session, scoped_session
 from loguru import logger
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from shared.config import settings
+from .instrumentation import query_instrumentation
 
 
 # 创建基类
 Base = declarative_base()
 
+# IN 列表每批的参数个数（旧版 SQLite 单条语句最多 999 个参数）
+IN_CHUNK_SIZE = 500
+
 
 # 根据配置选择数据库
 def get_database_url() -> str:
     """获取数据库连接 URL"""
+    if settings.REPLICA_MODE:
+        logger.info("使用本地 SQLite 副本 (副本模式)")
+        return settings.replica_url
     if settings.OFFLINE_MODE:
         logger.info("使用 SQLite 数据库 (离线模式)")
         return settings.sqlite_url
@@ -34,6 +43,13 @@ def get_database_url() -> str:
             return settings.sqlite_url
 
 
+def get_remote_database_url() -> str:
+    """获取共享数据库连接 URL（副本模式下的同步目标）"""
+    if settings.OFFLINE_MODE:
+        return settings.sqlite_url
+    return settings.postgres_url
+
+
 # 创建数据库引擎
 database_url = get_database_url()
 engine = create_engine(
@@ -54,6 +70,10 @@ def set_sqlite_pragma(dbapi_conn, connection_record):
         cursor.close()
 
 
+# SQL 语句计时：慢查询日志、语句统计和 N+1 检测
+query_instrumentation.install(engine)
+
+
 # 创建会话工厂
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -62,6 +82,78 @@ SessionLocal = sessionmaker(
 )
 
 
+# 线程内共享的会话（每个线程一个），服务和界面统一通过 session_scope() 使用
+# 提交后不自动过期，返回给界面的对象仍可直接读取；新的工作单元开始时再统一过期
+ScopedSession = scoped_session(sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine
+))
+
+
+@contextmanager
+def session_scope() -> Generator[Session, None, None]:
+    """
+    工作单元：使用当前线程的会话，正常结束时提交，异常时回滚并继续抛出
+
+    进入时过期会话中缓存的对象，保证读到其他连接（或其他客户端）提交的最新数据。
+    可以嵌套，只有最外层负责过期、提交和回滚。
+    """
+    session = ScopedSession()
+    depth = session.info.get("scope_depth", 0)
+    session.info["scope_depth"] = depth + 1
+    if depth == 0:
+        session.expire_all()
+    try:
+        yield session
+        if depth == 0:
+            session.commit()
+    except Exception:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info["scope_depth"] = depth
+
+
+T = TypeVar("T")
+
+
+def detach(session: Session, objects: List[T]) -> List[T]:
+    """
+    把查询结果（连同已加载的关联对象）移出会话，返回原列表
+
+    放入 data_cache 的对象在多个线程间共享，不能留在某个线程的会话中：
+    该线程下一个工作单元开始时会过期这些对象，其他线程读取时再触发延迟加载。
+    移出后已加载的属性仍可读取。不要在外层工作单元中调用，否则外层正在使用的同一对象也会被移出
+    """
+    pending, seen = list(objects), set()
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or obj not in session:
+            continue
+        seen.add(id(obj))
+        state = sa_inspect(obj)
+        for rel in state.mapper.relationships:
+            value = state.dict.get(rel.key) if rel.key not in state.unloaded else None
+            if value is not None:
+                pending.extend(value if rel.uselist else [value])
+        session.expunge(obj)
+    return objects
+
+
+def remove_session():
+    """关闭当前线程的会话并归还连接（工作线程结束前调用）"""
+    ScopedSession.remove()
+
+
+def chunked(items: Iterable, size: int = IN_CHUNK_SIZE) -> Iterator[list]:
+    """把 ID 列表按 IN 参数个数上限分批"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 def get_db() -> Generator[Session, None, None]:
     """获取数据库会话"""
     db = SessionLocal()
@@ -75,12 +167,27 @@ def init_db():
     """初始化数据库"""
     try:
         # 导入所有模型
-        from . import user, regulation, history
+        from . import user, regulation, history, sync
+        from .migrations import run_migrations
 
         logger.info("开始初始化数据库...")
-        Base.metadata.create_all(bind=engine)
+        # 按结构版本建表或升级，已是最新版本时跳过
+        run_migrations()
         logger.success("数据库初始化完成!")
 
+        if settings.REPLICA_MODE:
+            # 副本模式：记录本地变更到发件箱，默认账户由共享数据库同步而来
+            sync.install_change_capture()
+            return
+
+        # 直接读写共享数据库的客户端不记录行版本，修改不会同步到副本，新增行的主键还会落入副本的号段，
+        # 因此共享数据库一旦被副本模式使用，所有客户端都必须开启副本模式
+        with engine.connect() as conn:
+            if sync.is_replicated(conn):
+                raise RuntimeError(
+                    "该数据库已由副本模式的客户端共享使用，请在 .env 中设置 REPLICA_MODE=True 后再启动"
+                )
+
         # 创建默认管理员账户
         from .user import User
         from shared.constants import UserRole
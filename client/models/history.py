@@ -2,56 +2,247 @@
 历史变更记录模型
 """
 import sys
+import zlib
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import json
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Enum, ForeignKey, Boolean, LargeBinary, Index, func, insert, and_
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import expression
+from sqlalchemy.types import TypeDecorator
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from .database import Base
+from .database import Base, chunked
 from shared.constants import ChangeType, EntityType
 
 
+# 每隔多少条字段差异记录保存一次完整快照，重建历史版本时最多回放这么多条差异
+CHECKPOINT_INTERVAL = 20
+
+# 压缩格式版本（载荷首字节），预置字典变化时递增，旧数据仍按原字典解压
+_PAYLOAD_FORMAT = 1
+# 预置压缩字典：历史载荷中反复出现的键名，短载荷也能获得较好的压缩率
+_ZDICTS = {
+    1: (
+        b'{"changed": {"name": ["description": ["country": ["category": ["status": ["version": '
+        b'["tags": [], "snapshot": {"id": "code": "created_at": "parameter_count": '
+        b'"document_id": "code_file_id": "file_name": "active", "draft", "archived", null, '
+    ),
+}
+
+
+class CompactJSON(TypeDecorator):
+    """
+    紧凑 JSON 字段
+
+    PostgreSQL 上存为 JSONB；其他数据库存为 zlib 压缩（带预置字典）的二进制
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        compressor = zlib.compressobj(9, zdict=_ZDICTS[_PAYLOAD_FORMAT])
+        return bytes([_PAYLOAD_FORMAT]) + compressor.compress(data) + compressor.flush()
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        value = bytes(value)
+        decompressor = zlib.decompressobj(zdict=_ZDICTS[value[0]])
+        return json.loads(decompressor.decompress(value[1:]) + decompressor.flush())
+
+
 class ChangeHistory(Base):
     """历史变更记录表"""
 
     __tablename__ = "change_history"
+    __table_args__ = (
+        # 历史列表和查找最近快照都按实体过滤、按 ID 排序
+        Index("ix_change_history_entity_id_id", "entity_type", "entity_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     entity_type = Column(Enum(EntityType), nullable=False, index=True)
     entity_id = Column(Integer, nullable=False, index=True)
     change_type = Column(Enum(ChangeType), nullable=False)
-    change_data = Column(Text, nullable=True)
+    change_data = Column(Text, nullable=True)  # 旧版记录的 JSON 文本，新记录写入 payload
+    payload = Column(CompactJSON, nullable=True)
+    # 载荷中包含完整快照（"snapshot"），重建历史版本时从这里开始回放
+    is_checkpoint = Column(Boolean, nullable=False, default=False, server_default=expression.false())
     change_summary = Column(String(500), nullable=True)
-    changed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    changed_by = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     changed_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User", back_populates="changes")
 
     def set_change_data(self, data: dict):
         """设置变更数据"""
-        self.change_data = json.dumps(data, ensure_ascii=False)
+        self.payload = data
 
     def get_change_data(self) -> dict:
         """获取变更数据"""
+        if self.payload is not None:
+            return self.payload
         if self.change_data:
             return json.loads(self.change_data)
         return {}
 
+    def get_snapshot(self) -> Optional[dict]:
+        """该记录之后实体的完整状态（不是快照记录时返回 None）"""
+        data = self.get_change_data()
+        if "snapshot" in data:
+            return data["snapshot"]
+        # 旧版记录：更新保存完整的新旧数据，创建/删除保存完整数据
+        if "new" in data and "old" in data:
+            return data["new"]
+        if self.change_type in (ChangeType.CREATE, ChangeType.DELETE) and "id" in data:
+            return data
+        return None
+
     @staticmethod
-    def create_change_record(db, entity_type, entity_id, change_type, 
-                           change_data, change_summary, changed_by):
-        """创建变更记录"""
-        history = ChangeHistory(
-            entity_type=entity_type,
-            entity_id=entity_id,
-            change_type=change_type,
-            change_summary=change_summary,
-            changed_by=changed_by
+    def diff(old: dict, new: dict) -> dict:
+        """字段级差异 {字段: [旧值, 新值]}，只包含变化的字段"""
+        return {
+            key: [old.get(key), new.get(key)]
+            for key in old.keys() | new.keys()
+            if old.get(key) != new.get(key)
+        }
+
+    @staticmethod
+    def create_change_record(db, entity_type, entity_id, change_type,
+                           change_data, change_summary, changed_by,
+                           snapshot: Optional[dict] = None):
+        """
+        创建变更记录
+
+        记录在调用方的事务中写入，随业务修改一起提交（不单独提交）
+
+        Args:
+            change_data: 变更数据；字段修改使用 {"changed": ChangeHistory.diff(旧, 新)}
+            snapshot: 变更后的完整状态。创建、删除时总是保存；
+                      更新时每 CHECKPOINT_INTERVAL 条记录保存一次，作为重建历史版本的起点；
+                      实体还没有快照时第一次更新即保存
+        """
+        return ChangeHistory.create_change_records(
+            db, entity_type, change_type,
+            [(entity_id, change_data, change_summary, snapshot)], changed_by
+        )[0]
+
+    @staticmethod
+    def create_change_records(db, entity_type, change_type,
+                              changes: List[Tuple[int, dict, str, Optional[dict]]],
+                              changed_by) -> List[dict]:
+        """
+        批量创建变更记录（批量操作使用），快照间隔的计数对所有实体只查询一次
+
+        Args:
+            changes: [(实体ID, 变更数据, 变更摘要, 完整状态)]，含义同 create_change_record
+        """
+        since_checkpoint = {}
+        if change_type == ChangeType.UPDATE:
+            since_checkpoint = ChangeHistory._records_since_checkpoint(
+                db, entity_type, [change[0] for change in changes if change[3] is not None]
+            )
+
+        rows = []
+        now = datetime.utcnow()
+        for entity_id, change_data, change_summary, snapshot in changes:
+            data = dict(change_data or {})
+            is_checkpoint = snapshot is not None and (
+                change_type != ChangeType.UPDATE
+                or entity_id not in since_checkpoint
+                or since_checkpoint[entity_id] >= CHECKPOINT_INTERVAL - 1
+            )
+            if is_checkpoint:
+                data["snapshot"] = snapshot
+            rows.append({
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "change_type": change_type,
+                "payload": data,
+                "is_checkpoint": is_checkpoint,
+                "change_summary": change_summary,
+                "changed_by": changed_by,
+                "changed_at": now,
+            })
+
+        # 一条 INSERT 语句（executemany）写入全部记录
+        if rows:
+            db.execute(insert(ChangeHistory), rows)
+        return rows
+
+    @staticmethod
+    def _records_since_checkpoint(db, entity_type, entity_ids: List[int]) -> Dict[int, int]:
+        """
+        最近一次快照之后各实体的记录数 {实体ID: 记录数}
+
+        还没有快照的实体（创建时未记录历史、升级前已有的实体）不出现，调用方应立即保存快照
+        """
+        counts = {}
+        for chunk in chunked(set(entity_ids)):
+            last_checkpoint = db.query(
+                ChangeHistory.entity_id, func.max(ChangeHistory.id).label("checkpoint_id")
+            ).filter(
+                ChangeHistory.entity_type == entity_type,
+                ChangeHistory.entity_id.in_(chunk),
+                ChangeHistory.is_checkpoint.is_(True),
+            ).group_by(ChangeHistory.entity_id).subquery()
+
+            rows = db.query(last_checkpoint.c.entity_id, func.count(ChangeHistory.id)).outerjoin(
+                ChangeHistory, and_(
+                    ChangeHistory.entity_type == entity_type,
+                    ChangeHistory.entity_id == last_checkpoint.c.entity_id,
+                    ChangeHistory.id > last_checkpoint.c.checkpoint_id,
+                )
+            ).group_by(last_checkpoint.c.entity_id)
+            counts.update(dict(rows.all()))
+        return counts
+
+    @staticmethod
+    def reconstruct(db, entity_type, entity_id, at: Optional[datetime] = None) -> Optional[dict]:
+        """
+        重建实体在某一时刻（默认最新）的状态
+
+        从该时刻之前最近的快照开始，依次应用之后的字段差异；
+        实体在该时刻尚未创建或已删除时返回 None
+        """
+        query = db.query(ChangeHistory).filter(
+            ChangeHistory.entity_type == entity_type,
+            ChangeHistory.entity_id == entity_id,
         )
-        history.set_change_data(change_data)
-        db.add(history)
-        db.commit()
-        return history
\ No newline at end of file
+        if at is not None:
+            query = query.filter(ChangeHistory.changed_at <= at)
+
+        # 旧版记录没有 is_checkpoint 标记，但本身带有完整数据，也可以作为起点
+        records = []
+        for record in query.order_by(ChangeHistory.id.desc()).yield_per(CHECKPOINT_INTERVAL):
+            records.append(record)
+            if record.get_snapshot() is not None:
+                break
+        else:
+            return None
+
+        state = None
+        for record in reversed(records):
+            if record.change_type == ChangeType.DELETE:
+                state = None
+            elif state is None:
+                state = dict(record.get_snapshot())
+            else:
+                for key, (_, new_value) in record.get_change_data().get("changed", {}).items():
+                    state[key] = new_value
+        return state
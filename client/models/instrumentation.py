@@ -0,0 +1,226 @@
+"""
+SQL 语句统计、慢查询日志和 N+1 查询检测
+挂在数据库引擎的 before_cursor_execute / after_cursor_execute 事件上
+"""
+import sys
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+
+
+CLIENT_DIR = Path(__file__).resolve().parent.parent
+# 查找调用位置时跳过的文件（引擎和会话的封装本身）
+_SKIPPED_FILES = {
+    str(Path(__file__).resolve()),
+    str(CLIENT_DIR / "models" / "database.py"),
+}
+SLOW_QUERY_LOG = settings.LOG_DIR / "slow_queries.log"
+# 日志中 SQL 和参数的最大长度
+_MAX_LOGGED_SQL = 2000
+_MAX_LOGGED_PARAMETERS = 500
+
+
+@dataclass
+class StatementStats:
+    """同一条 SQL 语句（参数化文本相同）的累计统计"""
+    statement: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    # 写语句影响的行数（SQLite 的 SELECT 在执行时不知道行数，不计入）
+    rows: int = 0
+    callers: Counter = field(default_factory=Counter)
+    # 最近一次执行的参数，用于 EXPLAIN QUERY PLAN
+    last_parameters: Any = None
+
+    def to_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "rows": self.rows,
+            "callers": dict(self.callers.most_common(5)),
+        }
+
+
+def find_caller() -> str:
+    """调用这条语句的业务代码位置（client 包内第一个非数据库封装的栈帧），如 data_importer.DataImporter.import_from_json:85"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(str(CLIENT_DIR)) and filename not in _SKIPPED_FILES:
+            # co_qualname（含类名）从 Python 3.11 开始才有
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            return f"{Path(filename).stem}.{name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+def _shorten(value: Any, limit: int) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class QueryInstrumentation:
+    """
+    SQL 语句统计
+
+    慢查询（超过 SLOW_QUERY_MS）总是记录到 logs/slow_queries.log；
+    开启 SQL_INSTRUMENTATION 后另外按语句累计次数、耗时、行数和调用位置，
+    并检测 N+1 查询：同一次数据库连接使用期间（一个工作单元）同一语句
+    执行达到 N_PLUS_ONE_THRESHOLD 次时警告一次
+    """
+
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 200, n_plus_one_threshold: int = 20):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._stats: dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+
+    def install(self, engine):
+        """注册引擎事件"""
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        # 连接归还连接池时工作单元结束，重新统计重复语句（执行失败的语句留下的开始时间也一并清除）
+        event.listen(engine, "checkin", self._reset_unit)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        slow = self.slow_query_ms and elapsed >= self.slow_query_ms
+        if not (self.enabled or slow) or statement.startswith("EXPLAIN"):
+            return
+
+        caller = find_caller()
+        if slow:
+            logger.bind(slow_query=True, duration_ms=round(elapsed, 1), caller=caller).warning(
+                f"慢查询 {elapsed:.1f} ms ({caller}): {_shorten(statement, _MAX_LOGGED_SQL)} | "
+                f"参数: {_shorten(parameters, _MAX_LOGGED_PARAMETERS)}"
+            )
+        if not self.enabled:
+            return
+
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = StatementStats(statement)
+            stats.count += 1
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            stats.rows += rows
+            stats.callers[caller] += 1
+            stats.last_parameters = parameters[0] if executemany and parameters else parameters
+
+        # 连接信息在一个工作单元内只属于当前线程，不需要加锁
+        unit_counts = conn.info.setdefault("unit_statement_counts", Counter())
+        unit_counts[statement] += 1
+        if unit_counts[statement] == self.n_plus_one_threshold:
+            logger.warning(
+                f"疑似 N+1 查询: 同一工作单元中同一语句已执行 {self.n_plus_one_threshold} 次 "
+                f"({caller}): {_shorten(statement, 300)}"
+            )
+
+    @staticmethod
+    def _reset_unit(dbapi_connection, connection_record):
+        connection_record.info.pop("unit_statement_counts", None)
+        connection_record.info.pop("query_start", None)
+
+    def get_stats(self, top: int = 20, order_by: str = "total_ms") -> List[dict]:
+        """按累计耗时（或 count、max_ms）排序的语句统计"""
+        with self._lock:
+            stats = sorted(self._stats.values(), key=lambda s: getattr(s, order_by), reverse=True)[:top]
+            return [s.to_dict() for s in stats]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = datetime.now()
+
+    def explain(self, statement: str, parameters: Any = None) -> List[str]:
+        """查询计划（SQLite: EXPLAIN QUERY PLAN，按层级缩进；PostgreSQL: EXPLAIN）"""
+        from client.models.database import engine
+
+        with engine.connect() as conn:
+            if engine.dialect.name == "sqlite":
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).all()
+                depth = {0: -1}
+                lines = []
+                for node_id, parent_id, _, detail in rows:
+                    depth[node_id] = depth.get(parent_id, -1) + 1
+                    lines.append("  " * depth[node_id] + detail)
+                return lines
+            rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters or {}).all()
+            return [row[0] for row in rows]
+
+    def explain_hot_queries(self, top: int = 10) -> str:
+        """累计耗时最多的语句及其查询计划"""
+        with self._lock:
+            hot = sorted(self._stats.values(), key=lambda s: s.total_ms, reverse=True)[:top]
+
+        sections = []
+        for number, stats in enumerate(hot, 1):
+            summary = stats.to_dict()
+            lines = [
+                f"#{number}  执行 {summary['count']} 次，累计 {summary['total_ms']} ms，"
+                f"平均 {summary['avg_ms']} ms，最长 {summary['max_ms']} ms，影响 {summary['rows']} 行",
+                f"调用位置: {', '.join(f'{caller} ×{count}' for caller, count in summary['callers'].items())}",
+                stats.statement,
+                "查询计划:",
+            ]
+            if stats.statement.lstrip()[:6].upper() == "SELECT":
+                try:
+                    lines.extend("    " + line for line in self.explain(stats.statement, stats.last_parameters))
+                except Exception as e:
+                    lines.append(f"    无法获取: {e}")
+            else:
+                lines.append("    （只分析 SELECT 语句）")
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
+
+    def dump_report(self, path: Optional[Path] = None, top: int = 10) -> Path:
+        """把语句统计和热点语句的查询计划写入文件（默认 logs/query_report_时间.txt），返回文件路径"""
+        if path is None:
+            path = settings.LOG_DIR / f"query_report_{datetime.now():%Y%m%d_%H%M%S}.txt"
+        header = f"SQL 语句统计（{self.started_at:%Y-%m-%d %H:%M:%S} 起）\n\n"
+        if not self.enabled:
+            header += "未开启 SQL_INSTRUMENTATION，没有统计数据\n"
+        path.write_text(header + self.explain_hot_queries(top) + "\n", encoding="utf-8")
+        logger.info(f"SQL 语句统计已写入: {path}")
+        return path
+
+
+def add_slow_query_sink(log_format: str):
+    """把慢查询写入单独的滚动日志文件（在配置日志时调用）"""
+    logger.add(
+        SLOW_QUERY_LOG,
+        format=log_format,
+        filter=lambda record: record["extra"].get("slow_query", False),
+        rotation="10 MB",
+        retention="7 days",
+        encoding="utf-8",
+        enqueue=True,
+    )
+
+
+# 进程内共享的统计实例
+query_instrumentation = QueryInstrumentation(
+    settings.SQL_INSTRUMENTATION, settings.SLOW_QUERY_MS, settings.N_PLUS_ONE_THRESHOLD
+)
@@ -0,0 +1,210 @@
+"""
+数据库结构版本和迁移
+
+schema_version 表记录已执行的迁移：
+- 版本已是最新时启动直接跳过，不再执行 create_all 和逐表检查列、索引
+- 新数据库由 create_all 直接建成最新结构，记为最新版本
+- 旧数据库（没有版本记录的记为 0）依次执行尚未执行的迁移
+
+修改表结构时先改模型，再在 MIGRATIONS 末尾追加一项，把已有数据库升级到同样的结构
+"""
+import sys
+from pathlib import Path
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable
+from loguru import logger
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, inspect, select, func, text
+from sqlalchemy.engine import Connection
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from .database import Base, engine
+
+
+# 版本表不属于模型（Base.metadata），不参与副本同步
+schema_version_table = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一次结构变更"""
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def create_missing_columns(conn: Connection):
+    """
+    为已存在的表补建模型中新增的列（create_all 不会修改已有表）
+
+    只处理可为空或带服务端默认值的列，已有数据不受影响
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.warning(f"无法自动添加非空列 {table.name}.{column.name}")
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            if column.server_default is not None:
+                default = column.server_default.arg
+                if not isinstance(default, str):
+                    default = default.compile(dialect=conn.dialect)
+                ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+            logger.info(f"已添加列 {table.name}.{column.name}")
+
+
+def create_indexes(conn: Connection, *names: str):
+    """按名称创建模型中声明的索引（已存在的跳过）；不指定名称时创建全部"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if not names or index.name in names:
+                index.create(bind=conn, checkfirst=True)
+
+
+def drop_index(conn: Connection, table_name: str, index_name: str):
+    """删除已不在模型中的索引（不存在时跳过）"""
+    if any(index["name"] == index_name for index in inspect(conn).get_indexes(table_name)):
+        conn.execute(text(f"DROP INDEX {index_name}"))
+        logger.info(f"已删除索引 {index_name}")
+
+
+def _baseline(conn: Connection):
+    # 引入版本记录之前由每次启动执行的检查：补建缺少的表、列和索引
+    # （取代 add_coefficient_column.py 等单独的迁移脚本）
+    Base.metadata.create_all(bind=conn)
+    create_missing_columns(conn)
+    create_indexes(conn)
+
+
+def _foreign_key_indexes(conn: Connection):
+    # 当前参数按行顺序读取的索引包含了原 (regulation_id, valid_to) 索引
+    drop_index(conn, "regulation_parameters", "ix_regulation_parameters_regulation_id_valid_to")
+    create_indexes(
+        conn,
+        "ix_regulation_parameters_regulation_id_valid_to_row_order",
+        "ix_regulation_documents_regulation_id_sha256",
+        "ix_code_files_regulation_id_sha256",
+        "ix_regulation_tags_tag_id",
+        "ix_change_history_changed_by",
+        "ix_regulations_status_created_at",
+    )
+
+
+MIGRATIONS = [
+    Migration(1, "基线：补建旧版本数据库缺少的表、列和索引", _baseline),
+    Migration(2, "外键列和常用筛选列的索引", _foreign_key_indexes),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: Connection) -> int:
+    """数据库当前的结构版本（没有版本表时为 0）"""
+    if not inspect(conn).has_table(schema_version_table.name):
+        return 0
+    return conn.execute(select(func.max(schema_version_table.c.version))).scalar() or 0
+
+
+def _record_version(conn: Connection, version: int, description: str):
+    conn.execute(schema_version_table.insert().values(
+        version=version, description=description, applied_at=datetime.utcnow()
+    ))
+
+
+def analyze(conn: Connection):
+    """更新查询优化器的统计信息（新建索引后执行，优化器才会按数据分布选择索引）"""
+    conn.execute(text("ANALYZE"))
+
+
+def run_migrations(bind=None) -> int:
+    """
+    把数据库升级到最新结构
+
+    每个迁移在单独的事务中执行并记录版本；迁移本身可以重复执行，
+    中途失败时下次启动从失败的迁移继续
+
+    Returns:
+        执行的迁移数（已是最新时为 0）
+    """
+    # 导入所有模型，保证 Base.metadata 完整
+    from . import user, regulation, history, parameter, update_notification, sync
+
+    bind = bind or engine
+    with bind.begin() as conn:
+        current = get_schema_version(conn)
+        if current >= SCHEMA_VERSION:
+            if current > SCHEMA_VERSION:
+                logger.warning(f"数据库结构版本 {current} 高于程序支持的版本 {SCHEMA_VERSION}，请升级程序")
+            return 0
+
+        schema_version_table.create(bind=conn, checkfirst=True)
+        model_tables = {table.name for table in Base.metadata.sorted_tables}
+        if current == 0 and not model_tables & set(inspect(conn).get_table_names()):
+            # 新数据库：直接建成最新结构
+            Base.metadata.create_all(bind=conn)
+            _record_version(conn, SCHEMA_VERSION, "新建数据库")
+            logger.info(f"已创建数据库结构（版本 {SCHEMA_VERSION}）")
+            return 1
+
+    applied = 0
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        logger.info(f"执行数据库迁移 {migration.version}: {migration.description}")
+        with bind.begin() as conn:
+            migration.upgrade(conn)
+            _record_version(conn, migration.version, migration.description)
+        applied += 1
+
+    with bind.begin() as conn:
+        analyze(conn)
+    logger.success(f"数据库结构已从版本 {current} 升级到 {SCHEMA_VERSION}")
+    return applied
+
+
+def get_applied_migrations(bind=None) -> list:
+    """已执行的迁移记录 (版本, 说明, 执行时间)"""
+    bind = bind or engine
+    with bind.connect() as conn:
+        if not inspect(conn).has_table(schema_version_table.name):
+            return []
+        return conn.execute(
+            select(schema_version_table).order_by(schema_version_table.c.version)
+        ).all()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    parser.add_argument("--status", action="store_true", help="显示当前结构版本和已执行的迁移")
+    parser.add_argument("--analyze", action="store_true", help="只更新查询优化器统计信息")
+    args = parser.parse_args()
+
+    if args.status:
+        records = get_applied_migrations()
+        current = records[-1].version if records else 0
+        print(f"当前版本: {current}，最新版本: {SCHEMA_VERSION}")
+        for record in records:
+            print(f"  {record.version:>3}  {record.applied_at:%Y-%m-%d %H:%M:%S}  {record.description}")
+    elif args.analyze:
+        with engine.begin() as conn:
+            analyze(conn)
+        print("已更新统计信息")
+    else:
+        print(f"执行了 {run_migrations()} 个迁移")
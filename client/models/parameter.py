@@ -4,7 +4,7 @@
 import sys
 from pathlib import Path
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, LargeBinary, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, LargeBinary, DateTime, Index
 from sqlalchemy.orm import relationship
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -12,10 +12,27 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 from .database import Base
 
 
+# 参数行的内容字段，内容和行顺序都相同的行在不同版本之间共用
+PARAMETER_VALUE_FIELDS = (
+    "category", "parameter_name", "default_value", "upper_limit", "lower_limit",
+    "unit", "coefficient", "protocol_bit", "remark",
+)
+
+
 class RegulationParameter(Base):
-    """法规参数表"""
+    """
+    法规参数表
+
+    按时间区间保存参数的各个版本：valid_to 为空的是当前参数，
+    某一时刻 t 的参数为 valid_from <= t < valid_to 的行（valid_from 为空表示早于版本记录）
+    """
     
     __tablename__ = "regulation_parameters"
+    __table_args__ = (
+        # 当前参数（valid_to 为空）按行顺序读取，索引直接给出顺序，不需要再排序
+        Index("ix_regulation_parameters_regulation_id_valid_to_row_order", "regulation_id", "valid_to", "row_order"),
+        Index("ix_regulation_parameters_regulation_id_valid_from", "regulation_id", "valid_from"),
+    )
     
     id = Column(Integer, primary_key=True)
     regulation_id = Column(Integer, ForeignKey("regulations.id"), nullable=False)
@@ -32,5 +49,7 @@ class RegulationParameter(Base):
     row_order = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    valid_from = Column(DateTime, nullable=True, default=datetime.utcnow)
+    valid_to = Column(DateTime, nullable=True)
     
     regulation = relationship("Regulation", backref="parameters")
\ No newline at end of file
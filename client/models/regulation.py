@@ -4,7 +4,7 @@
 import sys
 from pathlib import Path
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -17,6 +17,10 @@ class Regulation(Base):
     """法规表"""
 
     __tablename__ = "regulations"
+    __table_args__ = (
+        # 按状态筛选的列表按创建时间倒序
+        Index("ix_regulations_status_created_at", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(50), unique=True, nullable=False, index=True)
@@ -55,6 +59,10 @@ class RegulationDocument(Base):
     """法规文档表"""
 
     __tablename__ = "regulation_documents"
+    __table_args__ = (
+        # 详情页按法规列出文档、上传时按法规查重、删除法规时按法规删除
+        Index("ix_regulation_documents_regulation_id_sha256", "regulation_id", "sha256"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     regulation_id = Column(Integer, ForeignKey("regulations.id"), nullable=False)
@@ -62,6 +70,7 @@ class RegulationDocument(Base):
     file_name = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=True)
+    sha256 = Column(String(64), nullable=True, index=True)  # 内容哈希，用于去重
     upload_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     upload_at = Column(DateTime, default=datetime.utcnow)
 
@@ -73,11 +82,15 @@ class CodeFile(Base):
     """C代码文件表"""
 
     __tablename__ = "code_files"
+    __table_args__ = (
+        Index("ix_code_files_regulation_id_sha256", "regulation_id", "sha256"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     regulation_id = Column(Integer, ForeignKey("regulations.id"), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
+    sha256 = Column(String(64), nullable=True, index=True)  # 内容哈希，用于去重
     description = Column(Text, nullable=True)
     usage_guide = Column(Text, nullable=True)
     version = Column(String(20), nullable=True)
@@ -107,4 +120,5 @@ class RegulationTag(Base):
     __tablename__ = "regulation_tags"
 
     regulation_id = Column(Integer, ForeignKey("regulations.id"), primary_key=True)
-    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
\ No newline at end of file
+    # 主键以 regulation_id 开头，按标签查法规需要单独的索引
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True, index=True)
\ No newline at end of file
@@ -0,0 +1,435 @@
+"""
+本地副本同步模型
+
+副本模式下，每个客户端的本地 SQLite 副本通过以下表记录同步状态：
+- sync_row_versions: 每行数据的版本向量（本地和共享数据库各有一份）
+- sync_outbox: 待推送到共享数据库的本地变更
+- sync_conflicts: 同步时检测到的并发修改冲突
+- sync_state: 同步游标等键值状态
+- sync_id_blocks: 共享数据库为各节点分配的主键号段，避免离线新增的行主键冲突
+"""
+import sys
+import json
+import uuid
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Boolean, Enum,
+    Table, event, select, and_,
+)
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from .database import Base
+from shared.config import settings, DATA_DIR
+from shared.constants import SyncStatus
+
+
+# 发件箱操作类型
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+# 同步元数据表不参与复制
+SYNC_TABLES = {"sync_row_versions", "sync_outbox", "sync_conflicts", "sync_state", "sync_id_blocks"}
+
+# 每次为节点分配的主键号段大小
+ID_BLOCK_SIZE = 1_000_000
+
+
+class RowVersion(Base):
+    """行版本向量表"""
+
+    __tablename__ = "sync_row_versions"
+
+    table_name = Column(String(64), primary_key=True)
+    row_key = Column(String(200), primary_key=True)
+    version_vector = Column(Text, nullable=False, default="{}")
+    is_deleted = Column(Boolean, nullable=False, default=False)
+    # 共享数据库中单调递增的序号，用作增量拉取游标
+    seq = Column(Integer, nullable=True, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SyncOutbox(Base):
+    """同步发件箱表"""
+
+    __tablename__ = "sync_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(64), nullable=False)
+    row_key = Column(String(200), nullable=False)
+    operation = Column(String(10), nullable=False)
+    status = Column(Enum(SyncStatus), nullable=False, default=SyncStatus.PENDING, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+
+class SyncConflict(Base):
+    """同步冲突记录表"""
+
+    __tablename__ = "sync_conflicts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(64), nullable=False)
+    row_key = Column(String(200), nullable=False)
+    local_vector = Column(Text, nullable=True)
+    remote_vector = Column(Text, nullable=True)
+    local_data = Column(Text, nullable=True)
+    remote_data = Column(Text, nullable=True)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    resolved = Column(Boolean, nullable=False, default=False, index=True)
+    resolution = Column(String(20), nullable=True)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "table_name": self.table_name,
+            "row_key": self.row_key,
+            "local_vector": load_vector(self.local_vector),
+            "remote_vector": load_vector(self.remote_vector),
+            "local_data": json.loads(self.local_data) if self.local_data else None,
+            "remote_data": json.loads(self.remote_data) if self.remote_data else None,
+            "detected_at": self.detected_at.isoformat() if self.detected_at else None,
+            "resolved": self.resolved,
+            "resolution": self.resolution,
+        }
+
+
+class SyncState(Base):
+    """同步状态表（键值）"""
+
+    __tablename__ = "sync_state"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(Text, nullable=True)
+
+
+class SyncIdBlock(Base):
+    """主键号段分配表（位于共享数据库）"""
+
+    __tablename__ = "sync_id_blocks"
+
+    id = Column(Integer, primary_key=True)
+    node_id = Column(String(64), nullable=False)
+    block_start = Column(Integer, nullable=False, unique=True)
+    block_end = Column(Integer, nullable=False)
+    allocated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+def get_node_id() -> str:
+    """获取本客户端的同步节点标识（首次使用时生成并持久化）"""
+    if settings.SYNC_NODE_ID:
+        return settings.SYNC_NODE_ID
+
+    node_file = DATA_DIR / "sync_node_id"
+    if node_file.exists():
+        node_id = node_file.read_text(encoding="utf-8").strip()
+        if node_id:
+            return node_id
+
+    node_id = uuid.uuid4().hex[:12]
+    node_file.write_text(node_id, encoding="utf-8")
+    return node_id
+
+
+# ========== 版本向量 ==========
+
+def load_vector(text: Optional[str]) -> Dict[str, int]:
+    """解析版本向量"""
+    if not text:
+        return {}
+    return {str(k): int(v) for k, v in json.loads(text).items()}
+
+
+def dump_vector(vector: Dict[str, int]) -> str:
+    """序列化版本向量"""
+    return json.dumps(vector, sort_keys=True)
+
+
+def compare_vectors(a: Dict[str, int], b: Dict[str, int]) -> str:
+    """
+    比较两个版本向量
+
+    Returns:
+        "equal" / "newer"（a 支配 b）/ "older"（b 支配 a）/ "concurrent"（并发修改）
+    """
+    a_greater = any(a.get(node, 0) > b.get(node, 0) for node in a)
+    b_greater = any(b.get(node, 0) > a.get(node, 0) for node in b)
+    if a_greater and b_greater:
+        return "concurrent"
+    if a_greater:
+        return "newer"
+    if b_greater:
+        return "older"
+    return "equal"
+
+
+def merge_vectors(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    """合并版本向量（逐节点取最大值）"""
+    merged = dict(a)
+    for node, counter in b.items():
+        merged[node] = max(merged.get(node, 0), counter)
+    return merged
+
+
+# ========== 行标识 ==========
+
+def replicated_tables() -> List[Table]:
+    """需要复制的表（按外键依赖排序）"""
+    return [t for t in Base.metadata.sorted_tables if t.name not in SYNC_TABLES]
+
+
+def make_row_key(values: Iterable) -> str:
+    """由主键值生成行标识"""
+    return json.dumps(list(values), default=str)
+
+
+def row_key_clause(table: Table, row_key: str):
+    """由行标识生成主键过滤条件"""
+    values = json.loads(row_key)
+    return and_(*[col == value for col, value in zip(table.primary_key.columns, values)])
+
+
+def row_to_json(row: Optional[dict]) -> Optional[str]:
+    """将行数据序列化为 JSON（用于冲突记录，二进制字段只保留长度）"""
+    if row is None:
+        return None
+    data = {}
+    for key, value in row.items():
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            data[key] = f"<{len(value)} bytes>"
+        elif hasattr(value, "value"):
+            data[key] = value.value
+        else:
+            data[key] = value
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# ========== 本地变更捕获 ==========
+
+def record_local_change(conn, node_id: str, table_name: str, row_key: str, operation: str):
+    """
+    记录一次本地变更：递增本节点的版本计数并写入发件箱
+
+    同一行尚未推送的变更会合并为一条发件箱记录
+    """
+    versions = RowVersion.__table__
+    outbox = SyncOutbox.__table__
+    now = datetime.utcnow()
+
+    current = conn.execute(
+        select(versions.c.version_vector).where(and_(
+            versions.c.table_name == table_name,
+            versions.c.row_key == row_key,
+        ))
+    ).first()
+
+    vector = load_vector(current[0]) if current else {}
+    vector[node_id] = vector.get(node_id, 0) + 1
+
+    values = {
+        "version_vector": dump_vector(vector),
+        "is_deleted": operation == OP_DELETE,
+        "updated_at": now,
+    }
+    if current:
+        conn.execute(versions.update().where(and_(
+            versions.c.table_name == table_name,
+            versions.c.row_key == row_key,
+        )).values(**values))
+    else:
+        conn.execute(versions.insert().values(table_name=table_name, row_key=row_key, **values))
+
+    pending = conn.execute(
+        select(outbox.c.id).where(and_(
+            outbox.c.table_name == table_name,
+            outbox.c.row_key == row_key,
+            outbox.c.status == SyncStatus.PENDING,
+        ))
+    ).first()
+    if pending:
+        conn.execute(outbox.update().where(outbox.c.id == pending[0]).values(operation=operation))
+    else:
+        conn.execute(outbox.insert().values(
+            table_name=table_name, row_key=row_key, operation=operation,
+            status=SyncStatus.PENDING, attempts=0, created_at=now,
+        ))
+
+
+def is_replicated(conn) -> bool:
+    """数据库是否已被副本模式的客户端用作共享数据库（分配过主键号段）"""
+    blocks = SyncIdBlock.__table__
+    return conn.execute(select(blocks.c.node_id).limit(1)).first() is not None
+
+
+def take_block_ids(conn, count: int) -> List[int]:
+    """从本节点的主键号段中取出至多 count 个连续 ID（号段用尽时可能少于 count 个）"""
+    state = SyncState.__table__
+    values = dict(conn.execute(
+        select(state.c.key, state.c.value).where(state.c.key.in_(["id_next", "id_block_end"]))
+    ).all())
+    if "id_next" not in values or "id_block_end" not in values:
+        return []
+
+    next_id, block_end = int(values["id_next"]), int(values["id_block_end"])
+    ids = list(range(next_id, min(next_id + count, block_end + 1)))
+    if ids:
+        conn.execute(state.update().where(state.c.key == "id_next").values(value=str(ids[-1] + 1)))
+    return ids
+
+
+def take_block_id(conn) -> Optional[int]:
+    """从本节点的主键号段中取出下一个可用 ID"""
+    ids = take_block_ids(conn, 1)
+    return ids[0] if ids else None
+
+
+def _collect_flush_changes(session: Session) -> List[Tuple[str, str, str]]:
+    """收集一次 flush 中 ORM 对象（含多对多关联表）的变更"""
+    changes = []
+    seen = set()
+
+    def add(table_name, row_key, operation):
+        if table_name in SYNC_TABLES or (table_name, row_key) in seen:
+            return
+        seen.add((table_name, row_key))
+        changes.append((table_name, row_key, operation))
+
+    def add_secondary(state, deleted: bool):
+        for rel in state.mapper.relationships:
+            if rel.secondary is None:
+                continue
+            history = state.attrs[rel.key].history
+            added = [] if deleted else list(history.added or [])
+            removed = list(history.deleted or [])
+            if deleted and history.unchanged:
+                removed.extend(history.unchanged)
+            for child, operation in [(c, OP_UPSERT) for c in added] + [(c, OP_DELETE) for c in removed]:
+                child_state = sa_inspect(child)
+                row = {}
+                for parent_col, sec_col in rel.synchronize_pairs:
+                    row[sec_col.name] = getattr(state.obj(), state.mapper.get_property_by_column(parent_col).key)
+                for child_col, sec_col in rel.secondary_synchronize_pairs:
+                    row[sec_col.name] = getattr(child, child_state.mapper.get_property_by_column(child_col).key)
+                pk_values = [row.get(col.name) for col in rel.secondary.primary_key.columns]
+                if None not in pk_values:
+                    add(rel.secondary.name, make_row_key(pk_values), operation)
+
+    for obj, operation in (
+        [(o, OP_UPSERT) for o in session.new]
+        + [(o, OP_UPSERT) for o in session.dirty if session.is_modified(o)]
+        + [(o, OP_DELETE) for o in session.deleted]
+    ):
+        state = sa_inspect(obj)
+        table = state.mapper.local_table
+        pk_values = state.mapper.primary_key_from_instance(obj)
+        if None not in pk_values:
+            add(table.name, make_row_key(pk_values), operation)
+        add_secondary(state, deleted=operation == OP_DELETE)
+
+    return changes
+
+
+_capture_installed = False
+
+
+def install_change_capture(node_id: Optional[str] = None):
+    """
+    在所有 ORM 会话上安装本地变更捕获
+
+    - ORM 对象的增删改在 after_flush 中记录
+    - query.update()/query.delete() 等批量语句在 do_orm_execute 中预先查出受影响的主键后记录
+    - session.execute(insert(Model), rows) 批量插入在 do_orm_execute 中从号段分配主键后记录
+    """
+    global _capture_installed
+    if _capture_installed:
+        return
+    _capture_installed = True
+
+    if node_id is None:
+        node_id = get_node_id()
+
+    @event.listens_for(Base, "before_insert", propagate=True)
+    def _assign_block_id(mapper, connection, target):
+        # 单列整数主键的新行从本节点号段中取值，号段用尽时退回数据库自增
+        pk_columns = mapper.local_table.primary_key.columns
+        if len(pk_columns) != 1 or mapper.local_table.name in SYNC_TABLES:
+            return
+        pk_column = list(pk_columns)[0]
+        prop = mapper.get_property_by_column(pk_column)
+        if getattr(target, prop.key) is not None or pk_column.type.python_type is not int:
+            return
+        new_id = take_block_id(connection)
+        if new_id is not None:
+            setattr(target, prop.key, new_id)
+
+    @event.listens_for(Session, "after_flush")
+    def _capture_flush(session, flush_context):
+        changes = _collect_flush_changes(session)
+        if not changes:
+            return
+        conn = session.connection()
+        for table_name, row_key, operation in changes:
+            record_local_change(conn, node_id, table_name, row_key, operation)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _capture_bulk(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return None
+        statement = orm_execute_state.statement
+        table = getattr(statement, "table", None)
+        if table is None or table.name in SYNC_TABLES:
+            return None
+
+        conn = orm_execute_state.session.connection()
+        if orm_execute_state.is_insert:
+            return _capture_insert(orm_execute_state, conn, table)
+
+        pk_query = select(*table.primary_key.columns)
+        if statement.whereclause is not None:
+            pk_query = pk_query.where(statement.whereclause)
+        affected = [tuple(row) for row in conn.execute(pk_query)]
+
+        result = orm_execute_state.invoke_statement()
+
+        operation = OP_DELETE if orm_execute_state.is_delete else OP_UPSERT
+        for pk_values in affected:
+            record_local_change(conn, node_id, table.name, make_row_key(pk_values), operation)
+        return result
+
+    def _capture_insert(orm_execute_state, conn, table):
+        # 参数中的键是 ORM 属性名，与列名不同时按映射转换
+        mapper = orm_execute_state.bind_mapper
+        pk_columns = list(table.primary_key.columns)
+        pk_keys = [mapper.get_property_by_column(col).key if mapper else col.name for col in pk_columns]
+
+        params = orm_execute_state.parameters
+        rows = [dict(row) for row in (params if orm_execute_state.is_executemany else [params or {}])]
+
+        # 单列整数主键的新行与 _assign_block_id 一样从本节点号段中取值
+        missing = [row for row in rows if row.get(pk_keys[0]) is None]
+        if len(pk_columns) == 1 and pk_columns[0].type.python_type is int and missing:
+            for row, new_id in zip(missing, take_block_ids(conn, len(missing))):
+                row[pk_keys[0]] = new_id
+
+        if all(row.get(key) is not None for row in rows for key in pk_keys):
+            result = orm_execute_state.invoke_statement(params=rows if orm_execute_state.is_executemany else rows[0])
+            inserted = [[row[key] for key in pk_keys] for row in rows]
+        else:
+            # 号段用尽（或 VALUES 写在语句中）时由数据库生成主键，通过 RETURNING 取回
+            frozen = orm_execute_state.invoke_statement(
+                statement=orm_execute_state.statement.returning(*pk_columns, sort_by_parameter_order=True),
+                params=rows if orm_execute_state.is_executemany else rows[0],
+            ).freeze()
+            inserted = [list(pk_values) for pk_values in frozen()]
+            result = frozen()
+
+        for pk_values in inserted:
+            record_local_change(conn, node_id, table.name, make_row_key(pk_values), OP_UPSERT)
+        return result
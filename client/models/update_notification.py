@@ -4,7 +4,7 @@
 import sys
 from pathlib import Path
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, Index
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
@@ -22,6 +22,12 @@ class UpdateNotification(Base):
     """更新通知表"""
 
     __tablename__ = "update_notifications"
+    __table_args__ = (
+        # 未读计数、按类型筛选和分页排序都走索引，不随通知数量增长而变慢
+        Index("ix_update_notifications_is_read_created_at", "is_read", "created_at"),
+        Index("ix_update_notifications_type_created_at", "type", "created_at"),
+        Index("ix_update_notifications_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String(20), nullable=False)  # software 或 regulation
@@ -47,3 +53,22 @@ class UpdateNotification(Base):
 
     def __repr__(self):
         return f"<UpdateNotification(id={self.id}, type='{self.type}', title='{self.title}')>"
+
+
+class UpdateNotificationArchive(Base):
+    """已归档通知表（超过保留期的已读通知）"""
+
+    __tablename__ = "update_notifications_archive"
+
+    id = Column(Integer, primary_key=True)  # 沿用原通知ID
+    type = Column(String(20), nullable=False)
+    title = Column(String(200), nullable=False)
+    message = Column(Text, nullable=True)
+    version = Column(String(50), nullable=True)
+    regulation_id = Column(Integer, nullable=True)
+    is_read = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UpdateNotificationArchive(id={self.id}, title='{self.title}')>"
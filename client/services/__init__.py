@@ -1,16 +1,23 @@
 """
 业务逻辑服务模块
+
+按需导入：访问 client.services.UpdateService 等属性时才导入对应子模块，
+例如登录前只需要 AuthService，不会加载 requests 和更新、同步相关模块
 """
-from .auth_service import AuthService
-from .regulation_service import RegulationService
-from .search_service import SearchService
-from .update_service import UpdateService
-from .data_sync_service import DataSyncService
+from client.lazy_import import make_lazy_getattr
+
+# 导出名称 -> 子模块
+_LAZY_ATTRS = {
+    "AuthService": ".auth_service",
+    "RegulationService": ".regulation_service",
+    "SearchService": ".search_service",
+    "UpdateService": ".update_service",
+    "DataSyncService": ".data_sync_service",
+    "ReplicaSyncService": ".replica_sync_service",
+    "NotificationWatcher": ".notification_watcher",
+    "UpdateCheckScheduler": ".update_scheduler",
+}
+
+__all__ = list(_LAZY_ATTRS)
 
-__all__ = [
-    "AuthService",
-    "RegulationService",
-    "SearchService",
-    "UpdateService",
-    "DataSyncService",
-]
\ No newline at end of file
+__getattr__, __dir__ = make_lazy_getattr(__name__, _LAZY_ATTRS)
@@ -0,0 +1,115 @@
+"""
+进程内数据缓存
+缓存法规、标签和参数的查询结果，按 LRU 淘汰，写操作和同步拉取后失效
+"""
+import sys
+import time
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+
+
+class DataCache:
+    """
+    读穿透缓存
+
+    键为 (实体类型, 版本号, 键)。每种实体类型有一个版本号，整体失效时只需递增版本号，
+    旧条目不再被命中，随后按 LRU 淘汰；单个实体失效时删除对应条目，正在加载该实体时还递增它的代数。
+    加载前后版本号或代数不同说明加载期间发生了失效，结果可能是旧数据，不写入缓存。
+    代数只为正在加载的实体保留，最后一个加载结束时删除。
+    其他客户端的修改无法主动通知，条目超过 ttl 秒后重新查询。
+
+    缓存的 ORM 对象已脱离会话，只能读取，修改请通过服务方法。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 300):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._generations: dict[tuple, int] = {}  # (实体类型, 键) -> 加载期间单个实体失效的次数
+        self._loading: dict[tuple, int] = {}  # (实体类型, 键) -> 正在进行的加载数
+        self._epoch = 0  # clear() 时递增，使所有类型同时失效
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, kind: str, key: Hashable) -> tuple:
+        return kind, self._epoch, self._versions.get(kind, 0), key
+
+    def _generation(self, kind: str, key: Hashable) -> int:
+        return self._generations.get((kind, key), 0)
+
+    def get_or_load(self, kind: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """命中时返回缓存值，否则调用 loader 加载并缓存（None 不缓存）"""
+        with self._lock:
+            cache_key = self._key(kind, key)
+            generation = self._generation(kind, key)
+            entry = self._entries.get(cache_key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._loading[(kind, key)] = self._loading.get((kind, key), 0) + 1
+
+        value = None
+        try:
+            # 加载期间不持有锁，避免慢查询阻塞其他线程的读取
+            value = loader()
+        finally:
+            with self._lock:
+                # 加载期间如果发生了失效，版本号或代数已变化，结果不再写入
+                if (value is not None and self._key(kind, key) == cache_key
+                        and self._generation(kind, key) == generation):
+                    self._entries[cache_key] = (time.monotonic(), value)
+                    self._entries.move_to_end(cache_key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                self._loading[(kind, key)] -= 1
+                if not self._loading[(kind, key)]:
+                    del self._loading[(kind, key)]
+                    self._generations.pop((kind, key), None)
+        return value
+
+    def invalidate(self, kind: str, key: Hashable = None):
+        """使缓存失效：指定 key 时只删除该条目，否则使该类型的全部条目失效"""
+        with self._lock:
+            if key is None:
+                self._versions[kind] = self._versions.get(kind, 0) + 1
+            else:
+                self._entries.pop(self._key(kind, key), None)
+                if (kind, key) in self._loading:
+                    self._generations[(kind, key)] = self._generation(kind, key) + 1
+
+    def clear(self):
+        """清空缓存（同步拉取了其他客户端的数据后调用）"""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+        logger.debug("数据缓存已清空")
+
+    def stats(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# 进程内共享的缓存实例
+data_cache = DataCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL or None)
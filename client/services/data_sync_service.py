@@ -12,6 +12,8 @@ from loguru import logger
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from shared.config import BASE_DIR
+from client.services.cache import data_cache
+from client.utils.profiler import profiled
 
 
 class DataSyncService:
@@ -86,6 +88,7 @@ class DataSyncService:
             logger.error(f"获取更新失败: {e}")
             return False, f"获取更新失败: {str(e)}"
 
+    @profiled("检查数据更新")
     def check_for_data_updates(self) -> Tuple[bool, Optional[Dict]]:
         """
         检查是否有数据更新
@@ -207,6 +210,7 @@ class DataSyncService:
                 'has_data_changes': False
             }
 
+    @profiled("数据同步")
     def pull_updates(self) -> Tuple[bool, str]:
         """拉取并应用远程更新"""
         try:
@@ -246,6 +250,7 @@ class DataSyncService:
                 error_msg = result.stderr.strip()
                 return False, f"拉取更新失败: {error_msg}"
 
+            data_cache.clear()
             logger.info("成功拉取远程更新")
             return True, "数据更新成功"
 
@@ -0,0 +1,253 @@
+"""
+增量更新
+发布时为安装包生成文件清单（manifest）和相对上一版本的补丁包，客户端只下载变化的文件，
+应用补丁时先备份再替换，失败或中途退出时回滚
+"""
+import sys
+import json
+import shutil
+import hashlib
+import zipfile
+from pathlib import Path, PurePosixPath
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import BASE_DIR
+from client.utils.file_handler import FileHandler
+
+
+# 补丁包内的说明文件
+PATCH_INFO_NAME = "patch.json"
+# 补丁包内变化文件的存放目录
+PATCH_FILES_DIR = "files/"
+# 用户数据不参与增量更新
+EXCLUDED_PREFIXES = ("data/", ".env")
+# 应用补丁时使用的临时目录和日志（位于程序目录下）
+STAGING_DIR_NAME = "_update_staging"
+BACKUP_DIR_NAME = "_update_backup"
+JOURNAL_NAME = "_update_journal.json"
+
+
+def _is_excluded(rel_path: str) -> bool:
+    return rel_path.startswith(EXCLUDED_PREFIXES) or rel_path.split("/", 1)[0] in (
+        STAGING_DIR_NAME, BACKUP_DIR_NAME, JOURNAL_NAME
+    )
+
+
+def _zip_root_prefix(names) -> str:
+    """安装包内所有文件都在同一个顶层目录下时返回该目录前缀（清单使用相对程序目录的路径）"""
+    tops = {name.split("/", 1)[0] for name in names}
+    if len(tops) == 1 and all("/" in name for name in names):
+        return tops.pop() + "/"
+    return ""
+
+
+def build_manifest_from_zip(zip_path: str, version: str) -> dict:
+    """
+    为完整安装包生成文件清单
+
+    Returns:
+        {"version": 版本号, "files": {相对路径: {"sha256": 哈希, "size": 大小}}}
+    """
+    files = {}
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        prefix = _zip_root_prefix([info.filename for info in members])
+        for info in members:
+            rel_path = info.filename[len(prefix):]
+            if _is_excluded(rel_path):
+                continue
+            sha256 = hashlib.sha256()
+            with zf.open(info) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            files[rel_path] = {"sha256": sha256.hexdigest(), "size": info.file_size}
+    return {"version": version, "files": files}
+
+
+def build_patch(old_manifest: dict, new_manifest: dict, release_zip: str, patch_path: str) -> dict:
+    """
+    生成从 old_manifest 对应版本到 new_manifest 对应版本的补丁包
+
+    补丁包只包含新增和内容变化的文件，patch.json 记录每个文件的新旧哈希和需要删除的文件
+
+    Returns:
+        补丁说明（patch.json 的内容）
+    """
+    old_files = old_manifest.get("files", {})
+    new_files = new_manifest["files"]
+    changed = {
+        path: {"sha256": entry["sha256"], "size": entry["size"],
+               "old_sha256": old_files.get(path, {}).get("sha256")}
+        for path, entry in new_files.items()
+        if old_files.get(path, {}).get("sha256") != entry["sha256"]
+    }
+    removed = {
+        path: {"old_sha256": entry["sha256"]}
+        for path, entry in old_files.items() if path not in new_files
+    }
+    patch_info = {
+        "from_version": old_manifest.get("version"),
+        "to_version": new_manifest["version"],
+        "changed": changed,
+        "removed": removed,
+    }
+
+    with zipfile.ZipFile(release_zip) as src, \
+            zipfile.ZipFile(patch_path, "w", compression=zipfile.ZIP_DEFLATED) as dst:
+        prefix = _zip_root_prefix([n for n in src.namelist() if not n.endswith("/")])
+        for path in changed:
+            with src.open(prefix + path) as f_in, dst.open(PATCH_FILES_DIR + path, "w") as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        dst.writestr(PATCH_INFO_NAME, json.dumps(patch_info, ensure_ascii=False, indent=2))
+
+    logger.info(
+        f"补丁包生成完成: {patch_info['from_version']} -> {patch_info['to_version']}，"
+        f"变化 {len(changed)} 个文件，删除 {len(removed)} 个文件"
+    )
+    return patch_info
+
+
+class DeltaUpdater:
+    """客户端增量更新：查找补丁、应用补丁、回滚"""
+
+    def __init__(self, app_dir: Path = None):
+        self.app_dir = Path(app_dir or BASE_DIR)
+        self.staging_dir = self.app_dir / STAGING_DIR_NAME
+        self.backup_dir = self.app_dir / BACKUP_DIR_NAME
+        self.journal_file = self.app_dir / JOURNAL_NAME
+
+    @staticmethod
+    def is_supported() -> bool:
+        """只有打包后的程序支持增量更新"""
+        return bool(getattr(sys, 'frozen', False))
+
+    @staticmethod
+    def find_patch(update_info: dict, current_version: str) -> Optional[dict]:
+        """从 version.json 中查找适用于当前版本的补丁 {"from_version", "url", "sha256", "size"}"""
+        for patch in update_info.get("patches") or []:
+            if patch.get("from_version") == current_version and patch.get("url"):
+                return patch
+        return None
+
+    def apply_patch(self, patch_zip: str) -> Tuple[bool, str]:
+        """
+        应用补丁包
+
+        1. 校验本地待替换文件与补丁的旧版本哈希一致
+        2. 解压变化文件到临时目录并逐个校验
+        3. 原文件改名移入备份目录（运行中的文件也可改名），再把新文件移到原位置
+        任一步失败都会恢复备份；日志文件记录进度，中途退出时下次启动自动回滚
+        """
+        try:
+            with zipfile.ZipFile(patch_zip) as zf:
+                patch_info = json.loads(zf.read(PATCH_INFO_NAME).decode("utf-8"))
+                changed: Dict[str, dict] = patch_info.get("changed", {})
+                removed: Dict[str, dict] = patch_info.get("removed", {})
+
+                for rel_path, entry in list(changed.items()) + list(removed.items()):
+                    if _is_excluded(rel_path) or ".." in PurePosixPath(rel_path).parts:
+                        return False, f"补丁包包含非法路径: {rel_path}"
+                    target = self.app_dir / rel_path
+                    old_sha256 = entry.get("old_sha256")
+                    if old_sha256 and target.exists() and FileHandler.calculate_sha256(str(target)) != old_sha256:
+                        return False, f"本地文件与补丁不匹配: {rel_path}，请下载完整安装包"
+
+                shutil.rmtree(self.staging_dir, ignore_errors=True)
+                for rel_path, entry in changed.items():
+                    staged = self.staging_dir / rel_path
+                    staged.parent.mkdir(parents=True, exist_ok=True)
+                    with zf.open(PATCH_FILES_DIR + rel_path) as f_in, open(staged, "wb") as f_out:
+                        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                    if FileHandler.calculate_sha256(str(staged)) != entry["sha256"]:
+                        shutil.rmtree(self.staging_dir, ignore_errors=True)
+                        return False, f"补丁文件校验失败: {rel_path}"
+        except (KeyError, ValueError, zipfile.BadZipFile) as e:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            logger.error(f"补丁包格式错误: {e}")
+            return False, f"补丁包格式错误: {str(e)}"
+        except Exception as e:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            logger.error(f"准备补丁失败: {e}")
+            return False, f"准备补丁失败: {str(e)}"
+
+        journal = {
+            "to_version": patch_info.get("to_version"),
+            "state": "applying",
+            "started_at": datetime.now().isoformat(),
+            "backed_up": [],
+            "installed": [],
+        }
+        try:
+            shutil.rmtree(self.backup_dir, ignore_errors=True)
+            self._write_journal(journal)
+
+            for rel_path in list(changed) + list(removed):
+                target = self.app_dir / rel_path
+                if target.exists():
+                    backup = self.backup_dir / rel_path
+                    backup.parent.mkdir(parents=True, exist_ok=True)
+                    target.replace(backup)
+                    journal["backed_up"].append(rel_path)
+                    self._write_journal(journal)
+
+            for rel_path in changed:
+                target = self.app_dir / rel_path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                (self.staging_dir / rel_path).replace(target)
+                journal["installed"].append(rel_path)
+                self._write_journal(journal)
+
+            journal["state"] = "done"
+            self._write_journal(journal)
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            logger.success(f"增量更新已应用: {journal['to_version']}（{len(changed)} 个文件）")
+            return True, f"已更新到 {journal['to_version']}，请重启程序"
+
+        except Exception as e:
+            logger.error(f"应用补丁失败，开始回滚: {e}")
+            self._rollback(journal)
+            return False, f"应用补丁失败，已恢复原版本: {str(e)}"
+
+    def recover(self):
+        """
+        启动时调用：回滚未完成的补丁，清理已完成补丁留下的备份
+        （Windows 下运行中的文件不能删除，备份只能在下次启动时清理）
+        """
+        if not self.journal_file.exists():
+            return
+        try:
+            journal = json.loads(self.journal_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            journal = {"state": "unknown"}
+
+        if journal.get("state") == "applying":
+            logger.warning("检测到未完成的增量更新，正在回滚")
+            self._rollback(journal)
+            return
+
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.journal_file.unlink(missing_ok=True)
+
+    def _rollback(self, journal: dict):
+        for rel_path in reversed(journal.get("installed", [])):
+            (self.app_dir / rel_path).unlink(missing_ok=True)
+        for rel_path in reversed(journal.get("backed_up", [])):
+            backup = self.backup_dir / rel_path
+            if backup.exists():
+                target = self.app_dir / rel_path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                backup.replace(target)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
+        self.journal_file.unlink(missing_ok=True)
+        logger.info("增量更新已回滚")
+
+    def _write_journal(self, journal: dict):
+        tmp_file = self.journal_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(journal, ensure_ascii=False), encoding="utf-8")
+        tmp_file.replace(self.journal_file)
@@ -6,23 +6,74 @@ import sys
 from pathlib import Path
 import subprocess
 import json
+import time
+import zipfile
+import tempfile
+import mimetypes
 import requests
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Callable
 from datetime import datetime
 from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from shared.config import settings, BASE_DIR
+from client.utils.file_handler import FileHandler
+from client.services.delta_update import build_manifest_from_zip, build_patch
+
+
+# 上传失败后的重试次数和退避基数（秒）
+UPLOAD_RETRIES = 4
+UPLOAD_BACKOFF_BASE = 2
+# 上传时每次读取的块大小
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# 上传请求的连接超时和单次读写超时（秒）
+UPLOAD_TIMEOUT = (10, 120)
+
+
+class _UploadReader:
+    """按块读取待上传文件并报告进度，requests 会以流的方式发送文件对象"""
+
+    def __init__(self, file_path: str, callback: Optional[Callable[[int, int], None]] = None):
+        self._file = open(file_path, 'rb')
+        self.total = Path(file_path).stat().st_size
+        self.sent = 0
+        self.callback = callback
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(UPLOAD_CHUNK_SIZE if size is None or size < 0 else size)
+        self.sent += len(data)
+        if self.callback and data:
+            self.callback(self.sent, self.total)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 class GitService:
     """Git 自动推送服务"""
 
+    api_base_url = "https://api.github.com"
+    upload_base_url = "https://uploads.github.com"
+
     def __init__(self):
         self.repo_path = self._find_git_repo_root()
         self.version_file = self.repo_path / "version.json"
         self.config_file = self.repo_path / "shared" / "config.py"
+        # GitHub API 请求复用同一个会话（保持连接）
+        self.http = requests.Session()
+        # 上传进度回调 (文件名, 已上传字节, 总字节)，在调用线程中执行
+        self.upload_progress_callback: Optional[Callable[[str, int, int], None]] = None
 
     def _find_git_repo_root(self) -> Path:
         """查找 Git 仓库根目录"""
@@ -102,8 +153,14 @@ class GitService:
 
     def update_version_json(self, version: str, download_url: str,
                            changelog: list, required: bool = False,
-                           min_version: str = "1.0.0") -> Tuple[bool, str]:
-        """更新 version.json 文件"""
+                           min_version: str = "1.0.0",
+                           sha256: str = None, size: int = None,
+                           manifest_url: str = None, patches: list = None) -> Tuple[bool, str]:
+        """
+        更新 version.json 文件
+
+        sha256/size 用于客户端校验下载文件，manifest_url/patches 用于增量更新
+        """
         try:
             version_data = {
                 "version": version,
@@ -113,6 +170,14 @@ class GitService:
                 "required": required,
                 "min_version": min_version
             }
+            if sha256:
+                version_data["sha256"] = sha256
+            if size:
+                version_data["size"] = size
+            if manifest_url:
+                version_data["manifest_url"] = manifest_url
+            if patches:
+                version_data["patches"] = patches
 
             with open(self.version_file, 'w', encoding='utf-8') as f:
                 json.dump(version_data, f, ensure_ascii=False, indent=2)
@@ -446,7 +511,7 @@ class GitService:
             # 创建 Release
             logger.info(f"正在创建 GitHub Release: {tag_name}")
 
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/releases"
+            api_url = f"{self.api_base_url}/repos/{owner}/{repo}/releases"
             headers = {
                 'Authorization': f'token {github_token}',
                 'Accept': 'application/vnd.github.v3+json'
@@ -460,7 +525,7 @@ class GitService:
                 'prerelease': False
             }
 
-            response = requests.post(api_url, headers=headers, json=release_data, timeout=30)
+            response = self.http.post(api_url, headers=headers, json=release_data, timeout=30)
 
             if response.status_code == 201:
                 release_info = response.json()
@@ -473,6 +538,7 @@ class GitService:
                         release_id, release_file, github_token
                     )
                     if success:
+                        self.upload_checksum_asset(release_id, release_file, github_token)
                         return True, f"Release 创建成功并上传文件完成", download_url
                     else:
                         return False, f"Release 创建成功但上传文件失败: {message}", None
@@ -500,13 +566,13 @@ class GitService:
         """更新已存在的 Release"""
         try:
             # 获取已存在的 Release
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/tags/{tag_name}"
+            api_url = f"{self.api_base_url}/repos/{owner}/{repo}/releases/tags/{tag_name}"
             headers = {
                 'Authorization': f'token {github_token}',
                 'Accept': 'application/vnd.github.v3+json'
             }
 
-            response = requests.get(api_url, headers=headers, timeout=10)
+            response = self.http.get(api_url, headers=headers, timeout=10)
 
             if response.status_code != 200:
                 return False, f"获取已存在的 Release 失败", None
@@ -520,6 +586,7 @@ class GitService:
                     release_id, release_file, github_token
                 )
                 if success:
+                    self.upload_checksum_asset(release_id, release_file, github_token)
                     return True, "已更新现有 Release 并上传文件", download_url
                 else:
                     return False, f"上传文件失败: {message}", None
@@ -535,6 +602,9 @@ class GitService:
         """
         上传文件到 GitHub Release
 
+        文件按块流式发送并通过 upload_progress_callback 报告进度；网络错误、超时或服务器错误时
+        删除残留的同名附件后按指数退避重试。Release 中原有的、已上传完成的同名附件不会被删除
+
         Args:
             release_id: Release ID
             file_path: 文件路径
@@ -559,37 +629,230 @@ class GitService:
             logger.info(f"正在上传文件: {file_name} ({file_path_obj.stat().st_size / 1024 / 1024:.2f} MB)")
 
             # 上传文件
-            upload_url = f"https://uploads.github.com/repos/{owner}/{repo}/releases/{release_id}/assets"
+            upload_url = f"{self.upload_base_url}/repos/{owner}/{repo}/releases/{release_id}/assets"
             headers = {
                 'Authorization': f'token {github_token}',
-                'Content-Type': 'application/zip'
+                'Content-Type': mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
             }
             params = {'name': file_name}
 
-            with open(file_path, 'rb') as f:
-                response = requests.post(
-                    upload_url,
-                    headers=headers,
-                    params=params,
-                    data=f,
-                    timeout=300  # 5分钟超时
-                )
+            def on_progress(sent: int, total: int):
+                if self.upload_progress_callback:
+                    self.upload_progress_callback(file_name, sent, total)
+
+            last_error = "未知错误"
+            # 连接中断、超时或服务器错误后不知道附件是否已创建，重试前可以删除上传完成的同名附件
+            may_have_created = False
+            for attempt in range(1, UPLOAD_RETRIES + 1):
+                try:
+                    with _UploadReader(file_path, on_progress) as reader:
+                        response = self.http.post(
+                            upload_url,
+                            headers=headers,
+                            params=params,
+                            data=reader,
+                            timeout=UPLOAD_TIMEOUT
+                        )
 
-            if response.status_code == 201:
-                asset_info = response.json()
-                download_url = asset_info['browser_download_url']
-                logger.info(f"文件上传成功: {download_url}")
-                return True, "文件上传成功", download_url
-            else:
-                error_msg = response.json().get('message', '未知错误')
-                return False, f"上传失败: {error_msg}", None
+                    if response.status_code == 201:
+                        asset_info = response.json()
+                        download_url = asset_info['browser_download_url']
+                        logger.info(f"文件上传成功: {download_url}")
+                        return True, "文件上传成功", download_url
+
+                    error_msg = self._response_message(response)
+                    if response.status_code == 422:
+                        # 同名附件已存在：上次中断留下的未完成附件删除后重传，原有的附件保留
+                        asset = self._find_release_asset(owner, repo, release_id, file_name, github_token)
+                        if asset and asset.get('state') == 'uploaded' and not may_have_created:
+                            return False, f"上传失败: Release 中已存在附件 {file_name}", None
+                    elif response.status_code >= 500:
+                        may_have_created = True
+                    elif response.status_code != 429:
+                        # 其余 4xx 重试无意义
+                        return False, f"上传失败: {error_msg}", None
+                    last_error = error_msg
+
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    may_have_created = True
+                    last_error = str(e)
+
+                if attempt == UPLOAD_RETRIES:
+                    break
+                delay = UPLOAD_BACKOFF_BASE * (2 ** (attempt - 1))
+                logger.warning(f"上传 {file_name} 失败（第 {attempt} 次）: {last_error}，{delay} 秒后重试")
+                self._delete_release_asset(owner, repo, release_id, file_name, github_token,
+                                           include_uploaded=may_have_created)
+                time.sleep(delay)
+
+            return False, f"上传失败（已重试 {UPLOAD_RETRIES} 次）: {last_error}", None
 
-        except requests.exceptions.Timeout:
-            return False, "上传超时，文件可能太大或网络不稳定", None
         except Exception as e:
             logger.error(f"上传文件失败: {e}")
             return False, f"上传失败: {str(e)}", None
 
+    def upload_checksum_asset(self, release_id: int, file_path: str,
+                              github_token: str) -> Tuple[bool, str, Optional[str]]:
+        """上传文件的 SHA-256 校验文件（<文件名>.sha256，sha256sum 格式）"""
+        sha256 = FileHandler.calculate_sha256(file_path)
+        if not sha256:
+            return False, "计算文件哈希失败", None
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            checksum_file = Path(work_dir) / f"{Path(file_path).name}.sha256"
+            checksum_file.write_text(f"{sha256}  {Path(file_path).name}\n", encoding='utf-8')
+            success, message, download_url = self.upload_release_asset(
+                release_id, str(checksum_file), github_token
+            )
+        if not success:
+            logger.warning(f"上传校验文件失败: {message}")
+        return success, message, download_url
+
+    def _find_release_asset(self, owner: str, repo: str, release_id: int,
+                            file_name: str, github_token: str) -> Optional[dict]:
+        """查找 Release 中的同名附件，查询失败时返回 None"""
+        headers = {
+            'Authorization': f'token {github_token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        try:
+            response = self.http.get(
+                f"{self.api_base_url}/repos/{owner}/{repo}/releases/{release_id}/assets",
+                headers=headers, params={'per_page': 100}, timeout=10
+            )
+            if response.status_code != 200:
+                return None
+            return next((asset for asset in response.json() if asset.get('name') == file_name), None)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"查询 Release 附件失败: {e}")
+            return None
+
+    def _delete_release_asset(self, owner: str, repo: str, release_id: int,
+                              file_name: str, github_token: str, include_uploaded: bool = False):
+        """
+        删除 Release 中的同名附件（上传中断后 GitHub 可能留下未完成的附件）
+
+        include_uploaded 为 False 时只删除未上传完成的附件（state 不是 uploaded）
+        """
+        asset = self._find_release_asset(owner, repo, release_id, file_name, github_token)
+        if asset is None or (asset.get('state') == 'uploaded' and not include_uploaded):
+            return
+        try:
+            self.http.delete(
+                f"{self.api_base_url}/repos/{owner}/{repo}/releases/assets/{asset['id']}",
+                headers={
+                    'Authorization': f'token {github_token}',
+                    'Accept': 'application/vnd.github.v3+json'
+                },
+                timeout=10
+            )
+            logger.info(f"已删除残留附件: {file_name}")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"删除残留附件失败: {e}")
+
+    @staticmethod
+    def _response_message(response) -> str:
+        try:
+            return response.json().get('message', '未知错误')
+        except ValueError:
+            return f"HTTP {response.status_code}"
+
+    def upload_release_files(self, version: str, files: list,
+                             github_token: str) -> Tuple[bool, str, dict]:
+        """
+        上传附加文件到指定版本的 Release
+
+        Returns:
+            (成功, 消息, {文件名: 下载链接})
+        """
+        try:
+            repo_info = self._get_repo_info()
+            if not repo_info:
+                return False, "无法获取仓库信息", {}
+
+            owner, repo = repo_info
+            api_url = f"{self.api_base_url}/repos/{owner}/{repo}/releases/tags/v{version}"
+            headers = {
+                'Authorization': f'token {github_token}',
+                'Accept': 'application/vnd.github.v3+json'
+            }
+            response = self.http.get(api_url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                return False, "获取 Release 失败", {}
+            release_id = response.json()['id']
+
+            urls = {}
+            for file_path in files:
+                success, message, download_url = self.upload_release_asset(
+                    release_id, str(file_path), github_token
+                )
+                if not success:
+                    return False, message, urls
+                urls[Path(file_path).name] = download_url
+            return True, "上传成功", urls
+
+        except Exception as e:
+            logger.error(f"上传附加文件失败: {e}")
+            return False, f"上传失败: {str(e)}", {}
+
+    def _load_previous_manifest(self) -> Optional[dict]:
+        """读取当前 version.json 指向的上一版本文件清单"""
+        try:
+            with open(self.version_file, 'r', encoding='utf-8') as f:
+                manifest_url = json.load(f).get("manifest_url")
+            if not manifest_url:
+                return None
+            response = self.http.get(manifest_url, timeout=30)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.warning(f"读取上一版本文件清单失败: {e}")
+            return None
+
+    def publish_delta_assets(self, version: str, release_file: str, github_token: str) -> dict:
+        """
+        生成并上传增量更新文件：本版本的文件清单，以及相对上一版本的补丁包
+
+        Returns:
+            写入 version.json 的字段 {"manifest_url": ..., "patches": [...]}，无法生成时返回空字典
+        """
+        if not zipfile.is_zipfile(release_file):
+            logger.info("发布文件不是 zip 格式，跳过增量更新包")
+            return {}
+
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                manifest = build_manifest_from_zip(release_file, version)
+                manifest_file = Path(work_dir) / f"manifest-{version}.json"
+                manifest_file.write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+                files = [manifest_file]
+
+                patch_file = None
+                previous = self._load_previous_manifest()
+                if previous and previous.get("version") != version:
+                    patch_file = Path(work_dir) / f"patch-{previous['version']}-{version}.zip"
+                    build_patch(previous, manifest, release_file, str(patch_file))
+                    files.append(patch_file)
+
+                success, message, urls = self.upload_release_files(version, files, github_token)
+                if not success:
+                    logger.warning(f"上传增量更新文件失败: {message}")
+                    return {}
+
+                fields = {"manifest_url": urls.get(manifest_file.name)}
+                if patch_file:
+                    fields["patches"] = [{
+                        "from_version": previous["version"],
+                        "url": urls.get(patch_file.name),
+                        "sha256": FileHandler.calculate_sha256(str(patch_file)),
+                        "size": FileHandler.get_file_size(str(patch_file)),
+                    }]
+                return fields
+
+        except Exception as e:
+            logger.warning(f"生成增量更新文件失败: {e}")
+            return {}
+
     def push_release_with_file(self, version: str, changelog: list,
                                github_token: str, release_file: str,
                                update_app_version: bool = True,
@@ -626,13 +889,19 @@ class GitService:
 
             logger.info(f"Release 创建成功，下载链接: {download_url}")
 
-            # 3. 更新 version.json
+            # 3. 生成并上传增量更新文件（失败不影响完整包发布）
+            delta_fields = self.publish_delta_assets(version, release_file, github_token)
+
+            # 4. 更新 version.json（附带文件哈希供客户端校验）
             logger.info("更新 version.json...")
             success, msg = self.update_version_json(
                 version=version,
                 download_url=download_url,
                 changelog=changelog,
-                required=required
+                required=required,
+                sha256=FileHandler.calculate_sha256(release_file),
+                size=FileHandler.get_file_size(release_file),
+                **delta_fields
             )
 
             if not success:
@@ -640,14 +909,14 @@ class GitService:
 
             files_to_add = ['version.json']
 
-            # 4. 更新 config.py（可选）
+            # 5. 更新 config.py（可选）
             if update_app_version:
                 logger.info("更新 shared/config.py...")
                 success, msg = self.update_app_version(version)
                 if success:
                     files_to_add.append('shared/config.py')
 
-            # 5. Git 提交和推送
+            # 6. Git 提交和推送
             logger.info("提交并推送到 GitHub...")
             success, msg = self.git_add_files(files_to_add)
             if not success:
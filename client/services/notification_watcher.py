@@ -0,0 +1,170 @@
+"""
+通知变更监听服务
+服务器模式下通过 PostgreSQL LISTEN/NOTIFY 接收推送，SQLite 模式下监视数据库文件变化
+"""
+import sys
+import select
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.models import engine
+from client.services.update_service import UpdateService, NOTIFY_CHANNEL
+
+
+# SQLite 文件检查间隔（秒）
+FILE_POLL_INTERVAL = 0.5
+# PostgreSQL 等待通知的超时（秒），超时后检查是否需要停止
+LISTEN_TIMEOUT = 1.0
+# 监听连接断开后的最长重连间隔（秒）
+MAX_RECONNECT_DELAY = 30
+
+
+class NotificationWatcher:
+    """
+    通知变更监听器
+
+    检测到变更后更新未读数量缓存，并在后台线程中调用 on_changed(未读数量)
+    """
+
+    def __init__(self, on_changed: Callable[[int], None], update_service: UpdateService = None):
+        self.on_changed = on_changed
+        self.update_service = update_service or UpdateService()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listen_conn = None
+
+    @property
+    def mode(self) -> str:
+        """监听方式：postgresql 或 file"""
+        return "postgresql" if engine.dialect.name == "postgresql" else "file"
+
+    def start(self) -> Tuple[bool, str]:
+        """启动监听，失败时调用方应回退到定时轮询"""
+        if self._thread and self._thread.is_alive():
+            return True, "通知监听已在运行"
+
+        try:
+            if self.mode == "postgresql":
+                self._listen_conn = self._open_listen_connection()
+                target = self._listen_loop
+            else:
+                if not self._database_file():
+                    return False, "内存数据库不支持文件监听"
+                target = self._file_loop
+        except Exception as e:
+            logger.warning(f"启动通知监听失败: {e}")
+            return False, f"启动通知监听失败: {str(e)}"
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=target, name="notification-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"通知监听已启动 ({self.mode})")
+        return True, "通知监听已启动"
+
+    def stop(self):
+        """停止监听"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=LISTEN_TIMEOUT * 2)
+            self._thread = None
+        self._close_listen_connection()
+        logger.info("通知监听已停止")
+
+    def _emit(self, count: int):
+        try:
+            self.on_changed(count)
+        except Exception as e:
+            logger.error(f"通知变更回调失败: {e}")
+
+    # ========== PostgreSQL LISTEN/NOTIFY ==========
+
+    def _open_listen_connection(self):
+        """打开专用的监听连接（自动提交模式）"""
+        conn = engine.raw_connection()
+        dbapi_conn = conn.driver_connection
+        dbapi_conn.autocommit = True
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        cursor.close()
+        return conn
+
+    def _close_listen_connection(self):
+        if self._listen_conn is None:
+            return
+        try:
+            # 监听连接已切换为自动提交，不再归还连接池
+            self._listen_conn.invalidate()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def _listen_loop(self):
+        reconnect_delay = 1
+        while not self._stop_event.is_set():
+            try:
+                if self._listen_conn is None:
+                    self._listen_conn = self._open_listen_connection()
+                    reconnect_delay = 1
+                    # 断线期间可能漏掉通知，重新统计一次
+                    self._emit(self.update_service.refresh_unread_count())
+
+                dbapi_conn = self._listen_conn.driver_connection
+                readable, _, _ = select.select([dbapi_conn], [], [], LISTEN_TIMEOUT)
+                if not readable:
+                    continue
+
+                dbapi_conn.poll()
+                count = None
+                while dbapi_conn.notifies:
+                    notify = dbapi_conn.notifies.pop(0)
+                    count = self.update_service.handle_notify_event(notify.payload)
+                if count is not None:
+                    self._emit(count)
+            except Exception as e:
+                logger.warning(f"通知监听连接异常，{reconnect_delay} 秒后重连: {e}")
+                self._close_listen_connection()
+                self._stop_event.wait(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+
+    # ========== SQLite 文件监视 ==========
+
+    def _database_file(self) -> Optional[Path]:
+        database = engine.url.database
+        if not database or database == ":memory:":
+            return None
+        return Path(database)
+
+    def _file_signature(self, db_file: Path) -> tuple:
+        """数据库文件及 WAL 文件的修改时间和大小"""
+        signature = []
+        for path in (db_file, db_file.with_name(db_file.name + "-wal")):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _file_loop(self):
+        db_file = self._database_file()
+        last_signature = self._file_signature(db_file)
+        last_count = self.update_service.get_unread_count()
+
+        while not self._stop_event.wait(FILE_POLL_INTERVAL):
+            try:
+                signature = self._file_signature(db_file)
+                if signature == last_signature:
+                    continue
+                last_signature = signature
+
+                # 文件变化不一定涉及通知表，只有数量变化时才回调
+                count = self.update_service.refresh_unread_count()
+                if count != last_count:
+                    last_count = count
+                    self._emit(count)
+            except Exception as e:
+                logger.warning(f"检查数据库文件变化失败: {e}")
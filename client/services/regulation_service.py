@@ -3,26 +3,42 @@
 """
 import sys
 from pathlib import Path
-from typing import Optional, List
+from datetime import datetime
+from typing import Callable, Optional, List
 import shutil
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import defer, joinedload, selectinload
 from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import Regulation, RegulationDocument, CodeFile, Tag, SessionLocal, ChangeHistory
+from client.models import (
+    Regulation, RegulationDocument, CodeFile, Tag, RegulationTag, RegulationParameter, ChangeHistory,
+    session_scope, chunked, detach,
+)
+from client.models.parameter import PARAMETER_VALUE_FIELDS
+from client.services.cache import data_cache
+from client.utils.blob_store import BlobStore
+from client.utils.file_handler import FileHandler
 from shared.config import settings, DOCUMENTS_DIR, CODES_DIR
 from shared.constants import RegulationStatus, DocumentType, EntityType, ChangeType
 
 
+# 支持批量修改的法规字段
+BULK_UPDATE_FIELDS = ("country", "category", "status", "version")
+
+
 class RegulationService:
-    """法规管理服务"""
+    """
+    法规管理服务
 
-    def __init__(self):
-        self.db = SessionLocal()
+    每个方法是一个工作单元（session_scope），使用当前线程的会话，
+    服务实例不持有连接，可以长期复用。
+    法规、标签和参数的读取经过进程内缓存（data_cache），写方法负责使缓存失效
+    """
 
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
+    def __init__(self):
+        self.blob_store = BlobStore()
 
     def create_regulation(self, code: str, name: str, country: Optional[str] = None,
                          category: Optional[str] = None, description: Optional[str] = None,
@@ -31,245 +47,682 @@ class RegulationService:
                          tags: Optional[List[str]] = None) -> tuple[bool, str, Optional[Regulation]]:
         """创建法规"""
         try:
-            existing = self.db.query(Regulation).filter(Regulation.code == code).first()
-            if existing:
-                return False, f"法规编号 '{code}' 已存在", None
-
-            regulation = Regulation(
-                code=code, name=name, country=country, category=category,
-                description=description, status=status, version=version, created_by=created_by
-            )
+            with session_scope() as db:
+                existing = db.query(Regulation).filter(Regulation.code == code).first()
+                if existing:
+                    return False, f"法规编号 '{code}' 已存在", None
+
+                regulation = Regulation(
+                    code=code, name=name, country=country, category=category,
+                    description=description, status=status, version=version, created_by=created_by
+                )
 
-            self.db.add(regulation)
-            self.db.flush()
+                db.add(regulation)
+                db.flush()
 
-            if tags:
-                self._add_tags_to_regulation(regulation, tags)
+                if tags:
+                    self._add_tags_to_regulation(db, regulation, tags)
 
-            self.db.commit()
-            self.db.refresh(regulation)
-
-            if created_by:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, regulation.id,
-                    ChangeType.CREATE, regulation.to_dict(), f"创建法规: {name}", created_by
-                )
+                # 历史记录与法规在同一事务中提交
+                if created_by:
+                    db.flush()
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation.id,
+                        ChangeType.CREATE, {}, f"创建法规: {name}", created_by,
+                        snapshot=regulation.to_dict()
+                    )
 
+            self.invalidate_cache(regulation.id)
             logger.success(f"法规 '{name}' 创建成功")
             return True, "法规创建成功", regulation
 
         except Exception as e:
-            self.db.rollback()
             logger.error(f"创建法规失败: {e}")
             return False, f"创建失败: {str(e)}", None
 
     def update_regulation(self, regulation_id: int, **kwargs) -> tuple[bool, str, Optional[Regulation]]:
         """更新法规"""
         try:
-            regulation = self.db.query(Regulation).filter(Regulation.id == regulation_id).first()
-            if not regulation:
-                return False, "法规不存在", None
+            with session_scope() as db:
+                regulation = db.query(Regulation).filter(Regulation.id == regulation_id).first()
+                if not regulation:
+                    return False, "法规不存在", None
+
+                old_data = regulation.to_dict()
+
+                for key, value in kwargs.items():
+                    if hasattr(regulation, key) and key != 'id':
+                        setattr(regulation, key, value)
+
+                if 'tags' in kwargs:
+                    self._update_regulation_tags(db, regulation, kwargs['tags'])
+
+                db.flush()
+                if 'updated_by' in kwargs:
+                    # 只记录变化的字段，完整状态按间隔保存为快照
+                    new_data = regulation.to_dict()
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation.id,
+                        ChangeType.UPDATE, {"changed": ChangeHistory.diff(old_data, new_data)},
+                        f"更新法规: {regulation.name}", kwargs['updated_by'],
+                        snapshot=new_data
+                    )
+
+            self.invalidate_cache(regulation_id)
+            return True, "法规更新成功", regulation
 
-            old_data = regulation.to_dict()
+        except Exception as e:
+            return False, f"更新失败: {str(e)}", None
 
-            for key, value in kwargs.items():
-                if hasattr(regulation, key) and key != 'id':
-                    setattr(regulation, key, value)
+    def delete_regulation(self, regulation_id: int, deleted_by: Optional[int] = None) -> tuple[bool, str]:
+        """删除法规"""
+        try:
+            with session_scope() as db:
+                regulation = db.query(Regulation).filter(Regulation.id == regulation_id).first()
+                if not regulation:
+                    return False, "法规不存在"
+
+                if deleted_by:
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation.id,
+                        ChangeType.DELETE, {},
+                        f"删除法规: {regulation.name}", deleted_by,
+                        snapshot=regulation.to_dict()
+                    )
+
+                self._delete_regulation_files(regulation)
+
+                regulation_name = regulation.name
+                # 参数通过 backref 关联，不会级联删除
+                db.query(RegulationParameter).filter(
+                    RegulationParameter.regulation_id == regulation_id
+                ).delete()
+                db.delete(regulation)
+
+            self._collect_blob_garbage()
+            self.invalidate_cache(regulation_id)
+            data_cache.invalidate("parameters", regulation_id)
 
-            if 'tags' in kwargs:
-                self._update_regulation_tags(regulation, kwargs['tags'])
+            logger.info(f"法规 '{regulation_name}' 已删除")
+            return True, "法规删除成功"
 
-            self.db.commit()
-            self.db.refresh(regulation)
+        except Exception as e:
+            return False, f"删除失败: {str(e)}"
 
-            if 'updated_by' in kwargs:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, regulation.id,
-                    ChangeType.UPDATE, {"old": old_data, "new": regulation.to_dict()},
-                    f"更新法规: {regulation.name}", kwargs['updated_by']
-                )
+    # ========== 批量操作 ==========
+    # 每个方法一个事务：按 ID 分批执行集合操作（UPDATE/DELETE ... WHERE id IN (...)），
+    # 历史记录批量写入，不逐条查询和提交
+
+    def bulk_update(self, regulation_ids: List[int], updated_by: Optional[int] = None,
+                    **fields) -> tuple[bool, str, int]:
+        """
+        批量修改法规字段（BULK_UPDATE_FIELDS 中的字段）
+
+        Returns:
+            (成功, 消息, 修改的法规数)
+        """
+        unsupported = set(fields) - set(BULK_UPDATE_FIELDS)
+        if unsupported:
+            return False, f"不支持批量修改的字段: {', '.join(sorted(unsupported))}", 0
+        if "status" in fields:
+            fields["status"] = RegulationStatus(fields["status"])
+        ids = set(regulation_ids)
+        if not ids or not fields:
+            return True, "没有需要修改的法规", 0
 
-            return True, "法规更新成功", regulation
+        try:
+            with session_scope() as db:
+                old_data = self._load_regulation_dicts(db, ids) if updated_by else {}
+                count = 0
+                for chunk in chunked(ids):
+                    count += db.query(Regulation).filter(Regulation.id.in_(chunk)).update(
+                        fields, synchronize_session=False
+                    )
+
+                if updated_by:
+                    changed = {key: value.value if key == "status" else value for key, value in fields.items()}
+                    changes = []
+                    for regulation_id, old in old_data.items():
+                        new = {**old, **changed}
+                        diff = ChangeHistory.diff(old, new)
+                        if diff:
+                            changes.append((
+                                regulation_id, {"changed": diff},
+                                f"批量更新法规: {old['name']}", new
+                            ))
+                    ChangeHistory.create_change_records(
+                        db, EntityType.REGULATION, ChangeType.UPDATE, changes, updated_by
+                    )
+
+            self.invalidate_cache()
+            logger.info(f"批量更新 {count} 条法规: {', '.join(fields)}")
+            return True, f"已更新 {count} 条法规", count
 
         except Exception as e:
-            self.db.rollback()
-            return False, f"更新失败: {str(e)}", None
+            logger.error(f"批量更新法规失败: {e}")
+            return False, f"批量更新失败: {str(e)}", 0
+
+    def bulk_tag(self, regulation_ids: List[int], add: Optional[List[str]] = None,
+                 remove: Optional[List[str]] = None,
+                 updated_by: Optional[int] = None) -> tuple[bool, str, int]:
+        """
+        批量添加/移除标签（不存在的标签自动创建）
+
+        Returns:
+            (成功, 消息, 标签有变化的法规数)
+        """
+        add_names = {name.strip() for name in add or [] if name.strip()}
+        remove_names = {name.strip() for name in remove or [] if name.strip()} - add_names
+        ids = set(regulation_ids)
+        if not ids or not (add_names or remove_names):
+            return True, "没有需要修改的标签", 0
 
-    def delete_regulation(self, regulation_id: int, deleted_by: Optional[int] = None) -> tuple[bool, str]:
-        """删除法规"""
         try:
-            regulation = self.db.query(Regulation).filter(Regulation.id == regulation_id).first()
-            if not regulation:
-                return False, "法规不存在"
-
-            if deleted_by:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, regulation.id,
-                    ChangeType.DELETE, regulation.to_dict(),
-                    f"删除法规: {regulation.name}", deleted_by
-                )
+            with session_scope() as db:
+                old_data = self._load_regulation_dicts(db, ids)
+
+                tags = {tag.name: tag for tag in db.query(Tag).filter(Tag.name.in_(add_names | remove_names))}
+                new_tags = [Tag(name=name) for name in add_names - tags.keys()]
+                if new_tags:
+                    db.add_all(new_tags)
+                    db.flush()
+                    tags.update((tag.name, tag) for tag in new_tags)
+
+                remove_ids = [tags[name].id for name in remove_names if name in tags]
+                add_ids = [tags[name].id for name in add_names]
+                for chunk in chunked(old_data):
+                    if remove_ids:
+                        db.query(RegulationTag).filter(
+                            RegulationTag.regulation_id.in_(chunk),
+                            RegulationTag.tag_id.in_(remove_ids)
+                        ).delete(synchronize_session=False)
+                if add_ids:
+                    existing = set()
+                    for chunk in chunked(old_data):
+                        existing.update(db.query(RegulationTag.regulation_id, RegulationTag.tag_id).filter(
+                            RegulationTag.regulation_id.in_(chunk),
+                            RegulationTag.tag_id.in_(add_ids)
+                        ).all())
+                    pairs = [
+                        {"regulation_id": regulation_id, "tag_id": tag_id}
+                        for regulation_id in old_data for tag_id in add_ids
+                        if (regulation_id, tag_id) not in existing
+                    ]
+                    if pairs:
+                        db.execute(insert(RegulationTag), pairs)
+
+                changes = []
+                for regulation_id, old in old_data.items():
+                    tag_names = [name for name in old["tags"] if name not in remove_names]
+                    tag_names += sorted(add_names - set(tag_names))
+                    if set(tag_names) != set(old["tags"]):
+                        changes.append((regulation_id, old, {**old, "tags": tag_names}))
+                if updated_by:
+                    ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.UPDATE, [
+                        (regulation_id, {"changed": ChangeHistory.diff(old, new)},
+                         f"批量修改标签: {old['name']}", new)
+                        for regulation_id, old, new in changes
+                    ], updated_by)
+
+            self.invalidate_cache()
+            logger.info(f"批量修改标签: {len(changes)} 条法规，添加 {sorted(add_names)}，移除 {sorted(remove_names)}")
+            return True, f"已修改 {len(changes)} 条法规的标签", len(changes)
 
-            self._delete_regulation_files(regulation)
+        except Exception as e:
+            logger.error(f"批量修改标签失败: {e}")
+            return False, f"批量修改标签失败: {str(e)}", 0
 
-            regulation_name = regulation.name
-            self.db.delete(regulation)
-            self.db.commit()
+    def bulk_delete(self, regulation_ids: List[int],
+                    deleted_by: Optional[int] = None) -> tuple[bool, str, int]:
+        """
+        批量删除法规及其参数、文档、代码文件和标签关联
 
-            logger.info(f"法规 '{regulation_name}' 已删除")
-            return True, "法规删除成功"
+        数据库删除提交后再删除文件，事务失败时文件保持不变
+
+        Returns:
+            (成功, 消息, 删除的法规数)
+        """
+        ids = set(regulation_ids)
+        if not ids:
+            return True, "没有需要删除的法规", 0
+
+        try:
+            with session_scope() as db:
+                old_data = self._load_regulation_dicts(db, ids)
+                if deleted_by:
+                    ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.DELETE, [
+                        (regulation_id, {}, f"批量删除法规: {old['name']}", old)
+                        for regulation_id, old in old_data.items()
+                    ], deleted_by)
+
+                for chunk in chunked(old_data):
+                    for model in (RegulationParameter, RegulationDocument, CodeFile, RegulationTag):
+                        db.query(model).filter(model.regulation_id.in_(chunk)).delete(synchronize_session=False)
+                    db.query(Regulation).filter(Regulation.id.in_(chunk)).delete(synchronize_session=False)
+
+            # 旧版本按法规目录保存的文件
+            for regulation_id in old_data:
+                for directory in (DOCUMENTS_DIR / str(regulation_id), CODES_DIR / str(regulation_id)):
+                    shutil.rmtree(directory, ignore_errors=True)
+            self._collect_blob_garbage()
+
+            self.invalidate_cache()
+            data_cache.invalidate("parameters")
+            logger.info(f"批量删除 {len(old_data)} 条法规")
+            return True, f"已删除 {len(old_data)} 条法规", len(old_data)
 
         except Exception as e:
-            self.db.rollback()
-            return False, f"删除失败: {str(e)}"
+            logger.error(f"批量删除法规失败: {e}")
+            return False, f"批量删除失败: {str(e)}", 0
+
+    def _load_regulation_dicts(self, db, regulation_ids) -> dict:
+        """按 ID 分批加载法规（含标签）的 to_dict()，{ID: 数据}，不存在的 ID 不出现"""
+        result = {}
+        for chunk in chunked(regulation_ids):
+            for regulation in db.query(Regulation).options(
+                selectinload(Regulation.tags)
+            ).filter(Regulation.id.in_(chunk)):
+                result[regulation.id] = regulation.to_dict()
+        return result
 
     def get_regulation(self, regulation_id: int) -> Optional[Regulation]:
-        """获取法规"""
-        return self.db.query(Regulation).filter(Regulation.id == regulation_id).first()
+        """获取法规（含标签；缓存对象只读）。文档和代码文件用 get_documents / get_code_files 读取"""
+        def load():
+            with session_scope() as db:
+                regulation = db.query(Regulation).options(
+                    selectinload(Regulation.tags)
+                ).filter(Regulation.id == regulation_id).first()
+                return detach(db, [regulation])[0] if regulation else None
+
+        return data_cache.get_or_load("regulation", regulation_id, load)
+
+    def get_documents(self, regulation_id: int) -> List[RegulationDocument]:
+        """获取法规的文档列表（按上传顺序；缓存对象只读）"""
+        def load():
+            with session_scope() as db:
+                return detach(db, db.query(RegulationDocument).filter(
+                    RegulationDocument.regulation_id == regulation_id
+                ).order_by(RegulationDocument.id).all())
+
+        return data_cache.get_or_load("documents", regulation_id, load)
+
+    def get_code_files(self, regulation_id: int) -> List[CodeFile]:
+        """获取法规的代码文件列表（按创建顺序；缓存对象只读）"""
+        def load():
+            with session_scope() as db:
+                return detach(db, db.query(CodeFile).filter(
+                    CodeFile.regulation_id == regulation_id
+                ).order_by(CodeFile.id).all())
+
+        return data_cache.get_or_load("code_files", regulation_id, load)
+
+    def get_history_page(self, regulation_id: int, offset: int = 0,
+                         limit: int = 100) -> tuple[List[ChangeHistory], int]:
+        """
+        分页读取法规的变更历史（按时间倒序），返回 (本页记录, 总条数)
+
+        只读取摘要，不加载变更载荷；操作人随记录一次性加载
+        """
+        with session_scope() as db:
+            query = db.query(ChangeHistory).filter(
+                ChangeHistory.entity_type == EntityType.REGULATION,
+                ChangeHistory.entity_id == regulation_id
+            )
+            total = query.count()
+            records = query.options(
+                defer(ChangeHistory.payload), defer(ChangeHistory.change_data),
+                joinedload(ChangeHistory.user),
+            ).order_by(ChangeHistory.changed_at.desc(), ChangeHistory.id.desc()).offset(offset).limit(limit).all()
+            return records, total
 
     def get_regulation_by_code(self, code: str) -> Optional[Regulation]:
         """通过编号获取法规"""
-        return self.db.query(Regulation).filter(Regulation.code == code).first()
+        with session_scope() as db:
+            return db.query(Regulation).filter(Regulation.code == code).first()
+
+    def get_regulation_version(self, regulation_id: int, at: Optional[datetime] = None) -> Optional[dict]:
+        """根据历史记录重建法规在某一时刻（默认最新）的数据，法规当时不存在时返回 None"""
+        with session_scope() as db:
+            return ChangeHistory.reconstruct(db, EntityType.REGULATION, regulation_id, at)
 
     def list_regulations(self, country: Optional[str] = None, category: Optional[str] = None,
                         status: Optional[RegulationStatus] = None,
                         tags: Optional[List[str]] = None,
                         keyword: Optional[str] = None) -> List[Regulation]:
-        """列出法规"""
-        query = self.db.query(Regulation)
-
-        if country:
-            query = query.filter(Regulation.country == country)
-        if category:
-            query = query.filter(Regulation.category == category)
-        if status:
-            query = query.filter(Regulation.status == status)
-        if keyword:
-            query = query.filter(
-                (Regulation.name.contains(keyword)) |
-                (Regulation.code.contains(keyword)) |
-                (Regulation.description.contains(keyword))
-            )
-        if tags:
-            query = query.join(Regulation.tags).filter(Tag.name.in_(tags))
+        """列出法规（含标签；缓存对象只读）"""
+        cache_key = (country, category, status, tuple(sorted(tags)) if tags else None, keyword)
+        return data_cache.get_or_load(
+            "regulation_list", cache_key,
+            lambda: self._query_regulations(country, category, status, tags, keyword)
+        )
+
+    def _query_regulations(self, country, category, status, tags, keyword) -> List[Regulation]:
+        with session_scope() as db:
+            query = db.query(Regulation).options(selectinload(Regulation.tags))
+
+            if country:
+                query = query.filter(Regulation.country == country)
+            if category:
+                query = query.filter(Regulation.category == category)
+            if status:
+                query = query.filter(Regulation.status == status)
+            if keyword:
+                query = query.filter(
+                    (Regulation.name.contains(keyword)) |
+                    (Regulation.code.contains(keyword)) |
+                    (Regulation.description.contains(keyword))
+                )
+            if tags:
+                query = query.join(Regulation.tags).filter(Tag.name.in_(tags))
+
+            return detach(db, query.order_by(Regulation.created_at.desc()).all())
+
+    def get_parameters(self, regulation_id: int) -> List[RegulationParameter]:
+        """获取法规当前参数（按行顺序；缓存对象只读）"""
+        def load():
+            with session_scope() as db:
+                return detach(db, db.query(RegulationParameter).filter(
+                    RegulationParameter.regulation_id == regulation_id,
+                    RegulationParameter.valid_to.is_(None)
+                ).order_by(RegulationParameter.row_order).all())
+
+        return data_cache.get_or_load("parameters", regulation_id, load)
+
+    def get_parameters_as_of(self, regulation_id: int, at: datetime) -> List[RegulationParameter]:
+        """
+        获取法规在某一时刻（UTC）生效的参数（按行顺序）
+
+        只读取当时有效的行，不回放历史；早于版本记录的参数（valid_from 为空）视为一直有效
+        """
+        with session_scope() as db:
+            return db.query(RegulationParameter).filter(
+                RegulationParameter.regulation_id == regulation_id,
+                or_(RegulationParameter.valid_to.is_(None), RegulationParameter.valid_to > at),
+                or_(RegulationParameter.valid_from.is_(None), RegulationParameter.valid_from <= at)
+            ).order_by(RegulationParameter.row_order).all()
+
+    def list_parameter_versions(self, regulation_id: int) -> List[datetime]:
+        """法规参数每次保存（产生新版本）的时间，按时间倒序"""
+        with session_scope() as db:
+            saved_at = db.query(RegulationParameter.valid_from).filter(
+                RegulationParameter.regulation_id == regulation_id,
+                RegulationParameter.valid_from.isnot(None)
+            ).distinct().all()
+            removed_at = db.query(RegulationParameter.valid_to).filter(
+                RegulationParameter.regulation_id == regulation_id,
+                RegulationParameter.valid_to.isnot(None)
+            ).distinct().all()
+            return sorted({row[0] for row in saved_at + removed_at}, reverse=True)
+
+    def save_parameters(self, regulation_id: int, rows: List[dict],
+                        changed_by: Optional[int] = None) -> tuple[bool, str, int]:
+        """
+        保存法规参数（产生一个新版本）
+
+        与当前参数逐行比较：内容和行顺序都未变的行保留（新旧版本共用），
+        其余旧行标记失效（valid_to），新行以同一时间开始生效（valid_from）
+
+        Args:
+            regulation_id: 法规ID
+            rows: 参数行，键为 RegulationParameter 的字段名，行顺序即保存顺序
+            changed_by: 修改人，指定时记录历史
+
+        Returns:
+            (成功, 消息, 保存行数)
+        """
+        def row_key(row_order, values) -> tuple:
+            return (row_order,) + tuple(values(field) or "" for field in PARAMETER_VALUE_FIELDS)
 
-        return query.order_by(Regulation.created_at.desc()).all()
+        try:
+            with session_scope() as db:
+                now = datetime.utcnow()
+                current = {}
+                for param in db.query(RegulationParameter).filter(
+                    RegulationParameter.regulation_id == regulation_id,
+                    RegulationParameter.valid_to.is_(None)
+                ):
+                    current.setdefault(row_key(param.row_order, lambda f: getattr(param, f)), []).append(param)
+
+                added = 0
+                for row_order, row in enumerate(rows):
+                    unchanged = current.get(row_key(row_order, row.get))
+                    if unchanged:
+                        unchanged.pop()
+                        continue
+                    db.add(RegulationParameter(
+                        regulation_id=regulation_id, row_order=row_order, valid_from=now, **row
+                    ))
+                    added += 1
+
+                removed = 0
+                for params in current.values():
+                    for param in params:
+                        param.valid_to = now
+                        removed += 1
+
+                if changed_by and (added or removed):
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation_id,
+                        ChangeType.UPDATE, {
+                            "parameter_count": len(rows), "added": added, "removed": removed,
+                            "version": now.isoformat(),
+                        },
+                        f"编辑参数: 保存了 {len(rows)} 个参数", changed_by
+                    )
+
+            data_cache.invalidate("parameters", regulation_id)
+            return True, "参数保存成功", len(rows)
 
-    def add_document(self, regulation_id: int, file_path: str, doc_type: DocumentType,
-                    upload_by: Optional[int] = None) -> tuple[bool, str, Optional[RegulationDocument]]:
-        """添加法规文档"""
+        except Exception as e:
+            data_cache.invalidate("parameters", regulation_id)
+            logger.error(f"保存参数失败: {e}")
+            return False, f"保存失败: {str(e)}", 0
+
+    def save_parameter_image(self, data: bytes, suffix: str = ".png") -> Path:
+        """
+        保存参数表单元格中的图片，返回存储路径（参数值为 "IMAGE:路径"）
+
+        图片按内容存放（见 BlobStore），内容变化时路径随之变化，save_parameters 把该行作为修改保存，
+        旧版本参数引用的图片保持不变
+        """
+        blob, _, _ = self.blob_store.put_bytes(data, suffix)
+        return blob
+
+    def update_code_file(self, code_id: int, **kwargs) -> tuple[bool, str]:
+        """更新代码文件信息（版本、说明等）"""
         try:
-            regulation = self.get_regulation(regulation_id)
-            if not regulation:
-                return False, "法规不存在", None
-
-            source_file = Path(file_path)
-            if not source_file.exists():
-                return False, "文件不存在", None
-
-            target_dir = DOCUMENTS_DIR / str(regulation_id)
-            target_dir.mkdir(parents=True, exist_ok=True)
-
-            target_file = target_dir / source_file.name
-            shutil.copy2(source_file, target_file)
-
-            document = RegulationDocument(
-                regulation_id=regulation_id,
-                doc_type=doc_type,
-                file_name=source_file.name,
-                file_path=str(target_file),
-                file_size=source_file.stat().st_size,
-                upload_by=upload_by
-            )
+            with session_scope() as db:
+                code_file = db.query(CodeFile).filter(CodeFile.id == code_id).first()
+                if not code_file:
+                    return False, "代码文件不存在"
+
+                for key, value in kwargs.items():
+                    if hasattr(code_file, key) and key != 'id':
+                        setattr(code_file, key, value)
+                regulation_id = code_file.regulation_id
 
-            self.db.add(document)
-            self.db.commit()
-            self.db.refresh(document)
+            data_cache.invalidate("code_files", regulation_id)
+            return True, "代码文件更新成功"
 
-            # 记录历史
-            if upload_by:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, regulation_id,
-                    ChangeType.UPDATE, {"document_id": document.id, "file_name": source_file.name},
-                    f"上传文档: {source_file.name}", upload_by
+        except Exception as e:
+            return False, f"更新失败: {str(e)}"
+
+    def invalidate_cache(self, regulation_id: Optional[int] = None):
+        """使法规缓存失效（不指定ID时全部失效），绕过服务直接写数据库后调用"""
+        data_cache.invalidate("regulation_list")
+        data_cache.invalidate("regulation", regulation_id)
+        data_cache.invalidate("documents", regulation_id)
+        data_cache.invalidate("code_files", regulation_id)
+
+    def get_cache_stats(self) -> dict:
+        """缓存命中统计"""
+        return data_cache.stats()
+
+    def add_document(self, regulation_id: int, file_path: str, doc_type: DocumentType,
+                    upload_by: Optional[int] = None,
+                    progress_callback: Optional[Callable[[int, int], None]] = None
+                    ) -> tuple[bool, str, Optional[RegulationDocument]]:
+        """
+        添加法规文档
+
+        文件边复制边计算 SHA-256，内容相同的文件在存储区只保存一份（见 BlobStore），
+        file_path 记录存储路径，原文件名记录在 file_name（同一法规下重名时改为 "名称 (n).扩展名"）。
+        耗时与文件大小成正比，界面中应在工作线程调用（UploadWorker）
+
+        Args:
+            progress_callback: 复制进度回调 (已复制字节, 总字节)，在调用线程中执行
+        """
+        try:
+            ok, message = self._check_upload(regulation_id, file_path)
+            if not ok:
+                return False, message, None
+
+            blob, size, sha256 = self.blob_store.put(file_path, progress_callback)
+            with session_scope() as db:
+                existing = db.query(RegulationDocument).filter(
+                    RegulationDocument.regulation_id == regulation_id,
+                    RegulationDocument.sha256 == sha256
+                ).first()
+                if existing:
+                    return False, f"相同内容的文档已存在: {existing.file_name}", None
+
+                file_name = self._unique_file_name(db, RegulationDocument, regulation_id, Path(file_path).name)
+                document = RegulationDocument(
+                    regulation_id=regulation_id,
+                    doc_type=doc_type,
+                    file_name=file_name,
+                    file_path=str(blob),
+                    file_size=size,
+                    sha256=sha256,
+                    upload_by=upload_by
                 )
 
-            logger.success(f"文档 '{source_file.name}' 添加成功")
+                db.add(document)
+                db.flush()
+
+                # 记录历史
+                if upload_by:
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation_id,
+                        ChangeType.UPDATE, {"document_id": document.id, "file_name": file_name},
+                        f"上传文档: {file_name}", upload_by
+                    )
+
+            data_cache.invalidate("documents", regulation_id)
+            logger.success(f"文档 '{file_name}' 添加成功")
             return True, "文档添加成功", document
 
         except Exception as e:
-            self.db.rollback()
             return False, f"添加失败: {str(e)}", None
 
     def add_code_file(self, regulation_id: int, file_path: str,
                      description: Optional[str] = None, usage_guide: Optional[str] = None,
                      version: Optional[str] = None,
-                     created_by: Optional[int] = None) -> tuple[bool, str, Optional[CodeFile]]:
-        """添加代码文件"""
+                     created_by: Optional[int] = None,
+                     progress_callback: Optional[Callable[[int, int], None]] = None
+                     ) -> tuple[bool, str, Optional[CodeFile]]:
+        """添加代码文件（存储方式同 add_document）"""
         try:
-            regulation = self.get_regulation(regulation_id)
-            if not regulation:
-                return False, "法规不存在", None
-
-            source_file = Path(file_path)
-            if not source_file.exists():
-                return False, "文件不存在", None
-
-            target_dir = CODES_DIR / str(regulation_id)
-            target_dir.mkdir(parents=True, exist_ok=True)
-
-            target_file = target_dir / source_file.name
-            shutil.copy2(source_file, target_file)
-
-            code_file = CodeFile(
-                regulation_id=regulation_id,
-                file_name=source_file.name,
-                file_path=str(target_file),
-                description=description,
-                usage_guide=usage_guide,
-                version=version,
-                created_by=created_by
-            )
+            ok, message = self._check_upload(regulation_id, file_path)
+            if not ok:
+                return False, message, None
+
+            blob, size, sha256 = self.blob_store.put(file_path, progress_callback)
+            with session_scope() as db:
+                existing = db.query(CodeFile).filter(
+                    CodeFile.regulation_id == regulation_id,
+                    CodeFile.sha256 == sha256
+                ).first()
+                if existing:
+                    return False, f"相同内容的代码文件已存在: {existing.file_name}", None
+
+                file_name = self._unique_file_name(db, CodeFile, regulation_id, Path(file_path).name)
+                code_file = CodeFile(
+                    regulation_id=regulation_id,
+                    file_name=file_name,
+                    file_path=str(blob),
+                    sha256=sha256,
+                    description=description,
+                    usage_guide=usage_guide,
+                    version=version,
+                    created_by=created_by
+                )
 
-            self.db.add(code_file)
-            self.db.commit()
-            self.db.refresh(code_file)
+                db.add(code_file)
+                db.flush()
 
-            # 记录历史
-            if created_by:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, regulation_id,
-                    ChangeType.UPDATE, {"code_file_id": code_file.id, "file_name": source_file.name},
-                    f"上传代码文件: {source_file.name}", created_by
-                )
+                # 记录历史
+                if created_by:
+                    ChangeHistory.create_change_record(
+                        db, EntityType.REGULATION, regulation_id,
+                        ChangeType.UPDATE, {"code_file_id": code_file.id, "file_name": file_name},
+                        f"上传代码文件: {file_name}", created_by
+                    )
 
-            logger.success(f"代码文件 '{source_file.name}' 添加成功")
+            data_cache.invalidate("code_files", regulation_id)
+            logger.success(f"代码文件 '{file_name}' 添加成功")
             return True, "代码文件添加成功", code_file
 
         except Exception as e:
-            self.db.rollback()
             return False, f"添加失败: {str(e)}", None
 
-    def _add_tags_to_regulation(self, regulation: Regulation, tag_names: List[str]):
+    def _check_upload(self, regulation_id: int, file_path: str) -> tuple[bool, str]:
+        """复制前检查法规和文件，超过 MAX_UPLOAD_SIZE 的文件不复制"""
+        if not self.get_regulation(regulation_id):
+            return False, "法规不存在"
+        if not Path(file_path).is_file():
+            return False, "文件不存在"
+        return FileHandler.validate_file_size(file_path, settings.MAX_UPLOAD_SIZE)
+
+    @staticmethod
+    def _unique_file_name(db, model, regulation_id: int, file_name: str) -> str:
+        """同一法规下已有同名文件时改用 "名称 (n).扩展名"，不同内容的文件不重名"""
+        names = {name for (name,) in db.query(model.file_name).filter(model.regulation_id == regulation_id)}
+        name = Path(file_name)
+        unique, counter = name.name, 1
+        while unique in names:
+            unique = f"{name.stem} ({counter}){name.suffix}"
+            counter += 1
+        return unique
+
+    def _add_tags_to_regulation(self, db, regulation: Regulation, tag_names: List[str]):
         """为法规添加标签"""
         for tag_name in tag_names:
-            tag = self.db.query(Tag).filter(Tag.name == tag_name).first()
+            tag = db.query(Tag).filter(Tag.name == tag_name).first()
             if not tag:
                 tag = Tag(name=tag_name)
-                self.db.add(tag)
-                self.db.flush()
+                db.add(tag)
+                db.flush()
             regulation.tags.append(tag)
 
-    def _update_regulation_tags(self, regulation: Regulation, tag_names: List[str]):
+    def _update_regulation_tags(self, db, regulation: Regulation, tag_names: List[str]):
         """更新法规标签"""
         regulation.tags.clear()
-        self._add_tags_to_regulation(regulation, tag_names)
+        self._add_tags_to_regulation(db, regulation, tag_names)
 
     def _delete_regulation_files(self, regulation: Regulation):
-        """删除法规关联文件"""
+        """删除旧版本按法规目录保存的文件（存储区中的文件由 _collect_blob_garbage 清理）"""
         doc_dir = DOCUMENTS_DIR / str(regulation.id)
         if doc_dir.exists():
             shutil.rmtree(doc_dir)
 
         code_dir = CODES_DIR / str(regulation.id)
         if code_dir.exists():
-            shutil.rmtree(code_dir)
\ No newline at end of file
+            shutil.rmtree(code_dir)
+
+    def _collect_blob_garbage(self):
+        """清理不再被任何文档、代码文件或参数图片（含历史版本）引用的存储文件（删除记录提交后调用）"""
+        try:
+            with session_scope() as db:
+                referenced = set()
+                for model in (RegulationDocument, CodeFile):
+                    referenced.update(sha256 for (sha256,) in db.query(model.sha256).filter(
+                        model.sha256.isnot(None)
+                    ).distinct())
+                for field in PARAMETER_VALUE_FIELDS:
+                    column = getattr(RegulationParameter, field)
+                    for (value,) in db.query(column).filter(column.like("IMAGE:%")).distinct():
+                        referenced.add(BlobStore.sha256_of(value[6:]))  # 去掉"IMAGE:"前缀
+            self.blob_store.collect_garbage(referenced)
+        except Exception as e:
+            logger.warning(f"清理存储文件失败: {e}")
\ No newline at end of file
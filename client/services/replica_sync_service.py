@@ -0,0 +1,546 @@
+"""
+本地副本同步服务
+在本地 SQLite 副本与共享数据库（PostgreSQL 或网络 SQLite）之间推送/拉取增量
+"""
+import sys
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Tuple, Optional, List, Dict, Callable
+from sqlalchemy import create_engine, event, select, func, and_, false, text
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+from shared.constants import SyncStatus
+from client.models import Base, engine
+from client.models.database import get_remote_database_url
+from client.models.migrations import create_missing_columns
+from client.models.sync import (
+    RowVersion, SyncOutbox, SyncConflict, SyncState, SyncIdBlock,
+    OP_DELETE, ID_BLOCK_SIZE, get_node_id, load_vector, dump_vector, compare_vectors,
+    merge_vectors, row_key_clause, row_to_json, replicated_tables,
+    make_row_key,
+)
+from client.services.cache import data_cache
+from client.utils.profiler import profiled
+
+
+class ReplicaSyncService:
+    """本地副本同步服务"""
+
+    def __init__(self):
+        self.node_id = get_node_id()
+        self.local_engine = engine
+        self._remote_engine = None
+        self._sync_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._tables = {t.name: t for t in replicated_tables()}
+
+    @property
+    def remote_engine(self):
+        """共享数据库引擎（首次使用时创建）"""
+        if self._remote_engine is None:
+            remote_url = get_remote_database_url()
+            is_sqlite = "sqlite" in remote_url
+            remote_engine = create_engine(
+                remote_url,
+                echo=False,
+                pool_pre_ping=True,
+                connect_args={"check_same_thread": False, "timeout": 30} if is_sqlite else {},
+            )
+
+            if is_sqlite:
+                @event.listens_for(remote_engine, "connect")
+                def set_sqlite_pragma(dbapi_conn, connection_record):
+                    cursor = dbapi_conn.cursor()
+                    cursor.execute("PRAGMA foreign_keys=ON")
+                    cursor.close()
+
+            # 共享数据库只需要额外的版本向量表和号段表
+            Base.metadata.create_all(
+                bind=remote_engine, tables=[RowVersion.__table__, SyncIdBlock.__table__]
+            )
+            # 同步会写入所有列，共享数据库上缺少的新列先补上
+            with remote_engine.begin() as conn:
+                create_missing_columns(conn)
+            self._remote_engine = remote_engine
+        return self._remote_engine
+
+    # ========== 同步状态 ==========
+
+    def _get_state(self, conn, key: str) -> Optional[str]:
+        state = SyncState.__table__
+        row = conn.execute(select(state.c.value).where(state.c.key == key)).first()
+        return row[0] if row else None
+
+    def _set_state(self, conn, key: str, value: str):
+        state = SyncState.__table__
+        if self._get_state(conn, key) is None:
+            conn.execute(state.insert().values(key=key, value=value))
+        else:
+            conn.execute(state.update().where(state.c.key == key).values(value=value))
+
+    def _get_vector(self, conn, table_name: str, row_key: str) -> Tuple[Optional[Dict[str, int]], bool]:
+        """读取行版本向量，返回 (向量或 None, 是否已删除)"""
+        versions = RowVersion.__table__
+        row = conn.execute(
+            select(versions.c.version_vector, versions.c.is_deleted).where(and_(
+                versions.c.table_name == table_name,
+                versions.c.row_key == row_key,
+            ))
+        ).first()
+        if not row:
+            return None, False
+        return load_vector(row[0]), bool(row[1])
+
+    def _lock_remote(self, conn):
+        """
+        取得共享数据库的写锁（事务提交时释放），在分配拉取序号的事务开始时调用
+
+        推送依次执行，序号按 max(seq) + 1 分配不会重复，且序号顺序与提交顺序一致，
+        拉取按序号增量读取不会漏掉并发推送的变更
+        """
+        if conn.dialect.name == "postgresql":
+            # 与自身冲突、不阻塞只读查询
+            conn.execute(text("LOCK TABLE sync_row_versions IN SHARE ROW EXCLUSIVE MODE"))
+        else:
+            # SQLite：写语句（即使不影响任何行）即取得数据库写锁
+            versions = RowVersion.__table__
+            conn.execute(versions.update().where(false()).values(seq=versions.c.seq))
+
+    def _put_vector(self, conn, table_name: str, row_key: str, vector: Dict[str, int],
+                    is_deleted: bool, assign_seq: bool = False):
+        """写入行版本向量，共享数据库端同时分配新的拉取序号（事务须已调用 _lock_remote）"""
+        versions = RowVersion.__table__
+        values = {
+            "version_vector": dump_vector(vector),
+            "is_deleted": is_deleted,
+            "updated_at": datetime.utcnow(),
+        }
+        if assign_seq:
+            max_seq = conn.execute(select(func.max(versions.c.seq))).scalar() or 0
+            values["seq"] = max_seq + 1
+
+        key_clause = and_(versions.c.table_name == table_name, versions.c.row_key == row_key)
+        if conn.execute(select(versions.c.table_name).where(key_clause)).first():
+            conn.execute(versions.update().where(key_clause).values(**values))
+        else:
+            conn.execute(versions.insert().values(table_name=table_name, row_key=row_key, **values))
+
+    def ensure_id_block(self) -> bool:
+        """
+        确保本节点持有可用的主键号段
+
+        剩余不足 10% 时向共享数据库申请新号段，号段起点取已分配号段和现有数据的最大值之后
+        """
+        blocks = SyncIdBlock.__table__
+        with self.local_engine.connect() as local_conn:
+            next_id = self._get_state(local_conn, "id_next")
+            block_end = self._get_state(local_conn, "id_block_end")
+        if next_id and block_end and int(block_end) - int(next_id) >= ID_BLOCK_SIZE // 10:
+            return True
+
+        for _ in range(3):
+            try:
+                with self.remote_engine.begin() as remote_conn:
+                    start = remote_conn.execute(select(func.max(blocks.c.block_end))).scalar() or 0
+                    for table in self._tables.values():
+                        pk_columns = list(table.primary_key.columns)
+                        if len(pk_columns) == 1 and pk_columns[0].type.python_type is int:
+                            start = max(start, remote_conn.execute(select(func.max(pk_columns[0]))).scalar() or 0)
+                    start += 1
+                    remote_conn.execute(blocks.insert().values(
+                        node_id=self.node_id, block_start=start,
+                        block_end=start + ID_BLOCK_SIZE - 1, allocated_at=datetime.utcnow(),
+                    ))
+
+                with self.local_engine.begin() as local_conn:
+                    self._set_state(local_conn, "id_next", str(start))
+                    self._set_state(local_conn, "id_block_end", str(start + ID_BLOCK_SIZE - 1))
+                logger.info(f"已分配主键号段: {start} - {start + ID_BLOCK_SIZE - 1}")
+                return True
+            except Exception as e:
+                # 其他节点同时申请到相同起点时唯一约束冲突，重试即可
+                logger.warning(f"分配主键号段失败: {e}")
+        return False
+
+    # ========== 行读写 ==========
+
+    def _read_row(self, conn, table_name: str, row_key: str) -> Optional[dict]:
+        table = self._tables[table_name]
+        row = conn.execute(select(table).where(row_key_clause(table, row_key))).mappings().first()
+        return dict(row) if row else None
+
+    def _write_row(self, conn, table_name: str, row_key: str, data: Optional[dict]):
+        """写入（data 为 None 时删除）一行数据"""
+        table = self._tables[table_name]
+        clause = row_key_clause(table, row_key)
+        if data is None:
+            conn.execute(table.delete().where(clause))
+            return
+        if conn.execute(select(*table.primary_key.columns).where(clause)).first():
+            conn.execute(table.update().where(clause).values(**data))
+        else:
+            conn.execute(table.insert().values(**data))
+
+    def _record_conflict(self, conn, table_name: str, row_key: str,
+                         local_vector: Dict[str, int], remote_vector: Dict[str, int],
+                         local_data: Optional[dict], remote_data: Optional[dict]):
+        conflicts = SyncConflict.__table__
+        existing = conn.execute(
+            select(conflicts.c.id).where(and_(
+                conflicts.c.table_name == table_name,
+                conflicts.c.row_key == row_key,
+                conflicts.c.resolved == False,
+            ))
+        ).first()
+        values = {
+            "local_vector": dump_vector(local_vector),
+            "remote_vector": dump_vector(remote_vector),
+            "local_data": row_to_json(local_data),
+            "remote_data": row_to_json(remote_data),
+            "detected_at": datetime.utcnow(),
+        }
+        if existing:
+            conn.execute(conflicts.update().where(conflicts.c.id == existing[0]).values(**values))
+        else:
+            conn.execute(conflicts.insert().values(
+                table_name=table_name, row_key=row_key, resolved=False, **values
+            ))
+        logger.warning(f"同步冲突: {table_name} {row_key}")
+
+    # ========== 推送 ==========
+
+    def push_changes(self) -> Tuple[bool, str, int]:
+        """
+        推送发件箱中的本地变更到共享数据库
+
+        Returns:
+            (成功, 消息, 推送行数)
+        """
+        outbox = SyncOutbox.__table__
+        pushed = 0
+        conflicts = 0
+
+        try:
+            with self.local_engine.connect() as local_conn:
+                entries = local_conn.execute(
+                    select(outbox).where(outbox.c.status == SyncStatus.PENDING).order_by(outbox.c.id)
+                ).mappings().all()
+
+            if not entries:
+                return True, "没有需要推送的变更", 0
+
+            # 整批在一个共享数据库事务中写入，失败时全部回滚并保留发件箱
+            with self.local_engine.begin() as local_conn, self.remote_engine.begin() as remote_conn:
+                self._lock_remote(remote_conn)
+                for entry in entries:
+                    table_name, row_key = entry["table_name"], entry["row_key"]
+                    if table_name not in self._tables:
+                        continue
+
+                    local_vector, _ = self._get_vector(local_conn, table_name, row_key)
+                    local_vector = local_vector or {}
+                    local_data = None if entry["operation"] == OP_DELETE else \
+                        self._read_row(local_conn, table_name, row_key)
+
+                    remote_vector, _ = self._get_vector(remote_conn, table_name, row_key)
+                    relation = compare_vectors(local_vector, remote_vector or {})
+
+                    status, error = SyncStatus.SUCCESS, None
+                    if relation == "newer" or remote_vector is None:
+                        self._write_row(remote_conn, table_name, row_key, local_data)
+                        self._put_vector(remote_conn, table_name, row_key, local_vector,
+                                         is_deleted=local_data is None, assign_seq=True)
+                        pushed += 1
+                    elif relation == "concurrent":
+                        remote_data = self._read_row(remote_conn, table_name, row_key)
+                        self._record_conflict(local_conn, table_name, row_key,
+                                              local_vector, remote_vector, local_data, remote_data)
+                        status, error = SyncStatus.FAILED, "conflict"
+                        conflicts += 1
+                    # equal / older: 共享数据库已包含本次修改，由拉取负责更新本地
+
+                    local_conn.execute(outbox.update().where(outbox.c.id == entry["id"]).values(
+                        status=status,
+                        attempts=entry["attempts"] + 1,
+                        last_error=error,
+                        synced_at=datetime.utcnow() if status == SyncStatus.SUCCESS else None,
+                    ))
+
+            message = f"推送 {pushed} 行"
+            if conflicts:
+                message += f"，{conflicts} 行存在冲突"
+            logger.info(f"副本同步: {message}")
+            return True, message, pushed
+
+        except Exception as e:
+            logger.error(f"推送本地变更失败: {e}")
+            with self.local_engine.begin() as local_conn:
+                local_conn.execute(
+                    outbox.update().where(outbox.c.status == SyncStatus.PENDING).values(
+                        attempts=outbox.c.attempts + 1, last_error=str(e)
+                    )
+                )
+            return False, f"推送失败: {str(e)}", 0
+
+    # ========== 拉取 ==========
+
+    def pull_changes(self) -> Tuple[bool, str, int]:
+        """
+        从共享数据库拉取其他客户端的增量到本地副本
+
+        Returns:
+            (成功, 消息, 拉取行数)
+        """
+        versions = RowVersion.__table__
+        outbox = SyncOutbox.__table__
+        pulled = 0
+
+        try:
+            with self.local_engine.connect() as local_conn:
+                cursor = int(self._get_state(local_conn, "last_pull_seq") or 0)
+
+            with self.remote_engine.connect() as remote_conn:
+                changes = remote_conn.execute(
+                    select(versions).where(versions.c.seq > cursor).order_by(versions.c.seq)
+                ).mappings().all()
+
+                if not changes:
+                    return True, "没有新的远程变更", 0
+
+                remote_rows = {}
+                for change in changes:
+                    if change["table_name"] in self._tables and not change["is_deleted"]:
+                        remote_rows[(change["table_name"], change["row_key"])] = self._read_row(
+                            remote_conn, change["table_name"], change["row_key"]
+                        )
+
+            with self.local_engine.begin() as local_conn:
+                for change in changes:
+                    table_name, row_key = change["table_name"], change["row_key"]
+                    if table_name not in self._tables:
+                        continue
+
+                    remote_vector = load_vector(change["version_vector"])
+                    local_vector, _ = self._get_vector(local_conn, table_name, row_key)
+                    relation = compare_vectors(remote_vector, local_vector or {})
+
+                    if relation == "newer" or local_vector is None:
+                        data = None if change["is_deleted"] else remote_rows.get((table_name, row_key))
+                        self._write_row(local_conn, table_name, row_key, data)
+                        self._put_vector(local_conn, table_name, row_key, remote_vector,
+                                         is_deleted=data is None)
+                        pulled += 1
+                    elif relation == "concurrent":
+                        has_pending = local_conn.execute(
+                            select(outbox.c.id).where(and_(
+                                outbox.c.table_name == table_name,
+                                outbox.c.row_key == row_key,
+                                outbox.c.status.in_([SyncStatus.PENDING, SyncStatus.FAILED]),
+                            ))
+                        ).first()
+                        if has_pending:
+                            self._record_conflict(
+                                local_conn, table_name, row_key, local_vector, remote_vector,
+                                self._read_row(local_conn, table_name, row_key),
+                                remote_rows.get((table_name, row_key)),
+                            )
+
+                self._set_state(local_conn, "last_pull_seq", str(max(c["seq"] or 0 for c in changes)))
+                self._set_state(local_conn, "last_pull_at", datetime.utcnow().isoformat())
+
+            message = f"拉取 {pulled} 行"
+            if pulled:
+                data_cache.clear()
+                logger.info(f"副本同步: {message}")
+            return True, message, pulled
+
+        except Exception as e:
+            logger.error(f"拉取远程变更失败: {e}")
+            return False, f"拉取失败: {str(e)}", 0
+
+    def bootstrap(self) -> Tuple[bool, str]:
+        """首次使用副本时，从共享数据库完整复制所有数据"""
+        try:
+            with self.local_engine.connect() as local_conn:
+                if self._get_state(local_conn, "bootstrapped_at"):
+                    return True, "本地副本已初始化"
+
+            logger.info("正在从共享数据库初始化本地副本...")
+            versions = RowVersion.__table__
+            copied = 0
+
+            with self.remote_engine.connect() as remote_conn, self.local_engine.begin() as local_conn:
+                remote_vectors = {
+                    (row.table_name, row.row_key): load_vector(row.version_vector)
+                    for row in remote_conn.execute(
+                        select(versions.c.table_name, versions.c.row_key, versions.c.version_vector)
+                    )
+                }
+
+                for table in self._tables.values():
+                    for row in remote_conn.execute(select(table)).mappings():
+                        data = dict(row)
+                        row_key = make_row_key(data[col.name] for col in table.primary_key.columns)
+                        self._write_row(local_conn, table.name, row_key, data)
+                        self._put_vector(local_conn, table.name, row_key,
+                                         remote_vectors.get((table.name, row_key), {}), is_deleted=False)
+                        copied += 1
+
+                max_seq = remote_conn.execute(select(func.max(versions.c.seq))).scalar() or 0
+                self._set_state(local_conn, "last_pull_seq", str(max_seq))
+                self._set_state(local_conn, "bootstrapped_at", datetime.utcnow().isoformat())
+
+            self.ensure_id_block()
+            logger.success(f"本地副本初始化完成，复制 {copied} 行")
+            return True, f"本地副本初始化完成，复制 {copied} 行"
+
+        except Exception as e:
+            logger.error(f"初始化本地副本失败: {e}")
+            return False, f"初始化失败: {str(e)}"
+
+    @profiled("副本同步")
+    def sync_once(self) -> Tuple[bool, str, int]:
+        """
+        执行一次完整同步（先推送后拉取）
+
+        Returns:
+            (成功, 消息, 拉取行数)
+        """
+        with self._sync_lock:
+            self.ensure_id_block()
+            push_ok, push_msg, _ = self.push_changes()
+            pull_ok, pull_msg, pulled = self.pull_changes()
+            return push_ok and pull_ok, f"{push_msg}；{pull_msg}", pulled
+
+    # ========== 冲突管理 ==========
+
+    def get_pending_count(self) -> int:
+        """获取待推送的变更数量"""
+        outbox = SyncOutbox.__table__
+        with self.local_engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(outbox).where(outbox.c.status == SyncStatus.PENDING)
+            ).scalar() or 0
+
+    def get_conflicts(self, include_resolved: bool = False) -> List[dict]:
+        """获取同步冲突列表"""
+        conflicts = SyncConflict.__table__
+        query = select(conflicts).order_by(conflicts.c.detected_at.desc())
+        if not include_resolved:
+            query = query.where(conflicts.c.resolved == False)
+        with self.local_engine.connect() as conn:
+            return [SyncConflict(**dict(row)).to_dict() for row in conn.execute(query).mappings()]
+
+    def resolve_conflict(self, conflict_id: int, keep: str = "remote") -> Tuple[bool, str]:
+        """
+        解决同步冲突
+
+        Args:
+            conflict_id: 冲突ID
+            keep: "local" 保留本地版本并重新推送，"remote" 采用共享数据库版本
+        """
+        if keep not in ("local", "remote"):
+            return False, "keep 参数必须为 local 或 remote"
+
+        conflicts = SyncConflict.__table__
+        outbox = SyncOutbox.__table__
+        try:
+            with self._sync_lock, self.local_engine.begin() as local_conn, \
+                    self.remote_engine.begin() as remote_conn:
+                self._lock_remote(remote_conn)
+                conflict = local_conn.execute(
+                    select(conflicts).where(conflicts.c.id == conflict_id)
+                ).mappings().first()
+                if not conflict:
+                    return False, "冲突记录不存在"
+
+                table_name, row_key = conflict["table_name"], conflict["row_key"]
+                local_vector, _ = self._get_vector(local_conn, table_name, row_key)
+                remote_vector, remote_deleted = self._get_vector(remote_conn, table_name, row_key)
+                merged = merge_vectors(local_vector or {}, remote_vector or {})
+
+                if keep == "local":
+                    # 合并向量后本节点再递增一次，使本地版本支配双方历史
+                    merged[self.node_id] = merged.get(self.node_id, 0) + 1
+                    local_data = self._read_row(local_conn, table_name, row_key)
+                    self._write_row(remote_conn, table_name, row_key, local_data)
+                    self._put_vector(remote_conn, table_name, row_key, merged,
+                                     is_deleted=local_data is None, assign_seq=True)
+                    self._put_vector(local_conn, table_name, row_key, merged, is_deleted=local_data is None)
+                else:
+                    remote_data = None if remote_deleted else self._read_row(remote_conn, table_name, row_key)
+                    self._write_row(local_conn, table_name, row_key, remote_data)
+                    self._put_vector(local_conn, table_name, row_key, merged, is_deleted=remote_data is None)
+
+                local_conn.execute(outbox.update().where(and_(
+                    outbox.c.table_name == table_name,
+                    outbox.c.row_key == row_key,
+                    outbox.c.status == SyncStatus.FAILED,
+                )).values(status=SyncStatus.SUCCESS, synced_at=datetime.utcnow(), last_error=None))
+                local_conn.execute(conflicts.update().where(conflicts.c.id == conflict_id).values(
+                    resolved=True, resolution=keep
+                ))
+
+            if keep == "remote":
+                data_cache.clear()
+
+            logger.info(f"同步冲突 {conflict_id} 已解决（保留{'本地' if keep == 'local' else '远程'}版本）")
+            return True, "冲突已解决"
+
+        except Exception as e:
+            logger.error(f"解决同步冲突失败: {e}")
+            return False, f"解决失败: {str(e)}"
+
+    # ========== 后台同步 ==========
+
+    def start_background_sync(self, interval: Optional[int] = None,
+                              on_synced: Optional[Callable[[bool, str, int], None]] = None):
+        """
+        启动后台同步线程
+
+        Args:
+            interval: 同步间隔（秒），默认使用 settings.SYNC_INTERVAL
+            on_synced: 每次同步完成后的回调 (成功, 消息, 拉取行数)，在后台线程中调用
+        """
+        if self._sync_thread and self._sync_thread.is_alive():
+            return
+
+        interval = interval or settings.SYNC_INTERVAL
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    result = self.sync_once()
+                    if on_synced:
+                        on_synced(*result)
+                except Exception as e:
+                    logger.error(f"后台同步失败: {e}")
+                self._stop_event.wait(interval)
+
+        self._sync_thread = threading.Thread(target=run, name="ReplicaSync", daemon=True)
+        self._sync_thread.start()
+        logger.info(f"后台同步已启动，间隔 {interval} 秒")
+
+    def stop_background_sync(self, final_push: bool = True):
+        """停止后台同步线程，可选在退出前推送剩余的本地变更"""
+        self._stop_event.set()
+        if self._sync_thread:
+            self._sync_thread.join(timeout=10)
+            self._sync_thread = None
+        if final_push:
+            with self._sync_lock:
+                self.push_changes()
+
+
+# 测试代码
+if __name__ == "__main__":
+    service = ReplicaSyncService()
+    print(f"节点标识: {service.node_id}")
+    print(f"待推送变更: {service.get_pending_count()}")
+    print(service.sync_once())
@@ -0,0 +1,288 @@
+"""
+更新文件下载器
+支持 HTTP Range 断点续传、多连接分段下载和 SHA-256 校验
+"""
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+import requests
+from urllib3.exceptions import HTTPError as Urllib3Error
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.utils.file_handler import FileHandler
+
+
+# 读取缓冲区大小范围，按实际吞吐自适应调整
+MIN_BUFFER_SIZE = 64 * 1024
+MAX_BUFFER_SIZE = 1024 * 1024
+# 小于该大小的文件不分段
+PARALLEL_MIN_SIZE = 4 * 1024 * 1024
+# 单个分段失败后的重试次数
+SEGMENT_RETRIES = 3
+# 下载状态写盘间隔（秒）
+STATE_SAVE_INTERVAL = 1.0
+
+
+class DownloadCancelled(Exception):
+    """下载被取消"""
+
+
+class UpdateDownloader:
+    """
+    更新文件下载器
+
+    下载内容先写入 <save_path>.part，进度记录在 <save_path>.part.json，
+    中断后再次下载同一地址时从已完成的位置继续；全部完成且校验通过后才替换为目标文件
+    """
+
+    def __init__(self, session: requests.Session = None, connections: int = 1,
+                 cancel_event: threading.Event = None):
+        self.session = session or requests.Session()
+        self.connections = max(1, connections)
+        self.cancel_event = cancel_event or threading.Event()
+        self._abort_event = threading.Event()  # 某个分段失败时通知其余分段停止
+        self._lock = threading.Lock()
+        self._downloaded = 0
+        self._total = 0
+        self._last_state_save = 0.0
+        self._progress_callback: Optional[Callable[[int, int], None]] = None
+
+    def download(self, url: str, save_path: str,
+                 progress_callback: Callable[[int, int], None] = None,
+                 expected_sha256: str = None) -> Tuple[bool, str]:
+        """
+        下载文件
+
+        Args:
+            url: 下载地址
+            save_path: 保存路径
+            progress_callback: 进度回调 (已下载字节, 总字节)，多连接时在下载线程中调用
+            expected_sha256: 期望的 SHA-256（十六进制），为空时不校验
+
+        Returns:
+            (成功, 消息)
+        """
+        save_path = Path(save_path)
+        part_file = save_path.with_name(save_path.name + ".part")
+        state_file = save_path.with_name(save_path.name + ".part.json")
+        self._progress_callback = progress_callback
+        self._abort_event.clear()
+
+        try:
+            save_path.parent.mkdir(parents=True, exist_ok=True)
+            total, etag, supports_range = self._probe(url)
+
+            if supports_range and total:
+                state = self._load_state(state_file, url, etag, total, part_file)
+                if state is None:
+                    state = self._new_state(url, etag, total, part_file)
+                    logger.info(f"开始下载更新: {url} ({len(state['segments'])} 个连接)")
+                else:
+                    logger.info(f"继续下载更新: {url}")
+                self._download_segments(url, state, part_file, state_file)
+            else:
+                # 服务器不支持 Range，只能整体下载
+                logger.info(f"开始下载更新: {url} (不支持断点续传)")
+                state_file.unlink(missing_ok=True)
+                self._download_whole(url, part_file, total)
+
+            if total and part_file.stat().st_size != total:
+                return False, "下载失败: 文件大小与服务器不一致"
+
+            if expected_sha256:
+                actual_sha256 = FileHandler.calculate_sha256(str(part_file))
+                if not actual_sha256 or actual_sha256.lower() != expected_sha256.lower():
+                    part_file.unlink(missing_ok=True)
+                    state_file.unlink(missing_ok=True)
+                    logger.error(f"更新文件校验失败: 期望 {expected_sha256}，实际 {actual_sha256}")
+                    return False, "下载失败: 文件校验不通过，请重新下载"
+
+            part_file.replace(save_path)
+            state_file.unlink(missing_ok=True)
+            logger.info(f"更新下载完成: {save_path}")
+            return True, "下载成功"
+
+        except DownloadCancelled:
+            logger.info("更新下载已取消，已下载部分保留用于续传")
+            return False, "下载已取消"
+        except Exception as e:
+            logger.error(f"下载更新失败: {e}")
+            return False, f"下载失败: {str(e)}"
+
+    def cancel(self):
+        """取消下载（已下载部分保留用于续传）"""
+        self.cancel_event.set()
+
+    # ========== 探测与状态 ==========
+
+    def _probe(self, url: str) -> Tuple[int, Optional[str], bool]:
+        """请求首字节，获取 (总大小, ETag, 是否支持 Range)"""
+        response = self.session.get(
+            url, headers={"Range": "bytes=0-0", "Accept-Encoding": "identity"},
+            stream=True, timeout=(10, 30)
+        )
+        try:
+            response.raise_for_status()
+            etag = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                return (int(total) if total.isdigit() else 0), etag, total.isdigit()
+            return int(response.headers.get("Content-Length", 0)), etag, False
+        finally:
+            response.close()
+
+    def _load_state(self, state_file: Path, url: str, etag: Optional[str],
+                    total: int, part_file: Path) -> Optional[dict]:
+        """读取上次的下载进度，服务器文件已变化时作废"""
+        try:
+            state = json.loads(state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if (state.get("url") != url or state.get("etag") != etag
+                or state.get("total") != total or not part_file.exists()):
+            logger.info("服务器文件已变化，重新下载")
+            return None
+        return state
+
+    def _new_state(self, url: str, etag: Optional[str], total: int, part_file: Path) -> dict:
+        """按连接数划分分段，并预分配临时文件"""
+        count = self.connections if total >= PARALLEL_MIN_SIZE else 1
+        segment_size = -(-total // count)
+        segments = []
+        for start in range(0, total, segment_size):
+            end = min(start + segment_size, total) - 1
+            segments.append([start, end, start])  # [起点, 终点, 下一个待写位置]
+
+        with open(part_file, "wb") as f:
+            f.truncate(total)
+        return {"url": url, "etag": etag, "total": total, "segments": segments}
+
+    def _save_state(self, state_file: Path, state: dict, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_state_save < STATE_SAVE_INTERVAL:
+                return
+            self._last_state_save = now
+            tmp_file = state_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(state), encoding="utf-8")
+            tmp_file.replace(state_file)
+
+    # ========== 下载 ==========
+
+    def _download_segments(self, url: str, state: dict, part_file: Path, state_file: Path):
+        segments: List[list] = state["segments"]
+        self._total = state["total"]
+        self._downloaded = sum(seg[2] - seg[0] for seg in segments)
+        self._report_progress(0)
+
+        pending = [seg for seg in segments if seg[2] <= seg[1]]
+        try:
+            if len(pending) <= 1:
+                for seg in pending:
+                    self._download_segment(url, state, seg, part_file, state_file)
+            else:
+                with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                    futures = [
+                        executor.submit(self._download_segment, url, state, seg, part_file, state_file)
+                        for seg in pending
+                    ]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        # 一个分段失败时停止其余分段，已下载进度保留
+                        self._abort_event.set()
+                        raise
+        finally:
+            self._save_state(state_file, state, force=True)
+
+    def _download_segment(self, url: str, state: dict, segment: list,
+                          part_file: Path, state_file: Path):
+        """下载一个分段，失败后从已写入位置重试"""
+        attempt = 0
+        while segment[2] <= segment[1]:
+            headers = {
+                "Range": f"bytes={segment[2]}-{segment[1]}",
+                "Accept-Encoding": "identity",
+            }
+            if state.get("etag"):
+                headers["If-Range"] = state["etag"]
+
+            position_before = segment[2]
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise IOError("服务器文件已变化，请重新下载")
+                    with open(part_file, "r+b") as f:
+                        f.seek(segment[2])
+
+                        def on_chunk(size):
+                            # 先落盘再推进进度，保证续传位置之前的内容都已写入
+                            f.flush()
+                            segment[2] += size
+                            self._report_progress(size)
+                            self._save_state(state_file, state)
+
+                        self._copy_stream(response, f, on_chunk, segment[1] - segment[2] + 1)
+            except (requests.exceptions.RequestException, Urllib3Error, ConnectionError) as e:
+                # 有进展时重置重试计数，持续失败才放弃
+                attempt = 0 if segment[2] > position_before else attempt + 1
+                if attempt >= SEGMENT_RETRIES:
+                    raise
+                logger.warning(f"分段下载中断，{2 ** attempt} 秒后重试: {e}")
+                if self.cancel_event.wait(2 ** attempt):
+                    raise DownloadCancelled()
+
+    def _download_whole(self, url: str, part_file: Path, total: int):
+        self._total = total
+        self._downloaded = 0
+        with self.session.get(url, headers={"Accept-Encoding": "identity"},
+                              stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+            with open(part_file, "wb") as f:
+                self._copy_stream(response, f, self._report_progress)
+
+    def _copy_stream(self, response, f, on_chunk: Callable[[int], None], limit: int = None):
+        """
+        把响应内容写入文件，缓冲区在 64KB - 1MB 之间自适应：
+        读满且很快时加倍，读取缓慢时减半，兼顾高速网络的吞吐和慢速网络的进度刷新
+        """
+        buffer_size = MIN_BUFFER_SIZE
+        remaining = limit
+        while remaining is None or remaining > 0:
+            if self.cancel_event.is_set() or self._abort_event.is_set():
+                raise DownloadCancelled()
+
+            size = buffer_size if remaining is None else min(buffer_size, remaining)
+            started = time.monotonic()
+            data = response.raw.read(size)
+            elapsed = time.monotonic() - started
+            if not data:
+                if remaining:
+                    raise ConnectionError("连接提前结束")
+                break
+
+            f.write(data)
+            on_chunk(len(data))
+            if remaining is not None:
+                remaining -= len(data)
+
+            if len(data) == size and elapsed < 0.05:
+                buffer_size = min(buffer_size * 2, MAX_BUFFER_SIZE)
+            elif elapsed > 0.5:
+                buffer_size = max(buffer_size // 2, MIN_BUFFER_SIZE)
+
+    def _report_progress(self, size: int):
+        with self._lock:
+            self._downloaded += size
+            downloaded = self._downloaded
+        if self._progress_callback and self._total > 0:
+            self._progress_callback(downloaded, self._total)
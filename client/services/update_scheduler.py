@@ -0,0 +1,78 @@
+"""
+后台版本检查调度
+"""
+import sys
+import random
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+from client.services.update_service import UpdateService
+
+
+# 启动后首次检查的延迟（秒），避开启动高峰
+FIRST_CHECK_DELAY = 10
+# 检查间隔的随机抖动比例，避免大量客户端同时请求
+INTERVAL_JITTER = 0.1
+
+
+class UpdateCheckScheduler:
+    """
+    后台定时检查版本更新
+
+    发现新版本时在后台线程中调用 on_update_found(更新信息)，同一版本只回调一次
+    """
+
+    def __init__(self, on_update_found: Callable[[dict], None],
+                 update_service: UpdateService = None, interval: int = None):
+        self.on_update_found = on_update_found
+        self.update_service = update_service or UpdateService()
+        self.interval = interval or settings.UPDATE_CHECK_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reported_version: Optional[str] = None
+
+    def start(self):
+        """启动后台检查"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="update-check", daemon=True)
+        self._thread.start()
+        logger.info(f"后台版本检查已启动，间隔 {self.interval} 秒")
+
+    def stop(self):
+        """停止后台检查"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        delay = FIRST_CHECK_DELAY
+        while not self._stop_event.wait(delay):
+            self.check_now()
+            delay = self.interval * random.uniform(1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+
+    def check_now(self):
+        """立即检查一次（退避期内直接使用缓存结果）"""
+        try:
+            has_update, update_info = self.update_service.check_for_updates()
+        except Exception as e:
+            logger.error(f"后台检查更新失败: {e}")
+            return
+
+        if not has_update or not update_info:
+            return
+        latest_version = update_info.get("version")
+        if latest_version == self._reported_version:
+            return
+        self._reported_version = latest_version
+        try:
+            self.on_update_found(update_info)
+        except Exception as e:
+            logger.error(f"新版本回调失败: {e}")
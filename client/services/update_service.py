@@ -2,17 +2,63 @@
 版本更新服务
 """
 import sys
+import json
+import time
+import uuid
+import random
+import threading
 from pathlib import Path
-import requests
 from typing import Optional, Tuple, List
 from packaging import version
 from loguru import logger
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import text, and_, or_
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from shared.config import settings
-from client.models import SessionLocal, UpdateNotification, NotificationType
+from shared.config import settings, DATA_DIR
+from client.models import SessionLocal, UpdateNotification, UpdateNotificationArchive, NotificationType
+from client.services.delta_update import DeltaUpdater
+
+
+# 数据库通知频道（PostgreSQL LISTEN/NOTIFY）
+NOTIFY_CHANNEL = "update_notifications"
+
+# 本进程标识，监听端据此忽略自己发出的通知
+PROCESS_TOKEN = uuid.uuid4().hex
+
+# 归档时每批移动的通知数量
+ARCHIVE_BATCH_SIZE = 500
+
+# 更新检查缓存文件
+UPDATE_CHECK_CACHE_FILE = DATA_DIR / "update_check_cache.json"
+# 增量补丁下载目录
+UPDATES_DIR = DATA_DIR / "updates"
+# 检查失败后的退避时间（秒）
+CHECK_BACKOFF_BASE = 60
+CHECK_BACKOFF_MAX = 6 * 60 * 60
+
+_check_cache_lock = threading.Lock()
+_http_session: Optional["requests.Session"] = None
+_http_session_lock = threading.Lock()
+
+# 未读通知数量缓存（进程内所有 UpdateService 共享），None 表示尚未统计
+_unread_lock = threading.Lock()
+_unread_count: Optional[int] = None
+
+
+def get_http_session() -> "requests.Session":
+    """获取共享的 HTTP 会话（保持连接复用）"""
+    import requests  # 导入较慢，首次联网时才导入
+
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            # 使用英文User-Agent，避免编码问题
+            session.headers["User-Agent"] = f"SafetyManager/{settings.APP_VERSION}"
+            _http_session = session
+        return _http_session
 
 
 class UpdateService:
@@ -22,57 +68,116 @@ class UpdateService:
         self.current_version = settings.APP_VERSION
         self.update_url = settings.UPDATE_CHECK_URL
 
-    def check_for_updates(self) -> Tuple[bool, Optional[dict]]:
+    def check_for_updates(self, force: bool = False) -> Tuple[bool, Optional[dict]]:
         """
         检查版本更新
 
         支持两种方式：
         1. 静态JSON文件：直接读取 version.json 文件内容
         2. API接口：调用后端API获取版本信息
+
+        请求带 If-None-Match / If-Modified-Since，未变化时服务器返回 304，直接使用本地缓存；
+        连续失败后按指数退避暂停请求，退避期间使用缓存结果（force=True 时忽略退避）
         """
-        try:
-            logger.info(f"检查版本更新: {self.update_url}")
+        import requests
 
-            # 使用英文User-Agent，避免编码问题
-            response = requests.get(
-                self.update_url,
-                timeout=10,
-                headers={'User-Agent': f'SafetyManager/{self.current_version}'}
-            )
+        cache = self._load_check_cache()
 
-            if response.status_code != 200:
-                logger.warning(f"检查更新失败: HTTP {response.status_code}")
-                return False, None
+        if not force and time.time() < cache.get("next_retry_at", 0):
+            logger.debug("检查更新处于退避期，使用缓存结果")
+            return self._evaluate_update_info(cache.get("body"))
 
-            # 确保响应是UTF-8编码
-            response.encoding = 'utf-8'
+        headers = {}
+        if cache.get("body") is not None:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
 
-            # 解析JSON响应
-            update_info = response.json()
-            latest_version = update_info.get('version')
+        try:
+            logger.info(f"检查版本更新: {self.update_url}")
+            response = get_http_session().get(self.update_url, timeout=(5, 10), headers=headers)
 
-            if not latest_version:
-                logger.warning("版本信息中未找到version字段")
+            if response.status_code == 304:
+                logger.debug("版本信息未变化 (304)")
+                update_info = cache.get("body")
+            elif response.status_code != 200:
+                logger.warning(f"检查更新失败: HTTP {response.status_code}")
+                self._record_check_failure(cache)
                 return False, None
-
-            # 比较版本号
-            if version.parse(latest_version) > version.parse(self.current_version):
-                logger.info(f"发现新版本: {latest_version} (当前版本: {self.current_version})")
-                return True, update_info
             else:
-                logger.info(f"当前已是最新版本: {self.current_version}")
-                return False, None
+                # 确保响应是UTF-8编码
+                response.encoding = 'utf-8'
+                # 解析JSON响应
+                update_info = response.json()
+                cache["body"] = update_info
+                cache["etag"] = response.headers.get("ETag")
+                cache["last_modified"] = response.headers.get("Last-Modified")
+
+            cache["failures"] = 0
+            cache["next_retry_at"] = 0
+            cache["checked_at"] = time.time()
+            self._save_check_cache(cache)
+            return self._evaluate_update_info(update_info)
 
         except requests.exceptions.Timeout:
             logger.warning("检查更新超时，请检查网络连接")
-            return False, None
         except requests.exceptions.ConnectionError:
             logger.warning("无法连接到更新服务器，请检查网络连接")
-            return False, None
         except Exception as e:
             logger.error(f"检查更新失败: {e}")
+        self._record_check_failure(cache)
+        return False, None
+
+    def _evaluate_update_info(self, update_info: Optional[dict]) -> Tuple[bool, Optional[dict]]:
+        """比较版本信息与当前版本"""
+        if not update_info:
+            return False, None
+
+        latest_version = update_info.get('version')
+        if not latest_version:
+            logger.warning("版本信息中未找到version字段")
             return False, None
 
+        # 比较版本号
+        if version.parse(latest_version) > version.parse(self.current_version):
+            logger.info(f"发现新版本: {latest_version} (当前版本: {self.current_version})")
+            return True, update_info
+        logger.info(f"当前已是最新版本: {self.current_version}")
+        return False, None
+
+    # ========== 检查结果缓存 ==========
+
+    def _load_check_cache(self) -> dict:
+        """读取检查缓存（ETag、Last-Modified、上次内容和退避状态），地址变化时作废"""
+        with _check_cache_lock:
+            try:
+                cache = json.loads(UPDATE_CHECK_CACHE_FILE.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                cache = {}
+        if cache.get("url") != self.update_url:
+            cache = {"url": self.update_url}
+        return cache
+
+    def _save_check_cache(self, cache: dict):
+        with _check_cache_lock:
+            try:
+                tmp_file = UPDATE_CHECK_CACHE_FILE.with_suffix(".tmp")
+                tmp_file.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+                tmp_file.replace(UPDATE_CHECK_CACHE_FILE)
+            except OSError as e:
+                logger.warning(f"保存更新检查缓存失败: {e}")
+
+    def _record_check_failure(self, cache: dict):
+        """记录一次失败并计算下次允许请求的时间（指数退避，带随机抖动）"""
+        failures = cache.get("failures", 0) + 1
+        delay = min(CHECK_BACKOFF_BASE * (2 ** (failures - 1)), CHECK_BACKOFF_MAX)
+        delay *= random.uniform(0.8, 1.2)
+        cache["failures"] = failures
+        cache["next_retry_at"] = time.time() + delay
+        self._save_check_cache(cache)
+        logger.info(f"检查更新连续失败 {failures} 次，{int(delay)} 秒内不再请求")
+
     def get_update_info(self, update_data: dict) -> str:
         """格式化更新信息"""
         info = f"发现新版本: {update_data.get('version')}\n\n"
@@ -88,31 +193,49 @@ class UpdateService:
         return info
 
     def download_update(self, download_url: str, save_path: str,
-                       progress_callback=None) -> Tuple[bool, str]:
-        """下载更新文件"""
-        try:
-            logger.info(f"开始下载更新: {download_url}")
-
-            response = requests.get(download_url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if progress_callback and total_size > 0:
-                            progress_callback(downloaded, total_size)
-
-            logger.info(f"更新下载完成: {save_path}")
-            return True, "下载成功"
+                       progress_callback=None, expected_sha256: str = None,
+                       connections: int = None,
+                       cancel_event: threading.Event = None) -> Tuple[bool, str]:
+        """
+        下载更新文件
 
-        except Exception as e:
-            logger.error(f"下载更新失败: {e}")
-            return False, f"下载失败: {str(e)}"
+        支持断点续传（中断后再次调用继续下载）和多连接分段下载，
+        expected_sha256 通常取自 version.json 的 sha256 字段
+        """
+        from client.services.update_downloader import UpdateDownloader
+
+        downloader = UpdateDownloader(
+            session=get_http_session(),
+            connections=connections or settings.UPDATE_DOWNLOAD_CONNECTIONS,
+            cancel_event=cancel_event,
+        )
+        return downloader.download(download_url, save_path, progress_callback, expected_sha256)
+
+    def get_delta_patch(self, update_info: dict) -> Optional[dict]:
+        """返回适用于当前版本的增量补丁信息，不支持或没有补丁时返回 None"""
+        if not update_info or not DeltaUpdater.is_supported():
+            return None
+        return DeltaUpdater.find_patch(update_info, self.current_version)
+
+    def apply_delta_update(self, update_info: dict, progress_callback=None,
+                           cancel_event: threading.Event = None) -> Tuple[bool, str]:
+        """下载并应用增量补丁（只包含变化的文件），完成后需重启程序"""
+        patch = self.get_delta_patch(update_info)
+        if not patch:
+            return False, "没有适用于当前版本的增量更新包"
+
+        patch_file = UPDATES_DIR / f"patch-{self.current_version}-{update_info.get('version')}.zip"
+        success, message = self.download_update(
+            patch["url"], str(patch_file), progress_callback,
+            expected_sha256=patch.get("sha256"), cancel_event=cancel_event
+        )
+        if not success:
+            return False, message
+
+        success, message = DeltaUpdater().apply_patch(str(patch_file))
+        if success:
+            patch_file.unlink(missing_ok=True)
+        return success, message
 
     # ========== 更新通知管理 ==========
 
@@ -133,7 +256,9 @@ class UpdateService:
                     created_at=datetime.utcnow()
                 )
                 db.add(notification)
+                self._publish(db, "create", 1)
                 db.commit()
+                self._adjust_unread(1)
                 logger.info(f"创建更新通知成功: {title}")
                 return True, "通知创建成功"
             finally:
@@ -143,13 +268,23 @@ class UpdateService:
             return False, f"创建通知失败: {str(e)}"
 
     def get_unread_count(self) -> int:
-        """获取未读通知数量"""
+        """获取未读通知数量（优先使用缓存，首次调用时统计）"""
+        with _unread_lock:
+            if _unread_count is not None:
+                return _unread_count
+        return self.refresh_unread_count()
+
+    def refresh_unread_count(self) -> int:
+        """重新统计未读通知数量并更新缓存"""
+        global _unread_count
         try:
             db = SessionLocal()
             try:
                 count = db.query(UpdateNotification).filter(
                     UpdateNotification.is_read == False
                 ).count()
+                with _unread_lock:
+                    _unread_count = count
                 return count
             finally:
                 db.close()
@@ -157,20 +292,94 @@ class UpdateService:
             logger.error(f"获取未读通知数量失败: {e}")
             return 0
 
+    def handle_notify_event(self, payload: Optional[str]) -> int:
+        """
+        处理其他客户端发出的通知变更事件，返回最新未读数量
+
+        payload 带有增量时直接调整缓存，无法解析或缓存尚未建立时重新统计
+        """
+        try:
+            event = json.loads(payload) if payload else {}
+        except ValueError:
+            event = {}
+
+        if event.get("source") == PROCESS_TOKEN:
+            # 本进程发出的变更，缓存已在写入时更新
+            return self.get_unread_count()
+
+        delta = event.get("delta")
+        if event.get("op") == "clear" or not isinstance(delta, int):
+            return self.refresh_unread_count()
+
+        with _unread_lock:
+            cached = _unread_count
+        if cached is None:
+            return self.refresh_unread_count()
+        self._adjust_unread(delta)
+        return self.get_unread_count()
+
+    @staticmethod
+    def _adjust_unread(delta: int):
+        """增量调整未读数量缓存"""
+        global _unread_count
+        with _unread_lock:
+            if _unread_count is not None:
+                _unread_count = max(0, _unread_count + delta)
+
+    @staticmethod
+    def _publish(db, op: str, delta: Optional[int]):
+        """在当前事务中发出变更通知（仅 PostgreSQL，随事务提交送达）"""
+        if db.bind.dialect.name != "postgresql":
+            return
+        payload = json.dumps({"op": op, "delta": delta, "source": PROCESS_TOKEN})
+        db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                   {"channel": NOTIFY_CHANNEL, "payload": payload})
+
     def get_all_notifications(self, limit: int = 50) -> List[UpdateNotification]:
         """获取所有通知"""
+        notifications, _ = self.get_notifications_page(limit=limit)
+        return notifications
+
+    def get_notifications_page(self, cursor: Optional[Tuple[datetime, int]] = None,
+                               limit: int = 50, notification_type: str = None
+                               ) -> Tuple[List[UpdateNotification], Optional[Tuple[datetime, int]]]:
+        """
+        按时间倒序分页获取通知（键集分页）
+
+        cursor 为上一页最后一条通知的 (created_at, id)，返回 (通知列表, 下一页游标)，
+        没有更多通知时下一页游标为 None
+        """
         try:
             db = SessionLocal()
             try:
-                notifications = db.query(UpdateNotification).order_by(
-                    UpdateNotification.created_at.desc()
-                ).limit(limit).all()
-                return notifications
+                query = db.query(UpdateNotification)
+                if notification_type:
+                    query = query.filter(UpdateNotification.type == notification_type)
+                if cursor:
+                    created_at, notification_id = cursor
+                    query = query.filter(or_(
+                        UpdateNotification.created_at < created_at,
+                        and_(UpdateNotification.created_at == created_at,
+                             UpdateNotification.id < notification_id),
+                    ))
+
+                # 多取一条用于判断是否还有下一页
+                notifications = query.order_by(
+                    UpdateNotification.created_at.desc(),
+                    UpdateNotification.id.desc()
+                ).limit(limit + 1).all()
+
+                next_cursor = None
+                if len(notifications) > limit:
+                    notifications = notifications[:limit]
+                    last = notifications[-1]
+                    next_cursor = (last.created_at, last.id)
+                return notifications, next_cursor
             finally:
                 db.close()
         except Exception as e:
             logger.error(f"获取通知列表失败: {e}")
-            return []
+            return [], None
 
     def mark_as_read(self, notification_id: int) -> Tuple[bool, str]:
         """标记通知为已读"""
@@ -184,8 +393,13 @@ class UpdateService:
                 if not notification:
                     return False, "通知不存在"
 
+                was_unread = not notification.is_read
                 notification.is_read = True
+                if was_unread:
+                    self._publish(db, "read", -1)
                 db.commit()
+                if was_unread:
+                    self._adjust_unread(-1)
                 logger.info(f"通知已标记为已读: {notification_id}")
                 return True, "标记成功"
             finally:
@@ -196,13 +410,17 @@ class UpdateService:
 
     def mark_all_as_read(self) -> Tuple[bool, str]:
         """标记所有通知为已读"""
+        global _unread_count
         try:
             db = SessionLocal()
             try:
-                db.query(UpdateNotification).filter(
+                updated = db.query(UpdateNotification).filter(
                     UpdateNotification.is_read == False
                 ).update({"is_read": True})
+                self._publish(db, "read_all", -updated)
                 db.commit()
+                with _unread_lock:
+                    _unread_count = 0
                 logger.info("所有通知已标记为已读")
                 return True, "标记成功"
             finally:
@@ -213,15 +431,73 @@ class UpdateService:
 
     def clear_all_notifications(self) -> Tuple[bool, str]:
         """清空所有通知"""
+        global _unread_count
         try:
             db = SessionLocal()
             try:
                 db.query(UpdateNotification).delete()
+                self._publish(db, "clear", None)
                 db.commit()
+                with _unread_lock:
+                    _unread_count = 0
                 logger.info("所有通知已清空")
                 return True, "清空成功"
             finally:
                 db.close()
         except Exception as e:
             logger.error(f"清空通知失败: {e}")
-            return False, f"清空失败: {str(e)}"
\ No newline at end of file
+            return False, f"清空失败: {str(e)}"
+
+    def archive_read_notifications(self, older_than_days: int = None) -> Tuple[bool, str, int]:
+        """
+        将超过保留期的已读通知移入归档表
+
+        Args:
+            older_than_days: 保留天数，默认使用 NOTIFICATION_RETENTION_DAYS
+
+        Returns:
+            (成功, 消息, 归档数量)
+        """
+        if older_than_days is None:
+            older_than_days = settings.NOTIFICATION_RETENTION_DAYS
+        if older_than_days <= 0:
+            return True, "未启用通知归档", 0
+
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        archived = 0
+        try:
+            db = SessionLocal()
+            try:
+                while True:
+                    batch = db.query(UpdateNotification).filter(
+                        UpdateNotification.is_read == True,
+                        UpdateNotification.created_at < cutoff
+                    ).order_by(UpdateNotification.created_at).limit(ARCHIVE_BATCH_SIZE).all()
+                    if not batch:
+                        break
+
+                    now = datetime.utcnow()
+                    db.add_all([
+                        UpdateNotificationArchive(
+                            id=n.id, type=n.type, title=n.title, message=n.message,
+                            version=n.version, regulation_id=n.regulation_id,
+                            is_read=n.is_read, created_at=n.created_at, archived_at=now
+                        )
+                        for n in batch
+                    ])
+                    db.query(UpdateNotification).filter(
+                        UpdateNotification.id.in_([n.id for n in batch])
+                    ).delete(synchronize_session=False)
+                    # 每批单独提交，避免长时间占用写锁
+                    db.commit()
+                    db.expunge_all()
+                    archived += len(batch)
+
+                if archived:
+                    logger.info(f"已归档 {archived} 条已读通知")
+                return True, f"已归档 {archived} 条通知", archived
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"归档通知失败: {e}")
+            return False, f"归档失败: {str(e)}", archived
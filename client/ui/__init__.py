@@ -1,18 +1,21 @@
 """
 UI界面模块
+
+按需导入：访问 client.ui.MainWindow 等属性时才导入对应对话框模块，
+启动时只加载登录对话框，主窗口和其他对话框在首次使用时加载
 """
-from .main_window import MainWindow
-from .login_dialog import LoginDialog
-from .regulation_dialog import RegulationDialog
-from .regulation_detail_dialog import RegulationDetailDialog
-from .code_manager_dialog import CodeManagerDialog
-from .regulation_selector_dialog import RegulationSelectorDialog
+from client.lazy_import import make_lazy_getattr
+
+# 导出名称 -> 子模块
+_LAZY_ATTRS = {
+    "MainWindow": ".main_window",
+    "LoginDialog": ".login_dialog",
+    "RegulationDialog": ".regulation_dialog",
+    "RegulationDetailDialog": ".regulation_detail_dialog",
+    "CodeManagerDialog": ".code_manager_dialog",
+    "RegulationSelectorDialog": ".regulation_selector_dialog",
+}
+
+__all__ = list(_LAZY_ATTRS)
 
-__all__ = [
-    "MainWindow",
-    "LoginDialog",
-    "RegulationDialog",
-    "RegulationDetailDialog",
-    "CodeManagerDialog",
-    "RegulationSelectorDialog",
-]
\ No newline at end of file
+__getattr__, __dir__ = make_lazy_getattr(__name__, _LAZY_ATTRS)
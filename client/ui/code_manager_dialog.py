@@ -9,13 +9,13 @@ from PyQt6.QtWidgets import (
     QHeaderView, QComboBox, QLabel
 )
 from PyQt6.QtCore import Qt
-import subprocess
-import platform
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import SessionLocal, CodeFile, Regulation
+from client.models import CodeFile, Regulation, session_scope
 from client.services import RegulationService
+from client.ui.document_viewer import open_document
+from client.ui.upload_worker import UploadWorker
 
 
 class CodeManagerDialog(QDialog):
@@ -25,7 +25,7 @@ class CodeManagerDialog(QDialog):
         super().__init__(parent)
         self.user_id = user_id
         self.regulation_service = RegulationService()
-        self.db = SessionLocal()
+        self.upload_worker = None
         self.init_ui()
         self.load_codes()
 
@@ -107,9 +107,10 @@ class CodeManagerDialog(QDialog):
         # 暂时断开信号，避免加载时触发编辑事件
         self.code_table.itemChanged.disconnect(self.on_item_changed)
 
-        codes = self.db.query(CodeFile).order_by(
-            CodeFile.created_at.desc()
-        ).all()
+        with session_scope() as db:
+            codes = db.query(CodeFile).order_by(
+                CodeFile.created_at.desc()
+            ).all()
 
         self.code_table.setRowCount(len(codes))
 
@@ -162,10 +163,16 @@ class CodeManagerDialog(QDialog):
         if not file_path:
             return
 
-        success, message, _ = self.regulation_service.add_code_file(
-            regulation_id, file_path, None, None, self.user_id
+        self.upload_worker = UploadWorker(
+            self.regulation_service.add_code_file,
+            regulation_id, file_path, created_by=self.user_id
         )
+        self.upload_worker.finished.connect(self.on_upload_finished)
+        self.upload_worker.start_with_progress(self, f"正在上传 {Path(file_path).name}...")
 
+    def on_upload_finished(self, success: bool, message: str):
+        """上传完成"""
+        self.upload_worker = None
         if success:
             QMessageBox.information(self, "成功", message)
             self.load_codes()
@@ -182,21 +189,12 @@ class CodeManagerDialog(QDialog):
             return
 
         code_id = int(self.code_table.item(row, 0).text())
-        code = self.db.query(CodeFile).filter(CodeFile.id == code_id).first()
-
-        if not code:
-            return
-
-        try:
-            if col == 2:  # 版本列
-                code.version = item.text().strip() or None
-            elif col == 3:  # 说明列
-                code.description = item.text().strip() or None
-
-            self.db.commit()
-        except Exception as e:
-            self.db.rollback()
-            QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
+        field = "version" if col == 2 else "description"  # 版本列 / 说明列
+        success, message = self.regulation_service.update_code_file(
+            code_id, **{field: item.text().strip() or None}
+        )
+        if not success:
+            QMessageBox.critical(self, "错误", f"保存失败: {message}")
 
     def on_cell_double_clicked(self, row, col):
         """双击单元格时的处理"""
@@ -214,7 +212,8 @@ class CodeManagerDialog(QDialog):
         row = self.code_table.currentRow()
         code_id = int(self.code_table.item(row, 0).text())
 
-        code = self.db.query(CodeFile).filter(CodeFile.id == code_id).first()
+        with session_scope() as db:
+            code = db.query(CodeFile).filter(CodeFile.id == code_id).first()
         if not code:
             QMessageBox.critical(self, "错误", "代码文件不存在")
             return
@@ -224,15 +223,7 @@ class CodeManagerDialog(QDialog):
             QMessageBox.critical(self, "错误", "文件不存在")
             return
 
-        try:
-            if platform.system() == 'Windows':
-                subprocess.run(['start', '', str(file_path)], shell=True, check=True)
-            elif platform.system() == 'Darwin':  # macOS
-                subprocess.run(['open', str(file_path)], check=True)
-            else:  # Linux
-                subprocess.run(['xdg-open', str(file_path)], check=True)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"无法打开文件: {str(e)}")
+        open_document(self, str(file_path), code.file_name)
 
     def delete_code(self):
         """删除代码"""
@@ -260,8 +251,3 @@ class CodeManagerDialog(QDialog):
             self.load_codes()
         else:
             QMessageBox.critical(self, "错误", message)
-
-    def closeEvent(self, event):
-        """关闭事件"""
-        self.db.close()
-        super().closeEvent(event)
@@ -0,0 +1,179 @@
+"""
+法规详情数据读取和预读取
+
+主窗口选中某行或鼠标在某行停留时，在最低优先级的后台线程中预先读取该行及相邻行法规的
+基本信息、文档列表、参数和参数图片，打开法规详情时直接命中缓存
+"""
+import sys
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from loguru import logger
+from PyQt6.QtCore import QObject, Qt, QThread, QTimer
+from PyQt6.QtGui import QImage
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.models import remove_session
+from client.services import RegulationService
+from shared.config import settings
+
+
+# 参数表各列对应的参数字段
+PARAMETER_COLUMNS = (
+    "category", "parameter_name", "default_value", "lower_limit", "upper_limit",
+    "unit", "coefficient", "protocol_bit", "remark",
+)
+# 参数表中图片的显示尺寸
+THUMBNAIL_SIZE = 120
+# 选中行变化后等待多久开始预读取（毫秒），按住方向键连续移动时不逐行读取
+PREFETCH_DELAY_MS = 150
+# 除选中行外，再预读取下方和上方各几行
+PREFETCH_NEIGHBORS = 1
+
+# 最近读取的参数和图片 {法规ID: (参数列表, (各行的值, 图片))}，按 LRU 保留 DETAIL_PREFETCH_CACHE_SIZE 个法规。
+# 参数列表与 data_cache 返回的是同一个对象时结果仍然有效：参数修改、同步或缓存过期后重新读取
+_parameter_rows_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_parameter_rows_lock = threading.Lock()
+
+
+def load_parameter_rows(regulation_service: RegulationService, regulation_id: int,
+                        is_cancelled: Optional[Callable[[], bool]] = None) -> Optional[tuple]:
+    """
+    读取法规当前参数，并读取和缩放单元格中的图片（在工作线程中调用）
+
+    Args:
+        is_cancelled: 返回 True 时中止读取并返回 None（预读取被取消）
+
+    Returns:
+        (各行按列顺序的值, {(行, 列): (原图, 缩略图)})，图片为 QImage，文件丢失或无法读取的不包含
+    """
+    params = regulation_service.get_parameters(regulation_id)
+    with _parameter_rows_lock:
+        cached = _parameter_rows_cache.get(regulation_id)
+        if cached is not None and cached[0] is params:
+            _parameter_rows_cache.move_to_end(regulation_id)
+            return cached[1]
+
+    rows, images = [], {}
+    for row, param in enumerate(params):
+        if is_cancelled and is_cancelled():
+            return None
+        values = [getattr(param, field) or "" for field in PARAMETER_COLUMNS]
+        for col, value in enumerate(values):
+            if value.startswith("IMAGE:"):
+                image = QImage(value[6:])  # 去掉"IMAGE:"前缀
+                if not image.isNull():
+                    images[(row, col)] = (image, image.scaled(
+                        THUMBNAIL_SIZE, THUMBNAIL_SIZE,
+                        Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation
+                    ))
+        rows.append(values)
+
+    result = rows, images
+    with _parameter_rows_lock:
+        _parameter_rows_cache[regulation_id] = (params, result)
+        _parameter_rows_cache.move_to_end(regulation_id)
+        while len(_parameter_rows_cache) > max(1, settings.DETAIL_PREFETCH_CACHE_SIZE):
+            _parameter_rows_cache.popitem(last=False)
+    return result
+
+
+class PrefetchWorker(QThread):
+    """依次预读取法规详情，cancel() 后在当前法规（或参数的当前行）读完时停止"""
+
+    def __init__(self, regulation_service: RegulationService, regulation_ids: List[int]):
+        super().__init__()
+        self.regulation_service = regulation_service
+        self.regulation_ids = regulation_ids
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self):
+        """读取结果写入 data_cache 和参数图片缓存，不返回数据"""
+        fetched = 0
+        try:
+            for regulation_id in self.regulation_ids:
+                if self.is_cancelled():
+                    break
+                if self.regulation_service.get_regulation(regulation_id) is None:
+                    continue
+                self.regulation_service.get_documents(regulation_id)
+                if load_parameter_rows(self.regulation_service, regulation_id, self.is_cancelled) is not None:
+                    fetched += 1
+        except Exception as e:
+            logger.warning(f"预读取法规详情失败: {e}")
+        finally:
+            # 工作线程的会话随线程结束释放
+            remove_session()
+        logger.debug(f"预读取法规详情 {fetched}/{len(self.regulation_ids)}{'（已取消）' if self.is_cancelled() else ''}")
+
+
+class DetailPrefetcher(QObject):
+    """
+    法规详情预读取
+
+    同一时间只进行一次预读取：新的请求取消尚未完成的读取，
+    并延迟 PREFETCH_DELAY_MS 开始，短时间内的多次请求只执行最后一次
+    """
+
+    def __init__(self, regulation_service: RegulationService, enabled: bool = True, parent: QObject = None):
+        super().__init__(parent)
+        self.regulation_service = regulation_service
+        self.enabled = enabled
+        self._requested: List[int] = []
+        self._worker: Optional[PrefetchWorker] = None
+        self._workers = set()  # 包括已取消、还未结束的线程
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(PREFETCH_DELAY_MS)
+        self._timer.timeout.connect(self._start)
+
+    def prefetch(self, regulation_ids: List[int]):
+        """按顺序预读取这些法规（与正在进行的请求相同时忽略）"""
+        if not self.enabled or regulation_ids == self._requested:
+            return
+        self.cancel()
+        self._requested = list(regulation_ids)
+        if self._requested:
+            self._timer.start()
+
+    def cancel(self):
+        """取消尚未开始和正在进行的预读取"""
+        self._timer.stop()
+        self._requested = []
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+
+    def is_active(self) -> bool:
+        """是否有等待开始或正在运行的预读取"""
+        return self._timer.isActive() or bool(self._workers)
+
+    def stop(self):
+        """取消并等待预读取线程结束（关闭主窗口时调用）"""
+        self.cancel()
+        for worker in list(self._workers):
+            worker.wait()
+
+    def _start(self):
+        worker = PrefetchWorker(self.regulation_service, self._requested)
+        self._worker = worker
+        self._workers.add(worker)
+        worker.finished.connect(lambda: self._on_finished(worker))
+        # 最低优先级，不与界面线程和打开详情时的读取争抢
+        worker.start(QThread.Priority.LowestPriority)
+
+    def _on_finished(self, worker: PrefetchWorker):
+        self._workers.discard(worker)
+        if worker is self._worker:
+            # 完成后同样的请求可以再次发起（缓存过期后重新读取）
+            self._worker = None
+            self._requested = []
@@ -0,0 +1,535 @@
+"""
+内置文档查看器
+PDF 按页渲染（只渲染可见页，已渲染页按 LRU 缓存），代码文件按可见行增量高亮
+"""
+import sys
+import bisect
+import shutil
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Optional
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit,
+    QScrollArea, QWidget, QPlainTextEdit, QMessageBox
+)
+from PyQt6.QtCore import Qt, QSize, QTimer
+from PyQt6.QtGui import QPixmap, QFont, QColor, QTextCharFormat, QTextLayout
+from loguru import logger
+
+try:
+    from PyQt6.QtPdf import QPdfDocument
+    PDF_VIEWER_SUPPORT = True
+except ImportError:
+    PDF_VIEWER_SUPPORT = False
+    logger.warning("PyQt6.QtPdf 不可用，PDF 将使用系统默认程序打开")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+
+# 已渲染页缓存数量（按页和缩放比例）
+PAGE_CACHE_SIZE = 12
+# 保留提取文本的文档数量，再次打开同一文档时查找不必重新提取
+TEXT_CACHE_DOCUMENTS = 8
+# 可见区域上下额外预渲染的距离（像素）
+PRERENDER_MARGIN = 600
+PAGE_SPACING = 12
+ZOOM_LEVELS = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0)
+DEFAULT_ZOOM_INDEX = 2
+
+CODE_EXTENSIONS = {".c", ".h", ".cpp", ".hpp", ".py", ".java", ".js", ".ts", ".go", ".rs", ".txt"}
+# 代码高亮时可见区域之后额外高亮的行数
+HIGHLIGHT_LOOKAHEAD = 100
+
+# {(文件路径, 修改时间): {页码: 文本}}
+_text_cache: "OrderedDict[tuple, Dict[int, str]]" = OrderedDict()
+
+
+def open_with_system(file_path: Path, file_name: Optional[str] = None):
+    """
+    使用系统默认程序打开文件
+
+    指定 file_name 时（存储区中的文件以哈希命名）先复制到临时目录并按原文件名打开，
+    外部程序显示原文件名，在外部程序中修改也不会改动存储区中的内容
+    """
+    file_path = Path(file_path)
+    if file_name and file_name != file_path.name:
+        view_file = Path(tempfile.gettempdir()) / "SafetyManager" / file_path.stem / Path(file_name).name
+        if not view_file.exists():
+            view_file.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(file_path, view_file)
+        file_path = view_file
+    if platform.system() == 'Windows':
+        subprocess.run(['start', '', str(file_path)], shell=True, check=True)
+    elif platform.system() == 'Darwin':  # macOS
+        subprocess.run(['open', str(file_path)], check=True)
+    else:  # Linux
+        subprocess.run(['xdg-open', str(file_path)], check=True)
+
+
+def open_document(parent, file_path: str, file_name: Optional[str] = None):
+    """
+    查看文档：PDF 和代码文件使用内置查看器，其他格式使用系统默认程序
+
+    查看器为非模态窗口，可以同时打开多个
+
+    Args:
+        file_name: 显示的文件名（记录的 file_name），默认为路径中的文件名
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        QMessageBox.warning(parent, "警告", "文件不存在")
+        return
+
+    suffix = file_path.suffix.lower()
+    try:
+        if suffix == ".pdf" and PDF_VIEWER_SUPPORT:
+            viewer = PdfViewerDialog(file_path, parent, file_name)
+        elif suffix in CODE_EXTENSIONS:
+            viewer = CodeViewerDialog(file_path, parent, file_name)
+        else:
+            open_with_system(file_path, file_name)
+            return
+    except Exception as e:
+        logger.error(f"内置查看器打开失败，改用系统程序: {e}")
+        try:
+            open_with_system(file_path, file_name)
+        except Exception as e:
+            QMessageBox.critical(parent, "错误", f"无法打开文件: {str(e)}")
+        return
+
+    viewer.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    viewer.show()
+
+
+class PdfViewerDialog(QDialog):
+    """
+    PDF 查看器
+
+    每页先放一个按页面尺寸占位的标签，滚动时只渲染可见（及附近）的页，
+    渲染结果按 LRU 缓存 PAGE_CACHE_SIZE 页，淘汰的页清空图像；
+    查找时按需提取每页文本并缓存
+    """
+
+    def __init__(self, file_path: Path, parent=None, file_name: Optional[str] = None):
+        super().__init__(parent)
+        self.file_path = Path(file_path)
+        self.file_name = file_name or self.file_path.name
+        self.document = QPdfDocument(self)
+        error = self.document.load(str(self.file_path))
+        if error != QPdfDocument.Error.None_:
+            raise IOError(f"PDF 加载失败: {error.name}")
+
+        self.zoom_index = DEFAULT_ZOOM_INDEX
+        self.page_labels = []
+        self.page_tops = []  # 每页在容器中的起始位置，用于二分查找可见页
+        self.page_cache: "OrderedDict[tuple, QPixmap]" = OrderedDict()
+        self.search_term = ""
+        self.search_page = -1
+        self.pending_page = None  # 缩放后等待定位的页
+
+        stat = self.file_path.stat()
+        text_key = (str(self.file_path), stat.st_mtime_ns)
+        self.page_texts = _text_cache.pop(text_key, {})
+        _text_cache[text_key] = self.page_texts
+        while len(_text_cache) > TEXT_CACHE_DOCUMENTS:
+            _text_cache.popitem(last=False)
+
+        self.init_ui()
+        self.layout_pages()
+
+    def init_ui(self):
+        """初始化界面"""
+        self.setWindowTitle(f"查看文档 - {self.file_name}")
+        self.resize(900, 1000)
+        self.setWindowFlag(Qt.WindowType.WindowMaximizeButtonHint, True)
+
+        layout = QVBoxLayout(self)
+
+        toolbar = QHBoxLayout()
+        zoom_out_btn = QPushButton("缩小")
+        zoom_out_btn.clicked.connect(lambda: self.set_zoom(self.zoom_index - 1))
+        toolbar.addWidget(zoom_out_btn)
+
+        zoom_in_btn = QPushButton("放大")
+        zoom_in_btn.clicked.connect(lambda: self.set_zoom(self.zoom_index + 1))
+        toolbar.addWidget(zoom_in_btn)
+
+        self.page_label = QLabel()
+        toolbar.addWidget(self.page_label)
+        toolbar.addStretch()
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("在文档中查找...")
+        self.search_input.returnPressed.connect(self.find_next)
+        toolbar.addWidget(self.search_input)
+
+        find_btn = QPushButton("查找下一个")
+        find_btn.clicked.connect(self.find_next)
+        toolbar.addWidget(find_btn)
+
+        external_btn = QPushButton("外部程序打开")
+        external_btn.clicked.connect(self.open_external)
+        toolbar.addWidget(external_btn)
+
+        layout.addLayout(toolbar)
+
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setStyleSheet("QScrollArea { background-color: #808080; }")
+        container = QWidget()
+        self.pages_layout = QVBoxLayout(container)
+        self.pages_layout.setSpacing(PAGE_SPACING)
+        self.pages_layout.setAlignment(Qt.AlignmentFlag.AlignHCenter)
+        self.scroll_area.setWidget(container)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.render_visible_pages)
+        self.scroll_area.verticalScrollBar().rangeChanged.connect(self.on_scroll_range_changed)
+        layout.addWidget(self.scroll_area)
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #666;")
+        layout.addWidget(self.status_label)
+
+    def page_pixel_size(self, page: int) -> QSize:
+        """页面在当前缩放比例下的显示尺寸"""
+        scale = ZOOM_LEVELS[self.zoom_index] * self.logicalDpiY() / 72.0
+        size = self.document.pagePointSize(page)
+        return QSize(max(1, int(size.width() * scale)), max(1, int(size.height() * scale)))
+
+    def layout_pages(self):
+        """按页面尺寸放置占位标签（不渲染）"""
+        if not self.page_labels:
+            for page in range(self.document.pageCount()):
+                label = QLabel()
+                label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                label.setStyleSheet("background-color: white;")
+                self.pages_layout.addWidget(label)
+                self.page_labels.append(label)
+
+        self.page_tops = []
+        top = self.pages_layout.contentsMargins().top()
+        for page, label in enumerate(self.page_labels):
+            size = self.page_pixel_size(page)
+            label.setFixedSize(size)
+            label.clear()
+            self.page_tops.append(top)
+            top += size.height() + PAGE_SPACING
+
+        # 等布局生效后再计算可见页
+        QTimer.singleShot(0, self.render_visible_pages)
+
+    def visible_pages(self, margin: int = 0) -> range:
+        if not self.page_tops:
+            return range(0)
+        scroll_bar = self.scroll_area.verticalScrollBar()
+        top = scroll_bar.value() - margin
+        bottom = scroll_bar.value() + self.scroll_area.viewport().height() + margin
+        first = max(0, bisect.bisect_right(self.page_tops, top) - 1)
+        last = max(first, bisect.bisect_right(self.page_tops, bottom) - 1)
+        return range(first, min(last, len(self.page_tops) - 1) + 1)
+
+    def render_visible_pages(self):
+        """渲染可见及附近的页，其余页保持占位"""
+        pages = self.visible_pages(PRERENDER_MARGIN)
+        for page in pages:
+            self.page_labels[page].setPixmap(self.render_page(page))
+
+        current = self.visible_pages()
+        if current:
+            self.page_label.setText(f"第 {current.start + 1} / {self.document.pageCount()} 页")
+
+    def render_page(self, page: int) -> QPixmap:
+        """渲染一页（命中缓存时直接返回）"""
+        key = (page, self.zoom_index)
+        pixmap = self.page_cache.get(key)
+        if pixmap is not None:
+            self.page_cache.move_to_end(key)
+            return pixmap
+
+        size = self.page_pixel_size(page)
+        ratio = self.devicePixelRatioF()
+        image = self.document.render(page, QSize(int(size.width() * ratio), int(size.height() * ratio)))
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(ratio)
+
+        self.page_cache[key] = pixmap
+        while len(self.page_cache) > PAGE_CACHE_SIZE:
+            (evicted_page, _), _ = self.page_cache.popitem(last=False)
+            if evicted_page not in self.visible_pages(PRERENDER_MARGIN):
+                self.page_labels[evicted_page].clear()
+        return pixmap
+
+    def set_zoom(self, zoom_index: int):
+        """切换缩放比例，保持当前页"""
+        zoom_index = max(0, min(zoom_index, len(ZOOM_LEVELS) - 1))
+        if zoom_index == self.zoom_index:
+            return
+        current = self.visible_pages()
+        self.zoom_index = zoom_index
+        self.page_cache.clear()
+        self.layout_pages()
+        if current:
+            # 滚动范围在布局更新后才变化，届时再定位
+            self.pending_page = current.start
+            self.go_to_page(current.start)
+        self.status_label.setText(f"缩放: {int(ZOOM_LEVELS[zoom_index] * 100)}%")
+
+    def go_to_page(self, page: int):
+        scroll_bar = self.scroll_area.verticalScrollBar()
+        scroll_bar.setValue(self.page_tops[page])
+        if scroll_bar.value() == self.page_tops[page]:
+            self.pending_page = None
+        self.render_visible_pages()
+
+    def on_scroll_range_changed(self, minimum: int, maximum: int):
+        if self.pending_page is not None:
+            self.go_to_page(self.pending_page)
+
+    def page_text(self, page: int) -> str:
+        """页面文本（按需提取并缓存）"""
+        text = self.page_texts.get(page)
+        if text is None:
+            text = self.document.getAllText(page).text().casefold()
+            self.page_texts[page] = text
+        return text
+
+    def find_next(self):
+        """从当前结果的下一页开始查找，到末尾后从头继续"""
+        term = self.search_input.text().strip().casefold()
+        if not term:
+            return
+
+        page_count = self.document.pageCount()
+        if term != self.search_term:
+            self.search_term = term
+            current = self.visible_pages()
+            start = current.start if current else 0
+        else:
+            start = self.search_page + 1
+
+        for offset in range(page_count):
+            page = (start + offset) % page_count
+            count = self.page_text(page).count(term)
+            if count:
+                self.search_page = page
+                self.go_to_page(page)
+                self.status_label.setText(f"第 {page + 1} 页找到 {count} 处")
+                return
+
+        self.search_page = -1
+        self.status_label.setText(f"未找到: {self.search_input.text().strip()}")
+
+    def open_external(self):
+        try:
+            open_with_system(self.file_path, self.file_name)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法打开文件: {str(e)}")
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.render_visible_pages()
+
+    def closeEvent(self, event):
+        self.page_cache.clear()
+        self.document.close()
+        super().closeEvent(event)
+
+
+class LazyHighlighter:
+    """
+    按需代码高亮
+
+    Pygments 对全文的词法分析是一个生成器，只消费到可见行之后 HIGHLIGHT_LOOKAHEAD 行为止；
+    多行注释、字符串的状态由生成器保持，结果与整体高亮一致。
+    格式直接设置到文本块的布局上（与 QSyntaxHighlighter 的做法相同），文本只读
+    """
+
+    def __init__(self, editor: QPlainTextEdit, lexer, style_name: str = "default"):
+        from pygments.styles import get_style_by_name
+
+        self.editor = editor
+        self.style = get_style_by_name(style_name)
+        self.formats: Dict[object, Optional[QTextCharFormat]] = {}
+        self.tokens = lexer.get_tokens_unprocessed(editor.toPlainText())
+        self.block = editor.document().firstBlock()
+        self.ranges = []
+        self.pending = None  # 跨越当前批次末尾的词法单元
+
+        editor.verticalScrollBar().valueChanged.connect(self.highlight_visible)
+
+    @property
+    def highlighted_blocks(self) -> int:
+        """已高亮的行数"""
+        if self.tokens is None:
+            return self.editor.document().blockCount()
+        return self.block.blockNumber()
+
+    def highlight_visible(self):
+        """高亮到可见区域之后 HIGHLIGHT_LOOKAHEAD 行"""
+        viewport = self.editor.viewport()
+        last_visible = self.editor.cursorForPosition(viewport.rect().bottomLeft()).blockNumber()
+        self.highlight_until(last_visible + HIGHLIGHT_LOOKAHEAD)
+
+    def highlight_until(self, block_number: int):
+        while self.tokens is not None and self.block.blockNumber() <= block_number:
+            if self.pending is not None:
+                index, token_type, value = self.pending
+                self.pending = None
+            else:
+                try:
+                    index, token_type, value = next(self.tokens)
+                except StopIteration:
+                    self.flush_block()
+                    self.tokens = None
+                    break
+
+            char_format = self.token_format(token_type)
+            end = index + len(value)
+            while index < end and self.block.isValid():
+                block_start = self.block.position()
+                block_end = block_start + self.block.length()
+                if index >= block_end:
+                    self.flush_block()
+                    if self.block.blockNumber() > block_number:
+                        # 剩余部分留到下次
+                        self.pending = (index, token_type, value[len(value) - (end - index):])
+                        break
+                    continue
+                piece_end = min(end, block_end)
+                if char_format is not None:
+                    format_range = QTextLayout.FormatRange()
+                    format_range.start = index - block_start
+                    format_range.length = piece_end - index
+                    format_range.format = char_format
+                    self.ranges.append(format_range)
+                index = piece_end
+
+            if not self.block.isValid():
+                self.tokens = None
+
+    def flush_block(self):
+        """把当前块收集到的格式应用到布局，并前进到下一块"""
+        if not self.block.isValid():
+            return
+        if self.ranges:
+            self.block.layout().setFormats(self.ranges)
+            self.editor.document().markContentsDirty(self.block.position(), self.block.length())
+        self.ranges = []
+        self.block = self.block.next()
+
+    def token_format(self, token_type) -> Optional[QTextCharFormat]:
+        if token_type in self.formats:
+            return self.formats[token_type]
+
+        style = self.style.style_for_token(token_type)
+        char_format = None
+        if style["color"] or style["bold"] or style["italic"]:
+            char_format = QTextCharFormat()
+            if style["color"]:
+                char_format.setForeground(QColor(f"#{style['color']}"))
+            if style["bold"]:
+                char_format.setFontWeight(QFont.Weight.Bold)
+            if style["italic"]:
+                char_format.setFontItalic(True)
+        self.formats[token_type] = char_format
+        return char_format
+
+
+class CodeViewerDialog(QDialog):
+    """代码查看器（只读，按可见行增量高亮）"""
+
+    def __init__(self, file_path: Path, parent=None, file_name: Optional[str] = None):
+        super().__init__(parent)
+        self.file_path = Path(file_path)
+        self.file_name = file_name or self.file_path.name
+        self.highlighter = None
+        self.init_ui()
+        self.load_file()
+
+    def init_ui(self):
+        """初始化界面"""
+        self.setWindowTitle(f"查看代码 - {self.file_name}")
+        self.resize(1000, 800)
+        self.setWindowFlag(Qt.WindowType.WindowMaximizeButtonHint, True)
+
+        layout = QVBoxLayout(self)
+
+        toolbar = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("查找...")
+        self.search_input.returnPressed.connect(self.find_next)
+        toolbar.addWidget(self.search_input)
+
+        find_btn = QPushButton("查找下一个")
+        find_btn.clicked.connect(self.find_next)
+        toolbar.addWidget(find_btn)
+        toolbar.addStretch()
+
+        external_btn = QPushButton("外部程序打开")
+        external_btn.clicked.connect(self.open_external)
+        toolbar.addWidget(external_btn)
+        layout.addLayout(toolbar)
+
+        self.editor = QPlainTextEdit()
+        self.editor.setReadOnly(True)
+        self.editor.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        font = QFont("Consolas")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(10)
+        self.editor.setFont(font)
+        layout.addWidget(self.editor)
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #666;")
+        layout.addWidget(self.status_label)
+
+    def load_file(self):
+        """读取文件（UTF-8 失败时按 GBK），按文件名选择语法"""
+        from pygments.lexers import get_lexer_for_filename
+        from pygments.util import ClassNotFound
+
+        data = self.file_path.read_bytes()
+        for encoding in ("utf-8-sig", "gbk"):
+            try:
+                text = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            encoding = "latin-1"
+            text = data.decode(encoding)
+
+        self.editor.setPlainText(text)
+        self.status_label.setText(f"{self.editor.blockCount()} 行  {encoding}")
+
+        try:
+            lexer = get_lexer_for_filename(self.file_name, stripnl=False)
+        except ClassNotFound:
+            return
+        self.highlighter = LazyHighlighter(self.editor, lexer)
+        QTimer.singleShot(0, self.highlighter.highlight_visible)
+
+    def find_next(self):
+        term = self.search_input.text()
+        if not term:
+            return
+        if not self.editor.find(term):
+            # 到末尾后从头查找
+            cursor = self.editor.textCursor()
+            cursor.movePosition(cursor.MoveOperation.Start)
+            self.editor.setTextCursor(cursor)
+            if not self.editor.find(term):
+                self.status_label.setText(f"未找到: {term}")
+
+    def open_external(self):
+        try:
+            open_with_system(self.file_path, self.file_name)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法打开文件: {str(e)}")
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.highlighter:
+            self.highlighter.highlight_visible()
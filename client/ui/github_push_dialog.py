@@ -3,6 +3,7 @@ GitHub 自动推送对话框
 用于自动推送版本更新到 GitHub
 """
 import sys
+import time
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
@@ -21,6 +22,7 @@ from shared.config import settings
 class GitPushWorker(QThread):
     """Git 推送工作线程"""
     progress = pyqtSignal(str)  # 进度信息
+    upload_progress = pyqtSignal(int)  # 上传进度百分比
     finished = pyqtSignal(bool, str)  # 完成信号(成功, 消息)
 
     def __init__(self, git_service: GitService, version: str,
@@ -35,11 +37,38 @@ class GitPushWorker(QThread):
         self.release_file = release_file
         self.update_app_version = update_app_version
         self.required = required
+        self._upload_file = None
+        self._upload_started = 0.0
+        self._last_sent = 0
+        self._last_emit = 0.0
+
+    def on_upload_progress(self, file_name: str, sent: int, total: int):
+        """上传进度回调（在工作线程中执行），计算速度和剩余时间"""
+        now = time.monotonic()
+        if file_name != self._upload_file or sent < self._last_sent:
+            # 新文件或重试后重新开始计时
+            self._upload_file = file_name
+            self._upload_started = now
+        self._last_sent = sent
+        # 限制刷新频率
+        if now - self._last_emit < 0.2 and sent < total:
+            return
+        self._last_emit = now
+
+        elapsed = max(now - self._upload_started, 1e-3)
+        speed = sent / elapsed
+        eta = (total - sent) / speed if speed > 0 else 0
+        self.upload_progress.emit(int(sent * 100 / total) if total else 100)
+        self.progress.emit(
+            f"正在上传 {file_name}: {sent / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB，"
+            f"{speed / 1024 / 1024:.2f} MB/s，剩余约 {int(eta // 60)} 分 {int(eta % 60)} 秒"
+        )
 
     def run(self):
         """执行推送"""
         try:
             self.progress.emit("开始推送版本更新...")
+            self.git_service.upload_progress_callback = self.on_upload_progress
 
             success, message = self.git_service.push_release_with_file(
                 version=self.version,
@@ -54,6 +83,8 @@ class GitPushWorker(QThread):
 
         except Exception as e:
             self.finished.emit(False, f"推送失败: {str(e)}")
+        finally:
+            self.git_service.upload_progress_callback = None
 
 
 class GitHubPushDialog(QDialog):
@@ -365,6 +396,7 @@ class GitHubPushDialog(QDialog):
         )
 
         self.push_worker.progress.connect(self.on_progress)
+        self.push_worker.upload_progress.connect(self.on_upload_progress)
         self.push_worker.finished.connect(self.on_finished)
         self.push_worker.start()
 
@@ -372,6 +404,11 @@ class GitHubPushDialog(QDialog):
         """更新进度"""
         self.progress_label.setText(message)
 
+    def on_upload_progress(self, percent: int):
+        """更新上传进度条"""
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(percent)
+
     def on_finished(self, success: bool, message: str):
         """推送完成"""
         self.push_btn.setEnabled(True)
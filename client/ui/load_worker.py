@@ -0,0 +1,42 @@
+"""
+数据加载工作线程
+"""
+import sys
+from pathlib import Path
+from typing import Callable
+from loguru import logger
+from PyQt6.QtCore import QThread, pyqtSignal
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.models import remove_session
+
+
+class LoadWorker(QThread):
+    """
+    加载工作线程
+
+    在后台调用读取函数（查询数据库、读取和缩放图片），结果通过 loaded 信号交给界面线程显示。
+    读取函数中不能创建控件或 QPixmap，图片用 QImage
+    """
+    loaded = pyqtSignal(object)  # 读取函数的返回值
+    failed = pyqtSignal(str)  # 错误消息
+
+    def __init__(self, load_func: Callable, *args, **kwargs):
+        super().__init__()
+        self.load_func = load_func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        """执行加载"""
+        try:
+            result = self.load_func(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.exception(f"加载失败: {e}")
+            self.failed.emit(str(e))
+            return
+        finally:
+            # 工作线程的会话随线程结束释放
+            remove_session()
+        self.loaded.emit(result)
@@ -9,35 +9,10 @@ from loguru import logger
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from shared.config import settings
-from shared.constants import LOG_FORMAT
 from client.models import init_db
-from client.ui import LoginDialog, MainWindow
-
-
-def setup_logging():
-    """配置日志"""
-    logger.remove()
-
-    logger.add(
-        sys.stderr,
-        format=LOG_FORMAT,
-        level=settings.LOG_LEVEL,
-        colorize=True
-    )
-
-    log_file = settings.LOG_DIR / f"app_main.log"
-    logger.add(
-        log_file,
-        format=LOG_FORMAT,
-        level=settings.LOG_LEVEL,
-        rotation="10 MB",
-        retention="7 days",
-        encoding="utf-8"
-    )
-
-    logger.info("=" * 50)
-    logger.info(f"{settings.APP_NAME} v{settings.APP_VERSION} 启动")
-    logger.info("=" * 50)
+from client.utils.logging_config import setup_logging
+# 启动时只导入登录对话框，主窗口（及其依赖的服务和对话框）在登录成功后才导入
+from client.ui.login_dialog import LoginDialog
 
 
 def main():
@@ -157,6 +132,7 @@ def main():
 
     if login_dialog.exec() == LoginDialog.DialogCode.Accepted:
         auth_service = login_dialog.get_auth_service()
+        from client.ui.main_window import MainWindow
         main_window = MainWindow(auth_service)
         main_window.show()
 
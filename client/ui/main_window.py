@@ -4,14 +4,21 @@ from pathlib import Path
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
+from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.services import AuthService, RegulationService, SearchService, UpdateService, DataSyncService
-from client.utils.data_exporter import DataExporter
-from client.utils.data_importer import DataImporter
+from client.services import (
+    AuthService, RegulationService, SearchService, UpdateService, DataSyncService, ReplicaSyncService,
+    NotificationWatcher, UpdateCheckScheduler,
+)
+from client.models import remove_session
+from client.models.instrumentation import query_instrumentation
+from client.services.cache import data_cache
+from client.ui.detail_prefetch import PREFETCH_NEIGHBORS, DetailPrefetcher
+from client.utils.profiler import profiler, profiled
 from shared.config import settings
-from shared.constants import COUNTRIES, UI_CONFIG
+from shared.constants import COUNTRIES, UI_CONFIG, RegulationStatus
 
 
 class UpdateButton(QPushButton):
@@ -58,6 +65,10 @@ class UpdateButton(QPushButton):
 
 
 class MainWindow(QMainWindow):
+    replica_synced = pyqtSignal(bool, str, int)  # 后台副本同步完成(成功, 消息, 拉取行数)
+    unread_count_changed = pyqtSignal(int)  # 通知监听检测到未读数量变化
+    update_found = pyqtSignal(dict)  # 后台检查发现新版本
+
     def __init__(self, auth_service: AuthService):
         super().__init__()
         self.auth_service = auth_service
@@ -65,12 +76,19 @@ class MainWindow(QMainWindow):
         self.search_service = SearchService()
         self.update_service = UpdateService()
         self.data_sync_service = DataSyncService()
+        self.replica_sync_service = ReplicaSyncService() if settings.REPLICA_MODE else None
         self.current_user = auth_service.current_user
         self.last_notification_count = None  # 记录上次通知数量，None表示首次检查
+        self.notification_watcher = None
+        self.update_timer = None
+        self.update_scheduler = None
+        self.detail_prefetcher = DetailPrefetcher(self.regulation_service, settings.DETAIL_PREFETCH, self)
         self.init_ui()
         self.load_regulations()
         self.check_data_sync_on_startup()  # 启动时检查数据同步
         self.start_update_check_timer()
+        self.start_update_scheduler()
+        self.start_replica_sync()
 
     def init_ui(self):
         self.setWindowTitle(f"{settings.APP_NAME} v{settings.APP_VERSION}")
@@ -85,7 +103,7 @@ class MainWindow(QMainWindow):
         toolbar.addAction(QAction("删除法规", self, triggered=self.delete_regulation))
         toolbar.addAction(QAction("代码管理", self, triggered=self.manage_codes))
         toolbar.addSeparator()
-        toolbar.addAction(QAction("刷新", self, triggered=self.load_regulations))
+        toolbar.addAction(QAction("刷新", self, triggered=self.refresh_regulations))
         toolbar.addSeparator()
 
         # 添加带小红点的更新按钮
@@ -150,6 +168,7 @@ class MainWindow(QMainWindow):
         self.table.setColumnCount(6)
         self.table.setHorizontalHeaderLabels(["编号", "名称", "国家/地区", "状态", "版本", "创建时间"])
         self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.ExtendedSelection)  # 支持多选批量操作
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         self.table.doubleClicked.connect(self.view_detail)
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -157,6 +176,11 @@ class MainWindow(QMainWindow):
         self.table.setAlternatingRowColors(True)  # 启用交替行背景色
         self.table.verticalHeader().setVisible(False)  # 隐藏行号
 
+        # 选中行变化或鼠标停留在某行时预读取法规详情
+        self.table.setMouseTracking(True)
+        self.table.currentCellChanged.connect(lambda row, *_: self.prefetch_details(row))
+        self.table.cellEntered.connect(lambda row, _: self.prefetch_details(row))
+
         # 设置列宽
         header = self.table.horizontalHeader()
         header.setStretchLastSection(True)
@@ -174,10 +198,47 @@ class MainWindow(QMainWindow):
         
         self.statusBar().showMessage(f"用户: {self.current_user.username}")
 
+        # SQL 语句统计和热点查询计划（排查性能问题用，需开启 SQL_INSTRUMENTATION）
+        report_action = QAction("导出 SQL 统计", self, triggered=self.dump_query_report)
+        report_action.setShortcut(QKeySequence("Ctrl+Shift+Q"))
+        self.addAction(report_action)
+
+        # 性能采样：开始/结束一次 cProfile 和 tracemalloc 采样
+        profile_action = QAction("性能采样", self, triggered=self.toggle_profiling)
+        profile_action.setShortcut(QKeySequence("Ctrl+Shift+P"))
+        self.addAction(profile_action)
+        if profiler.enabled:
+            profiler.start_watchdog(self)
+
+    def toggle_profiling(self):
+        try:
+            if not profiler.capturing:
+                profiler.start_capture(self)
+                self.statusBar().showMessage("性能采样中，再按 Ctrl+Shift+P 结束", 10000)
+            else:
+                path = profiler.stop_capture()
+                self.statusBar().showMessage(f"性能采样已导出: {path}", 10000)
+        except Exception as e:
+            logger.error(f"性能采样失败: {e}")
+            self.statusBar().showMessage(f"性能采样失败: {e}", 10000)
+
+    def dump_query_report(self):
+        try:
+            path = query_instrumentation.dump_report()
+            self.statusBar().showMessage(f"SQL 统计已导出: {path}", 10000)
+        except Exception as e:
+            logger.error(f"导出 SQL 统计失败: {e}")
+            self.statusBar().showMessage(f"导出 SQL 统计失败: {e}", 10000)
+
+    def refresh_regulations(self):
+        """手动刷新：清空数据缓存后重新读取，立即显示其他客户端的修改"""
+        data_cache.clear()
+        self.load_regulations()
+
+    @profiled("刷新列表")
     def load_regulations(self):
-        # 创建新的 service 实例以获取最新数据（避免数据库会话缓存问题）
-        service = RegulationService()
-        regs = service.list_regulations()
+        # 列表经 data_cache 读取，其他客户端的修改在缓存过期（CACHE_TTL）或手动刷新后显示
+        regs = self.regulation_service.list_regulations()
         self.table.setRowCount(len(regs))
         for i, r in enumerate(regs):
             # 编号列，并在其中隐藏存储ID
@@ -191,6 +252,7 @@ class MainWindow(QMainWindow):
             self.table.setItem(i, 4, QTableWidgetItem(r.version or ""))
             self.table.setItem(i, 5, QTableWidgetItem(r.created_at.strftime("%Y-%m-%d") if r.created_at else ""))
 
+    @profiled("搜索")
     def search_regulations(self):
         kw = self.search_input.text().strip()
         regs = self.search_service.search(kw, None, None)
@@ -218,9 +280,22 @@ class MainWindow(QMainWindow):
         if row >= 0:
             rid = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)  # 从隐藏数据中获取ID
             from .regulation_detail_dialog import RegulationDetailDialog
-            d = RegulationDetailDialog(self, rid, self.current_user.id)
+            with profiler.action("打开法规详情"):
+                d = RegulationDetailDialog(self, rid, self.current_user.id)
             d.exec()
 
+    def prefetch_details(self, row: int):
+        """预读取该行及相邻行的法规详情（该行优先）"""
+        rows = [row]
+        for offset in range(1, PREFETCH_NEIGHBORS + 1):
+            rows += [row + offset, row - offset]
+        regulation_ids = []
+        for r in rows:
+            item = self.table.item(r, 0) if row >= 0 and 0 <= r < self.table.rowCount() else None
+            if item:
+                regulation_ids.append(item.data(Qt.ItemDataRole.UserRole))
+        self.detail_prefetcher.prefetch(regulation_ids)
+
     def edit_regulation(self):
         """编辑选中的法规"""
         row = self.table.currentRow()
@@ -267,11 +342,16 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "错误", message)
 
     def show_context_menu(self, position):
-        """显示右键菜单"""
+        """显示右键菜单（选中多条法规时显示批量操作）"""
         row = self.table.currentRow()
         if row < 0:
             return
 
+        regulation_ids = self.selected_regulation_ids()
+        if len(regulation_ids) > 1:
+            self.show_bulk_context_menu(position, regulation_ids)
+            return
+
         menu = QMenu(self)
 
         view_action = QAction("查看详情", self)
@@ -290,19 +370,122 @@ class MainWindow(QMainWindow):
 
         menu.exec(self.table.viewport().mapToGlobal(position))
 
+    def selected_regulation_ids(self) -> list:
+        """选中行的法规ID（按行顺序）"""
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [self.table.item(row, 0).data(Qt.ItemDataRole.UserRole) for row in rows]
+
+    def show_bulk_context_menu(self, position, regulation_ids: list):
+        """批量操作菜单"""
+        menu = QMenu(self)
+        title_action = menu.addAction(f"已选择 {len(regulation_ids)} 条法规")
+        title_action.setEnabled(False)
+        menu.addSeparator()
+
+        status_menu = menu.addMenu("修改状态")
+        for status in RegulationStatus:
+            action = status_menu.addAction(status.value)
+            action.triggered.connect(
+                lambda _, s=status: self.bulk_update_regulations(regulation_ids, status=s)
+            )
+
+        country_menu = menu.addMenu("修改国家/地区")
+        for country in COUNTRIES:
+            action = country_menu.addAction(country)
+            action.triggered.connect(
+                lambda _, c=country: self.bulk_update_regulations(regulation_ids, country=c)
+            )
+
+        add_tag_action = menu.addAction("添加标签...")
+        add_tag_action.triggered.connect(lambda: self.bulk_tag_regulations(regulation_ids, remove=False))
+        remove_tag_action = menu.addAction("移除标签...")
+        remove_tag_action.triggered.connect(lambda: self.bulk_tag_regulations(regulation_ids, remove=True))
+
+        menu.addSeparator()
+
+        delete_action = menu.addAction(f"删除选中的 {len(regulation_ids)} 条法规")
+        delete_action.triggered.connect(lambda: self.bulk_delete_regulations(regulation_ids))
+
+        menu.exec(self.table.viewport().mapToGlobal(position))
+
+    def bulk_update_regulations(self, regulation_ids: list, **fields):
+        """批量修改字段"""
+        success, message, _ = self.regulation_service.bulk_update(
+            regulation_ids, self.current_user.id, **fields
+        )
+        self.on_bulk_finished(success, message)
+
+    def bulk_tag_regulations(self, regulation_ids: list, remove: bool):
+        """批量添加/移除标签"""
+        text, ok = QInputDialog.getText(
+            self, "移除标签" if remove else "添加标签", "标签（多个标签用逗号分隔）:"
+        )
+        tag_names = [name.strip() for name in text.replace("，", ",").split(",") if name.strip()]
+        if not ok or not tag_names:
+            return
+
+        if remove:
+            success, message, _ = self.regulation_service.bulk_tag(
+                regulation_ids, remove=tag_names, updated_by=self.current_user.id
+            )
+        else:
+            success, message, _ = self.regulation_service.bulk_tag(
+                regulation_ids, add=tag_names, updated_by=self.current_user.id
+            )
+        self.on_bulk_finished(success, message)
+
+    def bulk_delete_regulations(self, regulation_ids: list):
+        """批量删除"""
+        reply = QMessageBox.question(
+            self,
+            "确认删除",
+            f"确定要删除选中的 {len(regulation_ids)} 条法规吗？\n此操作不可恢复！",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        success, message, _ = self.regulation_service.bulk_delete(regulation_ids, self.current_user.id)
+        self.on_bulk_finished(success, message)
+
+    def on_bulk_finished(self, success: bool, message: str):
+        if success:
+            self.statusBar().showMessage(message, 5000)
+            self.load_regulations()
+        else:
+            QMessageBox.critical(self, "错误", message)
+
     def start_update_check_timer(self):
-        """启动定时检查更新"""
+        """启动通知监听，监听不可用时回退到定时检查"""
         # 首次检查
         self.check_for_updates()
 
+        # 监听回调在后台线程中执行，通过信号切回界面线程
+        self.unread_count_changed.connect(self.on_unread_count_changed)
+        self.notification_watcher = NotificationWatcher(
+            self.unread_count_changed.emit, self.update_service
+        )
+        success, _ = self.notification_watcher.start()
+        if success:
+            return
+
+        self.notification_watcher = None
         # 每5分钟检查一次
         self.update_timer = QTimer(self)
-        self.update_timer.timeout.connect(self.check_for_updates)
+        self.update_timer.timeout.connect(self.refresh_unread_count)
         self.update_timer.start(5 * 60 * 1000)  # 5分钟
 
+    def refresh_unread_count(self):
+        """重新统计未读数量（定时检查回退路径）"""
+        self.on_unread_count_changed(self.update_service.refresh_unread_count())
+
     def check_for_updates(self):
         """检查更新并更新小红点"""
-        unread_count = self.update_service.get_unread_count()
+        self.on_unread_count_changed(self.update_service.get_unread_count())
+
+    def on_unread_count_changed(self, unread_count: int):
+        """未读数量变化，更新小红点并在有新通知时提醒"""
         self.update_button.set_badge_count(unread_count)
 
         # 如果有新的通知，自动弹窗提醒
@@ -321,6 +504,22 @@ class MainWindow(QMainWindow):
 
         self.last_notification_count = unread_count
 
+    def start_update_scheduler(self):
+        """启动后台版本检查"""
+        if not settings.AUTO_UPDATE:
+            return
+        self.update_found.connect(self.on_update_found)
+        # 回调在检查线程中执行，通过信号切回界面线程
+        self.update_scheduler = UpdateCheckScheduler(self.update_found.emit, self.update_service)
+        self.update_scheduler.start()
+
+    def on_update_found(self, update_info: dict):
+        """后台检查发现新版本"""
+        self.statusBar().showMessage(
+            f"用户: {self.current_user.username}    "
+            f"发现新版本 {update_info.get('version')}，点击【版本更新】查看"
+        )
+
     def show_notification_alert(self, count: int):
         """显示新通知提醒"""
         reply = QMessageBox.information(
@@ -396,12 +595,14 @@ class MainWindow(QMainWindow):
             return
 
         # 执行导出
+        from client.utils.data_exporter import DataExporter
         try:
             exporter = DataExporter()
-            if is_excel:
-                success, message = exporter.export_to_excel(file_path)
-            else:
-                success, message = exporter.export_to_json(file_path)
+            with profiler.action("导出"):
+                if is_excel:
+                    success, message = exporter.export_to_excel(file_path)
+                else:
+                    success, message = exporter.export_to_json(file_path)
 
             if success:
                 reply = QMessageBox.information(
@@ -457,17 +658,20 @@ class MainWindow(QMainWindow):
         overwrite = overwrite_reply == QMessageBox.StandardButton.Yes
 
         # 执行导入
+        from client.utils.data_importer import DataImporter
         try:
             importer = DataImporter()
 
             if file_path.endswith('.xlsx'):
-                success, message, stats = importer.import_from_excel(
-                    file_path, self.current_user.id, overwrite
-                )
+                with profiler.action("导入"):
+                    success, message, stats = importer.import_from_excel(
+                        file_path, self.current_user.id, overwrite
+                    )
             elif file_path.endswith('.json'):
-                success, message, stats = importer.import_from_json(
-                    file_path, self.current_user.id, overwrite
-                )
+                with profiler.action("导入"):
+                    success, message, stats = importer.import_from_json(
+                        file_path, self.current_user.id, overwrite
+                    )
             else:
                 QMessageBox.warning(self, "错误", "不支持的文件格式")
                 return
@@ -522,6 +726,44 @@ class MainWindow(QMainWindow):
             from loguru import logger
             logger.warning(f"启动时检查数据同步失败: {e}")
 
+    def start_replica_sync(self):
+        """副本模式下启动后台同步"""
+        if not self.replica_sync_service or not settings.AUTO_SYNC:
+            return
+
+        self.replica_synced.connect(self.on_replica_synced)
+        # 回调在同步线程中执行，通过信号切回界面线程
+        self.replica_sync_service.start_background_sync(on_synced=self.replica_synced.emit)
+
+    def on_replica_synced(self, success: bool, message: str, pulled: int):
+        """后台同步完成"""
+        if not success:
+            self.statusBar().showMessage(f"用户: {self.current_user.username}    同步失败: {message}")
+            return
+
+        conflicts = self.replica_sync_service.get_conflicts()
+        status = f"用户: {self.current_user.username}    已同步"
+        if conflicts:
+            status += f"（{len(conflicts)} 个冲突待处理）"
+        self.statusBar().showMessage(status)
+
+        if pulled:
+            self.load_regulations()
+
     def closeEvent(self, event):
+        if self.notification_watcher:
+            self.notification_watcher.stop()
+        if self.update_scheduler:
+            self.update_scheduler.stop()
+        if self.replica_sync_service:
+            self.replica_sync_service.stop_background_sync()
+        self.detail_prefetcher.stop()
+        logger.info(f"数据缓存统计: {self.regulation_service.get_cache_stats()}")
+        if query_instrumentation.enabled:
+            self.dump_query_report()
+        if profiler.capturing:
+            self.toggle_profiling()
+        profiler.stop_watchdog()
         self.auth_service.logout()
+        remove_session()
         event.accept()
\ No newline at end of file
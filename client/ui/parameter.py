@@ -12,7 +12,9 @@ from PyQt6.QtGui import QFont
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import Regulation, RegulationParameter, SessionLocal
+from client.models.parameter import PARAMETER_VALUE_FIELDS
+from client.services import RegulationService
+from client.utils.c_code_generator import TEMPLATE_PATH, generate_c_code
 
 
 class ParameterEditorDialog(QDialog):
@@ -21,12 +23,10 @@ class ParameterEditorDialog(QDialog):
     def __init__(self, parent=None, regulation_id: int = None):
         super().__init__(parent)
         self.regulation_id = regulation_id
-        self.db = SessionLocal()
+        self.regulation_service = RegulationService()
 
         # 获取法规
-        self.regulation = self.db.query(Regulation).filter(
-            Regulation.id == regulation_id
-        ).first()
+        self.regulation = self.regulation_service.get_regulation(regulation_id)
 
         if not self.regulation:
             QMessageBox.critical(self, "错误", "法规不存在")
@@ -166,9 +166,7 @@ class ParameterEditorDialog(QDialog):
     def load_parameters(self):
         """从数据库加载参数"""
         try:
-            parameters = self.db.query(RegulationParameter).filter(
-                RegulationParameter.regulation_id == self.regulation_id
-            ).order_by(RegulationParameter.row_order).all()
+            parameters = self.regulation_service.get_parameters(self.regulation_id)
 
             self.param_table.setRowCount(len(parameters))
 
@@ -189,148 +187,39 @@ class ParameterEditorDialog(QDialog):
 
     def save_parameters(self):
         """保存参数到数据库"""
-        try:
-            # 删除旧的参数
-            self.db.query(RegulationParameter).filter(
-                RegulationParameter.regulation_id == self.regulation_id
-            ).delete()
-
-            # 保存新的参数
-            for row in range(self.param_table.rowCount()):
-                # 列索引：0类别, 1参数, 2默认值, 3上限, 4下限, 5单位, 6系数, 7协议位, 8备注
-                category = self.param_table.item(row, 0).text() if self.param_table.item(row, 0) else ""
-                param_name = self.param_table.item(row, 1).text() if self.param_table.item(row, 1) else ""
-                default_val = self.param_table.item(row, 2).text() if self.param_table.item(row, 2) else ""
-                upper = self.param_table.item(row, 3).text() if self.param_table.item(row, 3) else ""
-                lower = self.param_table.item(row, 4).text() if self.param_table.item(row, 4) else ""
-                unit = self.param_table.item(row, 5).text() if self.param_table.item(row, 5) else ""
-                coef = self.param_table.item(row, 6).text() if self.param_table.item(row, 6) else ""
-                protocol = self.param_table.item(row, 7).text() if self.param_table.item(row, 7) else ""
-                remark = self.param_table.item(row, 8).text() if self.param_table.item(row, 8) else ""
-
-                param = RegulationParameter(
-                    regulation_id=self.regulation_id,
-                    category=category,
-                    parameter_name=param_name,
-                    default_value=default_val,
-                    upper_limit=upper,
-                    lower_limit=lower,
-                    unit=unit,
-                    coefficient=coef,
-                    protocol_bit=protocol,
-                    remark=remark,
-                    row_order=row
-                )
-                self.db.add(param)
-
-            self.db.commit()
-            QMessageBox.information(
-                self,
-                "成功",
-                f"参数已保存！\n共 {self.param_table.rowCount()} 行"
-            )
-
-        except Exception as e:
-            self.db.rollback()
-            QMessageBox.critical(self, "错误", f"保存失败:\n{str(e)}")
+        rows = []
+        for row in range(self.param_table.rowCount()):
+            # 列索引：0类别, 1参数, 2默认值, 3上限, 4下限, 5单位, 6系数, 7协议位, 8备注
+            values = [
+                self.param_table.item(row, col).text() if self.param_table.item(row, col) else ""
+                for col in range(9)
+            ]
+            rows.append(dict(zip(PARAMETER_VALUE_FIELDS, values)))  # 表格列顺序与字段顺序一致
+
+        success, message, count = self.regulation_service.save_parameters(self.regulation_id, rows)
+        if success:
+            QMessageBox.information(self, "成功", f"参数已保存！\n共 {count} 行")
+        else:
+            QMessageBox.critical(self, "错误", message)
 
     def generate_c_code(self):
         """生成C代码文件"""
         try:
-            # 读取模板文件
-            template_path = Path(__file__).resolve().parent.parent.parent / "Satety_Parameter.c"
-            if not template_path.exists():
-                QMessageBox.critical(self, "错误", f"模板文件不存在: {template_path}")
+            # 模板文件位于程序根目录
+            if not TEMPLATE_PATH.exists():
+                QMessageBox.critical(self, "错误", f"模板文件不存在: {TEMPLATE_PATH}")
                 return
 
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_lines = f.readlines()
-
-            # 收集表格数据，按协议位建立索引
-            protocol_data = {}
+            # 列索引：2默认值, 6系数, 7协议位
+            rows = []
             for row in range(self.param_table.rowCount()):
-                # 列索引：0类别, 1参数, 2默认值, 3上限, 4下限, 5单位, 6系数, 7协议位, 8备注
-                protocol_item = self.param_table.item(row, 7)  # 协议位
-                default_item = self.param_table.item(row, 2)   # 默认值
-                coef_item = self.param_table.item(row, 6)      # 系数
-
-                protocol = protocol_item.text().strip() if protocol_item else ""
-                default_val = default_item.text().strip() if default_item else ""
-                coef = coef_item.text().strip() if coef_item else ""
-
-                # 如果协议位是"-"或为空，跳过
-                if protocol == "-" or not protocol:
-                    continue
-
-                # 如果默认值是"-"或为空，设置为0
-                if default_val == "-" or not default_val:
-                    calculated_value = 0
-                else:
-                    try:
-                        # 计算：默认值 / 系数
-                        if coef and coef != "-" and float(coef) != 0:
-                            calculated_value = float(default_val) / float(coef)
-                        else:
-                            calculated_value = float(default_val)
-
-                        # 四舍五入取整
-                        calculated_value = int(round(calculated_value))
-                    except (ValueError, ZeroDivisionError):
-                        calculated_value = 0
-
-                protocol_data[protocol] = calculated_value
-
-            # 生成新的C代码
-            new_lines = []
-            for i, line in enumerate(template_lines):
-                # 跳过前4行（注释和列标题）
-                if i < 4:
-                    new_lines.append(line)
-                    continue
-
-                # 最后一行
-                if line.strip() == "};":
-                    new_lines.append(line)
-                    continue
-
-                # 解析数据行
-                if "//" in line and "{" in line:
-                    # 提取注释部分的协议位
-                    comment_part = line.split("//")[1].strip()
-                    protocol_match = comment_part.split()[0] if comment_part else ""
-
-                    # 查找协议位对应的值
-                    if protocol_match in protocol_data:
-                        value = protocol_data[protocol_match]
-                    else:
-                        value = 0
-
-                    # 处理负数
-                    if value < 0:
-                        default_str = f"(Uint16){value}"
-                    else:
-                        default_str = str(value)
-
-                    # 重新构建这一行，保留原来的MIN、MAX和注释
-                    # 提取原来的MIN和MAX
-                    data_part = line.split("{")[1].split("}")[0]
-                    parts = [p.strip() for p in data_part.split(",")]
-
-                    if len(parts) >= 3:
-                        min_val = parts[1]
-                        max_val = parts[2]
-                    else:
-                        min_val = "32768"
-                        max_val = "32767"
-
-                    # 提取完整注释
-                    full_comment = line.split("//")[1] if "//" in line else ""
-
-                    # 格式化新行
-                    new_line = f"    {{   {default_str:<7} ,   {min_val:<6} ,   {max_val:<6} }},   // {full_comment}"
-                    new_lines.append(new_line)
-                else:
-                    new_lines.append(line)
+                values = {}
+                for field, col in (("default_value", 2), ("coefficient", 6), ("protocol_bit", 7)):
+                    item = self.param_table.item(row, col)
+                    values[field] = item.text() if item else ""
+                rows.append(values)
+
+            new_lines = generate_c_code(rows)
 
             # 选择保存路径
             file_path, _ = QFileDialog.getSaveFileName(
@@ -348,9 +237,3 @@ class ParameterEditorDialog(QDialog):
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"生成失败:\n{str(e)}")
-
-    def closeEvent(self, event):
-        """关闭事件"""
-        if hasattr(self, 'db'):
-            self.db.close()
-        event.accept()
\ No newline at end of file
@@ -9,16 +9,30 @@ from PyQt6.QtWidgets import (
     QTableWidgetItem, QFileDialog, QMessageBox, QHeaderView,
     QFormLayout, QListWidget, QScrollArea
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont
-import subprocess
-import platform
+from PyQt6.QtCore import Qt, QSize, QBuffer, QIODevice
+from PyQt6.QtGui import QFont, QIcon, QPixmap
+from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import Regulation, SessionLocal, ChangeHistory
+from client.models import Regulation
 from client.services import RegulationService
-from shared.constants import DocumentType, EntityType, ChangeType
+from client.ui.detail_prefetch import load_parameter_rows
+from client.ui.document_viewer import open_document
+from client.ui.load_worker import LoadWorker
+from client.ui.upload_worker import UploadWorker
+from client.utils.c_code_generator import TEMPLATE_PATH, generate_c_code
+from client.utils.logging_config import SampledLogger
+from client.utils.profiler import profiler
+from shared.constants import DocumentType
+
+
+# 导入参数表时逐个单元格、逐张图片的调试日志采样输出
+_cell_log = SampledLogger()
+_image_log = SampledLogger()
+
+# 历史记录每页条数
+HISTORY_PAGE_SIZE = 100
 
 
 class RegulationDetailDialog(QDialog):
@@ -29,8 +43,13 @@ class RegulationDetailDialog(QDialog):
         self.regulation_id = regulation_id
         self.user_id = user_id
         self.regulation_service = RegulationService()
-        self.db = SessionLocal()
         self.original_images = {}  # 存储原始图片数据，用于双击放大查看
+        self.upload_worker = None
+        self.documents = []
+        self.code_files = []
+        self.history_page = 0
+        self._tab_loaders = {}  # {标签页: 首次切换到时调用的加载方法}
+        self._workers = set()  # 正在运行的加载线程
 
         self.regulation = self.regulation_service.get_regulation(regulation_id)
         if not self.regulation:
@@ -74,23 +93,35 @@ class RegulationDetailDialog(QDialog):
         """)
         layout.addWidget(title_label)
 
-        # 标签页
+        # 标签页（基本信息随对话框显示，其余标签页首次切换到时在后台加载）
         self.tab_widget = QTabWidget()
 
         # 基本信息
         self.tab_widget.addTab(self.create_info_tab(), "基本信息")
 
         #参数编辑
-        self.tab_widget.addTab(self.create_parameters_tab(), "参数编辑")  # 新增
-		
+        self.parameters_tab = self.create_parameters_tab()
+        self.tab_widget.addTab(self.parameters_tab, "参数编辑")
+
         # 文档列表
-        self.tab_widget.addTab(self.create_documents_tab(), "法规文档")
+        self.documents_tab = self.create_documents_tab()
+        self.tab_widget.addTab(self.documents_tab, "法规文档")
 
         # 代码列表
-        self.tab_widget.addTab(self.create_codes_tab(), "代码文件")
+        self.codes_tab = self.create_codes_tab()
+        self.tab_widget.addTab(self.codes_tab, "代码文件")
 
         # 历史记录
-        self.tab_widget.addTab(self.create_history_tab(), "历史记录")
+        self.history_tab = self.create_history_tab()
+        self.tab_widget.addTab(self.history_tab, "历史记录")
+
+        self._tab_loaders = {
+            self.parameters_tab: self.load_saved_parameters,
+            self.documents_tab: self.load_documents,
+            self.codes_tab: self.load_codes,
+            self.history_tab: self.load_history,
+        }
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
 
         layout.addWidget(self.tab_widget)
 
@@ -250,18 +281,73 @@ class RegulationDetailDialog(QDialog):
 
         layout.addWidget(self.history_table)
 
+        # 分页
+        page_layout = QHBoxLayout()
+        page_layout.addStretch()
+
+        self.history_prev_btn = QPushButton("上一页")
+        self.history_prev_btn.clicked.connect(lambda: self.load_history(self.history_page - 1))
+        page_layout.addWidget(self.history_prev_btn)
+
+        self.history_page_label = QLabel()
+        page_layout.addWidget(self.history_page_label)
+
+        self.history_next_btn = QPushButton("下一页")
+        self.history_next_btn.clicked.connect(lambda: self.load_history(self.history_page + 1))
+        page_layout.addWidget(self.history_next_btn)
+
+        layout.addLayout(page_layout)
+
         widget.setLayout(layout)
         return widget
 
     def load_data(self):
-        """加载所有数据"""
-        self.load_documents()
-        self.load_codes()
-        self.load_history()
+        """加载当前标签页的数据（其余标签页首次切换到时加载）"""
+        self.on_tab_changed(self.tab_widget.currentIndex())
+
+    def on_tab_changed(self, index: int):
+        """首次切换到标签页时加载数据"""
+        loader = self._tab_loaders.pop(self.tab_widget.widget(index), None)
+        if loader:
+            loader()
+
+    def start_load(self, page: QWidget, on_loaded, load_func, *args):
+        """
+        在后台线程调用 load_func(*args)，完成后在界面线程调用 on_loaded(结果)
+
+        加载期间标签页不可操作，避免在数据显示前编辑或保存
+        """
+        page.setEnabled(False)
+        worker = LoadWorker(load_func, *args)
+        self._workers.add(worker)
+
+        def on_finished():
+            self._workers.discard(worker)
+            page.setEnabled(True)
+
+        worker.loaded.connect(on_loaded)
+        worker.failed.connect(lambda message: QMessageBox.warning(self, "错误", f"加载失败: {message}"))
+        worker.finished.connect(on_finished)
+        worker.start()
+
+    def is_loading(self) -> bool:
+        """是否有标签页正在后台加载"""
+        return bool(self._workers)
+
+    def done(self, result: int):
+        # 加载都是短查询，等待结束后再关闭，线程不随对话框提前释放
+        for worker in list(self._workers):
+            worker.wait()
+        super().done(result)
 
     def load_documents(self):
         """加载文档列表"""
-        documents = self.regulation.documents
+        self.start_load(self.documents_tab, self.show_documents,
+                        self.regulation_service.get_documents, self.regulation_id)
+
+    def show_documents(self, documents: list):
+        """显示文档列表"""
+        self.documents = documents
         self.doc_table.setRowCount(len(documents))
 
         for row, doc in enumerate(documents):
@@ -278,7 +364,12 @@ class RegulationDetailDialog(QDialog):
 
     def load_codes(self):
         """加载代码列表"""
-        codes = self.regulation.code_files
+        self.start_load(self.codes_tab, self.show_codes,
+                        self.regulation_service.get_code_files, self.regulation_id)
+
+    def show_codes(self, codes: list):
+        """显示代码列表"""
+        self.code_files = codes
         self.code_table.setRowCount(len(codes))
 
         for row, code in enumerate(codes):
@@ -290,12 +381,20 @@ class RegulationDetailDialog(QDialog):
             time_str = code.created_at.strftime("%Y-%m-%d %H:%M") if code.created_at else ""
             self.code_table.setItem(row, 4, QTableWidgetItem(time_str))
 
-    def load_history(self):
-        """加载历史记录"""
-        history = self.db.query(ChangeHistory).filter(
-            ChangeHistory.entity_type == EntityType.REGULATION,
-            ChangeHistory.entity_id == self.regulation_id
-        ).order_by(ChangeHistory.changed_at.desc()).all()
+    def load_history(self, page: int = 0):
+        """加载一页历史记录（按时间倒序）"""
+        self.history_page = page
+        self.start_load(self.history_tab, self.show_history,
+                        self.regulation_service.get_history_page, self.regulation_id,
+                        page * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE)
+
+    def show_history(self, result: tuple):
+        """显示一页历史记录和分页状态"""
+        history, total = result
+        pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+        self.history_page_label.setText(f"第 {self.history_page + 1}/{pages} 页，共 {total} 条")
+        self.history_prev_btn.setEnabled(self.history_page > 0)
+        self.history_next_btn.setEnabled(self.history_page + 1 < pages)
 
         self.history_table.setRowCount(len(history))
 
@@ -327,15 +426,25 @@ class RegulationDetailDialog(QDialog):
             QMessageBox.warning(self, "警告", "不支持的文件类型")
             return
 
-        success, message, document = self.regulation_service.add_document(
-            self.regulation_id, file_path, doc_type, self.user_id
+        self.start_upload(
+            UploadWorker(self.regulation_service.add_document,
+                         self.regulation_id, file_path, doc_type, self.user_id),
+            file_path, self.load_documents
         )
 
-        if success:
-            QMessageBox.information(self, "成功", message)
-            self.load_documents()
-        else:
-            QMessageBox.critical(self, "错误", message)
+    def start_upload(self, worker: UploadWorker, file_path: str, on_success):
+        """在后台上传文件，完成后刷新法规和对应列表"""
+        def on_finished(success: bool, message: str):
+            self.upload_worker = None
+            if success:
+                QMessageBox.information(self, "成功", message)
+                on_success()
+            else:
+                QMessageBox.critical(self, "错误", message)
+
+        self.upload_worker = worker
+        worker.finished.connect(on_finished)
+        worker.start_with_progress(self, f"正在上传 {Path(file_path).name}...")
 
     def view_document(self):
         """查看文档"""
@@ -345,7 +454,7 @@ class RegulationDetailDialog(QDialog):
             return
 
         doc_id = int(self.doc_table.item(current_row, 0).text())
-        document = next((d for d in self.regulation.documents if d.id == doc_id), None)
+        document = next((d for d in self.documents if d.id == doc_id), None)
 
         if not document:
             QMessageBox.warning(self, "警告", "文档不存在")
@@ -356,15 +465,7 @@ class RegulationDetailDialog(QDialog):
             QMessageBox.warning(self, "警告", "文件不存在")
             return
 
-        try:
-            if platform.system() == 'Windows':
-                subprocess.run(['start', '', str(file_path)], shell=True)
-            elif platform.system() == 'Darwin':
-                subprocess.run(['open', str(file_path)])
-            else:
-                subprocess.run(['xdg-open', str(file_path)])
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"无法打开文件: {str(e)}")
+        open_document(self, str(file_path), document.file_name)
 
     def upload_code(self):
         """上传代码"""
@@ -376,21 +477,17 @@ class RegulationDetailDialog(QDialog):
             return
 
         # 简化版：直接上传
-        success, message, code_file = self.regulation_service.add_code_file(
-            regulation_id=self.regulation_id,
-            file_path=file_path,
-            description="C代码文件",
-            usage_guide="请查看代码注释",
-            version="1.0",
-            created_by=self.user_id
+        self.start_upload(
+            UploadWorker(self.regulation_service.add_code_file,
+                         regulation_id=self.regulation_id,
+                         file_path=file_path,
+                         description="C代码文件",
+                         usage_guide="请查看代码注释",
+                         version="1.0",
+                         created_by=self.user_id),
+            file_path, self.load_codes
         )
 
-        if success:
-            QMessageBox.information(self, "成功", message)
-            self.load_codes()
-        else:
-            QMessageBox.critical(self, "错误", message)
-
     def view_code(self):
         """查看代码"""
         current_row = self.code_table.currentRow()
@@ -399,27 +496,18 @@ class RegulationDetailDialog(QDialog):
             return
 
         code_id = int(self.code_table.item(current_row, 0).text())
-        code_file = next((c for c in self.regulation.code_files if c.id == code_id), None)
+        code_file = next((c for c in self.code_files if c.id == code_id), None)
 
         if not code_file:
             QMessageBox.warning(self, "警告", "代码文件不存在")
             return
 
-        # 使用系统默认程序打开
         file_path = Path(code_file.file_path)
         if not file_path.exists():
             QMessageBox.warning(self, "警告", "文件不存在")
             return
 
-        try:
-            if platform.system() == 'Windows':
-                subprocess.run(['start', '', str(file_path)], shell=True)
-            elif platform.system() == 'Darwin':
-                subprocess.run(['open', str(file_path)])
-            else:
-                subprocess.run(['xdg-open', str(file_path)])
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"无法打开文件: {str(e)}")
+        open_document(self, str(file_path), code_file.file_name)
 
     def create_parameters_tab(self):
         """创建参数编辑标签页"""
@@ -497,10 +585,6 @@ class RegulationDetailDialog(QDialog):
         layout.addWidget(self.param_table)
 
         widget.setLayout(layout)
-		
-		 # 加载已保存的参数
-        self.load_saved_parameters()  # 添加这一行
-		
         return widget
 
     def on_param_cell_double_clicked(self, item):
@@ -563,9 +647,8 @@ class RegulationDetailDialog(QDialog):
             dialog.exec()
 
         except Exception as e:
+            logger.exception(f"查看图片失败: {e}")
             QMessageBox.critical(self, "错误", f"查看图片失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
 
     def add_parameter_row(self):
         """新增参数行"""
@@ -603,63 +686,47 @@ class RegulationDetailDialog(QDialog):
             import re
             import xml.etree.ElementTree as ET
 
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
-
-            # 清空
-            self.param_table.setRowCount(0)
-            self.param_table.clearSpans()
+            with profiler.action("导入参数表") as timing:
+                wb = openpyxl.load_workbook(file_path)
+                ws = wb.active
 
-            # 提取Excel中的图片
-            image_map = {}  # 存储图片位置映射 {(row, col): QPixmap}
-            dispimg_id_map = {}  # 存储DISPIMG ID到图片的映射 {image_id: QPixmap}
+                # 清空
+                self.param_table.setRowCount(0)
+                self.param_table.clearSpans()
 
-            # 方法1: 解析DISPIMG图片（适用于Excel 365和WPS的"在单元格中插入图片"功能）
-            try:
-                with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                    # 步骤1: 从xl/media/提取所有图片文件到内存
-                    media_files = {}  # {filename: pixmap}
-                    for file_name in zip_ref.namelist():
-                        if file_name.startswith('xl/media/') and not file_name.endswith('/'):
-                            image_data = zip_ref.read(file_name)
-                            pixmap = QPixmap()
-                            if pixmap.loadFromData(image_data):
-                                base_name = file_name.split('/')[-1]
-                                media_files[base_name] = pixmap
-                                print(f"[ZIP] Extracted media: {base_name}, size: {pixmap.width()}x{pixmap.height()}")
-
-                    # 步骤2: 解析xl/cellimages.xml，建立图片ID -> rId的映射
-                    image_id_to_rid = {}  # {image_id: rId}
-                    if 'xl/cellimages.xml' in zip_ref.namelist():
-                        cellimages_xml = zip_ref.read('xl/cellimages.xml').decode('utf-8')
-                        root = ET.fromstring(cellimages_xml)
-
-                        # WPS和Excel可能使用不同的命名空间
-                        namespaces = {
-                            'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
-                            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-                            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
-                            'etc': 'http://www.wps.cn/officeDocument/2017/etCustomData',  # WPS命名空间
-                        }
-
-                        # 尝试WPS格式
-                        for cell_image in root.findall('.//etc:cellImage', namespaces):
-                            cNvPr = cell_image.find('.//xdr:cNvPr', namespaces)
-                            if cNvPr is not None:
-                                name = cNvPr.get('name', '')
-                                match = re.search(r'ID_([A-F0-9]+)', name)
-                                if match:
-                                    image_id = match.group(1)
-                                    blip = cell_image.find('.//a:blip', namespaces)
-                                    if blip is not None:
-                                        rid = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed', '')
-                                        if rid:
-                                            image_id_to_rid[image_id] = rid
-                                            print(f"[cellimages.xml] {image_id} -> {rid}")
-
-                        # 如果WPS格式没找到，尝试Excel格式
-                        if not image_id_to_rid:
-                            namespaces['etc'] = 'http://schemas.microsoft.com/office/excel/2017/cellimages'
+                # 提取Excel中的图片
+                image_map = {}  # 存储图片位置映射 {(row, col): QPixmap}
+                dispimg_id_map = {}  # 存储DISPIMG ID到图片的映射 {image_id: QPixmap}
+
+                # 方法1: 解析DISPIMG图片（适用于Excel 365和WPS的"在单元格中插入图片"功能）
+                try:
+                    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                        # 步骤1: 从xl/media/提取所有图片文件到内存
+                        media_files = {}  # {filename: pixmap}
+                        for file_name in zip_ref.namelist():
+                            if file_name.startswith('xl/media/') and not file_name.endswith('/'):
+                                image_data = zip_ref.read(file_name)
+                                pixmap = QPixmap()
+                                if pixmap.loadFromData(image_data):
+                                    base_name = file_name.split('/')[-1]
+                                    media_files[base_name] = pixmap
+                                    _image_log.debug("[ZIP] Extracted media: {}, size: {}x{}", base_name, pixmap.width(), pixmap.height())
+
+                        # 步骤2: 解析xl/cellimages.xml，建立图片ID -> rId的映射
+                        image_id_to_rid = {}  # {image_id: rId}
+                        if 'xl/cellimages.xml' in zip_ref.namelist():
+                            cellimages_xml = zip_ref.read('xl/cellimages.xml').decode('utf-8')
+                            root = ET.fromstring(cellimages_xml)
+
+                            # WPS和Excel可能使用不同的命名空间
+                            namespaces = {
+                                'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
+                                'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+                                'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+                                'etc': 'http://www.wps.cn/officeDocument/2017/etCustomData',  # WPS命名空间
+                            }
+
+                            # 尝试WPS格式
                             for cell_image in root.findall('.//etc:cellImage', namespaces):
                                 cNvPr = cell_image.find('.//xdr:cNvPr', namespaces)
                                 if cNvPr is not None:
@@ -672,151 +739,170 @@ class RegulationDetailDialog(QDialog):
                                             rid = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed', '')
                                             if rid:
                                                 image_id_to_rid[image_id] = rid
-                                                print(f"[cellimages.xml] {image_id} -> {rid}")
-
-                    # 步骤3: 解析xl/_rels/cellimages.xml.rels，建立rId -> 图片文件名的映射
-                    rid_to_filename = {}  # {rId: filename}
-                    if 'xl/_rels/cellimages.xml.rels' in zip_ref.namelist():
-                        rels_xml = zip_ref.read('xl/_rels/cellimages.xml.rels').decode('utf-8')
-                        root = ET.fromstring(rels_xml)
-
-                        for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-                            rid = rel.get('Id', '')
-                            target = rel.get('Target', '')
-                            if 'media' in target:
-                                filename = target.split('/')[-1]
-                                rid_to_filename[rid] = filename
-                                print(f"[cellimages.xml.rels] {rid} -> {filename}")
-
-                    # 步骤4: 合并映射，得到图片ID -> QPixmap
-                    for image_id, rid in image_id_to_rid.items():
-                        if rid in rid_to_filename:
-                            filename = rid_to_filename[rid]
-                            if filename in media_files:
-                                dispimg_id_map[image_id] = media_files[filename]
-                                print(f"[Final mapping] {image_id} -> {filename}")
-
-                    print(f"[Summary] Successfully mapped {len(dispimg_id_map)} DISPIMG images")
-
-            except Exception as e:
-                print(f"[DISPIMG] Failed to extract images: {e}")
-                import traceback
-                traceback.print_exc()
-
-            # 方法2: 使用openpyxl的_images（适用于直接插入的图片）
-            if hasattr(ws, '_images') and ws._images:
-                for idx, img in enumerate(ws._images):
-                    try:
-                        image_data = img._data()
-                        pixmap = QPixmap()
-                        if pixmap.loadFromData(image_data):
-                            if hasattr(img, 'anchor') and hasattr(img.anchor, '_from'):
-                                from_anchor = img.anchor._from
-                                row = from_anchor.row - 1
-                                col = from_anchor.col
-                                if row >= 0 and col < 9:
-                                    image_map[(row, col)] = pixmap
-                                    print(f"[_images] Extracted image at position ({row}, {col})")
-                    except Exception as e:
-                        print(f"[_images] Failed to process image: {e}")
+                                                _image_log.debug("[cellimages.xml] {} -> {}", image_id, rid)
+
+                            # 如果WPS格式没找到，尝试Excel格式
+                            if not image_id_to_rid:
+                                namespaces['etc'] = 'http://schemas.microsoft.com/office/excel/2017/cellimages'
+                                for cell_image in root.findall('.//etc:cellImage', namespaces):
+                                    cNvPr = cell_image.find('.//xdr:cNvPr', namespaces)
+                                    if cNvPr is not None:
+                                        name = cNvPr.get('name', '')
+                                        match = re.search(r'ID_([A-F0-9]+)', name)
+                                        if match:
+                                            image_id = match.group(1)
+                                            blip = cell_image.find('.//a:blip', namespaces)
+                                            if blip is not None:
+                                                rid = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed', '')
+                                                if rid:
+                                                    image_id_to_rid[image_id] = rid
+                                                    _image_log.debug("[cellimages.xml] {} -> {}", image_id, rid)
+
+                        # 步骤3: 解析xl/_rels/cellimages.xml.rels，建立rId -> 图片文件名的映射
+                        rid_to_filename = {}  # {rId: filename}
+                        if 'xl/_rels/cellimages.xml.rels' in zip_ref.namelist():
+                            rels_xml = zip_ref.read('xl/_rels/cellimages.xml.rels').decode('utf-8')
+                            root = ET.fromstring(rels_xml)
+
+                            for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
+                                rid = rel.get('Id', '')
+                                target = rel.get('Target', '')
+                                if 'media' in target:
+                                    filename = target.split('/')[-1]
+                                    rid_to_filename[rid] = filename
+                                    _image_log.debug("[cellimages.xml.rels] {} -> {}", rid, filename)
+
+                        # 步骤4: 合并映射，得到图片ID -> QPixmap
+                        for image_id, rid in image_id_to_rid.items():
+                            if rid in rid_to_filename:
+                                filename = rid_to_filename[rid]
+                                if filename in media_files:
+                                    dispimg_id_map[image_id] = media_files[filename]
+                                    _image_log.debug("[Final mapping] {} -> {}", image_id, filename)
+
+                        logger.debug(f"[Summary] Successfully mapped {len(dispimg_id_map)} DISPIMG images")
+
+                except Exception as e:
+                    logger.opt(exception=e).warning(f"[DISPIMG] Failed to extract images: {e}")
+
+                # 方法2: 使用openpyxl的_images（适用于直接插入的图片）
+                if hasattr(ws, '_images') and ws._images:
+                    for idx, img in enumerate(ws._images):
+                        try:
+                            image_data = img._data()
+                            pixmap = QPixmap()
+                            if pixmap.loadFromData(image_data):
+                                if hasattr(img, 'anchor') and hasattr(img.anchor, '_from'):
+                                    from_anchor = img.anchor._from
+                                    row = from_anchor.row - 1
+                                    col = from_anchor.col
+                                    if row >= 0 and col < 9:
+                                        image_map[(row, col)] = pixmap
+                                        _image_log.debug("[_images] Extracted image at position ({}, {})", row, col)
+                        except Exception as e:
+                            logger.warning(f"[_images] Failed to process image: {e}")
+                            continue
+
+                # 读取所有数据（从第2行开始，跳过表头）
+                # 先用非values_only模式读取，以便获取公式
+                all_rows = []
+                row_image_info = {}  # {(row, col): image_id}
+
+                for row_idx, excel_row in enumerate(ws.iter_rows(min_row=2, max_col=9)):
+                    if not excel_row:
                         continue
 
-            # 读取所有数据（从第2行开始，跳过表头）
-            # 先用非values_only模式读取，以便获取公式
-            all_rows = []
-            row_image_info = {}  # {(row, col): image_id}
-
-            for row_idx, excel_row in enumerate(ws.iter_rows(min_row=2, max_col=9)):
-                if not excel_row:
-                    continue
-
-                # 检查这一行是否有任何非空值
-                has_data = any(cell.value is not None for cell in excel_row)
-                if not has_data:
-                    continue
-
-                row_data = []
-                for col_idx, cell in enumerate(excel_row):
-                    value = cell.value
-
-                    # 打印单元格信息用于调试
-                    if value is not None and col_idx < 9:
-                        print(f"Cell({row_idx+2},{col_idx+1}): value={value}, type={type(value)}, data_type={cell.data_type if hasattr(cell, 'data_type') else 'N/A'}")
-
-                    # 检查是否是公式（data_type=='f'表示formula）
-                    if hasattr(cell, 'data_type') and cell.data_type == 'f':
-                        # 对于公式单元格，value是计算结果，需要获取公式本身
-                        formula = cell.value  # 在openpyxl中，公式单元格的value就是公式字符串
-                        if isinstance(formula, str) and '_xlfn.DISPIMG' in formula:
-                            # 提取ID：=_xlfn.DISPIMG("ID_xxx",1)
-                            match = re.search(r'ID_([A-F0-9]+)', formula)
-                            if match:
-                                image_id = match.group(1)
-                                row_image_info[(row_idx, col_idx)] = image_id
-                                print(f"[OK] Detected DISPIMG at ({row_idx},{col_idx}): ID_{image_id}")
-                            value = "__IMAGE__"
-                        elif isinstance(value, str) and '_xlfn.DISPIMG' in str(value):
-                            # 如果value本身包含DISPIMG
-                            match = re.search(r'ID_([A-F0-9]+)', str(value))
-                            if match:
-                                image_id = match.group(1)
-                                row_image_info[(row_idx, col_idx)] = image_id
-                                print(f"[OK] Detected DISPIMG(value) at ({row_idx},{col_idx}): ID_{image_id}")
-                            value = "__IMAGE__"
-
-                    row_data.append(str(value) if value is not None else "")
-                all_rows.append(row_data)
-
-            # 填充表格
-            self.param_table.setRowCount(len(all_rows))
-
-            # 使用图片ID将DISPIMG位置映射到实际图片
-            print(f"[Mapping] {len(dispimg_id_map)} DISPIMG images, {len(row_image_info)} DISPIMG positions")
-
-            for (row_idx, col_idx), image_id in row_image_info.items():
-                if image_id in dispimg_id_map:
-                    image_map[(row_idx, col_idx)] = dispimg_id_map[image_id]
-                    print(f"[Mapping] Position ({row_idx},{col_idx}) <- Image ID {image_id}")
-                else:
-                    print(f"[Warning] Image ID {image_id} not found in dispimg_id_map")
-
-            # 保存原始图片数据，用于双击放大查看
-            self.original_images = image_map.copy()
-
-            for row_idx, row_data in enumerate(all_rows):
-                # 设置行高（如果该行有图片，设置更大的行高）
-                has_image = any((row_idx, col) in image_map for col in range(9))
-                if has_image:
-                    self.param_table.setRowHeight(row_idx, 140)  # 增大行高以显示更大的图片
-                else:
-                    self.param_table.setRowHeight(row_idx, 40)  # 确保文字不被裁剪
-
-                for col_idx, value in enumerate(row_data):
-                    # 检查该位置是否有图片
-                    if (row_idx, col_idx) in image_map:
-                        # 创建带图片图标的item
-                        pixmap = image_map[(row_idx, col_idx)]
-                        # 缩放图片到合适大小（增大显示尺寸）
-                        scaled_pixmap = pixmap.scaled(
-                            120, 120,
-                            Qt.AspectRatioMode.KeepAspectRatio,
-                            Qt.TransformationMode.SmoothTransformation
-                        )
-                        icon = QIcon(scaled_pixmap)
-                        item = QTableWidgetItem(icon, "")
-                        item.setData(Qt.ItemDataRole.UserRole, "IMAGE")  # 标记为图片
-                        print(f"[Display] Showing image at ({row_idx},{col_idx})")
-                    elif value == "__IMAGE__":
-                        # 有图片标记但没找到实际图片
-                        item = QTableWidgetItem("[图片未提取]")
-                        print(f"[Warning] Failed to extract image at ({row_idx},{col_idx})")
+                    # 检查这一行是否有任何非空值
+                    has_data = any(cell.value is not None for cell in excel_row)
+                    if not has_data:
+                        continue
+
+                    row_data = []
+                    for col_idx, cell in enumerate(excel_row):
+                        value = cell.value
+
+                        # 单元格信息用于调试（采样输出）
+                        if value is not None and col_idx < 9:
+                            _cell_log.debug(
+                                "Cell({},{}): value={}, type={}, data_type={}",
+                                row_idx + 2, col_idx + 1, value, type(value), getattr(cell, 'data_type', 'N/A')
+                            )
+
+                        # 检查是否是公式（data_type=='f'表示formula）
+                        if hasattr(cell, 'data_type') and cell.data_type == 'f':
+                            # 对于公式单元格，value是计算结果，需要获取公式本身
+                            formula = cell.value  # 在openpyxl中，公式单元格的value就是公式字符串
+                            if isinstance(formula, str) and '_xlfn.DISPIMG' in formula:
+                                # 提取ID：=_xlfn.DISPIMG("ID_xxx",1)
+                                match = re.search(r'ID_([A-F0-9]+)', formula)
+                                if match:
+                                    image_id = match.group(1)
+                                    row_image_info[(row_idx, col_idx)] = image_id
+                                    _image_log.debug("[OK] Detected DISPIMG at ({},{}): ID_{}", row_idx, col_idx, image_id)
+                                value = "__IMAGE__"
+                            elif isinstance(value, str) and '_xlfn.DISPIMG' in str(value):
+                                # 如果value本身包含DISPIMG
+                                match = re.search(r'ID_([A-F0-9]+)', str(value))
+                                if match:
+                                    image_id = match.group(1)
+                                    row_image_info[(row_idx, col_idx)] = image_id
+                                    _image_log.debug("[OK] Detected DISPIMG(value) at ({},{}): ID_{}", row_idx, col_idx, image_id)
+                                value = "__IMAGE__"
+
+                        row_data.append(str(value) if value is not None else "")
+                    all_rows.append(row_data)
+
+                # 填充表格
+                self.param_table.setRowCount(len(all_rows))
+
+                # 使用图片ID将DISPIMG位置映射到实际图片
+                logger.debug(f"[Mapping] {len(dispimg_id_map)} DISPIMG images, {len(row_image_info)} DISPIMG positions")
+
+                for (row_idx, col_idx), image_id in row_image_info.items():
+                    if image_id in dispimg_id_map:
+                        image_map[(row_idx, col_idx)] = dispimg_id_map[image_id]
+                        _image_log.debug("[Mapping] Position ({},{}) <- Image ID {}", row_idx, col_idx, image_id)
                     else:
-                        item = QTableWidgetItem(value)
+                        logger.warning(f"[Warning] Image ID {image_id} not found in dispimg_id_map")
 
-                    self.param_table.setItem(row_idx, col_idx, item)
+                # 保存原始图片数据，用于双击放大查看
+                self.original_images = image_map.copy()
 
-            # 应用合并单元格（对类别列）
-            self.apply_category_merge()
+                for row_idx, row_data in enumerate(all_rows):
+                    # 设置行高（如果该行有图片，设置更大的行高）
+                    has_image = any((row_idx, col) in image_map for col in range(9))
+                    if has_image:
+                        self.param_table.setRowHeight(row_idx, 140)  # 增大行高以显示更大的图片
+                    else:
+                        self.param_table.setRowHeight(row_idx, 40)  # 确保文字不被裁剪
+
+                    for col_idx, value in enumerate(row_data):
+                        # 检查该位置是否有图片
+                        if (row_idx, col_idx) in image_map:
+                            # 创建带图片图标的item
+                            pixmap = image_map[(row_idx, col_idx)]
+                            # 缩放图片到合适大小（增大显示尺寸）
+                            scaled_pixmap = pixmap.scaled(
+                                120, 120,
+                                Qt.AspectRatioMode.KeepAspectRatio,
+                                Qt.TransformationMode.SmoothTransformation
+                            )
+                            icon = QIcon(scaled_pixmap)
+                            item = QTableWidgetItem(icon, "")
+                            item.setData(Qt.ItemDataRole.UserRole, "IMAGE")  # 标记为图片
+                            _image_log.debug("[Display] Showing image at ({},{})", row_idx, col_idx)
+                        elif value == "__IMAGE__":
+                            # 有图片标记但没找到实际图片
+                            item = QTableWidgetItem("[图片未提取]")
+                            logger.warning(f"[Warning] Failed to extract image at ({row_idx},{col_idx})")
+                        else:
+                            item = QTableWidgetItem(value)
+
+                        self.param_table.setItem(row_idx, col_idx, item)
+
+                # 应用合并单元格（对类别列）
+                self.apply_category_merge()
+                timing.update(rows=len(all_rows), images=len(image_map))
 
             image_count = len(image_map)
             dispimg_count = len(dispimg_id_map)
@@ -839,9 +925,8 @@ class RegulationDetailDialog(QDialog):
         except ImportError:
             QMessageBox.critical(self, "错误", "需要: pip install openpyxl")
         except Exception as e:
+            logger.exception(f"导入参数表失败: {e}")
             QMessageBox.critical(self, "错误", f"导入失败:\n{str(e)}")
-            import traceback
-            traceback.print_exc()
 
     def save_parameters(self):
         """保存参数到数据库"""
@@ -852,78 +937,46 @@ class RegulationDetailDialog(QDialog):
             return
 
         try:
-            from client.models import RegulationParameter
-            from pathlib import Path
-
-            # 创建图片存储目录
-            param_images_dir = Path("data") / "parameter_images" / str(self.regulation_id)
-            param_images_dir.mkdir(parents=True, exist_ok=True)
-
-            # 删除现有参数（但保留旧图片文件）
-            self.db.query(RegulationParameter).filter(
-                RegulationParameter.regulation_id == self.regulation_id
-            ).delete()
-
-            # 保存新参数
-            saved_count = 0
-            for row in range(row_count):
-                # 处理图片单元格：如果单元格被标记为图片，保存图片到文件
+            with profiler.action("保存参数"):
+                # 处理图片单元格：图片按内容存放，内容不变时路径不变（该行不产生新版本），
+                # 修改后写到新路径，旧版本参数引用的图片文件不会被覆盖
                 def get_cell_value(row, col):
                     item = self.param_table.item(row, col)
                     if not item:
                         return ""
                     # 检查是否是图片单元格
                     if item.data(Qt.ItemDataRole.UserRole) == "IMAGE":
-                        # 保存图片到文件
                         if hasattr(self, 'original_images') and (row, col) in self.original_images:
-                            pixmap = self.original_images[(row, col)]
-                            image_filename = f"image_{row}_{col}.png"
-                            image_path = param_images_dir / image_filename
-
-                            # 保存图片
-                            pixmap.save(str(image_path), "PNG")
+                            buffer = QBuffer()
+                            buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+                            self.original_images[(row, col)].save(buffer, "PNG")
+                            image_path = self.regulation_service.save_parameter_image(bytes(buffer.data()))
 
                             # 返回图片路径标记
                             return f"IMAGE:{image_path}"
                         return "[图片]"
                     return item.text()
 
-                category = get_cell_value(row, 0)
-                parameter = get_cell_value(row, 1)
-                default_val = get_cell_value(row, 2)
-                lower = get_cell_value(row, 3)
-                upper = get_cell_value(row, 4)
-                unit = get_cell_value(row, 5)
-                coefficient = get_cell_value(row, 6)
-                protocol_bit = get_cell_value(row, 7)
-                remark = get_cell_value(row, 8)
-
-                param = RegulationParameter(
-                    regulation_id=self.regulation_id,
-                    category=category,
-                    parameter_name=parameter,
-                    default_value=default_val,
-                    upper_limit=upper,
-                    lower_limit=lower,
-                    unit=unit,
-                    coefficient=coefficient,
-                    protocol_bit=protocol_bit,
-                    remark=remark,
-                    row_order=row
-                )
-                self.db.add(param)
-                saved_count += 1
-
-            # 提交
-            self.db.commit()
-
-            # 记录历史
-            if self.user_id:
-                ChangeHistory.create_change_record(
-                    self.db, EntityType.REGULATION, self.regulation_id,
-                    ChangeType.UPDATE, {"parameter_count": saved_count},
-                    f"编辑参数: 保存了 {saved_count} 个参数", self.user_id
+                rows = []
+                for row in range(row_count):
+                    rows.append({
+                        "category": get_cell_value(row, 0),
+                        "parameter_name": get_cell_value(row, 1),
+                        "default_value": get_cell_value(row, 2),
+                        "lower_limit": get_cell_value(row, 3),
+                        "upper_limit": get_cell_value(row, 4),
+                        "unit": get_cell_value(row, 5),
+                        "coefficient": get_cell_value(row, 6),
+                        "protocol_bit": get_cell_value(row, 7),
+                        "remark": get_cell_value(row, 8),
+                    })
+
+                success, message, saved_count = self.regulation_service.save_parameters(
+                    self.regulation_id, rows, self.user_id
                 )
+            if not success:
+                QMessageBox.critical(self, "保存失败", message)
+                return
 
             QMessageBox.information(
                 self, "保存成功",
@@ -931,86 +984,51 @@ class RegulationDetailDialog(QDialog):
             )
 
         except Exception as e:
-            self.db.rollback()
             QMessageBox.critical(self, "保存失败", f"保存失败:\n{str(e)}")
 
     def load_saved_parameters(self):
-        """加载已保存的参数"""
-        try:
-            from client.models import RegulationParameter
-            from pathlib import Path
-            from PyQt6.QtGui import QPixmap, QIcon
-
-            params = self.db.query(RegulationParameter).filter(
-                RegulationParameter.regulation_id == self.regulation_id
-            ).order_by(RegulationParameter.row_order).all()
+        """加载已保存的参数（读取参数和图片在后台进行）"""
+        self.start_load(self.parameters_tab, self.show_parameters,
+                        load_parameter_rows, self.regulation_service, self.regulation_id)
+
+    def show_parameters(self, result: tuple):
+        """显示参数：图片单元格显示缩略图，原图保存用于双击查看"""
+        rows, images = result
+        if not rows:
+            return
 
-            if params and len(params) > 0:
+        with profiler.action("显示参数", rows=len(rows), images=len(images)):
+            self.param_table.setUpdatesEnabled(False)
+            try:
                 self.param_table.setRowCount(0)
                 self.param_table.clearSpans()
-
-                # 用于处理每个单元格的函数
-                def create_table_item(value, row_idx, col_idx):
-                    if value and isinstance(value, str) and value.startswith("IMAGE:"):
-                        # 这是图片路径
-                        image_path_str = value[6:]  # 去掉"IMAGE:"前缀
-                        image_path = Path(image_path_str)
-
-                        if image_path.exists():
-                            # 加载图片
-                            pixmap = QPixmap(str(image_path))
-                            if not pixmap.isNull():
-                                # 保存原始图片用于双击查看
-                                self.original_images[(row_idx, col_idx)] = pixmap
-
-                                # 缩放图片
-                                scaled_pixmap = pixmap.scaled(
-                                    120, 120,
-                                    Qt.AspectRatioMode.KeepAspectRatio,
-                                    Qt.TransformationMode.SmoothTransformation
-                                )
-                                icon = QIcon(scaled_pixmap)
-                                item = QTableWidgetItem(icon, "")
-                                item.setData(Qt.ItemDataRole.UserRole, "IMAGE")
-                                return item
-                        # 如果文件不存在或加载失败
-                        return QTableWidgetItem("[图片已丢失]")
-                    else:
-                        return QTableWidgetItem(value or "")
-
-                for row, param in enumerate(params):
-                    self.param_table.insertRow(row)
-
-                    # 检查每个单元格是否有图片
-                    has_image = any(
-                        val and isinstance(val, str) and val.startswith("IMAGE:")
-                        for val in [param.category, param.parameter_name, param.default_value,
-                                   param.upper_limit, param.lower_limit, param.unit,
-                                   param.coefficient, param.protocol_bit, param.remark]
-                    )
-
-                    # 设置行高
-                    if has_image:
-                        self.param_table.setRowHeight(row, 140)  # 有图片时使用更大的行高
-                    # 如果没有图片，不设置固定行高，让后面的 resizeRowsToContents() 自动调整
-
-                    self.param_table.setItem(row, 0, create_table_item(param.category, row, 0))
-                    self.param_table.setItem(row, 1, create_table_item(param.parameter_name, row, 1))
-                    self.param_table.setItem(row, 2, create_table_item(param.default_value, row, 2))
-                    self.param_table.setItem(row, 3, create_table_item(param.lower_limit, row, 3))
-                    self.param_table.setItem(row, 4, create_table_item(param.upper_limit, row, 4))
-                    self.param_table.setItem(row, 5, create_table_item(param.unit, row, 5))
-                    self.param_table.setItem(row, 6, create_table_item(param.coefficient, row, 6))
-                    self.param_table.setItem(row, 7, create_table_item(param.protocol_bit, row, 7))
-                    self.param_table.setItem(row, 8, create_table_item(param.remark, row, 8))
+                self.original_images = {}
+                self.param_table.setRowCount(len(rows))
+
+                for row, values in enumerate(rows):
+                    # 有图片的行使用更大的行高；没有图片的行由后面的 resizeRowsToContents() 自动调整
+                    if any(value.startswith("IMAGE:") for value in values):
+                        self.param_table.setRowHeight(row, 140)
+
+                    for col, value in enumerate(values):
+                        if (row, col) in images:
+                            original, thumbnail = images[(row, col)]
+                            self.original_images[(row, col)] = QPixmap.fromImage(original)
+                            item = QTableWidgetItem(QIcon(QPixmap.fromImage(thumbnail)), "")
+                            item.setData(Qt.ItemDataRole.UserRole, "IMAGE")
+                        elif value.startswith("IMAGE:"):
+                            # 图片文件不存在或加载失败
+                            item = QTableWidgetItem("[图片已丢失]")
+                        else:
+                            item = QTableWidgetItem(value)
+                        self.param_table.setItem(row, col, item)
 
                 self.apply_category_merge()
 
                 # 自动调整行高以适应文本内容（特别是备注列）
                 self.param_table.resizeRowsToContents()
-
-        except:
-            pass
+            finally:
+                self.param_table.setUpdatesEnabled(True)
 
     def apply_category_merge(self):
         """自动合并类别列"""
@@ -1046,100 +1064,21 @@ class RegulationDetailDialog(QDialog):
     def generate_c_code_from_regulation(self):
         """生成C代码文件"""
         try:
-            # 读取模板文件
-            template_path = Path(__file__).resolve().parent.parent.parent / "Satety_Parameter.c"
-            if not template_path.exists():
-                QMessageBox.critical(self, "错误", f"模板文件不存在: {template_path}")
+            # 模板文件位于程序根目录
+            if not TEMPLATE_PATH.exists():
+                QMessageBox.critical(self, "错误", f"模板文件不存在: {TEMPLATE_PATH}")
                 return
 
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_lines = f.readlines()
-
-            # 收集表格数据，按协议位建立索引
-            # 列索引：0类别, 1参数, 2默认值, 3下限, 4上限, 5单位, 6系数, 7协议位, 8备注
-            protocol_data = {}
+            # 列索引：2默认值, 6系数, 7协议位
+            rows = []
             for row in range(self.param_table.rowCount()):
-                protocol_item = self.param_table.item(row, 7)  # 协议位
-                default_item = self.param_table.item(row, 2)   # 默认值
-                coef_item = self.param_table.item(row, 6)      # 系数
-
-                protocol = protocol_item.text().strip() if protocol_item else ""
-                default_val = default_item.text().strip() if default_item else ""
-                coef = coef_item.text().strip() if coef_item else ""
-
-                # 如果协议位是"-"或为空，跳过
-                if protocol == "-" or not protocol:
-                    continue
-
-                # 如果默认值是"-"或为空，设置为0
-                if default_val == "-" or not default_val:
-                    calculated_value = 0
-                else:
-                    try:
-                        # 计算：默认值 / 系数
-                        if coef and coef != "-" and float(coef) != 0:
-                            calculated_value = float(default_val) / float(coef)
-                        else:
-                            calculated_value = float(default_val)
-
-                        # 四舍五入取整
-                        calculated_value = int(round(calculated_value))
-                    except (ValueError, ZeroDivisionError):
-                        calculated_value = 0
-
-                protocol_data[protocol] = calculated_value
-
-            # 生成新的C代码
-            new_lines = []
-            for i, line in enumerate(template_lines):
-                # 跳过前4行（注释和列标题）
-                if i < 4:
-                    new_lines.append(line)
-                    continue
-
-                # 最后一行
-                if line.strip() == "};":
-                    new_lines.append(line)
-                    continue
-
-                # 解析数据行
-                if "//" in line and "{" in line:
-                    # 提取注释部分的协议位
-                    comment_part = line.split("//")[1].strip()
-                    protocol_match = comment_part.split()[0] if comment_part else ""
-
-                    # 查找协议位对应的值
-                    if protocol_match in protocol_data:
-                        value = protocol_data[protocol_match]
-                    else:
-                        value = 0
-
-                    # 处理负数
-                    if value < 0:
-                        default_str = f"(Uint16){value}"
-                    else:
-                        default_str = str(value)
-
-                    # 重新构建这一行，保留原来的MIN、MAX和注释
-                    # 提取原来的MIN和MAX
-                    data_part = line.split("{")[1].split("}")[0]
-                    parts = [p.strip() for p in data_part.split(",")]
-
-                    if len(parts) >= 3:
-                        min_val = parts[1]
-                        max_val = parts[2]
-                    else:
-                        min_val = "32768"
-                        max_val = "32767"
-
-                    # 提取完整注释
-                    full_comment = line.split("//")[1] if "//" in line else ""
+                values = {}
+                for field, col in (("default_value", 2), ("coefficient", 6), ("protocol_bit", 7)):
+                    item = self.param_table.item(row, col)
+                    values[field] = item.text() if item else ""
+                rows.append(values)
 
-                    # 格式化新行
-                    new_line = f"    {{   {default_str:<7} ,   {min_val:<6} ,   {max_val:<6} }},   // {full_comment}"
-                    new_lines.append(new_line)
-                else:
-                    new_lines.append(line)
+            new_lines = generate_c_code(rows)
 
             # 选择保存路径
             file_path, _ = QFileDialog.getSaveFileName(
@@ -1157,9 +1096,3 @@ class RegulationDetailDialog(QDialog):
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"生成失败:\n{str(e)}")
-
-    def closeEvent(self, event):
-        """关闭事件"""
-        if hasattr(self, 'db'):
-            self.db.close()
-        event.accept()
\ No newline at end of file
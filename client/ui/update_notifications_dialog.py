@@ -2,12 +2,14 @@
 更新通知列表对话框
 """
 import sys
+import threading
 from pathlib import Path
+from urllib.parse import urlparse, unquote
 import webbrowser
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
     QListWidget, QListWidgetItem, QLabel, QMessageBox,
-    QTextEdit, QGroupBox, QProgressBar
+    QTextEdit, QGroupBox, QProgressBar, QFileDialog
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
@@ -17,6 +19,10 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 from client.services import UpdateService
 
 
+# 通知列表每页数量
+NOTIFICATIONS_PAGE_SIZE = 50
+
+
 class CheckUpdateWorker(QThread):
     """检查更新工作线程"""
     finished = pyqtSignal(bool, object)  # (成功, 更新信息)
@@ -27,10 +33,51 @@ class CheckUpdateWorker(QThread):
 
     def run(self):
         """执行检查"""
-        has_update, update_info = self.update_service.check_for_updates()
+        # 手动检查不受失败退避限制
+        has_update, update_info = self.update_service.check_for_updates(force=True)
         self.finished.emit(has_update, update_info)
 
 
+class DownloadUpdateWorker(QThread):
+    """下载更新工作线程"""
+    progress = pyqtSignal(int, int)  # (已下载字节, 总字节)
+    finished = pyqtSignal(bool, str)  # (成功, 消息)
+
+    def __init__(self, update_service: UpdateService, download_url: str = None,
+                 save_path: str = None, expected_sha256: str = None,
+                 delta_update_info: dict = None):
+        super().__init__()
+        self.update_service = update_service
+        self.download_url = download_url
+        self.save_path = save_path
+        self.expected_sha256 = expected_sha256
+        self.delta_update_info = delta_update_info  # 不为空时下载并安装增量补丁
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        """执行下载"""
+        if self.delta_update_info:
+            success, message = self.update_service.apply_delta_update(
+                self.delta_update_info,
+                progress_callback=self.progress.emit,
+                cancel_event=self.cancel_event,
+            )
+            self.finished.emit(success, message)
+            return
+
+        success, message = self.update_service.download_update(
+            self.download_url, self.save_path,
+            progress_callback=self.progress.emit,
+            expected_sha256=self.expected_sha256,
+            cancel_event=self.cancel_event,
+        )
+        self.finished.emit(success, message)
+
+    def cancel(self):
+        """取消下载，已下载部分保留，下次继续"""
+        self.cancel_event.set()
+
+
 class UpdateNotificationsDialog(QDialog):
     """更新通知列表对话框"""
 
@@ -38,7 +85,9 @@ class UpdateNotificationsDialog(QDialog):
         super().__init__(parent)
         self.update_service = update_service
         self.check_worker = None
+        self.download_worker = None
         self.latest_update_info = None
+        self.next_cursor = None  # 下一页游标，None 表示没有更多通知
         self.init_ui()
         self.load_notifications()
 
@@ -115,10 +164,18 @@ class UpdateNotificationsDialog(QDialog):
         self.list_widget.itemDoubleClicked.connect(self.mark_as_read)
         layout.addWidget(self.list_widget)
 
-        # 提示文字
+        # 提示文字和加载更多
+        hint_layout = QHBoxLayout()
         hint = QLabel("双击通知标记为已读")
         hint.setStyleSheet("color: #888; font-size: 11px;")
-        layout.addWidget(hint)
+        hint_layout.addWidget(hint)
+        hint_layout.addStretch()
+
+        self.load_more_btn = QPushButton("加载更多")
+        self.load_more_btn.setVisible(False)
+        self.load_more_btn.clicked.connect(self.load_more_notifications)
+        hint_layout.addWidget(self.load_more_btn)
+        layout.addLayout(hint_layout)
 
         # 按钮
         button_layout = QHBoxLayout()
@@ -151,9 +208,12 @@ class UpdateNotificationsDialog(QDialog):
         self.setLayout(layout)
 
     def load_notifications(self):
-        """加载通知列表"""
+        """加载通知列表（第一页）"""
         self.list_widget.clear()
-        notifications = self.update_service.get_all_notifications()
+        notifications, self.next_cursor = self.update_service.get_notifications_page(
+            limit=NOTIFICATIONS_PAGE_SIZE
+        )
+        self.load_more_btn.setVisible(self.next_cursor is not None)
 
         if not notifications:
             item = QListWidgetItem("暂无更新通知")
@@ -161,6 +221,20 @@ class UpdateNotificationsDialog(QDialog):
             self.list_widget.addItem(item)
             return
 
+        self.append_notifications(notifications)
+
+    def load_more_notifications(self):
+        """加载下一页通知"""
+        if self.next_cursor is None:
+            return
+        notifications, self.next_cursor = self.update_service.get_notifications_page(
+            cursor=self.next_cursor, limit=NOTIFICATIONS_PAGE_SIZE
+        )
+        self.load_more_btn.setVisible(self.next_cursor is not None)
+        self.append_notifications(notifications)
+
+    def append_notifications(self, notifications):
+        """追加通知到列表"""
         for notif in notifications:
             # 创建列表项
             type_text = "软件更新" if notif.type == "software" else "法规更新"
@@ -277,40 +351,109 @@ class UpdateNotificationsDialog(QDialog):
             )
 
     def download_update(self):
-        """下载更新"""
+        """下载更新（支持断点续传，再次点击同一版本时继续上次的下载）"""
+        if self.download_worker and self.download_worker.isRunning():
+            self.download_worker.cancel()
+            return
+
         if not self.latest_update_info:
             QMessageBox.warning(self, "错误", "没有可用的更新信息")
             return
 
+        patch = self.update_service.get_delta_patch(self.latest_update_info)
+        if patch:
+            reply = QMessageBox.question(
+                self,
+                "增量更新",
+                f"可以只下载变化的文件完成更新（约 {(patch.get('size') or 0) / (1024 * 1024):.1f} MB）。\n\n"
+                f"是否立即安装？选择【否】将下载完整安装包。",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.start_download_worker(DownloadUpdateWorker(
+                    self.update_service, delta_update_info=self.latest_update_info
+                ))
+                return
+
         download_url = self.latest_update_info.get('download_url')
         if not download_url:
             QMessageBox.warning(self, "错误", "没有找到下载链接")
             return
 
-        # 打开浏览器下载
+        file_name = unquote(Path(urlparse(download_url).path).name) or "SafetyManager-update"
+        default_path = Path.home() / "Downloads" / file_name
+        save_path, _ = QFileDialog.getSaveFileName(self, "保存更新文件", str(default_path))
+        if not save_path:
+            return
+
+        self.start_download_worker(DownloadUpdateWorker(
+            self.update_service, download_url, save_path,
+            expected_sha256=self.latest_update_info.get('sha256')
+        ))
+
+    def start_download_worker(self, worker: DownloadUpdateWorker):
+        """启动下载线程"""
+        self.download_btn.setText("取消下载")
+        self.ignore_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_label.setVisible(True)
+        self.progress_label.setText("正在下载更新...")
+
+        self.download_worker = worker
+        self.download_worker.progress.connect(self.on_download_progress)
+        self.download_worker.finished.connect(self.on_download_finished)
+        self.download_worker.start()
+
+    def on_download_progress(self, downloaded: int, total: int):
+        """下载进度"""
+        self.progress_bar.setValue(int(downloaded * 100 / total))
+        self.progress_label.setText(
+            f"正在下载更新... {downloaded / (1024 * 1024):.1f} MB / {total / (1024 * 1024):.1f} MB"
+        )
+
+    def on_download_finished(self, success: bool, message: str):
+        """下载完成"""
+        save_path = self.download_worker.save_path
+        is_delta = self.download_worker.delta_update_info is not None
+        self.download_btn.setText("下载更新")
+        self.ignore_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        self.progress_label.setVisible(False)
+
+        if success and is_delta:
+            QMessageBox.information(self, "更新完成", f"{message}\n\n重启程序后新版本生效。")
+            return
+
+        if success:
+            QMessageBox.information(
+                self,
+                "下载完成",
+                f"新版本已下载到:\n{save_path}\n\n"
+                "安装步骤：\n"
+                "1. 解压下载的文件\n"
+                "2. 关闭当前程序\n"
+                "3. 用新版本覆盖旧版本\n"
+                "4. 重新启动程序"
+            )
+            return
+
+        if message == "下载已取消":
+            QMessageBox.information(self, "已取消", "下载已取消，再次点击【下载更新】可继续下载")
+            return
+
         reply = QMessageBox.question(
             self,
-            "下载更新",
-            f"即将打开浏览器下载新版本 {self.latest_update_info.get('version')}\n\n"
-            f"下载完成后，请手动解压并替换程序文件。\n\n"
-            f"是否继续？",
+            "下载失败",
+            f"{message}\n\n是否改用浏览器下载？",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.Yes
         )
-
         if reply == QMessageBox.StandardButton.Yes:
             try:
-                webbrowser.open(download_url)
-                QMessageBox.information(
-                    self,
-                    "提示",
-                    "已在浏览器中打开下载链接。\n\n"
-                    "下载完成后：\n"
-                    "1. 解压下载的文件\n"
-                    "2. 关闭当前程序\n"
-                    "3. 用新版本覆盖旧版本\n"
-                    "4. 重新启动程序"
-                )
+                webbrowser.open(self.latest_update_info.get('download_url'))
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"打开浏览器失败: {str(e)}")
 
@@ -333,6 +476,10 @@ class UpdateNotificationsDialog(QDialog):
 
     def closeEvent(self, event):
         """对话框关闭时自动标记所有通知为已读"""
+        if self.download_worker and self.download_worker.isRunning():
+            # 中止下载，已下载部分保留用于续传
+            self.download_worker.cancel()
+            self.download_worker.wait()
         # 自动将所有通知标记为已读
         self.update_service.mark_all_as_read()
         event.accept()
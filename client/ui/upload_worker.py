@@ -0,0 +1,58 @@
+"""
+文件上传工作线程
+"""
+import sys
+from pathlib import Path
+from typing import Callable
+from PyQt6.QtWidgets import QProgressDialog, QWidget
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.models import remove_session
+
+
+class UploadWorker(QThread):
+    """
+    上传工作线程
+
+    在后台调用 RegulationService.add_document / add_code_file，
+    复制和哈希计算期间界面保持响应
+    """
+    progress = pyqtSignal(int, int)  # (已复制字节, 总字节)
+    finished = pyqtSignal(bool, str)  # (成功, 消息)
+
+    def __init__(self, upload_func: Callable, *args, **kwargs):
+        super().__init__()
+        self.upload_func = upload_func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        """执行上传"""
+        try:
+            success, message, _ = self.upload_func(
+                *self.args, progress_callback=self.progress.emit, **self.kwargs
+            )
+        except Exception as e:
+            success, message = False, f"上传失败: {str(e)}"
+        finally:
+            # 工作线程的会话随线程结束释放
+            remove_session()
+        self.finished.emit(success, message)
+
+    def start_with_progress(self, parent: QWidget, label: str) -> QProgressDialog:
+        """显示进度对话框并启动线程（对话框为窗口模态，上传完成前不能关闭父窗口）"""
+        dialog = QProgressDialog(label, None, 0, 100, parent)
+        dialog.setWindowTitle("上传文件")
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(300)  # 小文件很快完成，不闪现进度框
+        dialog.setAutoClose(False)
+        dialog.setValue(0)
+
+        self.progress.connect(
+            lambda copied, total: dialog.setValue(int(copied * 100 / total) if total else 100)
+        )
+        self.finished.connect(lambda *_: dialog.close())
+        self.start()
+        return dialog
@@ -1,16 +1,20 @@
 """
 工具类模块
+
+按需导入：访问 client.utils.PDFParser 等属性时才导入对应子模块，
+导入本包不会加载 PDF/Word 解析库和导入导出模块
 """
-from .file_handler import FileHandler
-from .pdf_parser import PDFParser
-from .docx_parser import DocxParser
-from .data_exporter import DataExporter
-from .data_importer import DataImporter
+from client.lazy_import import make_lazy_getattr
+
+# 导出名称 -> 子模块
+_LAZY_ATTRS = {
+    "FileHandler": ".file_handler",
+    "PDFParser": ".pdf_parser",
+    "DocxParser": ".docx_parser",
+    "DataExporter": ".data_exporter",
+    "DataImporter": ".data_importer",
+}
+
+__all__ = list(_LAZY_ATTRS)
 
-__all__ = [
-    "FileHandler",
-    "PDFParser",
-    "DocxParser",
-    "DataExporter",
-    "DataImporter",
-]
\ No newline at end of file
+__getattr__, __dir__ = make_lazy_getattr(__name__, _LAZY_ATTRS)
@@ -0,0 +1,123 @@
+"""
+内容寻址文件存储
+上传的文件按 SHA-256 只保存一份，文档和代码文件记录直接引用存储路径
+"""
+import os
+import sys
+import time
+import hashlib
+import uuid
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import DATA_DIR
+from client.utils.file_handler import FileHandler
+
+
+BLOBS_DIR = DATA_DIR / "blobs"
+# 最近写入或复用的存储文件在这段时间内不清理（秒）：
+# 上传时 put() 之后、记录写入数据库之前，存储文件还没有被引用
+GC_GRACE_SECONDS = 3600
+
+# put() 判断复用和 collect_garbage() 删除文件互斥（同一进程内）
+_store_lock = threading.Lock()
+
+
+class BlobStore:
+    """
+    内容寻址存储
+
+    文件保存在 blobs/<哈希前两位>/<哈希><扩展名>，相同内容只保存一次；
+    记录的 file_path 即存储路径，原文件名只保存在 file_name 中，不依赖文件系统的硬链接
+    """
+
+    def __init__(self, root: Path = BLOBS_DIR):
+        self.root = Path(root)
+
+    def blob_path(self, sha256: str, suffix: str = "") -> Path:
+        return self.root / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+    def put(self, source: str,
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> Tuple[Path, int, str]:
+        """
+        流式复制文件到存储区并计算哈希，内容已存在时丢弃本次副本
+
+        Returns:
+            (存储路径, 文件大小, SHA-256)
+        """
+        source = Path(source)
+        temp_file = self.root / "tmp" / f"{uuid.uuid4().hex}.part"
+        try:
+            sha256 = FileHandler.copy_with_sha256(str(source), str(temp_file), progress_callback)
+            size = temp_file.stat().st_size
+            blob = self._store(temp_file, self.blob_path(sha256, source.suffix), source.name)
+            return blob, size, sha256
+        finally:
+            temp_file.unlink(missing_ok=True)
+
+    def put_bytes(self, data: bytes, suffix: str = "") -> Tuple[Path, int, str]:
+        """保存内存中的内容（如界面中编辑的图片），返回值同 put()"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        temp_file = self.root / "tmp" / f"{uuid.uuid4().hex}.part"
+        try:
+            temp_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file.write_bytes(data)
+            blob = self.blob_path(sha256, suffix)
+            return self._store(temp_file, blob, blob.name), len(data), sha256
+        finally:
+            temp_file.unlink(missing_ok=True)
+
+    def _store(self, temp_file: Path, blob: Path, name: str) -> Path:
+        """把临时文件移入存储区，内容已存在时丢弃临时文件"""
+        with _store_lock:
+            if blob.exists():
+                temp_file.unlink()
+                # 更新修改时间，清理时按刚写入处理
+                os.utime(blob)
+                logger.info(f"文件内容已存在，复用: {name}")
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                temp_file.replace(blob)
+        return blob
+
+    @staticmethod
+    def sha256_of(path: str) -> Optional[str]:
+        """由存储路径（<哈希前两位>/<哈希><扩展名>）得出 SHA-256，不是存储路径时返回 None"""
+        path = Path(path)
+        sha256 = path.name.split(".", 1)[0].lower()
+        if len(sha256) != 64 or path.parent.name != sha256[:2]:
+            return None
+        return sha256
+
+    def collect_garbage(self, referenced: Iterable[str], grace_seconds: float = GC_GRACE_SECONDS) -> int:
+        """
+        删除未被引用的存储文件，返回删除数量
+
+        是否引用以数据库中记录的 SHA-256 为准；
+        修改时间在 grace_seconds 内的文件和临时文件保留，正在上传、尚未写入数据库的文件不会被删除
+
+        Args:
+            referenced: 仍被引用的 SHA-256
+        """
+        removed = 0
+        if not self.root.exists():
+            return removed
+        referenced = {sha256.lower() for sha256 in referenced if sha256}
+        cutoff = time.time() - grace_seconds
+        with _store_lock:
+            for path in list(self.root.glob("??/*")) + list(self.root.glob("tmp/*.part")):
+                if path.parent.name != "tmp" and path.name.split(".", 1)[0].lower() in referenced:
+                    continue
+                try:
+                    if path.is_file() and path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"清理存储文件失败: {path}, {e}")
+        if removed:
+            logger.info(f"已清理 {removed} 个未引用的存储文件")
+        return removed
@@ -0,0 +1,120 @@
+"""
+参数 C 代码生成
+根据参数表的默认值和系数，按协议位填充 C 模板（Satety_Parameter.c）中的默认值列
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from client.utils.profiler import profiled
+
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent.parent / "Satety_Parameter.c"
+# 模板开头的注释和列标题行数，原样保留
+TEMPLATE_HEADER_LINES = 4
+
+
+def calculate_protocol_values(rows: Iterable[dict]) -> Dict[str, int]:
+    """
+    按协议位计算写入 C 代码的值：默认值 / 系数，四舍五入取整
+
+    Args:
+        rows: 参数行，使用 default_value、coefficient、protocol_bit 字段（值为表格中的文本）
+
+    Returns:
+        {协议位: 值}；协议位为空或 "-" 的行跳过，默认值为空、"-" 或无法解析时取 0
+    """
+    protocol_values = {}
+    for row in rows:
+        protocol = (row.get("protocol_bit") or "").strip()
+        default_val = (row.get("default_value") or "").strip()
+        coef = (row.get("coefficient") or "").strip()
+
+        # 如果协议位是"-"或为空，跳过
+        if protocol == "-" or not protocol:
+            continue
+
+        # 如果默认值是"-"或为空，设置为0
+        if default_val == "-" or not default_val:
+            calculated_value = 0
+        else:
+            try:
+                # 计算：默认值 / 系数
+                if coef and coef != "-" and float(coef) != 0:
+                    calculated_value = float(default_val) / float(coef)
+                else:
+                    calculated_value = float(default_val)
+
+                # 四舍五入取整
+                calculated_value = int(round(calculated_value))
+            except (ValueError, ZeroDivisionError):
+                calculated_value = 0
+
+        protocol_values[protocol] = calculated_value
+    return protocol_values
+
+
+def render_c_code(template_lines: List[str], protocol_values: Dict[str, int]) -> List[str]:
+    """
+    用协议位的值重写模板中的数据行 "{ 默认值 , MIN , MAX },   // 协议位 说明"
+
+    保留原来的 MIN、MAX 和注释；模板中没有对应参数的协议位写 0
+    """
+    new_lines = []
+    for i, line in enumerate(template_lines):
+        # 跳过前4行（注释和列标题）
+        if i < TEMPLATE_HEADER_LINES:
+            new_lines.append(line)
+            continue
+
+        # 最后一行
+        if line.strip() == "};":
+            new_lines.append(line)
+            continue
+
+        # 解析数据行
+        if "//" in line and "{" in line:
+            # 提取注释部分的协议位
+            comment_part = line.split("//")[1].strip()
+            protocol_match = comment_part.split()[0] if comment_part else ""
+
+            # 查找协议位对应的值
+            value = protocol_values.get(protocol_match, 0)
+
+            # 处理负数
+            if value < 0:
+                default_str = f"(Uint16){value}"
+            else:
+                default_str = str(value)
+
+            # 重新构建这一行，保留原来的MIN、MAX和注释
+            # 提取原来的MIN和MAX
+            data_part = line.split("{")[1].split("}")[0]
+            parts = [p.strip() for p in data_part.split(",")]
+
+            if len(parts) >= 3:
+                min_val = parts[1]
+                max_val = parts[2]
+            else:
+                min_val = "32768"
+                max_val = "32767"
+
+            # 提取完整注释
+            full_comment = line.split("//")[1]
+
+            # 格式化新行
+            new_line = f"    {{   {default_str:<7} ,   {min_val:<6} ,   {max_val:<6} }},   // {full_comment}"
+            new_lines.append(new_line)
+        else:
+            new_lines.append(line)
+    return new_lines
+
+
+@profiled("生成C代码")
+def generate_c_code(rows: Iterable[dict], template_path: Path = TEMPLATE_PATH) -> List[str]:
+    """读取模板并生成 C 代码行（模板不存在时抛出 FileNotFoundError）"""
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template_lines = f.readlines()
+    return render_c_code(template_lines, calculate_protocol_values(rows))
@@ -8,27 +8,26 @@ import csv
 from datetime import datetime
 from typing import List, Optional
 from loguru import logger
+from sqlalchemy.orm import selectinload
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import SessionLocal, Regulation
+from client.models import Regulation, session_scope
 
 
 class DataExporter:
     """数据导出工具"""
 
-    def __init__(self):
-        self.db = SessionLocal()
-
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
+    def _load_regulations(self) -> List[Regulation]:
+        """读取全部法规（标签一并批量查出，导出时不再逐条查询）"""
+        with session_scope() as db:
+            return db.query(Regulation).options(selectinload(Regulation.tags)).all()
 
     def export_to_json(self, output_path: str, regulations: Optional[List[Regulation]] = None) -> tuple[bool, str]:
         """导出为JSON格式"""
         try:
             if regulations is None:
-                regulations = self.db.query(Regulation).all()
+                regulations = self._load_regulations()
 
             data = {
                 "export_time": datetime.now().isoformat(),
@@ -64,7 +63,7 @@ class DataExporter:
         """导出为CSV格式"""
         try:
             if regulations is None:
-                regulations = self.db.query(Regulation).all()
+                regulations = self._load_regulations()
 
             fieldnames = ['法规编号', '法规名称', '国家/地区', '分类', '状态', '版本', '标签', '描述']
 
@@ -101,7 +100,7 @@ class DataExporter:
                 return False, "需要安装openpyxl库: pip install openpyxl"
 
             if regulations is None:
-                regulations = self.db.query(Regulation).all()
+                regulations = self._load_regulations()
 
             wb = Workbook()
             ws = wb.active
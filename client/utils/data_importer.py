@@ -5,13 +5,14 @@ import sys
 from pathlib import Path
 import json
 import csv
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Iterable
 from loguru import logger
+from sqlalchemy.orm import selectinload
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from client.models import SessionLocal, Regulation, Tag
-from shared.constants import RegulationStatus
+from client.models import Regulation, Tag, ChangeHistory, session_scope, chunked
+from shared.constants import RegulationStatus, EntityType, ChangeType
 from client.services import RegulationService
 
 
@@ -19,12 +20,50 @@ class DataImporter:
     """数据导入工具"""
 
     def __init__(self):
-        self.db = SessionLocal()
         self.regulation_service = RegulationService()
 
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
+    @staticmethod
+    def _preload(db, codes: Iterable[str]) -> Tuple[Dict[str, Regulation], Dict[str, Tag]]:
+        """
+        一次查出文件中已存在的法规（连同标签）和全部标签，避免逐行查询（N+1）
+
+        新建的法规和标签也要放入返回的字典：会话不自动 flush，
+        同一文件中重复出现的编号或标签查询不到尚未写入的对象
+        """
+        regulations = {}
+        for chunk in chunked(sorted(set(codes))):
+            query = db.query(Regulation).options(selectinload(Regulation.tags)).filter(Regulation.code.in_(chunk))
+            regulations.update((regulation.code, regulation) for regulation in query)
+        tags = {tag.name: tag for tag in db.query(Tag)}
+        return regulations, tags
+
+    @staticmethod
+    def _get_tag(db, tags: Dict[str, Tag], name: str) -> Tag:
+        """按名称取标签，不存在时新建"""
+        tag = tags.get(name)
+        if tag is None:
+            tag = tags[name] = Tag(name=name)
+            db.add(tag)
+        return tag
+
+    @staticmethod
+    def _record_history(db, imported: List[tuple], user_id: int):
+        """为导入的法规记录历史（与导入数据同一事务，只需一次 flush 分配新法规的 ID）"""
+        if not imported or not user_id:
+            return
+        db.flush()
+        created, updated = [], []
+        for regulation, old_data in imported:
+            new_data = regulation.to_dict()
+            if old_data is None:
+                created.append((regulation.id, {}, f"导入法规: {regulation.name}", new_data))
+            else:
+                updated.append((
+                    regulation.id, {"changed": ChangeHistory.diff(old_data, new_data)},
+                    f"导入更新法规: {regulation.name}", new_data
+                ))
+        ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.CREATE, created, user_id)
+        ChangeHistory.create_change_records(db, EntityType.REGULATION, ChangeType.UPDATE, updated, user_id)
 
     def import_from_json(self, file_path: str, user_id: int,
                         overwrite: bool = False) -> Tuple[bool, str, Dict]:
@@ -55,96 +94,91 @@ class DataImporter:
                 'errors': []
             }
 
-            for reg_data in regulations_data:
-                try:
-                    code = reg_data.get('code')
-                    if not code:
+            # 整个文件作为一个工作单元，全部成功后提交
+            with session_scope() as db:
+                existing_regulations, tags = self._preload(
+                    db, (reg_data['code'] for reg_data in regulations_data if reg_data.get('code'))
+                )
+                imported = []  # (法规, 导入前的数据)，用于记录历史
+                for reg_data in regulations_data:
+                    try:
+                        code = reg_data.get('code')
+                        if not code:
+                            stats['failed'] += 1
+                            stats['errors'].append("缺少法规编号")
+                            continue
+
+                        # 检查是否已存在
+                        existing = existing_regulations.get(code)
+
+                        if existing and not overwrite:
+                            stats['skipped'] += 1
+                            continue
+
+                        if existing and overwrite:
+                            # 更新现有法规
+                            old_data = existing.to_dict()
+                            existing.name = reg_data.get('name', existing.name)
+                            existing.country = reg_data.get('country')
+                            existing.category = reg_data.get('category')
+                            existing.description = reg_data.get('description')
+                            existing.version = reg_data.get('version')
+
+                            # 更新状态
+                            status_value = reg_data.get('status', 'active')
+                            try:
+                                existing.status = RegulationStatus(status_value)
+                            except ValueError:
+                                existing.status = RegulationStatus.ACTIVE
+
+                            # 更新标签
+                            if 'tags' in reg_data:
+                                existing.tags.clear()
+                                for tag_name in reg_data.get('tags', []):
+                                    existing.tags.append(self._get_tag(db, tags, tag_name))
+
+                            imported.append((existing, old_data))
+                            stats['success'] += 1
+                        else:
+                            # 创建新法规
+                            status_value = reg_data.get('status', 'active')
+                            try:
+                                status = RegulationStatus(status_value)
+                            except ValueError:
+                                status = RegulationStatus.ACTIVE
+
+                            regulation = Regulation(
+                                code=code,
+                                name=reg_data.get('name', ''),
+                                country=reg_data.get('country'),
+                                category=reg_data.get('category'),
+                                description=reg_data.get('description'),
+                                status=status,
+                                version=reg_data.get('version'),
+                                created_by=user_id,
+                                # 没有标签时也初始化标签列表，记录历史时不会再去数据库查询
+                                tags=[self._get_tag(db, tags, tag_name) for tag_name in reg_data.get('tags', [])]
+                            )
+
+                            db.add(regulation)
+                            existing_regulations[code] = regulation
+                            imported.append((regulation, None))
+                            stats['success'] += 1
+
+                    except Exception as e:
+                        logger.error(f"导入法规失败: {reg_data.get('code', 'unknown')}, {e}")
                         stats['failed'] += 1
-                        stats['errors'].append("缺少法规编号")
-                        continue
-
-                    # 检查是否已存在
-                    existing = self.db.query(Regulation).filter(
-                        Regulation.code == code
-                    ).first()
-
-                    if existing and not overwrite:
-                        stats['skipped'] += 1
-                        continue
-
-                    if existing and overwrite:
-                        # 更新现有法规
-                        existing.name = reg_data.get('name', existing.name)
-                        existing.country = reg_data.get('country')
-                        existing.category = reg_data.get('category')
-                        existing.description = reg_data.get('description')
-                        existing.version = reg_data.get('version')
-
-                        # 更新状态
-                        status_value = reg_data.get('status', 'active')
-                        try:
-                            existing.status = RegulationStatus(status_value)
-                        except ValueError:
-                            existing.status = RegulationStatus.ACTIVE
+                        stats['errors'].append(f"{reg_data.get('code', 'unknown')}: {str(e)}")
 
-                        # 更新标签
-                        if 'tags' in reg_data:
-                            existing.tags.clear()
-                            for tag_name in reg_data.get('tags', []):
-                                tag = self.db.query(Tag).filter(
-                                    Tag.name == tag_name
-                                ).first()
-                                if not tag:
-                                    tag = Tag(name=tag_name)
-                                    self.db.add(tag)
-                                existing.tags.append(tag)
-
-                        stats['success'] += 1
-                    else:
-                        # 创建新法规
-                        status_value = reg_data.get('status', 'active')
-                        try:
-                            status = RegulationStatus(status_value)
-                        except ValueError:
-                            status = RegulationStatus.ACTIVE
+                self._record_history(db, imported, user_id)
 
-                        regulation = Regulation(
-                            code=code,
-                            name=reg_data.get('name', ''),
-                            country=reg_data.get('country'),
-                            category=reg_data.get('category'),
-                            description=reg_data.get('description'),
-                            status=status,
-                            version=reg_data.get('version'),
-                            created_by=user_id
-                        )
-
-                        # 添加标签
-                        for tag_name in reg_data.get('tags', []):
-                            tag = self.db.query(Tag).filter(
-                                Tag.name == tag_name
-                            ).first()
-                            if not tag:
-                                tag = Tag(name=tag_name)
-                                self.db.add(tag)
-                            regulation.tags.append(tag)
-
-                        self.db.add(regulation)
-                        stats['success'] += 1
-
-                except Exception as e:
-                    logger.error(f"导入法规失败: {reg_data.get('code', 'unknown')}, {e}")
-                    stats['failed'] += 1
-                    stats['errors'].append(f"{reg_data.get('code', 'unknown')}: {str(e)}")
-
-            self.db.commit()
+            self.regulation_service.invalidate_cache()
 
             message = f"导入完成！\n成功: {stats['success']}, 跳过: {stats['skipped']}, 失败: {stats['failed']}"
             logger.info(f"JSON导入完成: {message}")
             return True, message, stats
 
         except Exception as e:
-            self.db.rollback()
             logger.error(f"导入JSON失败: {e}")
             return False, f"导入失败: {str(e)}", {}
 
@@ -196,113 +230,111 @@ class DataImporter:
             if 'code' not in col_map or 'name' not in col_map:
                 return False, "Excel文件缺少必需的列：法规编号、法规名称", {}
 
+            # 跳过表头，从第2行开始
+            rows = list(ws.iter_rows(min_row=2, values_only=True))
+            code_col = col_map['code']
+
             stats = {
-                'total': ws.max_row - 1,
+                'total': len(rows),
                 'success': 0,
                 'skipped': 0,
                 'failed': 0,
                 'errors': []
             }
 
-            # 跳过表头，从第2行开始
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
-                try:
-                    code = row[col_map['code']]
-                    if not code:
-                        stats['failed'] += 1
-                        stats['errors'].append(f"第{row_idx}行: 缺少法规编号")
-                        continue
+            # 整个文件作为一个工作单元，全部成功后提交
+            with session_scope() as db:
+                existing_regulations, tags = self._preload(
+                    db, (str(row[code_col]) for row in rows if len(row) > code_col and row[code_col])
+                )
+                imported = []  # (法规, 导入前的数据)，用于记录历史
+                for row_idx, row in enumerate(rows, 2):
+                    try:
+                        code = row[col_map['code']]
+                        if not code:
+                            stats['failed'] += 1
+                            stats['errors'].append(f"第{row_idx}行: 缺少法规编号")
+                            continue
+
+                        name = row[col_map['name']]
+                        if not name:
+                            stats['failed'] += 1
+                            stats['errors'].append(f"第{row_idx}行: 缺少法规名称")
+                            continue
+
+                        # 检查是否已存在
+                        existing = existing_regulations.get(str(code))
+
+                        if existing and not overwrite:
+                            stats['skipped'] += 1
+                            continue
+
+                        # 获取其他字段
+                        country = row[col_map['country']] if 'country' in col_map else None
+                        category = row[col_map['category']] if 'category' in col_map else None
+                        description = row[col_map['description']] if 'description' in col_map else None
+                        version = row[col_map['version']] if 'version' in col_map else None
+
+                        status_value = row[col_map['status']] if 'status' in col_map else 'active'
+                        try:
+                            status = RegulationStatus(status_value.lower() if status_value else 'active')
+                        except (ValueError, AttributeError):
+                            status = RegulationStatus.ACTIVE
 
-                    name = row[col_map['name']]
-                    if not name:
-                        stats['failed'] += 1
-                        stats['errors'].append(f"第{row_idx}行: 缺少法规名称")
-                        continue
+                        tags_str = row[col_map['tags']] if 'tags' in col_map else ''
+                        tag_names = [t.strip() for t in str(tags_str).split(',') if t.strip()] if tags_str else []
 
-                    # 检查是否已存在
-                    existing = self.db.query(Regulation).filter(
-                        Regulation.code == str(code)
-                    ).first()
+                        if existing and overwrite:
+                            # 更新现有法规
+                            old_data = existing.to_dict()
+                            existing.name = str(name)
+                            existing.country = str(country) if country else None
+                            existing.category = str(category) if category else None
+                            existing.description = str(description) if description else None
+                            existing.version = str(version) if version else None
+                            existing.status = status
 
-                    if existing and not overwrite:
-                        stats['skipped'] += 1
-                        continue
+                            # 更新标签
+                            existing.tags.clear()
+                            for tag_name in tag_names:
+                                existing.tags.append(self._get_tag(db, tags, tag_name))
+
+                            imported.append((existing, old_data))
+                            stats['success'] += 1
+                        else:
+                            # 创建新法规
+                            regulation = Regulation(
+                                code=str(code),
+                                name=str(name),
+                                country=str(country) if country else None,
+                                category=str(category) if category else None,
+                                description=str(description) if description else None,
+                                status=status,
+                                version=str(version) if version else None,
+                                created_by=user_id,
+                                # 没有标签时也初始化标签列表，记录历史时不会再去数据库查询
+                                tags=[self._get_tag(db, tags, tag_name) for tag_name in tag_names]
+                            )
+
+                            db.add(regulation)
+                            existing_regulations[regulation.code] = regulation
+                            imported.append((regulation, None))
+                            stats['success'] += 1
+
+                    except Exception as e:
+                        logger.error(f"导入第{row_idx}行失败: {e}")
+                        stats['failed'] += 1
+                        stats['errors'].append(f"第{row_idx}行: {str(e)}")
 
-                    # 获取其他字段
-                    country = row[col_map['country']] if 'country' in col_map else None
-                    category = row[col_map['category']] if 'category' in col_map else None
-                    description = row[col_map['description']] if 'description' in col_map else None
-                    version = row[col_map['version']] if 'version' in col_map else None
+                self._record_history(db, imported, user_id)
 
-                    status_value = row[col_map['status']] if 'status' in col_map else 'active'
-                    try:
-                        status = RegulationStatus(status_value.lower() if status_value else 'active')
-                    except (ValueError, AttributeError):
-                        status = RegulationStatus.ACTIVE
-
-                    tags_str = row[col_map['tags']] if 'tags' in col_map else ''
-                    tag_names = [t.strip() for t in str(tags_str).split(',') if t.strip()] if tags_str else []
-
-                    if existing and overwrite:
-                        # 更新现有法规
-                        existing.name = str(name)
-                        existing.country = str(country) if country else None
-                        existing.category = str(category) if category else None
-                        existing.description = str(description) if description else None
-                        existing.version = str(version) if version else None
-                        existing.status = status
-
-                        # 更新标签
-                        existing.tags.clear()
-                        for tag_name in tag_names:
-                            tag = self.db.query(Tag).filter(
-                                Tag.name == tag_name
-                            ).first()
-                            if not tag:
-                                tag = Tag(name=tag_name)
-                                self.db.add(tag)
-                            existing.tags.append(tag)
-
-                        stats['success'] += 1
-                    else:
-                        # 创建新法规
-                        regulation = Regulation(
-                            code=str(code),
-                            name=str(name),
-                            country=str(country) if country else None,
-                            category=str(category) if category else None,
-                            description=str(description) if description else None,
-                            status=status,
-                            version=str(version) if version else None,
-                            created_by=user_id
-                        )
-
-                        # 添加标签
-                        for tag_name in tag_names:
-                            tag = self.db.query(Tag).filter(
-                                Tag.name == tag_name
-                            ).first()
-                            if not tag:
-                                tag = Tag(name=tag_name)
-                                self.db.add(tag)
-                            regulation.tags.append(tag)
-
-                        self.db.add(regulation)
-                        stats['success'] += 1
-
-                except Exception as e:
-                    logger.error(f"导入第{row_idx}行失败: {e}")
-                    stats['failed'] += 1
-                    stats['errors'].append(f"第{row_idx}行: {str(e)}")
-
-            self.db.commit()
             wb.close()
+            self.regulation_service.invalidate_cache()
 
             message = f"导入完成！\n成功: {stats['success']}, 跳过: {stats['skipped']}, 失败: {stats['failed']}"
             logger.info(f"Excel导入完成: {message}")
             return True, message, stats
 
         except Exception as e:
-            self.db.rollback()
             logger.error(f"导入Excel失败: {e}")
             return False, f"导入失败: {str(e)}", {}
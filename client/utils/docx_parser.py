@@ -2,15 +2,14 @@
 Word文档解析器
 """
 import sys
+import importlib.util
 from pathlib import Path
 from typing import List
 from loguru import logger
 
-try:
-    from docx import Document
-    DOCX_SUPPORT = True
-except ImportError:
-    DOCX_SUPPORT = False
+# python-docx（及 lxml）首次解析时才导入
+DOCX_SUPPORT = importlib.util.find_spec("docx") is not None
+if not DOCX_SUPPORT:
     logger.warning("python-docx未安装，Word解析功能不可用")
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -29,6 +28,7 @@ class DocxParser:
         """提取Word文档文本"""
         if not DOCX_SUPPORT:
             return ""
+        from docx import Document
 
         try:
             doc = Document(docx_path)
@@ -44,6 +44,7 @@ class DocxParser:
         """提取Word文档段落"""
         if not DOCX_SUPPORT:
             return []
+        from docx import Document
 
         try:
             doc = Document(docx_path)
@@ -58,6 +59,7 @@ class DocxParser:
         """获取段落数量"""
         if not DOCX_SUPPORT:
             return 0
+        from docx import Document
 
         try:
             doc = Document(docx_path)
@@ -72,6 +74,7 @@ class DocxParser:
         """获取Word文档核心属性"""
         if not DOCX_SUPPORT:
             return {}
+        from docx import Document
 
         try:
             doc = Document(docx_path)
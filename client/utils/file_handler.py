@@ -2,9 +2,10 @@
 文件处理工具类
 """
 import sys
+import hashlib
 from pathlib import Path
 import shutil
-from typing import Tuple, Optional
+from typing import Callable, Tuple, Optional
 from loguru import logger
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -74,6 +75,46 @@ class FileHandler:
             logger.error(f"文件复制失败: {e}")
             return False, f"文件复制失败: {str(e)}"
 
+    @staticmethod
+    def calculate_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> Optional[str]:
+        """分块计算文件 SHA-256（十六进制）"""
+        try:
+            sha256 = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    sha256.update(chunk)
+            return sha256.hexdigest()
+        except Exception as e:
+            logger.error(f"计算文件哈希失败: {e}")
+            return None
+
+    @staticmethod
+    def copy_with_sha256(source: str, destination: str,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         chunk_size: int = 1024 * 1024) -> str:
+        """
+        分块复制文件并同时计算 SHA-256，源文件只读取一遍
+
+        Args:
+            progress_callback: 进度回调 (已复制字节, 总字节)
+
+        Returns:
+            SHA-256（十六进制）；复制失败时抛出异常
+        """
+        total = Path(source).stat().st_size
+        sha256 = hashlib.sha256()
+        copied = 0
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        with open(source, 'rb') as f_in, open(destination, 'wb') as f_out:
+            for chunk in iter(lambda: f_in.read(chunk_size), b''):
+                sha256.update(chunk)
+                f_out.write(chunk)
+                copied += len(chunk)
+                if progress_callback:
+                    progress_callback(copied, total)
+        shutil.copystat(source, destination)
+        return sha256.hexdigest()
+
     @staticmethod
     def read_text_file(file_path: str, encoding: str = 'utf-8') -> Optional[str]:
         """读取文本文件"""
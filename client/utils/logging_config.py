@@ -0,0 +1,127 @@
+"""
+日志配置
+
+- 所有输出都经队列（enqueue=True）由后台线程写出，记录日志不阻塞界面线程和导入等循环
+- 除文本日志外另写一份 JSON Lines 格式的结构化日志（每行一条记录），
+  操作耗时（operation、duration_ms）、慢查询等附加字段可以直接用程序分析
+- LOG_MODULE_LEVELS 为单个模块设置级别，如 "client.ui=DEBUG,client.utils.profiler=DEBUG"
+- 高频调试日志用 SampledLogger 采样输出
+"""
+import sys
+import json
+import traceback
+from pathlib import Path
+from typing import Dict
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+from shared.constants import LOG_FORMAT
+
+
+LOG_NAME = "app_main"
+LOG_ROTATION = "10 MB"
+LOG_RETENTION = "7 days"
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """解析 "模块=级别,模块=级别"，模块名按前缀匹配（client.ui 包括其下所有模块）"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        module, level = (part.strip() for part in item.split("=", 1))
+        try:
+            logger.level(level.upper())
+        except ValueError:
+            logger.warning(f"忽略无效的日志级别: {item.strip()}")
+            continue
+        levels[module] = level.upper()
+    return levels
+
+
+def _json_format(record) -> str:
+    """一条记录格式化为一行 JSON（附加字段平铺在顶层）"""
+    entry = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "thread": record["thread"].name,
+        "message": record["message"],
+    }
+    entry.update((key, value) for key, value in record["extra"].items() if key != "json")
+    if record["exception"]:
+        exc_type, exc_value, exc_traceback = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+    record["extra"]["json"] = json.dumps(entry, ensure_ascii=False, default=str)
+    return "{extra[json]}\n"
+
+
+def setup_logging(log_name: str = LOG_NAME):
+    """配置终端、文本文件、JSON 文件和慢查询日志输出"""
+    from client.models.instrumentation import add_slow_query_sink
+
+    logger.remove()
+
+    # "" 为默认级别，其余按模块名前缀匹配；输出级别取其中最低的，由过滤器按模块判断
+    levels = {"": settings.LOG_LEVEL.upper(), **parse_module_levels(settings.LOG_MODULE_LEVELS)}
+    min_level = min(levels.values(), key=lambda level: logger.level(level).no)
+
+    # 打包后的窗口程序没有终端
+    if sys.stderr:
+        logger.add(
+            sys.stderr,
+            format=LOG_FORMAT,
+            level=min_level,
+            filter=levels,
+            colorize=True,
+            enqueue=True,
+        )
+
+    logger.add(
+        settings.LOG_DIR / f"{log_name}.log",
+        format=LOG_FORMAT,
+        level=min_level,
+        filter=levels,
+        rotation=LOG_ROTATION,
+        retention=LOG_RETENTION,
+        encoding="utf-8",
+        enqueue=True,
+    )
+    logger.add(
+        settings.LOG_DIR / f"{log_name}.jsonl",
+        format=_json_format,
+        level=min_level,
+        filter=levels,
+        rotation=LOG_ROTATION,
+        retention=LOG_RETENTION,
+        encoding="utf-8",
+        enqueue=True,
+    )
+    add_slow_query_sink(LOG_FORMAT)
+
+    logger.info("=" * 50)
+    logger.info(f"{settings.APP_NAME} v{settings.APP_VERSION} 启动")
+    logger.info("=" * 50)
+
+
+class SampledLogger:
+    """
+    高频调试日志采样：每 every 条只输出第 1 条，并附带 sampled_every、sample_count 字段
+
+    参数按 loguru 的 "{}" 占位符传入，未输出的记录不会格式化；
+    DEBUG 级别未开启时也不会格式化
+    """
+
+    def __init__(self, every: int = None):
+        self.every = max(1, every or settings.LOG_SAMPLE_EVERY)
+        self.count = 0
+
+    def debug(self, message: str, *args, **kwargs):
+        self.count += 1
+        if (self.count - 1) % self.every:
+            return
+        logger.opt(depth=1).bind(sampled_every=self.every, sample_count=self.count).debug(message, *args, **kwargs)
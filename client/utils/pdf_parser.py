@@ -2,16 +2,14 @@
 PDF文档解析器
 """
 import sys
+import importlib.util
 from pathlib import Path
 from typing import Optional
 from loguru import logger
 
-try:
-    import PyPDF2
-    import pdfplumber
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
+# PyPDF2、pdfplumber（及其依赖 pdfminer）导入较慢，启动时只检查是否安装，首次解析时才导入
+PDF_SUPPORT = all(importlib.util.find_spec(name) for name in ("PyPDF2", "pdfplumber"))
+if not PDF_SUPPORT:
     logger.warning("PyPDF2或pdfplumber未安装，PDF解析功能不可用")
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -30,6 +28,7 @@ class PDFParser:
         """获取PDF页数"""
         if not PDF_SUPPORT:
             return 0
+        import PyPDF2
 
         try:
             with open(pdf_path, 'rb') as f:
@@ -44,6 +43,7 @@ class PDFParser:
         """提取PDF文本"""
         if not PDF_SUPPORT:
             return ""
+        import PyPDF2
 
         try:
             with open(pdf_path, 'rb') as f:
@@ -70,6 +70,7 @@ class PDFParser:
         """使用pdfplumber提取文本（更准确）"""
         if not PDF_SUPPORT:
             return ""
+        import pdfplumber
 
         try:
             text = ""
@@ -89,6 +90,7 @@ class PDFParser:
         """获取PDF元数据"""
         if not PDF_SUPPORT:
             return {}
+        import PyPDF2
 
         try:
             with open(pdf_path, 'rb') as f:
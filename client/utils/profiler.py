@@ -0,0 +1,360 @@
+"""
+界面操作耗时统计、按需性能采样和界面卡顿检测
+
+- profiled / profiler.action：记录刷新、搜索、导入导出、保存参数、同步、生成代码等操作的耗时
+- start_capture / stop_capture：按需采集 cProfile 和 tracemalloc，结果和摘要写入 LOG_DIR
+- UIStallWatchdog：界面线程的事件循环超过 UI_STALL_MS 没有响应时采样其调用栈
+
+开启方式：环境变量 PROFILING=True（启动即统计耗时并检测卡顿），
+或在主窗口按 Ctrl+Shift+P 开始/结束一次采样
+"""
+import io
+import sys
+import time
+import pstats
+import cProfile
+import inspect
+import threading
+import functools
+import traceback
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from shared.config import settings
+
+
+# 超过该耗时（毫秒）的操作记为警告
+SLOW_ACTION_MS = 1000
+# tracemalloc 为每次分配保存的调用栈深度
+TRACEMALLOC_FRAMES = 10
+# 摘要中列出的函数和分配位置数
+SUMMARY_TOP = 30
+# 卡顿日志中调用栈保留的帧数（最内层）
+STALL_STACK_FRAMES = 15
+
+
+@dataclass
+class ActionStats:
+    """同一操作的累计耗时"""
+    name: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "last_ms": round(self.last_ms, 1),
+        }
+
+
+@dataclass
+class StallRecord:
+    """一次界面卡顿"""
+    started_at: datetime
+    duration_ms: float
+    actions: List[str]
+    samples: int
+    stack: str
+
+
+class UIStallWatchdog:
+    """
+    界面卡顿检测
+
+    界面线程用定时器每 BEAT_INTERVAL_MS 发一次心跳；后台线程发现超过 stall_ms 没有心跳时，
+    每隔 SAMPLE_INTERVAL_MS 采样一次界面线程的调用栈，卡顿结束后把持续时间、
+    当时正在执行的操作和出现次数最多的调用栈写入日志
+    """
+
+    BEAT_INTERVAL_MS = 50
+    SAMPLE_INTERVAL_MS = 50
+
+    def __init__(self, profiler: "Profiler", stall_ms: int):
+        self.profiler = profiler
+        self.stall_ms = stall_ms
+        self.stalls: deque = deque(maxlen=100)
+        self._thread_id: Optional[int] = None
+        self._last_beat = time.perf_counter()
+        self._timer = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, parent=None):
+        """开始检测（在界面线程中调用）"""
+        from PyQt6.QtCore import QTimer
+
+        if self.running:
+            return
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._timer = QTimer(parent)
+        self._timer.timeout.connect(self.beat)
+        self._timer.start(self.BEAT_INTERVAL_MS)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ui-stall-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"界面卡顿检测已开启（阈值 {self.stall_ms} ms）")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._timer.stop()
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self._thread = None
+
+    def beat(self):
+        self._last_beat = time.perf_counter()
+
+    def _sample_stack(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return None
+        return "".join(traceback.format_stack(frame)[-STALL_STACK_FRAMES:])
+
+    def _run(self):
+        stall_start = None
+        stacks: Counter = Counter()
+        actions: List[str] = []
+        while not self._stop.wait(self.SAMPLE_INTERVAL_MS / 1000):
+            last_beat = self._last_beat
+            if (time.perf_counter() - last_beat) * 1000 >= self.stall_ms:
+                if stall_start is None:
+                    stall_start = last_beat
+                    stacks.clear()
+                    actions = []
+                stack = self._sample_stack()
+                if stack:
+                    stacks[stack] += 1
+                for name in self.profiler.running_actions(self._thread_id):
+                    if name not in actions:
+                        actions.append(name)
+            elif stall_start is not None:
+                self._report(stall_start, last_beat, stacks, actions)
+                stall_start = None
+
+    def _report(self, stall_start: float, stall_end: float, stacks: Counter, actions: List[str]):
+        duration_ms = (stall_end - stall_start) * 1000
+        stack, _ = stacks.most_common(1)[0] if stacks else ("", 0)
+        record = StallRecord(
+            started_at=datetime.now(), duration_ms=duration_ms, actions=actions,
+            samples=sum(stacks.values()), stack=stack,
+        )
+        self.stalls.append(record)
+        logger.warning(
+            f"界面卡顿 {duration_ms:.0f} ms（正在执行: {', '.join(actions) or '无'}，"
+            f"采样 {record.samples} 次），出现最多的调用栈:\n{stack}"
+        )
+
+
+class Profiler:
+    """
+    操作耗时统计和性能采样
+
+    未开启时 action() 只计时并记录一条调试日志，不累计统计
+    """
+
+    def __init__(self, enabled: bool = False, stall_ms: int = 200):
+        self.enabled = enabled
+        self.stall_ms = stall_ms
+        self.watchdog: Optional[UIStallWatchdog] = None
+        self._stats: Dict[str, ActionStats] = {}
+        self._running: Dict[int, List[str]] = {}  # 线程 -> 正在执行的操作（可嵌套）
+        self._lock = threading.Lock()
+        self._profile: Optional[cProfile.Profile] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+        self._capture_started: Optional[datetime] = None
+        # 采样前的 (enabled, 卡顿检测是否运行)，结束采样时恢复
+        self._state_before_capture: Optional[tuple] = None
+
+    # ========== 操作耗时 ==========
+
+    @contextmanager
+    def action(self, name: str, **fields):
+        """
+        统计一段操作的耗时
+
+        结束时记录一条带 operation、duration_ms 字段的日志（慢操作为 WARNING，其余为 DEBUG）；
+        fields 为附加字段，也可以在 with 块中更新返回的字典（如导入的行数）
+        """
+        start = time.perf_counter()
+        thread_id = threading.get_ident()
+        if self.enabled:
+            with self._lock:
+                self._running.setdefault(thread_id, []).append(name)
+        try:
+            yield fields
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            if self.enabled:
+                self._record(thread_id, name, elapsed)
+            level = "WARNING" if elapsed >= SLOW_ACTION_MS else "DEBUG"
+            logger.bind(operation=name, duration_ms=round(elapsed, 1), **fields).log(
+                level, f"操作 {name} 用时 {elapsed:.0f} ms"
+            )
+
+    def _record(self, thread_id: int, name: str, elapsed: float):
+        with self._lock:
+            running = self._running.get(thread_id)
+            if running:
+                running.pop()
+                if not running:
+                    del self._running[thread_id]
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = ActionStats(name)
+            stats.count += 1
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            stats.last_ms = elapsed
+
+    def running_actions(self, thread_id: int) -> List[str]:
+        with self._lock:
+            return list(self._running.get(thread_id, ()))
+
+    def get_stats(self) -> List[dict]:
+        """各操作的耗时统计，按平均耗时倒序"""
+        with self._lock:
+            stats = [s.to_dict() for s in self._stats.values()]
+        return sorted(stats, key=lambda s: s["avg_ms"], reverse=True)
+
+    # ========== 卡顿检测 ==========
+
+    def start_watchdog(self, parent=None):
+        """开启界面卡顿检测（在界面线程中调用）"""
+        if self.watchdog is None:
+            self.watchdog = UIStallWatchdog(self, self.stall_ms)
+        self.watchdog.start(parent)
+
+    def stop_watchdog(self):
+        if self.watchdog:
+            self.watchdog.stop()
+
+    # ========== cProfile / tracemalloc 采样 ==========
+
+    @property
+    def capturing(self) -> bool:
+        return self._profile is not None
+
+    def start_capture(self, parent=None):
+        """
+        开始采样：cProfile 记录调用它的线程（界面线程）的函数耗时，tracemalloc 记录内存分配
+
+        采样期间同时统计操作耗时并检测界面卡顿（parent 为卡顿检测定时器的父对象），
+        结束采样后恢复原来的设置
+        """
+        if self.capturing:
+            return
+        self._state_before_capture = (self.enabled, bool(self.watchdog and self.watchdog.running))
+        self.enabled = True
+        self.start_watchdog(parent)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._snapshot = tracemalloc.take_snapshot()
+        self._capture_started = datetime.now()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        logger.info("开始性能采样")
+
+    def stop_capture(self) -> Path:
+        """
+        结束采样，写入 profile_时间.prof（可用 snakeviz 等工具查看）和同名 .txt 摘要
+
+        Returns:
+            摘要文件路径
+        """
+        if not self.capturing:
+            raise RuntimeError("没有正在进行的性能采样")
+        profile, self._profile = self._profile, None
+        profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        base = settings.LOG_DIR / f"profile_{datetime.now():%Y%m%d_%H%M%S}"
+        profile.dump_stats(str(base.with_suffix(".prof")))
+        summary_path = base.with_suffix(".txt")
+        summary_path.write_text(self._summary(profile, snapshot), encoding="utf-8")
+        self._snapshot = None
+
+        enabled, watchdog_running = self._state_before_capture
+        self.enabled = enabled
+        if not watchdog_running:
+            self.stop_watchdog()
+        logger.info(f"性能采样已写入: {summary_path}")
+        return summary_path
+
+    def _summary(self, profile: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+        started = self._capture_started
+        lines = [f"性能采样 {started:%Y-%m-%d %H:%M:%S} - {datetime.now():%H:%M:%S}", "", "操作耗时:"]
+        for stats in self.get_stats():
+            lines.append(
+                f"  {stats['name']:<16} {stats['count']:>5} 次  平均 {stats['avg_ms']:>8.1f} ms  "
+                f"最长 {stats['max_ms']:>8.1f} ms"
+            )
+
+        stalls = [s for s in (self.watchdog.stalls if self.watchdog else ()) if s.started_at >= started]
+        lines += ["", f"界面卡顿: {len(stalls)} 次"]
+        for stall in sorted(stalls, key=lambda s: s.duration_ms, reverse=True)[:5]:
+            lines.append(f"  {stall.started_at:%H:%M:%S}  {stall.duration_ms:.0f} ms  "
+                         f"正在执行: {', '.join(stall.actions) or '无'}")
+            lines.extend("    " + line for line in stall.stack.splitlines())
+
+        for title, sort_key in (("累计耗时最多的函数", "cumulative"), ("自身耗时最多的函数", "tottime")):
+            output = io.StringIO()
+            pstats.Stats(profile, stream=output).sort_stats(sort_key).print_stats(SUMMARY_TOP)
+            lines += ["", f"{title}:", output.getvalue().strip()]
+
+        lines += ["", "新增内存分配最多的位置:"]
+        exclude = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        differences = snapshot.filter_traces(exclude).compare_to(self._snapshot.filter_traces(exclude), "lineno")
+        for difference in differences[:SUMMARY_TOP]:
+            lines.append(f"  {difference}")
+        return "\n".join(lines) + "\n"
+
+
+def profiled(name: str):
+    """
+    统计函数耗时的装饰器，可用于 Qt 槽函数
+
+    信号会多传 checked 等参数，调用时按函数签名截掉多余的位置参数
+    """
+    def decorator(func):
+        parameters = inspect.signature(func).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+            max_args = None
+        else:
+            max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            with profiler.action(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 进程内共享的实例
+profiler = Profiler(settings.PROFILING, settings.UI_STALL_MS)
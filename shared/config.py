@@ -138,7 +138,7 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 小时
 
     # 文件上传配置
-    MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_UPLOAD_SIZE: int = Field(default=10 * 1024 * 1024, env="MAX_UPLOAD_SIZE")  # 10MB
     ALLOWED_DOCUMENT_EXTENSIONS: set = {".pdf", ".docx", ".doc"}
     ALLOWED_CODE_EXTENSIONS: set = {".c", ".h", ".cpp", ".hpp"}
 
@@ -146,15 +146,57 @@ class Settings(BaseSettings):
     SEARCH_INDEX_DIR: Path = DATA_DIR / "search_index"
     SEARCH_RESULTS_PER_PAGE: int = 20
 
+    # 数据缓存配置（法规、标签、参数的查询结果）
+    CACHE_MAX_ENTRIES: int = Field(default=1024, env="CACHE_MAX_ENTRIES")
+    # 缓存有效期（秒），用于发现其他客户端的修改；0 表示只在本机写入或同步后失效
+    CACHE_TTL: int = Field(default=300, env="CACHE_TTL")
+    # 主窗口选中或鼠标停留时在后台预读取法规详情（基本信息、文档列表、参数和参数图片）
+    DETAIL_PREFETCH: bool = Field(default=True, env="DETAIL_PREFETCH")
+    # 保留参数图片的法规数（图片解码后占内存较多）
+    DETAIL_PREFETCH_CACHE_SIZE: int = Field(default=8, env="DETAIL_PREFETCH_CACHE_SIZE")
+
     # 日志配置
     LOG_DIR: Path = DATA_DIR / "logs"
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
+    # 单独设置部分模块的日志级别，如 "client.ui=DEBUG,client.utils.profiler=DEBUG"
+    LOG_MODULE_LEVELS: str = Field(default="", env="LOG_MODULE_LEVELS")
+    # 高频调试日志（如导入时逐个单元格的信息）每多少条输出一条
+    LOG_SAMPLE_EVERY: int = Field(default=100, env="LOG_SAMPLE_EVERY")
+    # 慢查询阈值（毫秒），超过的语句写入 logs/slow_queries.log；0 表示不记录
+    SLOW_QUERY_MS: int = Field(default=200, env="SLOW_QUERY_MS")
+    # SQL 语句统计（排查性能问题时开启）：按语句累计耗时、行数和调用位置，并检测 N+1 查询
+    SQL_INSTRUMENTATION: bool = Field(default=False, env="SQL_INSTRUMENTATION")
+    # 一个工作单元中同一语句执行达到该次数时警告疑似 N+1 查询
+    N_PLUS_ONE_THRESHOLD: int = Field(default=20, env="N_PLUS_ONE_THRESHOLD")
+    # 界面操作耗时统计和卡顿检测（排查"程序卡住"时开启），主窗口 Ctrl+Shift+P 可随时开始/结束采样
+    PROFILING: bool = Field(default=False, env="PROFILING")
+    # 界面线程超过该时间（毫秒）没有处理事件时记录卡顿和调用栈
+    UI_STALL_MS: int = Field(default=200, env="UI_STALL_MS")
 
     # 离线模式配置
     OFFLINE_MODE: bool = Field(default=True, env="OFFLINE_MODE")
     AUTO_SYNC: bool = Field(default=True, env="AUTO_SYNC")
     SYNC_INTERVAL: int = 300  # 秒
 
+    # 本地副本配置
+    # 开启后客户端读写本地 SQLite 副本，由后台同步与共享数据库（PostgreSQL 或网络 SQLite）交换增量
+    REPLICA_MODE: bool = Field(default=False, env="REPLICA_MODE")
+    REPLICA_DB_PATH: str = Field(default="", env="REPLICA_DB_PATH")
+    # 同步节点标识，留空时自动生成并保存在 data/sync_node_id
+    SYNC_NODE_ID: str = Field(default="", env="SYNC_NODE_ID")
+
+    @property
+    def replica_db_path(self) -> Path:
+        """获取本地副本数据库路径"""
+        if self.REPLICA_DB_PATH:
+            return Path(self.REPLICA_DB_PATH)
+        return DATABASES_DIR / "replica.db"
+
+    @property
+    def replica_url(self) -> str:
+        """本地副本 SQLite 连接 URL"""
+        return f"sqlite:///{self.replica_db_path}"
+
     # 版本更新配置
     # 支持静态文件服务（推荐）或完整API服务器
     # 静态文件示例：将 version.json 上传到任意文件托管服务
@@ -167,6 +209,12 @@ class Settings(BaseSettings):
         env="UPDATE_CHECK_URL"
     )
     AUTO_UPDATE: bool = Field(default=True, env="AUTO_UPDATE")
+    # 后台检查版本更新的间隔（秒）
+    UPDATE_CHECK_INTERVAL: int = Field(default=3600, env="UPDATE_CHECK_INTERVAL")
+    # 下载更新文件的并发连接数（服务器支持 Range 时生效）
+    UPDATE_DOWNLOAD_CONNECTIONS: int = Field(default=4, env="UPDATE_DOWNLOAD_CONNECTIONS")
+    # 已读通知保留天数，超过后移入归档表；0 表示不归档
+    NOTIFICATION_RETENTION_DAYS: int = Field(default=90, env="NOTIFICATION_RETENTION_DAYS")
 
     # GitHub 自动推送配置（管理员功能）
     # GitHub Personal Access Token，用于自动推送版本更新
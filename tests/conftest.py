@@ -0,0 +1,62 @@
+"""
+测试公共夹具
+"""
+import os
+import sys
+import textwrap
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """客户端提前断开连接（只读响应头、取消下载）时不打印异常"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    """启动本地 HTTP 测试服务器：start(处理器类) -> (服务器, 基础地址)，测试结束时关闭"""
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    servers = []
+
+    def start(handler_class):
+        server = QuietHTTPServer(("127.0.0.1", 0), handler_class)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def run_client(tmp_path):
+    """
+    在子进程中使用临时数据库初始化客户端并执行脚本，返回脚本的标准输出
+
+    数据库引擎在导入 client.models 时按环境变量创建，不能在测试进程中切换
+    """
+    env = dict(os.environ, DATABASE_PATH=str(tmp_path / "client.db"), OFFLINE_MODE="True")
+
+    def run(script: str) -> str:
+        code = "from client.models.database import init_db\ninit_db()\n" + textwrap.dedent(script)
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+                                capture_output=True, text=True, encoding="utf-8", errors="replace")
+        assert result.returncode == 0, result.stderr[-3000:]
+        return result.stdout
+
+    return run
@@ -0,0 +1,130 @@
+"""
+内容寻址存储测试
+"""
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from client.utils import blob_store
+from client.utils.blob_store import BlobStore
+
+
+def age(path, seconds: float):
+    """把文件的修改时间改到 seconds 秒之前"""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(tmp_path / "blobs")
+
+
+def put_file(store: BlobStore, tmp_path, name: str, content: bytes):
+    source = tmp_path / name
+    source.write_bytes(content)
+    return store.put(str(source))
+
+
+def test_put_deduplicates(store, tmp_path):
+    blob, size, sha256 = put_file(store, tmp_path, "a.pdf", b"same content")
+    again, _, _ = put_file(store, tmp_path, "b.pdf", b"same content")
+
+    assert again == blob and size == len(b"same content")
+    assert blob.read_bytes() == b"same content"
+    assert BlobStore.sha256_of(str(blob)) == sha256
+    assert not list((store.root / "tmp").glob("*.part"))
+
+
+def test_garbage_uses_references(store, tmp_path):
+    kept, _, kept_sha = put_file(store, tmp_path, "kept.pdf", b"kept")
+    dropped, _, _ = put_file(store, tmp_path, "dropped.pdf", b"dropped")
+    for blob in (kept, dropped):
+        age(blob, blob_store.GC_GRACE_SECONDS + 60)
+
+    assert store.collect_garbage([kept_sha.upper()]) == 1
+
+    assert kept.exists()
+    assert not dropped.exists()
+
+
+def test_uploads_reference_blobs(run_client, tmp_path):
+    """上传的文件记录直接引用存储路径，不在法规目录下另存副本；同一法规下重名的不同文件改名"""
+    for name, content in (("first/a.c", b"int a;"), ("second/a.c", b"int b;")):
+        (tmp_path / name).parent.mkdir()
+        (tmp_path / name).write_bytes(content)
+
+    output = run_client(f"""
+        from pathlib import Path
+        from client.services import RegulationService
+        from client.utils.blob_store import BlobStore
+        service = RegulationService()
+        service.blob_store = BlobStore(Path({str(tmp_path / "blobs")!r}))
+        regulation = service.create_regulation(code="R-1", name="法规1")[2]
+        other = service.create_regulation(code="R-2", name="法规2")[2]
+        for regulation_id, source in ((regulation.id, "first/a.c"), (regulation.id, "second/a.c"),
+                                      (other.id, "first/a.c")):
+            ok, msg, code_file = service.add_code_file(regulation_id, str(Path({str(tmp_path)!r}) / source))
+            assert ok, msg
+            print(code_file.file_name, code_file.file_path, sep="|")
+    """)
+
+    rows = [line.split("|") for line in output.splitlines()]
+    assert [name for name, _ in rows] == ["a.c", "a (1).c", "a.c"]
+    assert rows[0][1] == rows[2][1] != rows[1][1]
+    for _, path in rows:
+        assert Path(path).parent.parent == tmp_path / "blobs"
+    assert len(list((tmp_path / "blobs").glob("??/*"))) == 2
+
+
+def test_garbage_keeps_recent_blobs(store, tmp_path):
+    """put() 之后、记录写入数据库之前的存储文件在宽限期内保留"""
+    blob, _, _ = put_file(store, tmp_path, "new.c", b"int main;")
+
+    assert store.collect_garbage([]) == 0
+    assert blob.exists()
+    assert store.collect_garbage([], grace_seconds=0) == 1
+    assert not blob.exists()
+
+
+def test_reused_blob_is_refreshed(store, tmp_path):
+    """复用已有内容时刷新修改时间，清理不会删除刚复用的存储文件"""
+    blob, _, _ = put_file(store, tmp_path, "old.pdf", b"old content")
+    age(blob, blob_store.GC_GRACE_SECONDS + 60)
+
+    put_file(store, tmp_path, "again.pdf", b"old content")
+
+    assert store.collect_garbage([]) == 0
+    assert blob.exists()
+
+
+def test_garbage_removes_stale_temp_files(store):
+    temp_dir = store.root / "tmp"
+    temp_dir.mkdir(parents=True)
+    stale, fresh = temp_dir / "stale.part", temp_dir / "fresh.part"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"y")
+    age(stale, blob_store.GC_GRACE_SECONDS + 60)
+
+    assert store.collect_garbage([]) == 1
+    assert not stale.exists() and fresh.exists()
+
+
+def test_put_bytes_paths_follow_content(store):
+    """相同内容得到相同路径，内容变化时路径变化（参数图片据此判断该行是否修改）"""
+    first, size, sha256 = store.put_bytes(b"\x89PNG red", ".PNG")
+    same, _, _ = store.put_bytes(b"\x89PNG red", ".png")
+    changed, _, _ = store.put_bytes(b"\x89PNG blue", ".png")
+
+    assert first == same and first != changed
+    assert first.read_bytes() == b"\x89PNG red" and size == len(b"\x89PNG red")
+    assert first.name == f"{sha256}.png"
+    assert changed.read_bytes() == b"\x89PNG blue"
+    assert BlobStore.sha256_of(str(first)) == sha256
+
+
+def test_sha256_of_ignores_other_paths():
+    assert BlobStore.sha256_of("data/parameter_images/3/image_0_8.png") is None
+    assert BlobStore.sha256_of("blobs/ab/" + "cd" * 32 + ".png") is None
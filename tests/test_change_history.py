@@ -0,0 +1,33 @@
+"""
+变更历史测试
+"""
+
+
+def test_first_update_without_checkpoint_saves_snapshot(run_client):
+    """没有快照的法规（创建时未记录历史）第一次更新即保存快照，之后可以重建任意版本"""
+    run_client("""
+        from client.models import session_scope, ChangeHistory
+        from client.services import RegulationService
+        service = RegulationService()
+        ok, msg, untracked = service.create_regulation(code="R-1", name="法规1")
+        assert ok, msg
+        ok, msg, tracked = service.create_regulation(code="R-2", name="法规2", created_by=1)
+        assert ok, msg
+
+        for name in ("法规1-a", "法规1-b"):
+            assert service.update_regulation(untracked.id, name=name, updated_by=1)[0]
+            assert service.get_regulation_version(untracked.id)["name"] == name
+        assert service.update_regulation(tracked.id, name="法规2-a", updated_by=1)[0]
+        assert service.get_regulation_version(tracked.id)["name"] == "法规2-a"
+
+        with session_scope() as db:
+            def checkpoints(entity_id):
+                return [record.is_checkpoint for record in db.query(ChangeHistory).filter(
+                    ChangeHistory.entity_id == entity_id
+                ).order_by(ChangeHistory.id)]
+
+            # 没有快照：第一次更新保存快照，之后按间隔保存
+            assert checkpoints(untracked.id) == [True, False]
+            # 创建记录即快照：更新不保存
+            assert checkpoints(tracked.id) == [True, False]
+    """)
@@ -0,0 +1,272 @@
+"""
+Release 附件上传测试
+
+本地 HTTP 服务器模拟 GitHub 的附件上传和附件列表/删除接口，可按顺序注入服务器错误、限流、
+超时和连接中断
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from client.services import git_service
+from client.services.git_service import GitService, _UploadReader, UPLOAD_RETRIES
+
+RELEASE_ID = 7
+ASSETS_PATH = f"/repos/owner/repo/releases/{RELEASE_ID}/assets"
+
+
+class ReleaseState:
+    """Release 中的附件和请求记录"""
+
+    def __init__(self):
+        self.assets = {}  # 附件ID -> {"id", "name", "state", "content", "content_type"}
+        self.next_id = 1
+        # 依次用于后续的上传请求：状态码、"timeout"（延迟响应）或 "drop"（保存附件后不响应直接断开）
+        self.upload_faults = []
+        self.uploads = 0
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def add_asset(self, name: str, content: bytes, state: str = "uploaded", content_type: str = "") -> dict:
+        with self.lock:
+            asset = {"id": self.next_id, "name": name, "state": state,
+                     "content": content, "content_type": content_type}
+            self.assets[self.next_id] = asset
+            self.next_id += 1
+            return asset
+
+    def find(self, name: str):
+        return [asset for asset in self.assets.values() if asset["name"] == name]
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def asset_json(self, asset: dict) -> dict:
+        return {
+            "id": asset["id"], "name": asset["name"], "state": asset["state"],
+            "browser_download_url": f"https://example.invalid/download/{asset['name']}",
+        }
+
+    def do_POST(self):
+        state: ReleaseState = self.server.state
+        url = urlparse(self.path)
+        name = parse_qs(url.query)["name"][0]
+        content = self.rfile.read(int(self.headers["Content-Length"]))
+        with state.lock:
+            state.uploads += 1
+            fault = state.upload_faults.pop(0) if state.upload_faults else None
+
+        if fault == "timeout":
+            time.sleep(1)
+        elif fault == "drop":
+            # 附件已保存，但响应在途中丢失
+            state.add_asset(name, content, content_type=self.headers["Content-Type"])
+            self.close_connection = True
+            return
+        elif isinstance(fault, int):
+            self.send_json(fault, {"message": f"fault {fault}"})
+            return
+
+        if state.find(name):
+            self.send_json(422, {"message": "Validation Failed", "errors": [{"code": "already_exists"}]})
+            return
+        asset = state.add_asset(name, content, content_type=self.headers["Content-Type"])
+        self.send_json(201, self.asset_json(asset))
+
+    def do_GET(self):
+        state: ReleaseState = self.server.state
+        if urlparse(self.path).path != ASSETS_PATH:
+            self.send_json(404, {"message": "Not Found"})
+            return
+        with state.lock:
+            assets = [self.asset_json(asset) for asset in state.assets.values()]
+        self.send_json(200, assets)
+
+    def do_DELETE(self):
+        state: ReleaseState = self.server.state
+        asset_id = int(self.path.rsplit("/", 1)[1])
+        with state.lock:
+            state.assets.pop(asset_id)
+            state.deleted.append(asset_id)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def release(http_server, monkeypatch):
+    """启动 Release 接口服务器，返回 (GitService, ReleaseState)"""
+    server, base_url = http_server(ReleaseHandler)
+    server.state = ReleaseState()
+    monkeypatch.setattr(git_service, "UPLOAD_BACKOFF_BASE", 0)
+
+    service = GitService()
+    service.api_base_url = base_url
+    service.upload_base_url = base_url
+    monkeypatch.setattr(service, "_get_repo_info", lambda: ("owner", "repo"))
+    return service, server.state
+
+
+@pytest.fixture
+def release_file(tmp_path):
+    path = tmp_path / "SafetyManager_v1.2.0.zip"
+    path.write_bytes(os.urandom(700_000))
+    return path
+
+
+def test_upload_reader_reports_progress(tmp_path):
+    path = tmp_path / "data.bin"
+    content = os.urandom(git_service.UPLOAD_CHUNK_SIZE + 1000)
+    path.write_bytes(content)
+    progress = []
+
+    with _UploadReader(str(path), lambda sent, total: progress.append((sent, total))) as reader:
+        assert len(reader) == len(content)
+        chunks = [reader.read(), reader.read(), reader.read()]
+
+    assert b"".join(chunks) == content
+    assert [len(chunk) for chunk in chunks] == [git_service.UPLOAD_CHUNK_SIZE, 1000, 0]
+    assert progress == [(git_service.UPLOAD_CHUNK_SIZE, len(content)), (len(content), len(content))]
+    assert reader._file.closed
+
+
+def test_upload_streams_file_with_progress(release, release_file):
+    service, state = release
+    progress = []
+    service.upload_progress_callback = lambda name, sent, total: progress.append((name, sent, total))
+
+    ok, msg, url = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    assert url.endswith(release_file.name)
+    [asset] = state.find(release_file.name)
+    assert asset["content"] == release_file.read_bytes()
+    assert asset["content_type"] == "application/zip"
+    total = release_file.stat().st_size
+    assert len(progress) > 1
+    assert progress[-1] == (release_file.name, total, total)
+    assert [sent for _, sent, _ in progress] == sorted(sent for _, sent, _ in progress)
+
+
+@pytest.mark.parametrize("faults", [[500], [502, 429], [429, 429, 503]])
+def test_upload_retries_server_errors(release, release_file, faults):
+    service, state = release
+    state.upload_faults = list(faults)
+
+    ok, msg, _ = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    assert state.uploads == len(faults) + 1
+    assert len(state.find(release_file.name)) == 1
+    assert state.deleted == []
+
+
+def test_upload_retries_timeout(release, release_file, monkeypatch):
+    service, state = release
+    monkeypatch.setattr(git_service, "UPLOAD_TIMEOUT", (5, 0.3))
+    state.upload_faults = ["timeout"]
+    progress = []
+    service.upload_progress_callback = lambda name, sent, total: progress.append(sent)
+
+    ok, msg, _ = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    assert state.uploads == 2
+    # 重试时重新从头发送文件
+    assert progress.count(release_file.stat().st_size) == 2
+
+
+def test_upload_gives_up_after_retries(release, release_file):
+    service, state = release
+    state.upload_faults = [500] * UPLOAD_RETRIES
+
+    ok, msg, url = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert not ok and url is None
+    assert f"已重试 {UPLOAD_RETRIES} 次" in msg
+    assert state.uploads == UPLOAD_RETRIES
+
+
+def test_upload_does_not_retry_client_errors(release, release_file):
+    service, state = release
+    state.upload_faults = [401]
+
+    ok, msg, _ = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert not ok
+    assert "fault 401" in msg
+    assert state.uploads == 1
+
+
+def test_retry_deletes_asset_left_by_lost_response(release, release_file):
+    """上传完成但响应丢失：重试前删除本次上传留下的同名附件"""
+    service, state = release
+    state.upload_faults = ["drop"]
+
+    ok, msg, _ = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    assert state.uploads == 2
+    assert len(state.deleted) == 1
+    [asset] = state.find(release_file.name)
+    assert asset["content"] == release_file.read_bytes()
+
+
+def test_retry_replaces_incomplete_asset(release, release_file):
+    """上次中断留下的未完成附件（state 为 new）删除后重传"""
+    service, state = release
+    leftover = state.add_asset(release_file.name, b"partial", state="new")
+
+    ok, msg, _ = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    assert state.deleted == [leftover["id"]]
+    [asset] = state.find(release_file.name)
+    assert asset["content"] == release_file.read_bytes()
+
+
+@pytest.mark.parametrize("faults", [[], [429]])
+def test_existing_asset_is_not_deleted(release, release_file, faults):
+    """422 可以重试，但 Release 中原有的同名附件不能被删除"""
+    service, state = release
+    existing = state.add_asset(release_file.name, b"published build")
+    state.upload_faults = list(faults)
+
+    ok, msg, url = service.upload_release_asset(RELEASE_ID, str(release_file), "token")
+
+    assert not ok and url is None
+    assert "已存在" in msg
+    assert state.deleted == []
+    assert state.find(release_file.name) == [existing]
+    assert existing["content"] == b"published build"
+
+
+def test_checksum_asset(release, release_file):
+    service, state = release
+
+    ok, msg, url = service.upload_checksum_asset(RELEASE_ID, str(release_file), "token")
+
+    assert ok, msg
+    checksum_name = f"{release_file.name}.sha256"
+    assert url.endswith(checksum_name)
+    [asset] = state.find(checksum_name)
+    sha256 = hashlib.sha256(release_file.read_bytes()).hexdigest()
+    assert asset["content"].decode("utf-8") == f"{sha256}  {release_file.name}\n"
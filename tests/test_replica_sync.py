@@ -0,0 +1,77 @@
+"""
+副本同步测试
+
+数据库引擎在导入 client.models 时按环境变量创建，每个节点在单独的子进程中运行
+"""
+import os
+import sys
+import sqlite3
+import subprocess
+import textwrap
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_node(script: str, shared_db: Path, replica_db: Path = None, node_id: str = "a",
+             check: bool = True) -> subprocess.CompletedProcess:
+    """在子进程中初始化数据库并执行脚本（指定 replica_db 时为副本模式，check 时要求成功退出）"""
+    env = dict(os.environ, DATABASE_PATH=str(shared_db), OFFLINE_MODE="True")
+    if replica_db is not None:
+        env.update(REPLICA_MODE="True", REPLICA_DB_PATH=str(replica_db), SYNC_NODE_ID=node_id)
+    code = "from client.models.database import init_db\ninit_db()\n" + textwrap.dedent(script)
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if check:
+        assert result.returncode == 0, result.stderr[-3000:]
+    return result
+
+
+def fetch(db_path: Path, sql: str) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute(sql).fetchall())
+    finally:
+        conn.close()
+
+
+def test_replica_save_pushes_history_and_bulk_tags(tmp_path):
+    """副本上批量写入的历史记录和标签关联（insert(Model) 批量插入）推送到共享数据库"""
+    shared_db, replica_db = tmp_path / "shared.db", tmp_path / "a.db"
+    run_node("", shared_db)
+    run_node("""
+        from client.services import RegulationService, ReplicaSyncService
+        sync = ReplicaSyncService()
+        assert sync.bootstrap()[0]
+        service = RegulationService()
+        ok, msg, regulation = service.create_regulation(code="R-1", name="法规1", created_by=1)
+        assert ok, msg
+        service.update_regulation(regulation.id, name="法规1-修改", updated_by=1)
+        assert service.bulk_tag([regulation.id], add=["批量"], updated_by=1)[0]
+        assert sync.get_pending_count() > 0
+        ok, msg, _ = sync.sync_once()
+        assert ok, msg
+        assert sync.get_pending_count() == 0
+    """, shared_db, replica_db)
+
+    local_history = fetch(replica_db, "SELECT id, change_summary FROM change_history")
+    assert len(local_history) >= 2
+    assert fetch(shared_db, "SELECT id, change_summary FROM change_history") == local_history
+
+    local_tags = fetch(replica_db, "SELECT regulation_id, tag_id FROM regulation_tags")
+    assert local_tags
+    assert fetch(shared_db, "SELECT regulation_id, tag_id FROM regulation_tags") == local_tags
+
+
+def test_direct_client_refused_on_replicated_database(tmp_path):
+    """共享数据库被副本使用后，未开启副本模式的客户端拒绝启动（其写入不会同步且主键会落入号段）"""
+    shared_db, replica_db = tmp_path / "shared.db", tmp_path / "a.db"
+    run_node("", shared_db)
+    run_node("""
+        from client.services import ReplicaSyncService
+        assert ReplicaSyncService().bootstrap()[0]
+    """, shared_db, replica_db)
+
+    result = run_node("", shared_db, check=False)
+    assert result.returncode != 0
+    assert "REPLICA_MODE=True" in result.stderr
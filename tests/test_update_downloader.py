@@ -0,0 +1,247 @@
+"""
+更新文件下载器测试
+
+本地 HTTP 服务器模拟更新文件下载地址，可关闭 Range 支持、更换文件（ETag）和在传输中途断开连接
+"""
+import os
+import re
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from client.services import update_downloader
+from client.services.update_downloader import UpdateDownloader
+
+
+class FileState:
+    """服务器上的文件和请求记录"""
+
+    def __init__(self, content: bytes, etag: str = '"v1"', supports_range: bool = True):
+        self.content = content
+        self.etag = etag
+        self.supports_range = supports_range
+        self.drop_after = []  # 依次用于后续的数据请求：只发送这么多字节就断开连接
+        self.after_probe = None  # 响应探测请求（bytes=0-0）后调用一次
+        self.ranges = []  # 数据请求的 (起点, 终点, If-Range)
+        self.lock = threading.Lock()
+
+    def replace(self, content: bytes, etag: str):
+        with self.lock:
+            self.content, self.etag = content, etag
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state: FileState = self.server.state
+        with state.lock:
+            content, etag = state.content, state.etag
+        total = len(content)
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+
+        is_probe = match is not None and match.group(1) == "0" and match.group(2) == "0"
+        if match and state.supports_range and (if_range is None or if_range == etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), total - 1) if match.group(2) else total - 1
+            status, body = 206, content[start:end + 1]
+        else:
+            start, end = 0, total - 1
+            status, body = 200, content
+
+        drop_after = None
+        if not is_probe:
+            with state.lock:
+                state.ranges.append((start, end, if_range))
+                if state.drop_after:
+                    drop_after = state.drop_after.pop(0)
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        if state.supports_range:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+        self.end_headers()
+        try:
+            if drop_after is not None:
+                self.wfile.write(body[:drop_after])
+                self.wfile.flush()
+                self.close_connection = True
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 探测请求只读取响应头，客户端提前关闭连接
+            self.close_connection = True
+
+        if is_probe and state.after_probe:
+            callback, state.after_probe = state.after_probe, None
+            callback()
+
+
+@pytest.fixture
+def file_server(http_server):
+    """启动文件服务器：start(FileState) -> 下载地址"""
+    def start(state: FileState) -> str:
+        server, base_url = http_server(FileHandler)
+        server.state = state
+        return f"{base_url}/SafetyManager.zip"
+    return start
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cancel_after_first_chunk(downloader: UpdateDownloader):
+    """进度回调：收到第一块数据后取消下载"""
+    def on_progress(done, total):
+        if done > 0:
+            downloader.cancel()
+    return on_progress
+
+
+def test_download_and_verify(file_server, tmp_path):
+    content = os.urandom(300_000)
+    url = file_server(FileState(content))
+    save_path = tmp_path / "update.zip"
+    progress = []
+
+    ok, msg = UpdateDownloader().download(
+        url, str(save_path), lambda done, total: progress.append((done, total)), sha256(content)
+    )
+
+    assert ok, msg
+    assert save_path.read_bytes() == content
+    assert progress[-1] == (len(content), len(content))
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+    assert not (tmp_path / "update.zip.part").exists()
+    assert not (tmp_path / "update.zip.part.json").exists()
+
+
+def test_resume_after_dropped_connection(file_server, tmp_path):
+    """连接中途断开后从已写入的位置继续请求"""
+    content = os.urandom(300_000)
+    state = FileState(content)
+    state.drop_after = [100_000]
+    url = file_server(state)
+    save_path = tmp_path / "update.zip"
+
+    ok, msg = UpdateDownloader().download(url, str(save_path), expected_sha256=sha256(content))
+
+    assert ok, msg
+    assert save_path.read_bytes() == content
+    assert len(state.ranges) == 2
+    assert state.ranges[0][:2] == (0, len(content) - 1)
+    resumed_from = state.ranges[1][0]
+    assert 0 < resumed_from <= 100_000
+    assert state.ranges[1][1:] == (len(content) - 1, '"v1"')
+
+
+def test_resume_in_new_download_after_cancel(file_server, tmp_path):
+    """取消后保留 .part 和进度文件，再次下载同一地址时只请求剩余部分"""
+    content = os.urandom(1_000_000)
+    state = FileState(content)
+    url = file_server(state)
+    save_path = tmp_path / "update.zip"
+
+    downloader = UpdateDownloader()
+    ok, msg = downloader.download(url, str(save_path), cancel_after_first_chunk(downloader))
+    assert not ok and msg == "下载已取消"
+    assert (tmp_path / "update.zip.part").exists()
+    assert (tmp_path / "update.zip.part.json").exists()
+
+    ok, msg = UpdateDownloader().download(url, str(save_path), expected_sha256=sha256(content))
+
+    assert ok, msg
+    assert save_path.read_bytes() == content
+    assert len(state.ranges) == 2
+    assert 0 < state.ranges[1][0] < len(content)
+
+
+def test_etag_change_restarts_download(file_server, tmp_path):
+    """服务器文件更换后作废已下载部分：If-Range 不匹配时本次失败，再次下载从头开始"""
+    old, new = os.urandom(1_000_000), os.urandom(900_000)
+    state = FileState(old)
+    url = file_server(state)
+    save_path = tmp_path / "update.zip"
+
+    downloader = UpdateDownloader()
+    ok, _ = downloader.download(url, str(save_path), cancel_after_first_chunk(downloader))
+    assert not ok
+
+    # 探测到的仍是旧文件，续传请求的 If-Range 不再匹配，服务器返回整个新文件（200）
+    state.after_probe = lambda: state.replace(new, '"v2"')
+    ok, msg = UpdateDownloader().download(url, str(save_path), expected_sha256=sha256(new))
+    assert not ok
+    assert "服务器文件已变化" in msg
+    assert state.ranges[-1][2] == '"v1"'
+
+    ok, msg = UpdateDownloader().download(url, str(save_path), expected_sha256=sha256(new))
+
+    assert ok, msg
+    assert save_path.read_bytes() == new
+    assert state.ranges[-1] == (0, len(new) - 1, '"v2"')
+
+
+def test_sha256_mismatch_rejected(file_server, tmp_path):
+    content = os.urandom(200_000)
+    url = file_server(FileState(content))
+    save_path = tmp_path / "update.zip"
+
+    ok, msg = UpdateDownloader().download(url, str(save_path), expected_sha256=sha256(b"other"))
+
+    assert not ok
+    assert "校验不通过" in msg
+    assert not save_path.exists()
+    # 校验失败的内容不保留，下次重新下载
+    assert not (tmp_path / "update.zip.part").exists()
+    assert not (tmp_path / "update.zip.part.json").exists()
+
+
+def test_parallel_segments(file_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(update_downloader, "PARALLEL_MIN_SIZE", 1024)
+    content = os.urandom(1_000_000)
+    state = FileState(content)
+    url = file_server(state)
+    save_path = tmp_path / "update.zip"
+    progress = []
+    lock = threading.Lock()
+
+    def on_progress(done, total):
+        with lock:
+            progress.append(done)
+
+    ok, msg = UpdateDownloader(connections=4).download(url, str(save_path), on_progress, sha256(content))
+
+    assert ok, msg
+    assert save_path.read_bytes() == content
+    assert sorted(start for start, _, _ in state.ranges) == [0, 250_000, 500_000, 750_000]
+    assert sorted(end for _, end, _ in state.ranges) == [249_999, 499_999, 749_999, 999_999]
+    assert max(progress) == len(content)
+
+
+def test_server_without_range_support(file_server, tmp_path):
+    """服务器不支持 Range 时整体下载，不写进度文件"""
+    content = os.urandom(300_000)
+    state = FileState(content, supports_range=False)
+    url = file_server(state)
+    save_path = tmp_path / "update.zip"
+    progress = []
+
+    ok, msg = UpdateDownloader(connections=4).download(
+        url, str(save_path), lambda done, total: progress.append((done, total)), sha256(content)
+    )
+
+    assert ok, msg
+    assert save_path.read_bytes() == content
+    assert state.ranges == [(0, len(content) - 1, None)]
+    assert progress[-1] == (len(content), len(content))
+    assert not (tmp_path / "update.zip.part.json").exists()